@@ -2,6 +2,7 @@
 
 import os
 import time
+from contextlib import nullcontext
 from datetime import datetime
 from typing import Optional
 
@@ -37,8 +38,11 @@ if not os.getenv('OPENAI_API_KEY'):
 
 
 from src.rag_engine import RAGEngine, DocumentInfo
+from src.vector_store_manager import SearchFilter
 from src.config import Config, ConfigError
 from src.answer_generator import Answer
+from src import tracing
+from src.profiling import profile_block
 
 
 st.markdown("""
@@ -177,6 +181,12 @@ def initialize_session_state():
     
     if 'processing' not in st.session_state:
         st.session_state.processing = False
+    
+    if 'ingest_jobs' not in st.session_state:
+        st.session_state.ingest_jobs = []
+    
+    if 'completed_ingests' not in st.session_state:
+        st.session_state.completed_ingests = []
 
 
 def display_header():
@@ -242,6 +252,30 @@ def display_sidebar():
                     - **Uploaded:** {doc['upload_time']}
                     - **Processing:** {doc.get('processing_time', 0):.2f}s
                     """)
+                    if doc.get('usage'):
+                        st.caption(f"Embedding: {doc['usage']['embedding_tokens']:,} tokens "
+                                   f"(~${doc['usage']['cost_usd']:.4f})")
+                    summary = st.session_state.rag_engine.get_summary(doc['filename'])
+                    if summary['status'] == 'pending':
+                        st.caption("Summary: being built in the background")
+                    elif summary['status'] == 'failed':
+                        st.caption("Summary: failed; overview questions use retrieval")
+                    if summary['summary'] and st.checkbox("Show summary", key=f"summary_doc_{i}"):
+                        st.markdown(summary['summary']['summary'])
+                        for section in summary['summary']['sections']:
+                            st.markdown(f"**{section['title']}** (pages {section['first_page'] + 1}-"
+                                        f"{section['last_page'] + 1}): {section['summary']}")
+                    if st.button(" Delete", key=f"delete_doc_{i}", use_container_width=True,
+                                 help="Remove this document's chunks from the database"):
+                        try:
+                            st.session_state.rag_engine.delete_document(doc['filename'])
+                            st.session_state.uploaded_documents = [
+                                d for d in st.session_state.uploaded_documents
+                                if d['filename'] != doc['filename']
+                            ]
+                            st.rerun()
+                        except Exception as e:
+                            st.error(f" Failed to delete: {e}")
         else:
             st.info(" No documents uploaded yet\n\nGo to the 'Upload Documents' tab to get started!")
         
@@ -274,6 +308,11 @@ def display_sidebar():
         st.divider()
         
         
+        if st.session_state.engine_initialized:
+            display_usage()
+            st.divider()
+        
+        
         st.subheader(" System Settings")
         if st.session_state.engine_initialized:
             config = st.session_state.rag_engine.config
@@ -283,7 +322,34 @@ def display_sidebar():
             - **Top-K Results:** `{config.get('retrieval.top_k')}`
             - **Chunk Size:** `{config.get('chunking.chunk_size')}`
             - **Chunk Overlap:** `{config.get('chunking.chunk_overlap')}`
+            - **Retrieval Mode:** `{config.get('retrieval.mode')}`
             """)
+            
+            cache_stats = st.session_state.rag_engine.get_cache_stats()
+            for label, key in (("Retrieval cache", "retrieval"), ("Answer cache", "answer"),
+                               ("Sentence embeddings", "sentences")):
+                stats = cache_stats[key]
+                if stats.get('enabled'):
+                    st.caption(
+                        f"{label}: {stats['hits']} hits / {stats['misses']} misses "
+                        f"({stats['hit_rate']:.0%} hit rate, {stats['size']} entries)"
+                    )
+            
+            scheduler_stats = st.session_state.rag_engine.get_scheduler_stats()
+            st.caption(
+                f"Provider queue: {scheduler_stats['queue_depth']} waiting, "
+                f"{scheduler_stats['in_flight']} in flight "
+                f"(questions wait {scheduler_stats['interactive']['avg_wait_ms']:.0f} ms avg, "
+                f"ingestion {scheduler_stats['bulk']['avg_wait_ms']:.0f} ms)"
+            )
+            
+            for route, stats in st.session_state.rag_engine.get_routing_stats().items():
+                st.caption(
+                    f"Route {route}: {stats['questions']} questions, "
+                    f"{stats['avg_latency_ms']:.0f} ms avg, "
+                    f"{stats['avg_completion_tokens']:.0f} completion tokens, "
+                    f"${stats['avg_cost_usd']:.5f} per answer"
+                )
         
         st.divider()
         
@@ -292,6 +358,33 @@ def display_sidebar():
         st.caption("Your data is processed securely")
 
 
+def display_usage():
+    
+    st.subheader(" Usage")
+    usage = st.session_state.rag_engine.get_usage_stats()
+    session, today = usage['session'], usage['today']
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Session tokens", f"{session['total_tokens']:,}")
+        st.metric("Session cost", f"${session['cost_usd']:.4f}")
+    with col2:
+        st.metric("Today tokens", f"{today['total_tokens']:,}")
+        st.metric("Today cost", f"${today['cost_usd']:.4f}")
+    st.caption(
+        f"Session: {session['prompt_tokens']:,} prompt, {session['completion_tokens']:,} completion, "
+        f"{session['embedding_tokens']:,} embedding tokens over {session['llm_calls']} answers"
+    )
+    
+    for label, spent, budget in (("Session budget", session['cost_usd'], usage['session_budget_usd']),
+                                 ("Daily budget", today['cost_usd'], usage['global_budget_usd'])):
+        if budget:
+            st.progress(min(spent / budget, 1.0), text=f"{label}: ${spent:.4f} of ${budget:.2f}")
+    if usage['over_budget']:
+        st.warning(f"The {usage['over_budget']} budget is spent: answers now use fewer "
+                   f"chunks and a cheaper configuration.")
+
+
 def handle_pdf_upload():
  
     st.subheader(" Upload PDF Document")
@@ -328,52 +421,13 @@ def handle_pdf_upload():
                 with open(temp_path, "wb") as f:
                     f.write(uploaded_file.getbuffer())
                 
-                
-                with st.status(" Processing document...", expanded=True) as status:
-                    st.write(" Loading PDF...")
-                    time.sleep(0.3)
-                    
-                    st.write(" Splitting into chunks...")
-                    time.sleep(0.3)
-                    
-                    st.write(" Generating embeddings...")
-                    time.sleep(0.3)
-                    
-                    st.write(" Storing in database...")
-                    
-                
-                    start_time = time.time()
-                    doc_info = st.session_state.rag_engine.ingest_document(
-                        temp_path,
-                        show_progress=False
-                    )
-                    processing_time = time.time() - start_time
-                    
-                    status.update(label=" Document processed successfully!", state="complete")
-                
-                
-                st.session_state.uploaded_documents.append({
-                    'filename': uploaded_file.name,
-                    'chunk_count': doc_info.chunk_count,
-                    'file_size_mb': doc_info.file_size_mb,
-                    'upload_time': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    'processing_time': processing_time
-                })
-                
-                
-                st.markdown(f"""
-                    <div class="success-box">
-                        <strong> Success!</strong><br><br>
-                         <strong>Document:</strong> {uploaded_file.name}<br>
-                         <strong>Chunks created:</strong> {doc_info.chunk_count}<br>
-                         <strong>Processing time:</strong> {processing_time:.2f}s<br>
-                         <strong>File size:</strong> {doc_info.file_size_mb:.2f} MB
-                    </div>
-                """, unsafe_allow_html=True)
-                
-                st.balloons()
-                time.sleep(2)
-                st.rerun()
+                # The engine keeps its own copy, so the temp file can go now;
+                # ingestion continues in the background while the page polls it.
+                job_id = st.session_state.rag_engine.submit_ingest(
+                    temp_path,
+                    source_name=uploaded_file.name
+                )
+                st.session_state.ingest_jobs.append(job_id)
                 
             except Exception as e:
                 st.markdown(f"""
@@ -396,6 +450,89 @@ def handle_pdf_upload():
             <p style="color: #6c757d;">Upload a PDF document to get started</p>
         </div>
         """, unsafe_allow_html=True)
+    
+    if st.session_state.ingest_jobs:
+        display_ingest_jobs()
+    
+    # Shown once, on the full rerun that follows a finished job
+    completed_ingests = st.session_state.completed_ingests
+    st.session_state.completed_ingests = []
+    for done in completed_ingests:
+        st.markdown(f"""
+            <div class="success-box">
+                <strong> Success!</strong><br><br>
+                 <strong>Document:</strong> {done['filename']}<br>
+                 <strong>Chunks created:</strong> {done['chunk_count']}<br>
+                 <strong>Processing time:</strong> {done['processing_time']:.2f}s<br>
+                 <strong>File size:</strong> {done['file_size_mb']:.2f} MB
+            </div>
+        """, unsafe_allow_html=True)
+    if completed_ingests:
+        st.balloons()
+
+
+@st.fragment(run_every=1.0)
+def display_ingest_jobs():
+    
+    # Reruns on its own every second, so only this block refreshes while
+    # documents are ingested in the background.
+    engine = st.session_state.rag_engine
+    finished = False
+    
+    for job_id in list(st.session_state.ingest_jobs):
+        job = engine.get_ingest_job(job_id)
+        progress = job.progress
+        
+        if job.status == 'completed':
+            result = job.result
+            processing_time = job.finished_at - job.started_at
+            
+            # Re-uploading a file replaces its chunks, so replace its entry too
+            st.session_state.uploaded_documents = [
+                d for d in st.session_state.uploaded_documents
+                if d['filename'] != job.source
+            ]
+            st.session_state.uploaded_documents.append({
+                'filename': job.source,
+                'chunk_count': result['chunk_count'],
+                'file_size_mb': result['file_size_mb'],
+                'upload_time': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                'processing_time': processing_time,
+                'usage': (result.get('stats') or {}).get('usage')
+            })
+            st.session_state.ingest_jobs.remove(job_id)
+            st.session_state.completed_ingests.append({
+                'filename': job.source,
+                'chunk_count': result['chunk_count'],
+                'file_size_mb': result['file_size_mb'],
+                'processing_time': processing_time
+            })
+            finished = True
+        
+        elif job.status == 'failed':
+            st.markdown(f"""
+                <div class="error-box">
+                    <strong> Error processing {job.source}!</strong><br><br>
+                    {job.error}<br><br>
+                    <small>Please check the file and try again.</small>
+                </div>
+            """, unsafe_allow_html=True)
+            if st.button("Dismiss", key=f"dismiss_{job_id}"):
+                st.session_state.ingest_jobs.remove(job_id)
+                st.rerun()
+        
+        else:
+            label = f" {job.source}: " + (
+                "waiting for other uploads..." if job.status == 'queued' else
+                f"{progress.get('pages_parsed', 0)}/{progress.get('pages_total', '?')} pages parsed, "
+                f"{progress.get('chunks_embedded', 0)} chunks embedded, "
+                f"{progress.get('chunks_stored', 0)} stored"
+            )
+            st.progress(job.fraction_complete, text=label)
+    
+    if finished:
+        # Whole-page rerun so the sidebar and chat pick up the new documents
+        st.rerun(scope="app")
 
 
 def display_chat_interface():
@@ -464,6 +601,17 @@ def display_chat_interface():
 
     st.markdown("<br>", unsafe_allow_html=True)
     
+    
+    document_names = [doc['filename'] for doc in st.session_state.uploaded_documents]
+    selected_documents = st.multiselect(
+        " Search in documents",
+        options=document_names,
+        default=[],
+        placeholder="All documents",
+        help="Restrict answers to the selected documents. Leave empty to search everything."
+    )
+    search_filter = SearchFilter(sources=selected_documents) if selected_documents else None
+    
    
     if prompt := st.chat_input(" Ask a question about your documents...", key="chat_input"):
         
@@ -483,7 +631,7 @@ def display_chat_interface():
             with st.spinner("Thinking..."):
                 try:
                     start_time = time.time()
-                    answer = st.session_state.rag_engine.ask_question(prompt)
+                    answer = st.session_state.rag_engine.ask_question(prompt, filters=search_filter)
                     generation_time = time.time() - start_time
                     
                   
@@ -495,7 +643,14 @@ def display_chat_interface():
                             for i, source in enumerate(answer.sources, 1):
                                 st.markdown(f"**{i}.** {source}")
                     
-                    st.caption(f"⏱️ Generated in {generation_time:.2f}s")
+                    st.caption(
+                        f"⏱️ Generated in {generation_time:.2f}s · "
+                        f"{answer.usage['total_tokens']} tokens (~${answer.usage['cost_usd']:.4f})"
+                        + (f" · {answer.usage['route']} route" if answer.usage['route'] else "")
+                    )
+                    if answer.usage['degraded']:
+                        st.caption(f"The {answer.usage['degraded']} budget is spent: "
+                                   f"answered with fewer chunks and a cheaper configuration.")
                     
                  
                     st.session_state.messages.append({
@@ -514,6 +669,49 @@ def display_chat_interface():
                     })
 
 
+def display_trace_waterfall(trace: dict):
+    
+    # One bar per span, placed at its start offset within the trace
+    spans = trace['spans']
+    if not spans:
+        return
+    rows = [
+        {
+            "span": f"{'  ' * _span_depth(span, spans)}{span['name']} #{span['span_id']}",
+            "start_ms": span['offset_ms'],
+            "end_ms": span['offset_ms'] + span['duration_ms'],
+            "duration_ms": span['duration_ms'],
+            "details": ", ".join(f"{key}={value}" for key, value in span['attributes'].items())
+        }
+        for span in spans
+    ]
+    st.vega_lite_chart({
+        "data": {"values": rows},
+        "mark": {"type": "bar", "tooltip": True},
+        "encoding": {
+            "y": {"field": "span", "type": "nominal", "sort": None, "title": None},
+            "x": {"field": "start_ms", "type": "quantitative", "title": "ms"},
+            "x2": {"field": "end_ms"},
+            "color": {"field": "span", "type": "nominal", "legend": None},
+            "tooltip": [
+                {"field": "span"}, {"field": "duration_ms"}, {"field": "details"}
+            ]
+        },
+        "height": max(80, 24 * len(rows))
+    }, use_container_width=True)
+
+
+def _span_depth(span: dict, spans: list) -> int:
+    
+    parents = {s['span_id']: s['parent_id'] for s in spans}
+    depth = 0
+    parent = span['parent_id']
+    while parent is not None:
+        depth += 1
+        parent = parents.get(parent)
+    return depth
+
+
 def display_evaluation_interface():
    
     st.subheader(" System Evaluation & Debugging")
@@ -614,9 +812,16 @@ def display_evaluation_interface():
             height=100
         )
     
+    profile_run = st.checkbox("Profile this run", help="Sample the call stacks while answering, "
+                              "to see where the time goes (Chroma, LangChain, prompt building, network)")
+    
     if st.button("Generate & Evaluate Answer", type="primary") and eval_question:
         try:
-            with st.spinner("Processing..."):
+            profiling_config = st.session_state.rag_engine.config.get_section('profiling')
+            with st.spinner("Processing..."), tracing.capture("evaluate") as root, (
+                profile_block("evaluate", interval=profiling_config.get('interval_ms', 5) / 1000)
+                if profile_run else nullcontext()
+            ) as profile:
                 
                 start_retrieval = time.time()
                 chunks = st.session_state.rag_engine.query_processor.retrieve_context(eval_question)
@@ -662,9 +867,60 @@ def display_evaluation_interface():
                         st.warning(" Partial coverage of expected content")
                     else:
                         st.error(" Low coverage of expected content")
+            
+            trace = tracing.get_trace(root.trace_id)
+            if trace is not None:
+                st.markdown("####  Stage Waterfall")
+                display_trace_waterfall(trace)
+            
+            # Kept across reruns: clicking a download button reruns the script
+            if profile is not None:
+                st.session_state.eval_profile = profile
                 
         except Exception as e:
             st.error(f"Error during evaluation: {e}")
+    
+    profiles = [("Evaluation run", st.session_state.get('eval_profile')),
+                ("Last profiled ask / ingest", st.session_state.rag_engine.last_profile)]
+    profiles = [(label, profile) for label, profile in profiles if profile is not None]
+    if profiles:
+        st.divider()
+        st.markdown("###  Profiles")
+        st.caption("Open .speedscope.json at speedscope.app; .collapsed.txt works with flamegraph.pl and speedscope.")
+    for label, profile in profiles:
+        st.markdown(f"**{label}:** {profile.name}, {profile.duration:.2f}s, {profile.sample_count} samples")
+        col_a, col_b = st.columns(2)
+        with col_a:
+            st.download_button(
+                "Download speedscope JSON", profile.render('speedscope'),
+                file_name=f"{profile.name}-{profile.profile_id}.speedscope.json",
+                mime="application/json", key=f"speedscope_{profile.profile_id}"
+            )
+        with col_b:
+            st.download_button(
+                "Download collapsed stacks", profile.render('collapsed'),
+                file_name=f"{profile.name}-{profile.profile_id}.collapsed.txt",
+                mime="text/plain", key=f"collapsed_{profile.profile_id}"
+            )
+        if profile.memory is not None:
+            st.caption(f"Peak traced memory: {profile.memory['peak_mb']:.1f} MB")
+            if profile.memory['top']:
+                st.dataframe(profile.memory['top'], use_container_width=True)
+    
+    if tracing.tracing_enabled():
+        st.divider()
+        st.markdown("###  Recent Traces")
+        traces = tracing.recent_traces()
+        if not traces:
+            st.caption("No traces recorded yet")
+        else:
+            labels = {
+                f"{trace['spans'][0]['name'] if trace['spans'] else '?'} · "
+                f"{datetime.fromtimestamp(trace['started']).strftime('%H:%M:%S')} · {trace['trace_id']}": trace
+                for trace in traces
+            }
+            selected = st.selectbox("Trace", list(labels))
+            display_trace_waterfall(labels[selected])
 
 
 def main():
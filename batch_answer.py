@@ -0,0 +1,51 @@
+"""Pre-answer a problem set (JSONL or CSV) against the indexed documents."""
+
+# Usage:
+#   python batch_answer.py questions.jsonl answers.jsonl [--concurrency 16] [--batch-size 64]
+#
+# Re-running with the same output file resumes: questions already answered
+# there are skipped and failed ones are retried.
+
+import argparse
+import sys
+
+from src.batch_answering import BatchAnswerer, load_questions
+from src.config import Config
+from src.rag_engine import RAGEngine
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("input", help="Questions: .jsonl or .csv with a 'question' column")
+    parser.add_argument("output", help="Answers are appended here as JSONL")
+    parser.add_argument("--config", default="config.yaml", help="Path to config.yaml")
+    parser.add_argument("--concurrency", type=int, help="Overrides batch.max_concurrency")
+    parser.add_argument("--batch-size", type=int, help="Overrides batch.retrieval_batch_size")
+    args = parser.parse_args()
+
+    questions = load_questions(args.input)
+    engine = RAGEngine(Config(args.config))
+    answerer = BatchAnswerer.from_config(engine)
+    if args.concurrency:
+        answerer.max_concurrency = args.concurrency
+    if args.batch_size:
+        answerer.retrieval_batch_size = args.batch_size
+
+    def on_progress(done, total):
+        print(f"\r{done}/{total} questions", end="", flush=True)
+
+    stats = answerer.run(questions, args.output, on_progress=on_progress)
+    print()
+    print(f"Answered {stats['answered']}, failed {stats['failed']}, "
+          f"skipped {stats['skipped']} already answered, in {stats['elapsed_seconds']:.1f}s")
+    usage = stats['usage']
+    print(f"Tokens: {usage['total_tokens']} ({usage['prompt_tokens']} prompt, "
+          f"{usage['completion_tokens']} completion, {usage['embedding_tokens']} embedding), "
+          f"about ${usage['cost_usd']:.4f}")
+
+    return 1 if stats['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
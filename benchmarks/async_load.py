@@ -0,0 +1,134 @@
+"""Benchmark concurrent questions: thread-per-request ask_question vs asyncio aask_question."""
+
+# Usage: python -m benchmarks.async_load [--questions 400] [--threads 32] [--llm-latency 0.5]
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import yaml
+from langchain_core.documents import Document
+
+from src.config import Config
+from src.rag_engine import RAGEngine
+
+
+TOPICS = [
+    "Newton's second law relates force, mass and acceleration: F = ma.",
+    "Ohm's law states that voltage equals current times resistance.",
+    "Snell's law relates the angles of incidence and refraction.",
+    "The ideal gas law is PV = nRT.",
+    "Kinetic energy is one half of mass times velocity squared.",
+    "Photosynthesis converts light energy into chemical energy.",
+]
+
+
+def make_engine(persist_directory: str, embedding_latency: float, llm_latency: float) -> RAGEngine:
+
+    config_path = os.path.join(persist_directory, "config.yaml")
+    with open(config_path, "w") as f:
+        # Every question is distinct and caches are off, so each one pays for
+        # a full embedding call and a full LLM call.
+        yaml.safe_dump({
+            "embedding": {"provider": "stub", "model": "stub"},
+            "llm": {"provider": "stub", "model": "stub"},
+            "retrieval": {"top_k": 3, "cache": {"enabled": False}},
+            "answer_cache": {"enabled": False},
+            "concurrency": {"coalesce_questions": False},
+            "storage": {"persist_directory": persist_directory},
+        }, f)
+
+    engine = RAGEngine(Config(config_path, load_env=False))
+    engine.embedding_service._embeddings.latency = embedding_latency
+    engine.answer_generator._llm.latency = llm_latency
+    engine.vector_store_manager.replace_document("physics.pdf", [
+        Document(page_content=text, metadata={"page": i}) for i, text in enumerate(TOPICS)
+    ])
+    return engine
+
+
+def questions(count: int, run: str) -> List[str]:
+
+    return [f"({run} {i}) Explain: {TOPICS[i % len(TOPICS)]}" for i in range(count)]
+
+
+def percentile(values: List[float], q: float) -> float:
+
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def report(label: str, latencies: List[float], elapsed: float, peak_threads: int) -> None:
+
+    print(f"{label:<22} {len(latencies) / elapsed:>9.1f} {statistics.median(latencies) * 1000:>9.0f} "
+          f"{percentile(latencies, 0.95) * 1000:>9.0f} {elapsed:>9.2f} {peak_threads:>8}")
+
+
+def run_threads(engine: RAGEngine, batch: List[str], threads: int):
+
+    latencies = []
+    peak = [threading.active_count()]
+
+    def ask(question):
+        start = time.perf_counter()
+        engine.ask_question(question, use_context=False)
+        latencies.append(time.perf_counter() - start)
+        peak[0] = max(peak[0], threading.active_count())
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(ask, batch))
+    return latencies, time.perf_counter() - start, peak[0]
+
+
+async def run_async(engine: RAGEngine, batch: List[str]):
+
+    latencies = []
+    peak = [threading.active_count()]
+
+    async def ask(question):
+        start = time.perf_counter()
+        await engine.aask_question(question, use_context=False)
+        latencies.append(time.perf_counter() - start)
+        peak[0] = max(peak[0], threading.active_count())
+
+    start = time.perf_counter()
+    await asyncio.gather(*(ask(question) for question in batch))
+    return latencies, time.perf_counter() - start, peak[0]
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--questions", type=int, default=400, help="Concurrent distinct questions per run")
+    parser.add_argument("--threads", nargs="+", type=int, default=[8, 32, 128],
+                        help="Thread pool sizes for the sync runs")
+    parser.add_argument("--embedding-latency", type=float, default=0.05, help="Seconds per stub embedding call")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds per stub LLM call")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(tmp, args.embedding_latency, args.llm_latency)
+
+        print("=" * 72)
+        print(f"{args.questions} questions, embedding {args.embedding_latency * 1000:.0f} ms, "
+              f"LLM {args.llm_latency * 1000:.0f} ms (stub providers)")
+        print("=" * 72)
+        print(f"{'mode':<22} {'q/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'total s':>9} {'threads':>8}")
+
+        for threads in args.threads:
+            latencies, elapsed, peak = run_threads(engine, questions(args.questions, f"t{threads}"), threads)
+            report(f"sync, {threads} threads", latencies, elapsed, peak)
+
+        latencies, elapsed, peak = asyncio.run(run_async(engine, questions(args.questions, "async")))
+        report("async, 1 event loop", latencies, elapsed, peak)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Benchmark two-level retrieval (document centroids -> chunks) against flat search as the corpus grows."""
+
+# Usage: python -m benchmarks.document_routing [--documents 50 200 800] [--routed 5] [--k 4]
+#
+# Each synthetic document covers two subjects in different proportions and
+# chapters, so documents overlap the way a shelf of textbooks does. Recall is
+# the share of flat search's top k that routed search also returns; since many
+# documents cover the same subject, relevance (mean cosine of the routed top k
+# over that of the flat top k) shows whether the chunks it returns instead are
+# as good.
+
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from typing import List, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from benchmarks.synthetic_corpus import SUBJECTS, _sentence, make_questions
+from src.embedding_service import EmbeddingService
+from src.vector_store_manager import VectorStoreManager, SearchFilter
+
+
+def document_chunks(index: int, chunks: int, chunks_per_page: int, seed: int) -> Tuple[str, List[Document]]:
+
+    rng = random.Random(seed * 100003 + index)
+    first, second = rng.sample(list(SUBJECTS), 2)
+    share = rng.uniform(0.5, 0.9)
+    source = f"textbook_{index + 1:04d}.pdf"
+    documents = []
+    for i in range(chunks):
+        # The first share of the book is about one subject, the rest about the other
+        terms = SUBJECTS[first if i < share * chunks else second]
+        text = " ".join(_sentence(rng, terms) for _ in range(6))
+        documents.append(Document(
+            page_content=text,
+            metadata={"source": source, "page": i // chunks_per_page, "chunk_index": i}
+        ))
+    return source, documents
+
+
+def build_corpus(store: VectorStoreManager, start: int, stop: int, args) -> None:
+
+    service = store.embedding_service
+    for index in range(start, stop):
+        source, chunks = document_chunks(index, args.chunks, args.chunks_per_page, args.seed)
+        embeddings = service.embed_documents([chunk.page_content for chunk in chunks])
+        store.add_embedded_documents(
+            chunks, embeddings, store.make_chunk_ids(source, len(chunks)), save_lexical=False
+        )
+        store.refresh_document_centroids(source)
+
+
+def mean_similarity(store: VectorStoreManager, embedding: List[float], k: int,
+                    sources: List[str] = None) -> float:
+
+    # Mean cosine similarity of the top k chunks to the (unit) query
+    where = SearchFilter(sources=sources).to_where() if sources else None
+    results = store._get_vector_store()._collection.query(
+        query_embeddings=[embedding], n_results=k, where=where, include=['embeddings']
+    )
+    vectors = np.asarray(results['embeddings'][0], dtype=np.float32)
+    return float(np.mean(vectors @ np.asarray(embedding, dtype=np.float32)))
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", nargs="+", type=int, default=[50, 200, 800],
+                        help="Corpus sizes, each grown from the previous one")
+    parser.add_argument("--chunks", type=int, default=40, help="Chunks per document")
+    parser.add_argument("--chunks-per-page", type=int, default=2)
+    parser.add_argument("--routed", type=int, default=5, help="Documents searched per question")
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--questions", type=int, default=60)
+    parser.add_argument("--dim", type=int, default=256, help="Stub embedding dimension")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    service = EmbeddingService(provider="stub", model="stub")
+    service._embeddings.dimension = args.dim
+    questions = [question for _, question in make_questions(args.questions, args.seed)]
+    embeddings = service.embed_queries(questions)
+
+    print("=" * 72)
+    print(f"Document routing, {args.chunks} chunks/document, k={args.k}, "
+          f"{args.routed} routed documents, dim={args.dim}")
+    print("=" * 72)
+    print(f"{'documents':>9} {'chunks':>8} {'flat (ms)':>10} {'routed (ms)':>12} "
+          f"{'route (ms)':>11} {'recall@k':>9} {'relevance':>10}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = VectorStoreManager(service, persist_directory=tmp, collection_name="routing",
+                                   document_routing=True)
+        built = 0
+        for size in sorted(args.documents):
+            build_corpus(store, built, size, args)
+            built = size
+            router = store._get_document_router()
+
+            flat_seconds, routed_seconds, route_seconds, recall, relevance = [], [], [], [], []
+            for embedding in embeddings:
+                start = time.perf_counter()
+                flat = store.similarity_search_by_vectors([embedding], k=args.k)[0]
+                flat_seconds.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                sources = [source for source, _ in router.route(embedding, args.routed)]
+                routed_at = time.perf_counter()
+                routed = store.similarity_search_by_vectors(
+                    [embedding], k=args.k, filters=SearchFilter(sources=sources)
+                )[0]
+                route_seconds.append(routed_at - start)
+                routed_seconds.append(time.perf_counter() - start)
+
+                flat_ids = {doc.id for doc in flat}
+                recall.append(len(flat_ids & {doc.id for doc in routed}) / max(len(flat_ids), 1))
+                flat_score = mean_similarity(store, embedding, args.k)
+                routed_score = mean_similarity(store, embedding, args.k, sources)
+                relevance.append(routed_score / flat_score if flat_score > 0 else 1.0)
+
+            print(f"{size:>9} {size * args.chunks:>8} {statistics.median(flat_seconds) * 1000:>10.2f} "
+                  f"{statistics.median(routed_seconds) * 1000:>12.2f} "
+                  f"{statistics.median(route_seconds) * 1000:>11.3f} {statistics.mean(recall):>9.2f} "
+                  f"{statistics.mean(relevance):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+"""Simulate many concurrent chat sessions against one RAGEngine for capacity planning."""
+
+# Usage:
+#   python -m benchmarks.load_test --sessions 100 --duration 60
+#   python -m benchmarks.load_test --sessions 40 --mode threads --llm-median 2 --llm-p95 6 \
+#       --mix new=0.5,follow_up=0.35,popular=0.15 --config config.yaml --output load.json
+#
+# Every session is one student: it asks a question, waits an exponentially
+# distributed think time, and asks again, keeping its own conversation
+# history for follow-ups. Providers are stubs with log-normal latency (set
+# by median and p95) and an optional LLM error rate; retrieval, caching and
+# coalescing come from --config. --mode async drives aask_question on one
+# event loop (the HTTP server); --mode threads runs ask_question on one
+# thread per session (the Streamlit app).
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import resource
+import statistics
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import List, Dict, Any, Callable, Optional
+
+import yaml
+
+from benchmarks.synthetic_corpus import make_corpus, make_questions, SUBJECTS
+from src.config import Config
+from src.rag_engine import RAGEngine
+from src.request_timing import collect_timings
+
+
+FOLLOW_UPS = [
+    "Can you explain that in more detail?",
+    "What are the units in that answer?",
+    "Can you give a worked example of it?",
+    "Why does that happen?",
+    "How is that different from what we covered before?",
+]
+
+HISTORY_TURNS = 5
+
+
+def lognormal_sampler(median: float, p95: float, seed: int) -> Callable[[], float]:
+
+    # Log-normal with the given median and 95th percentile: most calls are
+    # quick, a long tail is slow, like hosted model APIs.
+    if median <= 0:
+        return lambda: 0.0
+    sigma = math.log(max(p95, median) / median) / 1.645
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    def sample() -> float:
+        with lock:
+            return rng.lognormvariate(math.log(median), sigma)
+
+    return sample
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("new", "follow_up", "popular"):
+            raise SystemExit(f"Unknown question kind in --mix: {name}")
+        mix[name] = float(weight)
+    if sum(mix.values()) <= 0:
+        raise SystemExit("--mix weights must add up to more than 0")
+    return mix
+
+
+def rss_mb() -> float:
+
+    # Current resident set size; falls back to the peak where /proc is missing
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class LoadRecorder:
+
+    def __init__(self):
+
+        self.requests: List[Dict[str, Any]] = []
+        self.timeline: List[Dict[str, Any]] = []
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def begin(self) -> None:
+
+        with self._lock:
+            self.in_flight += 1
+
+    def record(self, kind: str, seconds: float, timings: Dict[str, float], error: Optional[str]) -> None:
+
+        with self._lock:
+            self.in_flight -= 1
+            self.requests.append({
+                "finished": time.perf_counter(),
+                "kind": kind,
+                "seconds": seconds,
+                "timings": dict(timings),
+                "error": error
+            })
+
+    def sample(self, elapsed: float) -> None:
+
+        with self._lock:
+            completed = len(self.requests)
+            errors = sum(1 for r in self.requests if r["error"])
+            in_flight = self.in_flight
+        self.timeline.append({
+            "elapsed_seconds": round(elapsed, 1),
+            "completed": completed,
+            "errors": errors,
+            "in_flight": in_flight,
+            "rss_mb": round(rss_mb(), 1)
+        })
+
+
+class Session:
+
+    def __init__(self, number: int, mix: Dict[str, float], questions: List[str], popular: List[str], seed: int):
+
+        self.rng = random.Random(seed * 100003 + number)
+        self.kinds = list(mix)
+        self.weights = [mix[kind] for kind in self.kinds]
+        self.questions = questions
+        self.popular = popular
+        self.history: List[Dict[str, str]] = []
+
+    def next_question(self):
+
+        kind = self.rng.choices(self.kinds, self.weights)[0]
+        if kind == "follow_up" and not self.history:
+            kind = "new"
+        if kind == "follow_up":
+            return kind, self.rng.choice(FOLLOW_UPS)
+        if kind == "popular":
+            return kind, self.rng.choice(self.popular)
+        return kind, self.rng.choice(self.questions)
+
+    def remember(self, question: str, answer: str) -> None:
+
+        self.history.append({"question": question, "answer": answer})
+        del self.history[:-HISTORY_TURNS]
+
+
+def make_engine(args, directory: str) -> RAGEngine:
+
+    # The deployment's retrieval and cache settings, with stub providers and
+    # a scratch vector store
+    settings = {}
+    if args.config:
+        with open(args.config) as f:
+            settings = yaml.safe_load(f) or {}
+    settings["embedding"] = {"provider": "stub", "model": "stub"}
+    settings["llm"] = {"provider": "stub", "model": "stub"}
+    settings["storage"] = dict(settings.get("storage") or {}, persist_directory=os.path.join(directory, "db"))
+
+    config_path = os.path.join(directory, "config.yaml")
+    with open(config_path, "w") as f:
+        yaml.safe_dump(settings, f)
+    engine = RAGEngine(Config(config_path, load_env=False))
+
+    print(f"Indexing {args.documents} x {args.pages} synthetic pages...")
+    for path in make_corpus(os.path.join(directory, "corpus"), args.documents, args.pages, args.seed):
+        engine.ingest_document(path, show_progress=False)
+
+    # Latency is switched on only after indexing, so setup stays quick
+    engine.embedding_service._embeddings.latency = lognormal_sampler(
+        args.embedding_median, args.embedding_p95, args.seed
+    )
+    llm = engine.answer_generator._llm
+    llm.latency = lognormal_sampler(args.llm_median, args.llm_p95, args.seed + 1)
+    llm.failure_rate = args.llm_error_rate
+    return engine
+
+
+def ask(engine: RAGEngine, session: Session, recorder: LoadRecorder, kind: str, question: str) -> None:
+
+    recorder.begin()
+    start = time.perf_counter()
+    error = None
+    with collect_timings() as timings:
+        try:
+            answer = engine.ask_question(question, use_context=True, history=session.history)
+            session.remember(question, answer.text)
+        except Exception as e:
+            error = str(e)[:300] or type(e).__name__
+    recorder.record(kind, time.perf_counter() - start, timings, error)
+
+
+async def aask(engine: RAGEngine, session: Session, recorder: LoadRecorder, kind: str, question: str) -> None:
+
+    recorder.begin()
+    start = time.perf_counter()
+    error = None
+    with collect_timings() as timings:
+        try:
+            answer = await engine.aask_question(question, use_context=True, history=session.history)
+            session.remember(question, answer.text)
+        except Exception as e:
+            error = str(e)[:300] or type(e).__name__
+    recorder.record(kind, time.perf_counter() - start, timings, error)
+
+
+def run_threads(engine: RAGEngine, sessions: List[Session], recorder: LoadRecorder, args) -> None:
+
+    deadline = time.perf_counter() + args.duration
+
+    def student(session: Session):
+        # Staggered start so sessions do not all fire at once
+        time.sleep(session.rng.uniform(0, args.think_time))
+        while time.perf_counter() < deadline:
+            kind, question = session.next_question()
+            ask(engine, session, recorder, kind, question)
+            time.sleep(session.rng.expovariate(1 / args.think_time) if args.think_time else 0)
+
+    threads = [threading.Thread(target=student, args=(session,), daemon=True) for session in sessions]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+async def run_async(engine: RAGEngine, sessions: List[Session], recorder: LoadRecorder, args) -> None:
+
+    deadline = time.perf_counter() + args.duration
+
+    async def student(session: Session):
+        await asyncio.sleep(session.rng.uniform(0, args.think_time))
+        while time.perf_counter() < deadline:
+            kind, question = session.next_question()
+            await aask(engine, session, recorder, kind, question)
+            await asyncio.sleep(session.rng.expovariate(1 / args.think_time) if args.think_time else 0)
+
+    await asyncio.gather(*(student(session) for session in sessions))
+
+
+def percentiles_ms(values: List[float]) -> Dict[str, float]:
+
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def at(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+
+    return {
+        "count": len(values),
+        "mean": round(statistics.fmean(values) * 1000, 1),
+        "p50": at(0.50),
+        "p95": at(0.95),
+        "p99": at(0.99),
+        "max": round(ordered[-1] * 1000, 1)
+    }
+
+
+def summarize(recorder: LoadRecorder, elapsed: float, args) -> Dict[str, Any]:
+
+    requests = recorder.requests
+    ok = [r for r in requests if not r["error"]]
+
+    # "search" is retrieval minus the query embedding inside it
+    stages = {"embed": [], "search": [], "generate": []}
+    for r in ok:
+        timings = r["timings"]
+        embed = timings.get("embed", 0.0)
+        stages["embed"].append(embed)
+        if "retrieve" in timings:
+            stages["search"].append(max(0.0, timings["retrieve"] - embed))
+        if "generate" in timings:
+            stages["generate"].append(timings["generate"])
+
+    # Grouped by the innermost message: engine errors wrap the provider's
+    errors = Counter(r["error"].rsplit(": ", 1)[-1] for r in requests if r["error"])
+    return {
+        "settings": {key: value for key, value in vars(args).items() if key != "output"},
+        "elapsed_seconds": round(elapsed, 2),
+        "requests": len(requests),
+        "throughput_per_second": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        "error_rate": round(len(requests) and (len(requests) - len(ok)) / len(requests), 4),
+        "errors": dict(errors),
+        "latency_ms": {
+            "total": percentiles_ms([r["seconds"] for r in ok]),
+            **{stage: percentiles_ms(values) for stage, values in stages.items()}
+        },
+        "latency_ms_by_kind": {
+            kind: percentiles_ms([r["seconds"] for r in ok if r["kind"] == kind])
+            for kind in sorted({r["kind"] for r in ok})
+        },
+        "peak_rss_mb": max((row["rss_mb"] for row in recorder.timeline), default=round(rss_mb(), 1)),
+        "timeline": recorder.timeline
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+
+    print()
+    print("=" * 72)
+    print(f"{report['requests']} requests in {report['elapsed_seconds']}s: "
+          f"{report['throughput_per_second']} answers/s, error rate {report['error_rate']:.2%}")
+    if report["errors"]:
+        print(f"Errors: {report['errors']}")
+    print("=" * 72)
+    print(f"{'stage':<12} {'count':>7} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    rows = list(report["latency_ms"].items()) + [
+        (f"  {kind}", stats) for kind, stats in report["latency_ms_by_kind"].items()
+    ]
+    for name, stats in rows:
+        if not stats.get("count"):
+            continue
+        print(f"{name:<12} {stats['count']:>7} {stats['mean']:>9.1f} {stats['p50']:>9.1f} "
+              f"{stats['p95']:>9.1f} {stats['p99']:>9.1f} {stats['max']:>9.1f}")
+    print(f"\nPeak RSS {report['peak_rss_mb']:.0f} MB")
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=50, help="Concurrent students")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds to keep asking")
+    parser.add_argument("--think-time", type=float, default=5.0, help="Mean seconds between a session's questions")
+    parser.add_argument("--mode", choices=["async", "threads"], default="async")
+    parser.add_argument("--mix", default="new=0.5,follow_up=0.35,popular=0.15",
+                        help="Weights of new questions, follow-ups and questions many students ask")
+    parser.add_argument("--config", help="Take retrieval, cache and concurrency settings from this config")
+    parser.add_argument("--documents", type=int, default=2)
+    parser.add_argument("--pages", type=int, default=100, help="Pages per synthetic document")
+    parser.add_argument("--embedding-median", type=float, default=0.05, help="Seconds")
+    parser.add_argument("--embedding-p95", type=float, default=0.15, help="Seconds")
+    parser.add_argument("--llm-median", type=float, default=1.5, help="Seconds")
+    parser.add_argument("--llm-p95", type=float, default=4.0, help="Seconds")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="Share of LLM calls that fail")
+    parser.add_argument("--sample-every", type=float, default=5.0, help="Seconds between RSS/progress samples")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the report as JSON to this path")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    questions = [question for _, question in make_questions(500, args.seed)]
+    popular = [f"What is {term} in {subject}?" for subject, terms in SUBJECTS.items() for term in terms[:2]]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(args, tmp)
+        sessions = [Session(i, mix, questions, popular, args.seed) for i in range(args.sessions)]
+        recorder = LoadRecorder()
+
+        print(f"{args.sessions} sessions ({args.mode}) for {args.duration:.0f}s...")
+        start = time.perf_counter()
+        stop = threading.Event()
+
+        def sampler():
+            while not stop.wait(args.sample_every):
+                recorder.sample(time.perf_counter() - start)
+                row = recorder.timeline[-1]
+                print(f"  t={row['elapsed_seconds']:>6.1f}s completed={row['completed']:<6} "
+                      f"errors={row['errors']:<4} in_flight={row['in_flight']:<4} rss={row['rss_mb']:.0f}MB")
+
+        monitor = threading.Thread(target=sampler, daemon=True)
+        monitor.start()
+        try:
+            if args.mode == "threads":
+                run_threads(engine, sessions, recorder, args)
+            else:
+                asyncio.run(run_async(engine, sessions, recorder, args))
+        finally:
+            stop.set()
+            monitor.join()
+        elapsed = time.perf_counter() - start
+        recorder.sample(elapsed)
+
+    report = summarize(recorder, elapsed, args)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Benchmark MMR candidate selection: vectorized NumPy vs a per-pair Python loop."""
+
+# Usage: python -m benchmarks.mmr_selection [--dim 1536] [--k 4]
+
+import argparse
+import math
+import time
+from typing import List
+
+import numpy as np
+
+from src.mmr import maximal_marginal_relevance
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+
+    dot = sum(x * y for x, y in zip(a, b))
+    norm_a = math.sqrt(sum(x * x for x in a))
+    norm_b = math.sqrt(sum(y * y for y in b))
+    return dot / (norm_a * norm_b)
+
+
+def naive_mmr(query: List[float], candidates: List[List[float]], k: int, lambda_mult: float) -> List[int]:
+
+    # Reference implementation: one Python-level cosine per candidate pair
+    selected: List[int] = []
+    while len(selected) < min(k, len(candidates)):
+        best, best_score = -1, -float('inf')
+        for i, candidate in enumerate(candidates):
+            if i in selected:
+                continue
+            relevance = _cosine(query, candidate)
+            redundancy = max((_cosine(candidate, candidates[j]) for j in selected), default=0.0)
+            score = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+            if score > best_score:
+                best, best_score = i, score
+        selected.append(best)
+    return selected
+
+
+def time_call(fn, repeat: int) -> float:
+
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dim", type=int, default=1536, help="Embedding dimension (ada-002 is 1536)")
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--lambda-mult", type=float, default=0.5)
+    parser.add_argument("--fetch-k", nargs="+", type=int, default=[20, 50, 100, 200])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+
+    print("=" * 60)
+    print(f"MMR selection, dim={args.dim}, k={args.k}, lambda={args.lambda_mult}")
+    print("=" * 60)
+    print(f"{'fetch_k':>8} {'numpy (ms)':>12} {'python loop (ms)':>18} {'speedup':>9}")
+
+    for fetch_k in args.fetch_k:
+        query = rng.normal(size=args.dim).astype(np.float32)
+        candidates = rng.normal(size=(fetch_k, args.dim)).astype(np.float32)
+        query_list = query.tolist()
+        candidate_list = candidates.tolist()
+
+        fast = time_call(
+            lambda: maximal_marginal_relevance(query, candidates, args.k, args.lambda_mult),
+            args.repeat
+        )
+        slow = time_call(
+            lambda: naive_mmr(query_list, candidate_list, args.k, args.lambda_mult),
+            max(1, args.repeat // 2)
+        )
+
+        same = (
+            maximal_marginal_relevance(query, candidates, args.k, args.lambda_mult)
+            == naive_mmr(query_list, candidate_list, args.k, args.lambda_mult)
+        )
+        marker = "" if same else "  (selection differs!)"
+        print(f"{fetch_k:>8} {fast * 1000:>12.3f} {slow * 1000:>18.1f} {slow / fast:>8.0f}x{marker}")
+
+
+if __name__ == "__main__":
+    main()
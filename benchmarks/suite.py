@@ -0,0 +1,248 @@
+"""Time each hot path on a synthetic corpus with stub providers, and compare runs."""
+
+# Usage:
+#   python -m benchmarks.suite run [--pages 200] [--documents 2] [--output results.json]
+#   python -m benchmarks.suite compare baseline.json results.json [--threshold 0.15]
+#
+# Stub providers make the numbers about this code, not about the network:
+# embedding and LLM latency are zero unless --embedding-latency/--llm-latency
+# are given. Each case reports the median and best of --repeat runs.
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Any, List, Optional
+
+import yaml
+
+from benchmarks.synthetic_corpus import make_corpus, make_questions
+from src.config import Config
+from src.embedding_service import EmbeddingService
+from src.pdf_loader import PDFLoader
+from src.rag_engine import RAGEngine
+from src.text_chunker import TextChunker
+from src.vector_store_manager import VectorStoreManager
+
+
+def measure(fn: Callable[[], Any], repeat: int, items: int,
+            setup: Optional[Callable[[], None]] = None) -> Dict[str, float]:
+
+    # setup runs before every repetition and is not timed
+    seconds = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - start)
+
+    median = statistics.median(seconds)
+    return {
+        "median_seconds": median,
+        "best_seconds": min(seconds),
+        "items": items,
+        "items_per_second": items / median if median > 0 else 0.0,
+        "repeat": repeat
+    }
+
+
+def make_engine(directory: str, chunk_size: int, chunk_overlap: int, top_k: int) -> RAGEngine:
+
+    config_path = os.path.join(directory, "config.yaml")
+    with open(config_path, "w") as f:
+        # Caches and coalescing off: every question pays for the full path
+        yaml.safe_dump({
+            "embedding": {"provider": "stub", "model": "stub"},
+            "llm": {"provider": "stub", "model": "stub"},
+            "chunking": {"chunk_size": chunk_size, "chunk_overlap": chunk_overlap},
+            "retrieval": {"top_k": top_k, "cache": {"enabled": False}},
+            "answer_cache": {"enabled": False},
+            "concurrency": {"coalesce_questions": False},
+            "storage": {"persist_directory": os.path.join(directory, "engine_db")},
+        }, f)
+    return RAGEngine(Config(config_path, load_env=False))
+
+
+def run_suite(args) -> Dict[str, Any]:
+
+    results: Dict[str, Dict[str, float]] = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_corpus(os.path.join(tmp, "corpus"), args.documents, args.pages, args.seed)
+        questions = [question for _, question in make_questions(args.questions, args.seed)]
+        total_pages = args.documents * args.pages
+
+        loader = PDFLoader()
+        results["pdf_load"] = measure(
+            lambda: [loader.load(path) for path in paths], args.repeat, total_pages
+        )
+        pages = [doc for path in paths for doc in loader.load(path)]
+
+        chunker = TextChunker(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+        results["split_documents"] = measure(lambda: chunker.split_documents(pages), args.repeat, len(pages))
+        chunks = chunker.split_documents(pages)
+        texts = [chunk.page_content for chunk in chunks]
+
+        embedding_service = EmbeddingService(provider="stub", model="stub")
+        embedding_service._embeddings.latency = args.embedding_latency
+        batch = args.embed_batch_size
+        results["embed_documents"] = measure(
+            lambda: [embedding_service.embed_documents(texts[i:i + batch]) for i in range(0, len(texts), batch)],
+            args.repeat, len(texts)
+        )
+
+        stores = []
+
+        def new_store():
+            stores.append(VectorStoreManager(
+                embedding_service,
+                persist_directory=os.path.join(tmp, f"store_{len(stores)}"),
+                collection_name="benchmark"
+            ))
+
+        results["add_documents"] = measure(
+            lambda: stores[-1].add_documents(chunks, ids=VectorStoreManager.make_chunk_ids("bench", len(chunks))),
+            args.repeat, len(chunks), setup=new_store
+        )
+        store = stores[-1]
+
+        # Query embeddings are cached by the service; clear them so each
+        # repetition embeds every question again.
+        results["similarity_search"] = measure(
+            lambda: [store.similarity_search(question, k=args.top_k) for question in questions],
+            args.repeat, len(questions), setup=embedding_service._query_cache.clear
+        )
+
+        engine = make_engine(tmp, args.chunk_size, args.chunk_overlap, args.top_k)
+        contexts = [store.similarity_search(question, k=args.top_k) for question in questions]
+        results["format_context"] = measure(
+            lambda: [engine.answer_generator._format_context(context) for context in contexts],
+            args.repeat, len(contexts)
+        )
+
+        engine.vector_store_manager.add_documents(chunks)
+        engine.embedding_service._embeddings.latency = args.embedding_latency
+        engine.answer_generator._llm.latency = args.llm_latency
+        results["ask_question"] = measure(
+            lambda: [engine.ask_question(question, use_context=False) for question in questions],
+            args.repeat, len(questions), setup=engine.embedding_service._query_cache.clear
+        )
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "settings": {
+                "documents": args.documents, "pages": args.pages, "questions": args.questions,
+                "chunk_size": args.chunk_size, "chunk_overlap": args.chunk_overlap,
+                "top_k": args.top_k, "embed_batch_size": args.embed_batch_size,
+                "embedding_latency": args.embedding_latency, "llm_latency": args.llm_latency,
+                "repeat": args.repeat, "seed": args.seed
+            },
+            "chunks": len(chunks)
+        },
+        "results": results
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float,
+            min_seconds: float = 0.001) -> List[Dict[str, Any]]:
+
+    # A case regresses when its median time grew by more than threshold (0.15 = 15%).
+    # Cases faster than min_seconds in both runs are reported but never flagged:
+    # at that scale the change is timer noise.
+    rows = []
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        change = result["median_seconds"] / before["median_seconds"] - 1 if before["median_seconds"] else 0.0
+        rows.append({
+            "case": name,
+            "baseline_seconds": before["median_seconds"],
+            "current_seconds": result["median_seconds"],
+            "change": change,
+            "regression": change > threshold and max(result["median_seconds"], before["median_seconds"]) >= min_seconds
+        })
+    return rows
+
+
+def print_results(report: Dict[str, Any]) -> None:
+
+    print(f"{'case':<20} {'median s':>10} {'best s':>10} {'items':>8} {'items/s':>12}")
+    for name, result in report["results"].items():
+        print(f"{name:<20} {result['median_seconds']:>10.4f} {result['best_seconds']:>10.4f} "
+              f"{result['items']:>8} {result['items_per_second']:>12.1f}")
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run every case and save the results")
+    run_parser.add_argument("--documents", type=int, default=2)
+    run_parser.add_argument("--pages", type=int, default=200, help="Pages per document")
+    run_parser.add_argument("--questions", type=int, default=50)
+    run_parser.add_argument("--chunk-size", type=int, default=1000)
+    run_parser.add_argument("--chunk-overlap", type=int, default=200)
+    run_parser.add_argument("--top-k", type=int, default=4)
+    run_parser.add_argument("--embed-batch-size", type=int, default=64)
+    run_parser.add_argument("--embedding-latency", type=float, default=0.0, help="Seconds per stub embedding call")
+    run_parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds per stub LLM call")
+    run_parser.add_argument("--repeat", type=int, default=3)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--output", default="benchmark_results.json")
+
+    compare_parser = commands.add_parser("compare", help="Flag cases slower than a baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.15,
+                                help="Allowed slowdown of the median before a case is flagged")
+    compare_parser.add_argument("--min-seconds", type=float, default=0.001,
+                                help="Cases faster than this in both runs are never flagged")
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        report = run_suite(args)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"{report['meta']['chunks']} chunks from {args.documents} x {args.pages} pages")
+        print_results(report)
+        print(f"\nSaved to {args.output}")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    if baseline["meta"]["settings"] != current["meta"]["settings"]:
+        print("Warning: the runs used different settings; timings may not be comparable.")
+
+    rows = compare(baseline, current, args.threshold, args.min_seconds)
+    print(f"{'case':<20} {'baseline s':>11} {'current s':>11} {'change':>9}")
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['case']:<20} {row['baseline_seconds']:>11.4f} {row['current_seconds']:>11.4f} "
+              f"{row['change']:>+8.1%}{flag}")
+
+    regressions = [row["case"] for row in rows if row["regression"]]
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    print(f"\nNo regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
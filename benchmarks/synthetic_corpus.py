@@ -0,0 +1,138 @@
+"""Deterministic synthetic textbook PDFs and questions for benchmarks."""
+
+# Usage: python -m benchmarks.synthetic_corpus out_dir [--documents 2] [--pages 200]
+
+import argparse
+import os
+import random
+from typing import List, Tuple
+
+
+SUBJECTS = {
+    "mechanics": ["force", "mass", "acceleration", "momentum", "energy", "velocity", "friction",
+                  "torque", "inertia", "gravity", "work", "power", "impulse", "collision"],
+    "electricity": ["current", "voltage", "resistance", "charge", "capacitor", "circuit",
+                    "magnetic", "field", "induction", "conductor", "potential", "ohm"],
+    "optics": ["light", "refraction", "reflection", "lens", "mirror", "wavelength", "prism",
+               "diffraction", "interference", "focal", "photon", "spectrum"],
+    "thermodynamics": ["heat", "temperature", "entropy", "pressure", "volume", "gas",
+                       "engine", "efficiency", "equilibrium", "calorimetry", "expansion"],
+    "algebra": ["equation", "variable", "polynomial", "factor", "root", "matrix", "vector",
+                "determinant", "inequality", "function", "logarithm", "exponent"],
+    "calculus": ["derivative", "integral", "limit", "series", "slope", "area", "rate",
+                 "continuity", "tangent", "differential", "convergence", "chain"],
+}
+
+FILLER = ["the", "of", "and", "a", "is", "in", "to", "that", "we", "this", "when", "which",
+          "for", "with", "can", "be", "as", "by", "an", "are", "its", "from", "each", "so"]
+
+LINES_PER_PAGE = 40
+WORDS_PER_LINE = 12
+
+
+def _sentence(rng: random.Random, terms: List[str]) -> str:
+
+    words = []
+    for _ in range(rng.randint(8, 18)):
+        words.append(rng.choice(terms) if rng.random() < 0.35 else rng.choice(FILLER))
+    if rng.random() < 0.3:
+        words.append(f"{rng.choice(terms)} = {rng.randint(2, 99)} {rng.choice(['m', 's', 'kg', 'N', 'J', 'V'])}")
+    return " ".join(words).capitalize() + "."
+
+
+def textbook_pages(pages: int, seed: int = 0) -> List[str]:
+
+    # Chapters of a few pages each, cycling through the subjects; every page is
+    # a heading line followed by paragraphs drawn from the chapter's vocabulary.
+    rng = random.Random(seed)
+    subjects = list(SUBJECTS)
+    texts = []
+    for page in range(pages):
+        chapter = page // 10
+        subject = subjects[chapter % len(subjects)]
+        terms = SUBJECTS[subject]
+        lines = [f"Chapter {chapter + 1}: {subject.title()} - section {page % 10 + 1}"]
+        words: List[str] = []
+        while len(lines) < LINES_PER_PAGE:
+            words.extend(_sentence(rng, terms).split())
+            while len(words) >= WORDS_PER_LINE and len(lines) < LINES_PER_PAGE:
+                lines.append(" ".join(words[:WORDS_PER_LINE]))
+                words = words[WORDS_PER_LINE:]
+        texts.append("\n".join(lines))
+    return texts
+
+
+def write_pdf(path: str, pages: List[str]) -> None:
+
+    # Minimal hand-written PDF (Helvetica, one text object per page) so no PDF
+    # writer is needed; pypdf extracts the lines back in order.
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        lines = []
+        for line in text.split("\n"):
+            escaped = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+            lines.append(f"({escaped}) Tj T*")
+        stream = f"BT /F1 10 Tf 12 TL 54 750 Td {' '.join(lines)} ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    body = b"%PDF-1.4\n"
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(body))
+        body += f"{number} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(body)
+    body += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    body += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    body += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+
+    with open(path, "wb") as f:
+        f.write(body)
+
+
+def make_corpus(directory: str, documents: int = 2, pages: int = 200, seed: int = 0) -> List[str]:
+
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(documents):
+        path = os.path.join(directory, f"textbook_{i + 1}.pdf")
+        write_pdf(path, textbook_pages(pages, seed=seed + i))
+        paths.append(path)
+    return paths
+
+
+def make_questions(count: int, seed: int = 0) -> List[Tuple[str, str]]:
+
+    # (subject, question) pairs whose terms appear in that subject's chapters
+    rng = random.Random(seed)
+    subjects = list(SUBJECTS)
+    questions = []
+    for i in range(count):
+        subject = subjects[i % len(subjects)]
+        a, b = rng.sample(SUBJECTS[subject], 2)
+        questions.append((subject, f"How does {a} relate to {b} in {subject}? ({i})"))
+    return questions
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("directory", help="Where to write the PDFs")
+    parser.add_argument("--documents", type=int, default=2)
+    parser.add_argument("--pages", type=int, default=200, help="Pages per document")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for path in make_corpus(args.directory, args.documents, args.pages, args.seed):
+        print(f"{path}: {os.path.getsize(path) / 1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
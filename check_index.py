@@ -17,4 +17,8 @@ print(f"Collection Name: {collection.name}")
 print(f"Total Documents: {collection.count()}")
 print("\nMetadata:")
 print(collection.metadata)
+print("\nIndex configuration:")
+print(collection.configuration)
+print("\nConfigured storage.hnsw (applied to new collections):")
+print(engine.config.get('storage.hnsw'))
 print("=" * 60)
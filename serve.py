@@ -0,0 +1,43 @@
+"""Run the RAG QA system as a headless HTTP API."""
+
+# Usage:
+#   python serve.py [--config config.yaml] [--host 0.0.0.0] [--port 8080]
+#
+# Endpoints:
+#   GET    /health              engine and queue status (never queued)
+#   GET    /documents           indexed documents
+#   POST   /documents           upload a PDF (multipart "file", or raw body + ?name=) -> 202 {job_id}
+#   DELETE /documents/{source}  remove a document
+#   GET    /jobs/{job_id}       ingest job progress
+#   POST   /ask                 {"question", "history"?, "sources"?, "page_range"?, "stream"?}
+
+import argparse
+
+from aiohttp import web
+
+from src.config import Config
+from src.http_server import create_app_from_config
+from src.rag_engine import RAGEngine
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--config", default="config.yaml", help="Path to config.yaml")
+    parser.add_argument("--host", help="Overrides server.host")
+    parser.add_argument("--port", type=int, help="Overrides server.port")
+    args = parser.parse_args()
+
+    config = Config(args.config)
+    engine = RAGEngine(config)
+    app = create_app_from_config(engine)
+
+    web.run_app(
+        app,
+        host=args.host or config.get('server.host', '127.0.0.1'),
+        port=args.port or config.get('server.port', 8080)
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""Semantic cache of generated answers for near-duplicate questions."""
+
+# reuse an answer when the same question is asked in other words
+
+import atexit
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import weakref
+from dataclasses import asdict, replace
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+from src.answer_generator import Answer
+
+
+_FOLLOW_UP_PATTERN = re.compile(
+    r"\b(it|its|that|this|these|those|they|them|previous|above|earlier|again|same)\b"
+    r"|^\s*(and|also|so|then|what about|how about|why not)\b",
+    re.IGNORECASE
+)
+
+
+def is_follow_up(question: str) -> bool:
+
+    # References to earlier turns mean the answer depends on the conversation,
+    # not just on the question and the retrieved chunks.
+    return bool(_FOLLOW_UP_PATTERN.search(question))
+
+
+def context_fingerprint(documents: List[Document], variant: tuple = ()) -> str:
+
+    # Chunk ids plus a hash of their text: a re-indexed chunk that kept its id
+    # but changed content produces a different fingerprint. variant holds
+    # whatever else shapes the answer (route, model, prompt, token limit).
+    parts = sorted(
+        f"{doc.id or doc.metadata.get('source')}:{hashlib.sha1(doc.page_content.encode('utf-8')).hexdigest()}"
+        for doc in documents
+    )
+    return hashlib.sha1(("|".join(parts) + "#" + repr(variant)).encode('utf-8')).hexdigest()
+
+
+class SemanticAnswerCache:
+
+    _shared: Dict[str, 'SemanticAnswerCache'] = {}
+    _shared_lock = threading.Lock()
+    # Persisted caches, flushed at interpreter exit
+    _persisted: 'weakref.WeakSet[SemanticAnswerCache]' = weakref.WeakSet()
+
+    def __init__(self, path: Optional[str] = None, similarity_threshold: float = 0.95,
+                 max_entries: int = 500, ttl_seconds: Optional[float] = None,
+                 save_delay: float = 2.0):
+
+        self.path = path
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # Stores within save_delay seconds of each other are written together
+        # (0: write on every store)
+        self.save_delay = save_delay
+
+        self._lock = threading.Lock()
+        self._entries: List[Dict[str, Any]] = []
+        self._embeddings: Optional[np.ndarray] = None
+        self._dirty = False
+        self._save_timer: Optional[threading.Timer] = None
+        self.hits = 0
+        self.misses = 0
+
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            SemanticAnswerCache._persisted.add(self)
+            if os.path.exists(f"{path}.json"):
+                self._load()
+
+    @classmethod
+    def open_shared(cls, path: str, **kwargs) -> 'SemanticAnswerCache':
+
+        key = os.path.abspath(path)
+        with cls._shared_lock:
+            if key not in cls._shared:
+                cls._shared[key] = cls(path, **kwargs)
+            return cls._shared[key]
+
+    def lookup(self, question_embedding: List[float], fingerprint: str) -> Optional[Answer]:
+
+        with self._lock:
+            self._expire()
+
+            # Only entries answered from exactly the same chunks are candidates;
+            # similarity is then scored for all of them in one matrix product.
+            candidates = [i for i, entry in enumerate(self._entries) if entry['fingerprint'] == fingerprint]
+            if not candidates:
+                self.misses += 1
+                return None
+
+            query = self._normalize(np.asarray(question_embedding, dtype=np.float32))
+            similarities = self._embeddings[candidates] @ query
+            best = int(np.argmax(similarities))
+
+            if similarities[best] < self.similarity_threshold:
+                self.misses += 1
+                return None
+
+            entry = self._entries[candidates[best]]
+            entry['last_used'] = time.time()
+            entry['hits'] += 1
+            self.hits += 1
+            return replace(entry['answer'], sources=list(entry['answer'].sources))
+
+    def store(self, question: str, question_embedding: List[float],
+              fingerprint: str, answer: Answer) -> None:
+
+        vector = self._normalize(np.asarray(question_embedding, dtype=np.float32))
+        now = time.time()
+
+        with self._lock:
+            self._entries.append({
+                'question': question,
+                'fingerprint': fingerprint,
+                'answer': replace(answer, sources=list(answer.sources)),
+                'created_at': now,
+                'last_used': now,
+                'hits': 0
+            })
+            self._embeddings = (
+                vector[None, :] if self._embeddings is None
+                else np.vstack([self._embeddings, vector])
+            )
+
+            self._expire()
+            if len(self._entries) > self.max_entries:
+                # Least recently used entries go first
+                order = sorted(range(len(self._entries)), key=lambda i: self._entries[i]['last_used'])
+                self._keep(sorted(order[len(self._entries) - self.max_entries:]))
+
+            self._schedule_save()
+
+    def clear(self) -> None:
+
+        with self._lock:
+            self._entries = []
+            self._embeddings = None
+            if self.path:
+                self._save()
+
+    def flush(self) -> None:
+
+        # Writes stores still waiting for the save delay
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def stats(self) -> Dict[str, Any]:
+
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+    @staticmethod
+    def _normalize(vector: np.ndarray) -> np.ndarray:
+
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def _expire(self) -> None:
+
+        if not self.ttl_seconds or not self._entries:
+            return
+
+        cutoff = time.time() - self.ttl_seconds
+        keep = [i for i, entry in enumerate(self._entries) if entry['created_at'] >= cutoff]
+        if len(keep) != len(self._entries):
+            self._keep(keep)
+
+    def _keep(self, indices: List[int]) -> None:
+
+        self._entries = [self._entries[i] for i in indices]
+        self._embeddings = self._embeddings[indices] if indices else None
+
+    def _schedule_save(self) -> None:
+
+        # Called with self._lock held
+        if not self.path:
+            return
+        self._dirty = True
+        if self.save_delay <= 0:
+            self._save()
+        elif self._save_timer is None:
+            self._save_timer = threading.Timer(self.save_delay, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def _save(self) -> None:
+
+        # Called with self._lock held
+        if self._save_timer is not None:
+            self._save_timer.cancel()
+            self._save_timer = None
+        self._dirty = False
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        if not os.path.isdir(directory):
+            # The data directory was deleted while a save was pending
+            return
+
+        entries = [dict(entry, answer=asdict(entry['answer'])) for entry in self._entries]
+        embeddings = self._embeddings if self._embeddings is not None else np.zeros((0, 0), dtype=np.float32)
+
+        # Embeddings first, then the JSON index that refers to them, each swapped
+        # in atomically so a reader never sees a half-written file. Temp names
+        # are unique, so processes sharing the cache never write the same one.
+        self._replace(f"{self.path}.npy", lambda f: np.save(f, embeddings))
+        self._replace(f"{self.path}.json", lambda f: f.write(json.dumps(entries).encode('utf-8')))
+
+    @staticmethod
+    def _replace(path: str, write) -> None:
+
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(os.path.abspath(path)),
+                                         prefix=f"{os.path.basename(path)}.", suffix=".tmp",
+                                         delete=False) as f:
+            try:
+                write(f)
+            except BaseException:
+                f.close()
+                os.unlink(f.name)
+                raise
+        os.replace(f.name, path)
+
+    def _load(self) -> None:
+
+        try:
+            with open(f"{self.path}.json", 'r') as f:
+                entries = json.load(f)
+            embeddings = np.load(f"{self.path}.npy")
+        except Exception as e:
+            print(f"Warning: Failed to load answer cache '{self.path}': {e}")
+            return
+
+        if len(entries) != len(embeddings):
+            print(f"Warning: Answer cache '{self.path}' is inconsistent; starting empty.")
+            return
+
+        for entry in entries:
+            entry['answer'] = Answer(**entry['answer'])
+
+        self._entries = entries
+        self._embeddings = embeddings.astype(np.float32) if entries else None
+
+
+@atexit.register
+def _flush_answer_caches() -> None:
+
+    for cache in list(SemanticAnswerCache._persisted):
+        cache.flush()
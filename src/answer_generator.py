@@ -2,38 +2,67 @@
 
 # generate answers with LLM
 
-from typing import List
+from typing import List, Dict, Any, Optional, AsyncIterator
 from dataclasses import dataclass
 from langchain_core.documents import Document
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnablePassthrough
-from langchain_core.output_parsers import StrOutputParser
 
+from src.provider_scheduler import ProviderScheduler, get_scheduler, estimate_tokens
+from src.tracing import span
+from src.usage import record_usage
 
 
 
 
+
+SUMMARY_TEMPLATE = """You are summarizing course material so that students can review it quickly.
+
+{instruction}
+
+Keep definitions, key formulas and the order in which topics are introduced. Do not add facts that are not in the text.
+
+Text:
+{text}
+
+Summary:"""
+
+
 @dataclass
 class Answer:
     
     text: str
     sources: List[str]
     confidence: float = 1.0
+    # Tokens and cost spent on this request; filled in by RAGEngine
+    usage: Optional[Dict[str, Any]] = None
 
 
 class AnswerGenerator:
  
+    # full: the step-by-step math tutor prompt; compact: a short prompt for
+    # definitions and conceptual questions
+    PROMPT_VARIANTS = ('full', 'compact')
     
     def __init__(self, provider: str = "openai", model: str = "gpt-3.5-turbo", 
-                 temperature: float = 0.7, max_tokens: int = 500):
+                 temperature: float = 0.7, max_tokens: int = 500,
+                 scheduler: Optional[ProviderScheduler] = None,
+                 prompt_variant: str = 'full'):
        
+        if prompt_variant not in self.PROMPT_VARIANTS:
+            raise ValueError(f"Unsupported prompt variant: {prompt_variant}")
+        
         self.provider = provider.lower()
         self.model = model
         self.temperature = temperature
         self.max_tokens = max_tokens
+        self.prompt_variant = prompt_variant
+        self.scheduler = scheduler if scheduler is not None else get_scheduler()
         self._llm = self._initialize_llm()
         self._prompt_template = self._create_prompt_template()
+        # Tokens in the fixed instructions, charged on every call
+        self._prompt_overhead_tokens = estimate_tokens(self._prompt_template.messages[0].prompt.template)
     
     def _initialize_llm(self):
         
@@ -41,14 +70,37 @@ class AnswerGenerator:
             return ChatOpenAI(
                 model=self.model,
                 temperature=self.temperature,
-                max_tokens=self.max_tokens
+                max_tokens=self.max_tokens,
+                # Token usage is also reported on the last streamed chunk
+                stream_usage=True
             )
         
+        elif self.provider == "stub":
+            from src.stub_providers import StubChatModel
+            return StubChatModel()
+        
         else:
             raise ValueError(f"Unsupported LLM provider: {self.provider}")
     
     def _create_prompt_template(self) -> ChatPromptTemplate:
        
+        if self.prompt_variant == 'compact':
+            return ChatPromptTemplate.from_template("""You are a concise educational tutor. Answer the student's question using the context from their course material.
+
+Context from the documents:
+{context}
+
+Conversation History:
+{chat_history}
+
+Current Question: {question}
+
+Answer in a few sentences or a short list. Give the key formula or definition if there is one. Use the conversation history for follow-up questions.
+If the context doesn't contain relevant information, state: "I cannot find relevant information about this in the uploaded material."
+Do NOT reference chunk numbers.
+
+Answer:""")
+        
         template = """You are an expert educational tutor specializing in mathematics and science. Your goal is to help students learn through clear, detailed explanations and step-by-step problem solving.
 
 Context from the documents:
@@ -166,32 +218,15 @@ Answer:"""
         try:
             
             if not context:
-                return Answer(
-                    text="I cannot find relevant information about this in the uploaded material.",
-                    sources=[],
-                    confidence=0.0
-                )
+                return self._no_context_answer()
             
-           
-            formatted_context = self._format_context(context)
-            
-          
-            formatted_history = self._format_chat_history(chat_history or [])
-            
-           
-            chain = (
-                {
-                    "context": lambda x: formatted_context,
-                    "chat_history": lambda x: formatted_history,
-                    "question": RunnablePassthrough()
-                }
-                | self._prompt_template
-                | self._llm
-                | StrOutputParser()
-            )
+            chain, tokens = self._build_chain(question, context, chat_history)
             
-           
-            answer_text = chain.invoke(question)
+            with self._generate_span(tokens, context) as current:
+                with self.scheduler.acquire(tokens=tokens):
+                    message = chain.invoke(question)
+                answer_text = message.content
+                self._record_usage(current, tokens, answer_text, message.usage_metadata)
             
            
             sources = self._extract_sources(context)
@@ -205,6 +240,126 @@ Answer:"""
         except Exception as e:
             raise Exception(f"Failed to generate answer: {e}")
     
+    async def agenerate_answer(self, question: str, context: List[Document],
+                               chat_history: List[dict] = None) -> Answer:
+        
+        if not question or not question.strip():
+            raise ValueError("Question cannot be empty")
+        
+        try:
+            
+            if not context:
+                return self._no_context_answer()
+            
+            chain, tokens = self._build_chain(question, context, chat_history)
+            
+            with self._generate_span(tokens, context) as current:
+                grant = await self.scheduler.aacquire(tokens=tokens)
+                with grant:
+                    message = await chain.ainvoke(question)
+                answer_text = message.content
+                self._record_usage(current, tokens, answer_text, message.usage_metadata)
+            
+            return Answer(
+                text=answer_text,
+                sources=self._extract_sources(context),
+                confidence=1.0
+            )
+            
+        except Exception as e:
+            raise Exception(f"Failed to generate answer: {e}")
+    
+    async def astream_answer(self, question: str, context: List[Document],
+                             chat_history: List[dict] = None) -> AsyncIterator[str]:
+        
+        # Yields the answer text piece by piece as the model produces it
+        if not question or not question.strip():
+            raise ValueError("Question cannot be empty")
+        
+        if not context:
+            yield self._no_context_answer().text
+            return
+        
+        chain, tokens = self._build_chain(question, context, chat_history)
+        
+        with self._generate_span(tokens, context, streamed=True) as current:
+            grant = await self.scheduler.aacquire(tokens=tokens)
+            with grant:
+                pieces = []
+                usage = None
+                try:
+                    async for chunk in chain.astream(question):
+                        if chunk.usage_metadata:
+                            usage = chunk.usage_metadata
+                        if chunk.content:
+                            pieces.append(chunk.content)
+                            yield chunk.content
+                except Exception as e:
+                    raise Exception(f"Failed to generate answer: {e}")
+            self._record_usage(current, tokens, "".join(pieces), usage)
+    
+    def summarize(self, text: str, instruction: str) -> str:
+        
+        # One map or reduce step of document summarization; not a student-facing answer
+        prompt = ChatPromptTemplate.from_template(SUMMARY_TEMPLATE)
+        tokens = estimate_tokens(SUMMARY_TEMPLATE + instruction + text) + self.max_tokens
+        
+        with span("llm.summarize", model=self.model, tokens=tokens - self.max_tokens) as current:
+            with self.scheduler.acquire(tokens=tokens):
+                message = (prompt | self._llm).invoke({"instruction": instruction, "text": text})
+            self._record_usage(current, tokens, message.content, message.usage_metadata)
+        return message.content.strip()
+    
+    def _record_usage(self, current, tokens: int, answer_text: str, usage: Optional[dict]) -> None:
+        
+        # Counts reported by the provider when present, else the local estimate
+        if usage:
+            prompt_tokens, completion_tokens = usage['input_tokens'], usage['output_tokens']
+        else:
+            prompt_tokens, completion_tokens = tokens - self.max_tokens, estimate_tokens(answer_text)
+        cost = record_usage('llm', self.model, prompt_tokens, completion_tokens, estimated=not usage)
+        current.set(tokens=prompt_tokens, output_tokens=completion_tokens, cost_usd=cost)
+    
+    def _generate_span(self, tokens: int, context: List[Document], **attributes):
+        
+        # tokens as charged to the scheduler include the completion budget;
+        # the span reports the prompt alone
+        return span(
+            "llm.generate", model=self.model, items=len(context),
+            tokens=tokens - self.max_tokens, **attributes
+        )
+    
+    @staticmethod
+    def _no_context_answer() -> Answer:
+        
+        return Answer(
+            text="I cannot find relevant information about this in the uploaded material.",
+            sources=[],
+            confidence=0.0
+        )
+    
+    def _build_chain(self, question: str, context: List[Document], chat_history: Optional[List[dict]]):
+        
+        formatted_context = self._format_context(context)
+        formatted_history = self._format_chat_history(chat_history or [])
+        
+        chain = (
+            {
+                "context": lambda x: formatted_context,
+                "chat_history": lambda x: formatted_history,
+                "question": RunnablePassthrough()
+            }
+            | self._prompt_template
+            | self._llm
+        )
+        
+        # Prompt plus the completion budget, charged against tokens per minute
+        tokens = (
+            estimate_tokens(formatted_context + formatted_history + question)
+            + self._prompt_overhead_tokens + self.max_tokens
+        )
+        return chain, tokens
+    
     def _format_chat_history(self, chat_history: List[dict]) -> str:
       
         if not chat_history:
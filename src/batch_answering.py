@@ -0,0 +1,273 @@
+"""Answer a whole file of questions against the indexed documents."""
+
+# Input: JSONL ({"id"?, "question", "history"?, "sources"?} per line) or CSV
+# with the same columns ("sources" separated by ';'). Output: one JSONL record
+# per question, appended as soon as it is answered, so an interrupted run
+# resumes by skipping the ids already written.
+
+import asyncio
+import csv
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Callable, Set
+
+from langchain_core.runnables import RunnableLambda
+
+from src.provider_scheduler import Priority, request_priority
+from src.usage import track_usage
+from src.vector_store_manager import SearchFilter
+
+
+@dataclass
+class BatchQuestion:
+
+    id: str
+    question: str
+    history: List[Dict[str, str]] = field(default_factory=list)
+    sources: Optional[List[str]] = None
+
+
+def load_questions(path: str) -> List[BatchQuestion]:
+
+    if path.lower().endswith('.csv'):
+        with open(path, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        for row in rows:
+            row['history'] = json.loads(row['history']) if row.get('history') else []
+    else:
+        with open(path, encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    questions = []
+    seen = set()
+    for number, row in enumerate(rows, 1):
+        question = (row.get('question') or '').strip()
+        if not question:
+            raise ValueError(f"{path}: item {number} has no question")
+
+        # An empty CSV cell means no id; 0 is a valid one
+        question_id = row.get('id')
+        question_id = str(number if question_id is None or question_id == '' else question_id)
+        if question_id in seen:
+            raise ValueError(f"{path}: duplicate id {question_id}")
+        seen.add(question_id)
+
+        questions.append(BatchQuestion(
+            id=question_id,
+            question=question,
+            history=row.get('history') or [],
+            sources=_parse_sources(row.get('sources'))
+        ))
+
+    return questions
+
+
+def _parse_sources(sources) -> Optional[List[str]]:
+
+    # A list, or one string separated by ';' (always so in CSV)
+    if isinstance(sources, str):
+        sources = sources.split(';')
+    return [s.strip() for s in sources or [] if s.strip()] or None
+
+
+def completed_ids(output_path: str) -> Set[str]:
+
+    # Ids with an answer in a previous run's output; failed items are retried
+    if not os.path.exists(output_path):
+        return set()
+
+    done = set()
+    with open(output_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by the interruption
+                continue
+            if isinstance(record, dict) and 'id' in record and 'error' not in record:
+                done.add(str(record['id']))
+    return done
+
+
+class BatchAnswerer:
+
+    # Retrieval runs a batch of questions at a time (one embedding request and
+    # one index query per batch) in a worker thread, overlapping with answer
+    # generation for the previous batch. Answers are generated concurrently,
+    # at most max_concurrency LLM calls at once, at bulk priority so students
+    # asking questions interactively are served first.
+    def __init__(self, engine, max_concurrency: int = 8, retrieval_batch_size: int = 32):
+
+        if max_concurrency <= 0 or retrieval_batch_size <= 0:
+            raise ValueError("max_concurrency and retrieval_batch_size must be positive")
+
+        self.engine = engine
+        self.max_concurrency = max_concurrency
+        self.retrieval_batch_size = retrieval_batch_size
+
+    @classmethod
+    def from_config(cls, engine) -> 'BatchAnswerer':
+
+        return cls(
+            engine,
+            max_concurrency=engine.config.get('batch.max_concurrency', 8),
+            retrieval_batch_size=engine.config.get('batch.retrieval_batch_size', 32)
+        )
+
+    def run(self, questions: List[BatchQuestion], output_path: str,
+            on_progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+
+        return asyncio.run(self.arun(questions, output_path, on_progress))
+
+    async def arun(self, questions: List[BatchQuestion], output_path: str,
+                   on_progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+
+        done = completed_ids(output_path)
+        pending = [item for item in questions if item.id not in done]
+        stats = {
+            "total": len(questions),
+            "skipped": len(questions) - len(pending),
+            "answered": 0,
+            "failed": 0,
+            "elapsed_seconds": 0.0
+        }
+
+        start = time.perf_counter()
+        torn = False
+        if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+            with open(output_path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                torn = f.read(1) != b"\n"
+
+        with open(output_path, 'a', encoding='utf-8') as output, request_priority(Priority.BULK), \
+                track_usage() as usage:
+            # Finish a line cut short by the interruption so the next record starts cleanly
+            if torn:
+                output.write("\n")
+
+            def write(record: Dict[str, Any]) -> None:
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                output.flush()
+                stats["failed" if 'error' in record else "answered"] += 1
+                if on_progress is not None:
+                    on_progress(stats["skipped"] + stats["answered"] + stats["failed"], stats["total"])
+
+            batches = [
+                pending[i:i + self.retrieval_batch_size]
+                for i in range(0, len(pending), self.retrieval_batch_size)
+            ]
+
+            def plan_and_retrieve(batch):
+                plans = self._plan(batch)
+                return plans, asyncio.ensure_future(self._retrieve(batch, plans))
+
+            if batches:
+                plans, retrieval = plan_and_retrieve(batches[0])
+            for index, batch in enumerate(batches):
+                contexts, retrieve_seconds = await retrieval
+                batch_plans = plans
+                if index + 1 < len(batches):
+                    plans, retrieval = plan_and_retrieve(batches[index + 1])
+                await self._generate(batch, batch_plans, contexts, retrieve_seconds, write)
+
+        stats["elapsed_seconds"] = time.perf_counter() - start
+        stats["usage"] = usage.to_dict()
+        return stats
+
+    @staticmethod
+    def _chat_history(item: BatchQuestion) -> List[Dict[str, str]]:
+
+        # Each question sees only its own history, never the engine's
+        chat_history = []
+        for turn in item.history:
+            chat_history.append({"role": "user", "content": turn['question']})
+            chat_history.append({"role": "assistant", "content": turn['answer']})
+        return chat_history
+
+    def _plan(self, batch: List[BatchQuestion]) -> List[Any]:
+
+        # Planned like interactive questions, before retrieval: the plan sets
+        # top_k, and overview questions answered from a summary skip retrieval.
+        # A failed plan fails only its own item.
+        plans: List[Any] = []
+        for item in batch:
+            try:
+                plans.append(self.engine._answer_plan(
+                    item.question, self._chat_history(item),
+                    filters=SearchFilter(sources=list(item.sources)) if item.sources else None
+                ))
+            except Exception as e:
+                plans.append(e)
+        return plans
+
+    async def _retrieve(self, batch: List[BatchQuestion], plans: List[Any]):
+
+        # Items are grouped by source filter and top_k: each group is one
+        # batched search. Items with a failed plan or a precomputed context
+        # are not searched.
+        query_processor = self.engine.query_processor
+        contexts: List[Any] = [None] * len(batch)
+        groups: Dict[tuple, List[int]] = {}
+        for i, (item, plan) in enumerate(zip(batch, plans)):
+            if isinstance(plan, Exception) or plan.context is not None:
+                continue
+            groups.setdefault((tuple(item.sources or ()), plan.top_k), []).append(i)
+
+        start = time.perf_counter()
+        for (sources, top_k), indices in groups.items():
+            filters = SearchFilter(sources=list(sources)) if sources else None
+            try:
+                found = await asyncio.to_thread(
+                    query_processor.retrieve_contexts, [batch[i].question for i in indices], top_k, filters
+                )
+            except Exception as e:
+                found = [e] * len(indices)
+            for i, documents in zip(indices, found):
+                contexts[i] = documents
+
+        # Amortised over the batch: every item waited for the same searches
+        return contexts, (time.perf_counter() - start) / len(batch)
+
+    async def _generate(self, batch: List[BatchQuestion], plans: List[Any], contexts: List[Any],
+                        retrieve_seconds: float, write: Callable[[Dict[str, Any]], None]) -> None:
+
+        async def answer(index: int) -> None:
+            item = batch[index]
+            plan = plans[index]
+            record = {
+                "id": item.id,
+                "question": item.question,
+                "timings": {"retrieve_ms": round(retrieve_seconds * 1000, 1)}
+            }
+
+            # Every per-item step stays inside the try: one bad item is an
+            # error record, never the end of the run
+            start = time.perf_counter()
+            try:
+                context = plan if isinstance(plan, Exception) else contexts[index]
+                if isinstance(context, Exception):
+                    raise context
+                with track_usage() as usage:
+                    try:
+                        if plan.context is not None:
+                            context = plan.context
+                        else:
+                            context = await self.engine._acompress_context(item.question, context)
+                        result = await plan.generator.agenerate_answer(
+                            item.question, context, chat_history=self._chat_history(item)
+                        )
+                        record.update(answer=result.text, sources=result.sources, confidence=result.confidence)
+                    except Exception as e:
+                        record["error"] = str(e)
+                record["usage"] = await self.engine._aplan_usage(plan, item.question, usage, start)
+                record["timings"]["generate_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            except Exception as e:
+                record["error"] = str(e)
+            write(record)
+
+        await RunnableLambda(answer).abatch(
+            list(range(len(batch))),
+            config={"max_concurrency": self.max_concurrency}
+        )
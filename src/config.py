@@ -29,13 +29,129 @@ class Config:
             'chunk_size': 1000,
             'chunk_overlap': 200
         },
+        'ingestion': {
+            'parse_workers': 2,
+            'pages_per_task': 8,
+            'embed_workers': 4,
+            'embed_batch_size': 64,
+            'store_batch_size': 256,
+            'queue_size': 8,
+            'max_concurrent_jobs': 1
+        },
         'retrieval': {
             'top_k': 4,
-            'score_threshold': 0.7
+            'score_threshold': 0.7,
+            'mode': 'vector',
+            'rrf_k': 60,
+            'hybrid_fetch_k': 20,
+            'search_type': 'similarity',
+            'mmr_lambda': 0.5,
+            'fetch_k': 20,
+            'cache': {
+                'enabled': True,
+                'max_entries': 1024
+            },
+            'document_routing': {
+                'enabled': False,
+                'documents': 5,
+                'min_documents': 20,
+                'pages_per_section': 10
+            }
+        },
+        'answer_cache': {
+            'enabled': True,
+            'similarity_threshold': 0.95,
+            'max_entries': 500,
+            'ttl_hours': 168,
+            'save_delay_seconds': 2
+        },
+        'context_compression': {
+            'enabled': False,
+            'ratio': 0.5,
+            'max_tokens': None,
+            'neighbors': 1,
+            'min_sentences': 3,
+            'max_sentences': 50000
+        },
+        'summaries': {
+            'enabled': False,
+            'model': None,
+            'max_tokens': 300,
+            'answer_max_tokens': 400,
+            'map_chars': 6000,
+            'fanout': 6,
+            'workers': 4,
+            'pages_per_section': 10,
+            'max_documents': 3
+        },
+        'concurrency': {
+            'coalesce_questions': True
+        },
+        'provider_limits': {
+            'requests_per_minute': None,
+            'tokens_per_minute': None,
+            'max_concurrent': None,
+            'burst_seconds': 60
+        },
+        'batch': {
+            'max_concurrency': 8,
+            'retrieval_batch_size': 32
+        },
+        'server': {
+            'host': '127.0.0.1',
+            'port': 8080,
+            'max_concurrency': 64,
+            'max_queue': 256,
+            'queue_timeout_seconds': 10,
+            'request_timeout_seconds': 120,
+            'max_upload_mb': 100
+        },
+        'usage': {
+            'prices': {},
+            'session_budget_usd': None,
+            'global_budget_usd': None,
+            'degrade': {
+                'top_k': 2,
+                'max_tokens': 250,
+                'model': None
+            }
+        },
+        'routing': {
+            'enabled': False,
+            'threshold': 0.0,
+            'weights': {},
+            'log_path': './data/routing.jsonl',
+            'routes': {
+                'fast': {
+                    'model': None,
+                    'max_tokens': 350,
+                    'prompt': 'compact'
+                },
+                'full': {
+                    'model': None,
+                    'max_tokens': None,
+                    'prompt': 'full'
+                }
+            }
+        },
+        'profiling': {
+            'enabled': False,
+            'output_dir': './data/profiles',
+            'format': 'speedscope',
+            'interval_ms': 5,
+            'trace_memory': True,
+            'memory_top': 15
+        },
+        'tracing': {
+            'enabled': False,
+            'export_path': './data/traces.jsonl',
+            'keep_traces': 50
         },
         'storage': {
             'persist_directory': './data/chroma_db',
-            'collection_name': 'educational_docs'
+            'collection_name': 'educational_docs',
+            'delete_batch_size': 500,
+            'hnsw': {}
         }
     }
     
@@ -82,7 +198,7 @@ class Config:
                     "Missing required API key: OPENAI_API_KEY\n"
                     "Please set it in your .env file or environment variables."
                 )
-        elif embedding_provider == 'huggingface':
+        elif embedding_provider in ('huggingface', 'stub'):
            
             pass
         else:
@@ -95,6 +211,9 @@ class Config:
                     "Missing required API key: OPENAI_API_KEY\n"
                     "Please set it in your .env file or environment variables."
                 )
+        elif llm_provider == 'stub':
+            # Local deterministic provider for tests and benchmarks
+            pass
         elif llm_provider == 'anthropic':
             if not os.getenv('ANTHROPIC_API_KEY'):
                 raise ConfigError(
@@ -118,9 +237,182 @@ class Config:
                 f"chunk_overlap ({chunk_overlap}) must be less than chunk_size ({chunk_size})"
             )
         
+        parse_workers = self.get('ingestion.parse_workers')
+        if not isinstance(parse_workers, int) or parse_workers < 0:
+            raise ConfigError(f"Invalid ingestion.parse_workers: {parse_workers}. Must be a non-negative integer.")
+        
+        for key in ('pages_per_task', 'embed_workers', 'embed_batch_size', 'store_batch_size',
+                    'queue_size', 'max_concurrent_jobs'):
+            value = self.get(f'ingestion.{key}')
+            if not isinstance(value, int) or value <= 0:
+                raise ConfigError(f"Invalid ingestion.{key}: {value}. Must be a positive integer.")
+        
+        store_batch_size = self.get('ingestion.store_batch_size')
+        if store_batch_size > 5000:
+            # Chroma rejects larger upserts
+            raise ConfigError(f"Invalid ingestion.store_batch_size: {store_batch_size}. Must be at most 5000.")
+        
         top_k = self.get('retrieval.top_k')
         if not isinstance(top_k, int) or top_k <= 0:
             raise ConfigError(f"Invalid top_k: {top_k}. Must be a positive integer.")
+        
+        mode = self.get('retrieval.mode')
+        if mode not in ('vector', 'lexical', 'hybrid'):
+            raise ConfigError(f"Invalid retrieval.mode: {mode}. Must be one of vector, lexical, hybrid.")
+        
+        search_type = self.get('retrieval.search_type')
+        if search_type not in ('similarity', 'mmr'):
+            raise ConfigError(f"Invalid retrieval.search_type: {search_type}. Must be similarity or mmr.")
+        
+        mmr_lambda = self.get('retrieval.mmr_lambda')
+        if not isinstance(mmr_lambda, (int, float)) or not 0 <= mmr_lambda <= 1:
+            raise ConfigError(f"Invalid retrieval.mmr_lambda: {mmr_lambda}. Must be between 0 and 1.")
+        
+        fetch_k = self.get('retrieval.fetch_k')
+        if not isinstance(fetch_k, int) or fetch_k < top_k:
+            raise ConfigError(f"Invalid retrieval.fetch_k: {fetch_k}. Must be an integer >= top_k.")
+        
+        for key in ('documents', 'pages_per_section'):
+            value = self.get(f'retrieval.document_routing.{key}')
+            if not isinstance(value, int) or value <= 0:
+                raise ConfigError(f"Invalid retrieval.document_routing.{key}: {value}. Must be a positive integer.")
+        
+        min_documents = self.get('retrieval.document_routing.min_documents')
+        if not isinstance(min_documents, int) or min_documents < 0:
+            raise ConfigError(
+                f"Invalid retrieval.document_routing.min_documents: {min_documents}. Must be a non-negative integer."
+            )
+        
+        similarity_threshold = self.get('answer_cache.similarity_threshold')
+        if not isinstance(similarity_threshold, (int, float)) or not 0 < similarity_threshold <= 1:
+            raise ConfigError(
+                f"Invalid answer_cache.similarity_threshold: {similarity_threshold}. Must be in (0, 1]."
+            )
+        
+        save_delay = self.get('answer_cache.save_delay_seconds')
+        if not isinstance(save_delay, (int, float)) or save_delay < 0:
+            raise ConfigError(
+                f"Invalid answer_cache.save_delay_seconds: {save_delay}. Must be a non-negative number."
+            )
+        
+        for key in ('requests_per_minute', 'tokens_per_minute', 'max_concurrent', 'burst_seconds'):
+            value = self.get(f'provider_limits.{key}')
+            if value is not None and (not isinstance(value, (int, float)) or value <= 0):
+                raise ConfigError(f"Invalid provider_limits.{key}: {value}. Must be a positive number.")
+        
+        for key in ('max_concurrency', 'retrieval_batch_size'):
+            value = self.get(f'batch.{key}')
+            if not isinstance(value, int) or value <= 0:
+                raise ConfigError(f"Invalid batch.{key}: {value}. Must be a positive integer.")
+        
+        for key in ('port', 'max_concurrency', 'max_queue', 'max_upload_mb'):
+            value = self.get(f'server.{key}')
+            if not isinstance(value, int) or value <= 0:
+                raise ConfigError(f"Invalid server.{key}: {value}. Must be a positive integer.")
+        
+        for key in ('queue_timeout_seconds', 'request_timeout_seconds'):
+            value = self.get(f'server.{key}')
+            if not isinstance(value, (int, float)) or value <= 0:
+                raise ConfigError(f"Invalid server.{key}: {value}. Must be a positive number.")
+        
+        for key in ('session_budget_usd', 'global_budget_usd'):
+            value = self.get(f'usage.{key}')
+            if value is not None and (not isinstance(value, (int, float)) or value <= 0):
+                raise ConfigError(f"Invalid usage.{key}: {value}. Must be a positive number.")
+        
+        for key in ('top_k', 'max_tokens'):
+            value = self.get(f'usage.degrade.{key}')
+            if value is not None and (not isinstance(value, int) or value <= 0):
+                raise ConfigError(f"Invalid usage.degrade.{key}: {value}. Must be a positive integer.")
+        
+        for model, price in (self.get('usage.prices') or {}).items():
+            if not isinstance(price, dict) or any(
+                not isinstance(price.get(side, 0), (int, float)) or price.get(side, 0) < 0
+                for side in ('prompt', 'completion')
+            ):
+                raise ConfigError(f"Invalid usage.prices.{model}: {price}. "
+                                  f"Expected non-negative 'prompt' and 'completion' USD per 1K tokens.")
+        
+        if not isinstance(self.get('context_compression.enabled'), bool):
+            raise ConfigError(f"Invalid context_compression.enabled: {self.get('context_compression.enabled')}. "
+                              f"Must be true or false.")
+        
+        ratio = self.get('context_compression.ratio')
+        if not isinstance(ratio, (int, float)) or not 0 < ratio <= 1:
+            raise ConfigError(f"Invalid context_compression.ratio: {ratio}. Must be in (0, 1].")
+        
+        for key in ('max_tokens', 'min_sentences', 'max_sentences'):
+            value = self.get(f'context_compression.{key}')
+            if value is not None and (not isinstance(value, int) or value <= 0):
+                raise ConfigError(f"Invalid context_compression.{key}: {value}. Must be a positive integer.")
+        
+        neighbors = self.get('context_compression.neighbors')
+        if not isinstance(neighbors, int) or neighbors < 0:
+            raise ConfigError(f"Invalid context_compression.neighbors: {neighbors}. Must be a non-negative integer.")
+        
+        if not isinstance(self.get('summaries.enabled'), bool):
+            raise ConfigError(f"Invalid summaries.enabled: {self.get('summaries.enabled')}. Must be true or false.")
+        
+        for key in ('max_tokens', 'answer_max_tokens', 'map_chars', 'workers', 'pages_per_section', 'max_documents'):
+            value = self.get(f'summaries.{key}')
+            if not isinstance(value, int) or value <= 0:
+                raise ConfigError(f"Invalid summaries.{key}: {value}. Must be a positive integer.")
+        
+        fanout = self.get('summaries.fanout')
+        if not isinstance(fanout, int) or fanout < 2:
+            raise ConfigError(f"Invalid summaries.fanout: {fanout}. Must be an integer of at least 2.")
+        
+        if not isinstance(self.get('routing.enabled'), bool):
+            raise ConfigError(f"Invalid routing.enabled: {self.get('routing.enabled')}. Must be true or false.")
+        
+        threshold = self.get('routing.threshold')
+        if not isinstance(threshold, (int, float)):
+            raise ConfigError(f"Invalid routing.threshold: {threshold}. Must be a number.")
+        
+        for feature, weight in (self.get('routing.weights') or {}).items():
+            if not isinstance(weight, (int, float)):
+                raise ConfigError(f"Invalid routing.weights.{feature}: {weight}. Must be a number.")
+        
+        for route in ('fast', 'full'):
+            max_tokens = self.get(f'routing.routes.{route}.max_tokens')
+            if max_tokens is not None and (not isinstance(max_tokens, int) or max_tokens <= 0):
+                raise ConfigError(f"Invalid routing.routes.{route}.max_tokens: {max_tokens}. Must be a positive integer.")
+            prompt = self.get(f'routing.routes.{route}.prompt', 'full')
+            if prompt not in ('full', 'compact'):
+                raise ConfigError(f"Invalid routing.routes.{route}.prompt: {prompt}. Must be full or compact.")
+        
+        for key in ('enabled', 'trace_memory'):
+            if not isinstance(self.get(f'profiling.{key}'), bool):
+                raise ConfigError(f"Invalid profiling.{key}: {self.get(f'profiling.{key}')}. Must be true or false.")
+        
+        profile_format = self.get('profiling.format')
+        if profile_format not in ('speedscope', 'collapsed'):
+            raise ConfigError(f"Invalid profiling.format: {profile_format}. Must be speedscope or collapsed.")
+        
+        interval_ms = self.get('profiling.interval_ms')
+        if not isinstance(interval_ms, (int, float)) or interval_ms <= 0:
+            raise ConfigError(f"Invalid profiling.interval_ms: {interval_ms}. Must be a positive number.")
+        
+        memory_top = self.get('profiling.memory_top')
+        if not isinstance(memory_top, int) or memory_top <= 0:
+            raise ConfigError(f"Invalid profiling.memory_top: {memory_top}. Must be a positive integer.")
+        
+        if not isinstance(self.get('tracing.enabled'), bool):
+            raise ConfigError(f"Invalid tracing.enabled: {self.get('tracing.enabled')}. Must be true or false.")
+        
+        keep_traces = self.get('tracing.keep_traces')
+        if not isinstance(keep_traces, int) or keep_traces <= 0:
+            raise ConfigError(f"Invalid tracing.keep_traces: {keep_traces}. Must be a positive integer.")
+        
+        hnsw_config = self.get('storage.hnsw') or {}
+        space = hnsw_config.get('space')
+        if space is not None and space not in ('l2', 'cosine', 'ip'):
+            raise ConfigError(f"Invalid storage.hnsw.space: {space}. Must be one of l2, cosine, ip.")
+        
+        for key in ('M', 'construction_ef', 'search_ef', 'batch_size', 'sync_threshold'):
+            value = hnsw_config.get(key)
+            if value is not None and (not isinstance(value, int) or value <= 0):
+                raise ConfigError(f"Invalid storage.hnsw.{key}: {value}. Must be a positive integer.")
     
     def get(self, key: str, default: Any = None) -> Any:
        
@@ -0,0 +1,325 @@
+"""Query-aware extractive compression of retrieved chunks."""
+
+# keep the sentences that answer the question, drop the rest; no LLM call
+
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from src.tracing import span
+
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9(\[\"'])|\n\s*\n")
+_ABBREVIATION = re.compile(r"\b(?:e\.g|i\.e|etc|fig|figs|eq|eqs|vs|approx|cf|ch|sec|no|ref)\.$", re.IGNORECASE)
+
+
+def split_sentences(text: str, min_chars: int = 20) -> List[str]:
+
+    # Fragments shorter than min_chars ("Eq. 3.", a heading) and splits after
+    # abbreviations are joined to the sentence before them
+    sentences: List[str] = []
+    for piece in _SENTENCE_BOUNDARY.split(text.strip()):
+        piece = piece.strip()
+        if not piece:
+            continue
+        if sentences and (len(sentences[-1]) < min_chars or _ABBREVIATION.search(sentences[-1])):
+            sentences[-1] = f"{sentences[-1]} {piece}"
+        else:
+            sentences.append(piece)
+    if len(sentences) > 1 and len(sentences[-1]) < min_chars:
+        sentences[-2] = f"{sentences[-2]} {sentences.pop()}"
+    return sentences
+
+
+def _sentence_key(text: str) -> str:
+
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:20]
+
+
+class SentenceEmbeddingStore:
+
+    # Normalised sentence embeddings keyed by a hash of the sentence text, so
+    # overlapping chunks and re-indexed documents share entries and nothing
+    # goes stale. Filled at ingest; sentences of chunks indexed before that
+    # are embedded on first use. Vectors are kept as float16 to halve memory.
+    # Past max_entries the least recently used are evicted, ingest-computed
+    # ones included, so max_entries should cover the corpus's sentences.
+
+    _shared: Dict[str, 'SentenceEmbeddingStore'] = {}
+    _shared_lock = threading.Lock()
+
+    # Sentences embedded at question time are persisted once this many are pending
+    SAVE_EVERY = 2048
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 50000):
+
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # key -> vector, least recently used first
+        self._vectors: 'OrderedDict[str, np.ndarray]' = OrderedDict()
+        self._unsaved = 0
+        self.hits = 0
+        self.misses = 0
+
+        if path and os.path.exists(f"{path}.json"):
+            self._load()
+
+    @classmethod
+    def open_shared(cls, path: str, **kwargs) -> 'SentenceEmbeddingStore':
+
+        key = os.path.abspath(path)
+        with cls._shared_lock:
+            if key not in cls._shared:
+                cls._shared[key] = cls(path, **kwargs)
+            return cls._shared[key]
+
+    def __len__(self) -> int:
+
+        return len(self._vectors)
+
+    def missing(self, sentences: Sequence[str]) -> List[str]:
+
+        with self._lock:
+            seen = set()
+            missing = []
+            for sentence in sentences:
+                key = _sentence_key(sentence)
+                if key not in self._vectors and key not in seen:
+                    seen.add(key)
+                    missing.append(sentence)
+            return missing
+
+    def add(self, sentences: Sequence[str], embeddings: Sequence[Sequence[float]]) -> None:
+
+        if not sentences:
+            return
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        with self._lock:
+            for sentence, vector in zip(sentences, matrix.astype(np.float16)):
+                key = _sentence_key(sentence)
+                self._vectors[key] = vector
+                self._vectors.move_to_end(key)
+            while len(self._vectors) > self.max_entries:
+                self._vectors.popitem(last=False)
+            self._unsaved += len(sentences)
+
+    def embed(self, sentences: Sequence[str], embedding_service) -> np.ndarray:
+
+        # (len(sentences), dim) float32 matrix of unit vectors; sentences not
+        # in the store are embedded in one call and added
+        missing = self.missing(sentences)
+        if missing:
+            self.add(missing, embedding_service.embed_documents(missing))
+
+        with self._lock:
+            rows = []
+            for sentence in sentences:
+                key = _sentence_key(sentence)
+                vector = self._vectors.get(key)
+                if vector is None:
+                    # Evicted again by a concurrent writer; rare enough to re-embed
+                    break
+                self._vectors.move_to_end(key)
+                rows.append(vector)
+            self.hits += len(sentences) - len(missing)
+            self.misses += len(missing)
+            should_save = self._unsaved >= self.SAVE_EVERY
+
+        if len(rows) < len(sentences):
+            embeddings = np.asarray(embedding_service.embed_documents(list(sentences)), dtype=np.float32)
+            return embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        if should_save:
+            self.save()
+        return np.stack(rows).astype(np.float32)
+
+    def clear(self) -> None:
+
+        with self._lock:
+            self._vectors.clear()
+            self._unsaved = 1
+        self.save()
+
+    def stats(self) -> Dict[str, Any]:
+
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._vectors),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+    def save(self) -> None:
+
+        if not self.path:
+            return
+
+        with self._lock:
+            if not self._unsaved:
+                return
+            keys = list(self._vectors)
+            matrix = np.stack(list(self._vectors.values())) if keys else np.zeros((0, 0), dtype=np.float16)
+            self._unsaved = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # Vectors first, then the key list that refers to them, each swapped
+        # in atomically so a reader never sees a half-written file.
+        np.save(f"{self.path}.tmp.npy", matrix)
+        os.replace(f"{self.path}.tmp.npy", f"{self.path}.npy")
+        with open(f"{self.path}.json.tmp", 'w') as f:
+            json.dump(keys, f)
+        os.replace(f"{self.path}.json.tmp", f"{self.path}.json")
+
+    def _load(self) -> None:
+
+        try:
+            with open(f"{self.path}.json", 'r') as f:
+                keys = json.load(f)
+            matrix = np.load(f"{self.path}.npy")
+        except Exception as e:
+            print(f"Warning: Failed to load sentence embeddings '{self.path}': {e}")
+            return
+
+        if len(keys) != len(matrix):
+            print(f"Warning: Sentence embeddings '{self.path}' are inconsistent; starting empty.")
+            return
+        self._vectors = OrderedDict(zip(keys, matrix))
+
+
+class ContextCompressor:
+
+    def __init__(self, embedding_service, store: SentenceEmbeddingStore,
+                 ratio: float = 0.5, max_tokens: Optional[int] = None,
+                 neighbors: int = 1, min_sentences: int = 3, min_chars: int = 20):
+
+        self.embedding_service = embedding_service
+        self.store = store
+        # Share of the retrieved text kept, capped by max_tokens if set
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        # Sentences kept on each side of a selected one, for context
+        self.neighbors = neighbors
+        # Chunks with fewer sentences than this are passed through whole
+        self.min_sentences = min_sentences
+        self.min_chars = min_chars
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], embedding_service) -> 'ContextCompressor':
+
+        compression_config = config.get('context_compression', {})
+        storage_config = config.get('storage', {})
+        store = SentenceEmbeddingStore.open_shared(
+            os.path.join(
+                storage_config.get('persist_directory', './data/chroma_db'),
+                f"{storage_config.get('collection_name', 'educational_docs')}_sentences"
+            ),
+            max_entries=compression_config.get('max_sentences', 50000)
+        )
+        return cls(
+            embedding_service, store,
+            ratio=compression_config.get('ratio', 0.5),
+            max_tokens=compression_config.get('max_tokens'),
+            neighbors=compression_config.get('neighbors', 1),
+            min_sentences=compression_config.get('min_sentences', 3)
+        )
+
+    def prepare(self, documents: List[Document]) -> int:
+
+        # Ingest side: embed the sentences of new chunks ahead of questions.
+        # Returns how many sentences needed an embedding.
+        sentences = [s for doc in documents for s in split_sentences(doc.page_content, self.min_chars)]
+        missing = self.store.missing(sentences)
+        if missing:
+            self.store.add(missing, self.embedding_service.embed_documents(missing))
+        return len(missing)
+
+    def compress(self, query_embedding: Sequence[float],
+                 documents: List[Document]) -> Tuple[List[Document], Dict[str, Any]]:
+
+        chunk_sentences = [split_sentences(doc.page_content, self.min_chars) for doc in documents]
+        chars_before = sum(len(doc.page_content) for doc in documents)
+        budget = chars_before * self.ratio
+        if self.max_tokens:
+            budget = min(budget, self.max_tokens * 4)
+
+        owners = [i for i, sentences in enumerate(chunk_sentences)
+                  if len(sentences) >= self.min_sentences]
+        flat = [s for i in owners for s in chunk_sentences[i]]
+        stats = {"chars_before": chars_before, "chars_after": chars_before, "sentences": len(flat)}
+        if not flat:
+            return documents, stats
+
+        with span("compress", chunks=len(documents), sentences=len(flat)) as current:
+            # All candidate sentences are scored against the question in one
+            # matrix-vector product
+            query = np.asarray(query_embedding, dtype=np.float32)
+            query /= max(float(np.linalg.norm(query)), 1e-12)
+            scores = self.store.embed(flat, self.embedding_service) @ query
+
+            # flat index -> (chunk, position in chunk)
+            positions = [(i, p) for i in owners for p in range(len(chunk_sentences[i]))]
+            keep: Dict[int, set] = {i: set() for i in owners}
+            # Pass-through chunks count against the budget in full
+            used = sum(len(doc.page_content) for i, doc in enumerate(documents) if i not in keep)
+
+            def take(index: int) -> int:
+
+                chunk, position = positions[index]
+                sentences = chunk_sentences[chunk]
+                added = 0
+                for p in range(max(0, position - self.neighbors), min(len(sentences), position + self.neighbors + 1)):
+                    if p not in keep[chunk]:
+                        keep[chunk].add(p)
+                        added += len(sentences[p]) + 1
+                return added
+
+            order = np.argsort(-scores, kind='stable')
+            # Every chunk keeps its best sentence, so sources stay as retrieved
+            best_per_chunk = {}
+            for index in order:
+                best_per_chunk.setdefault(positions[index][0], int(index))
+            for index in best_per_chunk.values():
+                used += take(index)
+            for index in order:
+                if used >= budget:
+                    break
+                used += take(int(index))
+
+            compressed = []
+            for i, doc in enumerate(documents):
+                if i not in keep:
+                    compressed.append(doc)
+                    continue
+                sentences = chunk_sentences[i]
+                # "…" marks where sentences were left out
+                parts = []
+                previous = -1
+                for p in sorted(keep[i]):
+                    if p != previous + 1:
+                        parts.append("…")
+                    parts.append(sentences[p])
+                    previous = p
+                if previous < len(sentences) - 1:
+                    parts.append("…")
+                text = " ".join(parts)
+                # New documents: the originals may be shared with the retrieval cache
+                compressed.append(Document(
+                    page_content=text,
+                    metadata=dict(doc.metadata, original_chars=len(doc.page_content)),
+                    id=doc.id
+                ))
+
+            stats["chars_after"] = sum(len(doc.page_content) for doc in compressed)
+            current.set(chars_before=chars_before, chars_after=stats["chars_after"])
+        return compressed, stats
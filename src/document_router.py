@@ -0,0 +1,286 @@
+"""Document-level routing index: per-document and per-section centroids."""
+
+# score a question against a few vectors per document instead of every chunk,
+# then search chunks only inside the best-matching documents
+
+import json
+import logging
+import os
+import threading
+from typing import List, Dict, Any, Optional, Sequence, Tuple, Callable
+
+import numpy as np
+from langchain_core.documents import Document
+
+from src.shared_files import file_lock, file_signature
+from src.summary_index import pages_from_chunks, detect_sections
+
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+
+    return matrix / np.maximum(np.linalg.norm(matrix, axis=-1, keepdims=True), 1e-12)
+
+
+class DocumentRouter:
+
+    # Each document has one row for the mean of all its chunk embeddings and
+    # one per section (chapter headings, as for summaries, or fixed runs of
+    # pages). A document scores as its best row, so a book whose one chapter
+    # matches the question is not drowned out by the other chapters.
+    # Other processes write the same files: writes re-read and rewrite them
+    # under a file lock, and reads reload them once the .json file changed.
+
+    _shared: Dict[str, 'DocumentRouter'] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, path: Optional[str] = None, pages_per_section: int = 10):
+
+        self.path = path
+        self.pages_per_section = pages_per_section
+        self._lock = threading.Lock()
+        # source -> {"vectors": (rows, dim) float32 unit vectors, "sections": [...], "chunks": n}
+        self._documents: Dict[str, Dict[str, Any]] = {}
+        # Stacked rows of every document, rebuilt on the first route after a change
+        self._matrix: Optional[np.ndarray] = None
+        self._sources: List[str] = []
+        self._starts: Optional[np.ndarray] = None
+        # Signature of the .json file as last read or written here
+        self._signature: Optional[tuple] = None
+
+        if path:
+            self._sync()
+
+    @classmethod
+    def open_shared(cls, path: str, **kwargs) -> 'DocumentRouter':
+
+        key = os.path.abspath(path)
+        with cls._shared_lock:
+            if key not in cls._shared:
+                cls._shared[key] = cls(path, **kwargs)
+            return cls._shared[key]
+
+    @property
+    def exists_on_disk(self) -> bool:
+
+        return bool(self.path) and os.path.exists(f"{self.path}.json")
+
+    def __len__(self) -> int:
+
+        self._sync()
+        return len(self._documents)
+
+    def __contains__(self, source: str) -> bool:
+
+        self._sync()
+        return source in self._documents
+
+    def set_document(self, source: str, chunks: List[Document],
+                     embeddings: Sequence[Sequence[float]], save: bool = True) -> None:
+
+        # chunks in chunk order with their stored embeddings
+        if not chunks:
+            self.remove(source, save=save)
+            return
+
+        matrix = _normalize(np.asarray(embeddings, dtype=np.float32))
+        pages = np.array([int(chunk.metadata.get('page', 0)) for chunk in chunks])
+        rows = [matrix.mean(axis=0)]
+        sections = []
+        for section in detect_sections(pages_from_chunks(chunks), self.pages_per_section):
+            in_section = (pages >= section.first_page) & (pages <= section.last_page)
+            if in_section.any():
+                rows.append(matrix[in_section].mean(axis=0))
+                sections.append({
+                    "title": section.title,
+                    "first_page": section.first_page,
+                    "last_page": section.last_page
+                })
+
+        entry = {
+            "vectors": _normalize(np.stack(rows)).astype(np.float32),
+            "sections": sections,
+            "chunks": len(chunks)
+        }
+
+        def apply(documents):
+            documents[source] = entry
+            return True
+
+        self._change(apply, save)
+
+    def remove(self, source: str, save: bool = True) -> None:
+
+        self._change(lambda documents: documents.pop(source, None) is not None, save)
+
+    def clear(self) -> None:
+
+
+        def apply(documents):
+            documents.clear()
+            return True
+
+        self._change(apply, True)
+
+    def _change(self, apply: Callable[[Dict[str, Dict[str, Any]]], bool], save: bool) -> None:
+
+        # apply edits the documents and says whether anything changed. A
+        # saved change is made on top of the latest files, under the file
+        # lock, so writes from other processes are never overwritten.
+        if not (save and self.path):
+            with self._lock:
+                if apply(self._documents):
+                    self._matrix = None
+            return
+
+        with file_lock(self.path):
+            self._reload()
+            with self._lock:
+                changed = apply(self._documents)
+                if changed:
+                    self._matrix = None
+            if changed:
+                self._write()
+
+    def discard(self) -> None:
+
+        # Forgets every document and deletes the files, so the next owner
+        # rebuilds the index from scratch
+        if not self.path:
+            with self._lock:
+                self._documents = {}
+                self._matrix = None
+            return
+        with file_lock(self.path):
+            self._discard_files()
+
+    def _discard_files(self) -> None:
+
+        with self._lock:
+            self._documents = {}
+            self._matrix = None
+            self._signature = None
+        for suffix in ('.json', '.npy'):
+            if os.path.exists(f"{self.path}{suffix}"):
+                os.remove(f"{self.path}{suffix}")
+
+    def route(self, query_embedding: Sequence[float], n_documents: int) -> List[Tuple[str, float]]:
+
+        # (source, score) for the n best documents, best first
+        self._sync()
+        with self._lock:
+            if not self._documents:
+                return []
+            if self._matrix is None:
+                self._sources = list(self._documents)
+                blocks = [self._documents[source]["vectors"] for source in self._sources]
+                self._matrix = np.concatenate(blocks)
+                self._starts = np.cumsum([0] + [len(block) for block in blocks[:-1]])
+            matrix, sources, starts = self._matrix, self._sources, self._starts
+
+        query = _normalize(np.asarray(query_embedding, dtype=np.float32))
+        # One product over all rows, then the best row of each document
+        best = np.maximum.reduceat(matrix @ query, starts)
+        n = min(n_documents, len(sources))
+        top = np.argpartition(-best, n - 1)[:n]
+        top = top[np.argsort(-best[top])]
+        return [(sources[i], float(best[i])) for i in top]
+
+    def stats(self) -> Dict[str, Any]:
+
+        self._sync()
+        with self._lock:
+            return {
+                "documents": len(self._documents),
+                "rows": sum(len(entry["vectors"]) for entry in self._documents.values())
+            }
+
+    def save(self) -> None:
+
+        # Writes this process's documents as they are (after building them
+        # with save=False)
+        if not self.path:
+            return
+        with file_lock(self.path):
+            self._write()
+
+    def _write(self) -> None:
+
+        # Under the file lock
+        with self._lock:
+            sources = list(self._documents)
+            entries = [
+                {
+                    "source": source,
+                    "chunks": self._documents[source]["chunks"],
+                    "sections": self._documents[source]["sections"]
+                }
+                for source in sources
+            ]
+            blocks = [self._documents[source]["vectors"] for source in sources]
+            matrix = np.concatenate(blocks) if blocks else np.zeros((0, 0), dtype=np.float32)
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # Vectors first, then the entries that refer to them, each swapped in
+        # atomically so a reader never sees a half-written file.
+        np.save(f"{self.path}.tmp.npy", matrix)
+        os.replace(f"{self.path}.tmp.npy", f"{self.path}.npy")
+        with open(f"{self.path}.json.tmp", 'w') as f:
+            json.dump(entries, f)
+        os.replace(f"{self.path}.json.tmp", f"{self.path}.json")
+        with self._lock:
+            self._signature = file_signature(f"{self.path}.json")
+
+    def _sync(self) -> None:
+
+        # Never called with self._lock held: the file lock comes first
+        if not self.path or file_signature(f"{self.path}.json") == self._signature:
+            return
+        with file_lock(self.path):
+            self._reload()
+
+    def _reload(self) -> None:
+
+        # Under the file lock, so the two files are read as one writer left
+        # them. Unreadable or mismatched files (e.g. a crash between the two
+        # swaps) are deleted; the owner rebuilds them from the stored
+        # embeddings (see VectorStoreManager._get_document_router).
+        signature = file_signature(f"{self.path}.json")
+        if signature == self._signature:
+            return
+        documents: Dict[str, Dict[str, Any]] = {}
+        if signature is not None:
+            try:
+                documents = self._read()
+            except Exception as e:
+                logger.warning("Discarding unreadable document centroids '%s': %s", self.path, e)
+                self._discard_files()
+                return
+        with self._lock:
+            self._documents = documents
+            self._matrix = None
+            self._signature = signature
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+
+        with open(f"{self.path}.json", 'r') as f:
+            entries = json.load(f)
+        matrix = np.load(f"{self.path}.npy")
+
+        # One document row plus one per section
+        if sum(1 + len(entry["sections"]) for entry in entries) != len(matrix):
+            raise ValueError("entries and vectors do not match")
+
+        documents = {}
+        offset = 0
+        for entry in entries:
+            rows = 1 + len(entry["sections"])
+            documents[entry["source"]] = {
+                "vectors": matrix[offset:offset + rows].astype(np.float32),
+                "sections": entry["sections"],
+                "chunks": entry["chunks"]
+            }
+            offset += rows
+        return documents
@@ -2,20 +2,37 @@
 
 # convert text to vectors
 
+import asyncio
+import threading
 import time
-from typing import List
+from collections import OrderedDict
+from typing import List, Optional
 from langchain_openai import OpenAIEmbeddings
 from langchain_huggingface import HuggingFaceEmbeddings
 
+from src.provider_scheduler import ProviderScheduler, get_scheduler, estimate_tokens
+from src.request_timing import stage_timer
+from src.tracing import span
+from src.usage import record_usage
+
 
 class EmbeddingService:
 
+    # Recent query embeddings kept in memory: retrieval and the answer cache
+    # embed the same question, and students repeat questions.
+    QUERY_CACHE_SIZE = 256
     
-    def __init__(self, provider: str = "openai", model: str = "text-embedding-ada-002"):
+    def __init__(self, provider: str = "openai", model: str = "text-embedding-ada-002",
+                 scheduler: Optional[ProviderScheduler] = None):
      
         self.provider = provider.lower()
         self.model = model
+        self.scheduler = scheduler if scheduler is not None else get_scheduler()
         self._embeddings = self._initialize_embeddings()
+        self._query_cache: 'OrderedDict[str, List[float]]' = OrderedDict()
+        self._query_cache_lock = threading.Lock()
+        # (event loop, text) -> task embedding it, shared by concurrent awaiters
+        self._pending_queries = {}
     
     def _initialize_embeddings(self):
        
@@ -23,14 +40,22 @@ class EmbeddingService:
             return OpenAIEmbeddings(model=self.model)
         elif self.provider == "huggingface":
             return HuggingFaceEmbeddings(model_name=self.model)
+        elif self.provider == "stub":
+            from src.stub_providers import StubEmbeddings
+            return StubEmbeddings()
         else:
             raise ValueError(f"Unsupported embedding provider: {self.provider}")
     
     def embed_documents(self, texts: List[str], max_retries: int = 3) -> List[List[float]]:
        
+        tokens = sum(estimate_tokens(text) for text in texts)
+        
         for attempt in range(max_retries):
             try:
-                embeddings = self._embeddings.embed_documents(texts)
+                with span("embedding.embed_documents", items=len(texts), tokens=tokens, attempt=attempt):
+                    with self.scheduler.acquire(tokens=tokens):
+                        embeddings = self._embeddings.embed_documents(texts)
+                record_usage('embedding', self.model, tokens)
                 return embeddings
             except Exception as e:
                 if attempt < max_retries - 1:
@@ -42,9 +67,21 @@ class EmbeddingService:
     
     def embed_query(self, text: str, max_retries: int = 3) -> List[float]:
        
+        with self._query_cache_lock:
+            cached = self._query_cache.get(text)
+            if cached is not None:
+                self._query_cache.move_to_end(text)
+                return cached
+        
         for attempt in range(max_retries):
             try:
-                embedding = self._embeddings.embed_query(text)
+                tokens = estimate_tokens(text)
+                with stage_timer('embed'), span("embedding.embed_query", items=1, tokens=tokens, attempt=attempt), \
+                        self.scheduler.acquire(tokens=tokens):
+                    embedding = self._embeddings.embed_query(text)
+                
+                record_usage('embedding', self.model, tokens)
+                self._cache_query_embedding(text, embedding)
                 return embedding
             except Exception as e:
                 if attempt < max_retries - 1:
@@ -53,3 +90,76 @@ class EmbeddingService:
                     time.sleep(wait_time)
                 else:
                     raise Exception(f"Failed to generate query embedding after {max_retries} attempts: {e}")
+    
+    def embed_queries(self, texts: List[str], max_retries: int = 3) -> List[List[float]]:
+
+        # Many questions at once (batch answering). Uncached ones go out in a
+        # single provider request where query and document embeddings are the
+        # same call; HuggingFace models may encode queries differently, so
+        # those are embedded one by one.
+        embeddings = {}
+        with self._query_cache_lock:
+            for text in texts:
+                if text in self._query_cache:
+                    self._query_cache.move_to_end(text)
+                    embeddings[text] = self._query_cache[text]
+
+        missing = [text for text in dict.fromkeys(texts) if text not in embeddings]
+        if missing:
+            if self.provider == "huggingface":
+                for text in missing:
+                    embeddings[text] = self.embed_query(text, max_retries=max_retries)
+            else:
+                for text, embedding in zip(missing, self.embed_documents(missing, max_retries=max_retries)):
+                    self._cache_query_embedding(text, embedding)
+                    embeddings[text] = embedding
+
+        return [embeddings[text] for text in texts]
+
+    def _cache_query_embedding(self, text: str, embedding: List[float]) -> None:
+        
+        with self._query_cache_lock:
+            self._query_cache[text] = embedding
+            if len(self._query_cache) > self.QUERY_CACHE_SIZE:
+                self._query_cache.popitem(last=False)
+    
+    async def aembed_query(self, text: str, max_retries: int = 3) -> List[float]:
+        
+        with self._query_cache_lock:
+            cached = self._query_cache.get(text)
+            if cached is not None:
+                self._query_cache.move_to_end(text)
+                return cached
+        
+        # Coroutines that need the same text while it is being embedded (e.g.
+        # retrieval and the answer cache) await one provider call.
+        key = (asyncio.get_running_loop(), text)
+        task = self._pending_queries.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._aembed_query(text, max_retries))
+            self._pending_queries[key] = task
+            task.add_done_callback(lambda _: self._pending_queries.pop(key, None))
+        
+        # Shielded: one awaiter being cancelled does not cancel the others' call
+        return await asyncio.shield(task)
+    
+    async def _aembed_query(self, text: str, max_retries: int) -> List[float]:
+        
+        for attempt in range(max_retries):
+            try:
+                tokens = estimate_tokens(text)
+                with stage_timer('embed'), span("embedding.embed_query", items=1, tokens=tokens, attempt=attempt):
+                    grant = await self.scheduler.aacquire(tokens=tokens)
+                    with grant:
+                        embedding = await self._embeddings.aembed_query(text)
+                
+                record_usage('embedding', self.model, tokens)
+                self._cache_query_embedding(text, embedding)
+                return embedding
+            except Exception as e:
+                if attempt < max_retries - 1:
+                    wait_time = 2 ** attempt
+                    print(f"Query embedding attempt {attempt + 1} failed: {e}. Retrying in {wait_time}s...")
+                    await asyncio.sleep(wait_time)
+                else:
+                    raise Exception(f"Failed to generate query embedding after {max_retries} attempts: {e}")
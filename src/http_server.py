@@ -0,0 +1,436 @@
+"""Headless HTTP API over one shared RAGEngine."""
+
+# ingest, ask (optionally streamed), list documents, health, Prometheus metrics
+
+import asyncio
+import json
+import os
+import tempfile
+import time
+from typing import Dict, Any, List, Optional
+
+from aiohttp import web
+
+from src.rag_engine import RAGEngine
+from src.request_timing import collect_timings
+from src.tracing import span, render_prometheus
+from src.vector_store_manager import SearchFilter
+
+
+ENGINE = web.AppKey("engine", RAGEngine)
+ADMISSION = web.AppKey("admission", "AdmissionController")
+REQUEST_TIMEOUT = web.AppKey("request_timeout", float)
+MAX_UPLOAD_BYTES = web.AppKey("max_upload_bytes", int)
+TIMINGS = web.RequestKey("timings", dict)
+
+
+class Overloaded(Exception):
+
+    def __init__(self, status: int, reason: str):
+
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+
+
+class AdmissionController:
+
+    # At most max_concurrency requests are worked on at once; up to max_queue
+    # more may wait for a slot. Beyond that new requests are refused at once
+    # (429), and a request that waited longer than queue_timeout gives up (503).
+    def __init__(self, max_concurrency: int = 64, max_queue: int = 256,
+                 queue_timeout: float = 10.0):
+
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self.active = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    async def acquire(self) -> float:
+
+        # Returns the seconds spent waiting for a slot
+        if not self._slots.locked():
+            # A free slot is taken without suspending
+            await self._slots.acquire()
+            self.active += 1
+            return 0.0
+
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded(429, "Request queue is full")
+
+        start = time.perf_counter()
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise Overloaded(503, "Timed out waiting for a worker")
+        finally:
+            self.queued -= 1
+
+        self.active += 1
+        return time.perf_counter() - start
+
+    def release(self) -> None:
+
+        self.active -= 1
+        self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out
+        }
+
+
+def _server_timing(timings: Dict[str, float]) -> str:
+
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items())
+
+
+def _json_error(status: int, message: str, headers: Optional[Dict[str, str]] = None) -> web.Response:
+
+    return web.json_response({"error": message}, status=status, headers=headers)
+
+
+def _parse_filters(payload: Dict[str, Any]) -> Optional[SearchFilter]:
+
+    sources = payload.get('sources')
+    page_range = payload.get('page_range')
+    where = payload.get('where')
+    if not (sources or page_range or where):
+        return None
+    return SearchFilter(
+        sources=list(sources) if sources else None,
+        page_range=tuple(page_range) if page_range else None,
+        where=where
+    )
+
+
+def _parse_history(payload: Dict[str, Any]) -> List[Dict[str, str]]:
+
+    # Chat messages, [{"role": "user" | "assistant", "content": str}], paired
+    # into the engine's {"question", "answer"} turns
+    messages = payload.get('history') or []
+    if not isinstance(messages, list):
+        raise ValueError("history must be a list of messages")
+    for message in messages:
+        if not (isinstance(message, dict) and message.get('role') in ('user', 'assistant')
+                and isinstance(message.get('content'), str)):
+            raise ValueError("each message needs a 'role' of user or assistant and a string 'content'")
+    roles = [message['role'] for message in messages]
+    if roles != ['user', 'assistant'] * (len(messages) // 2):
+        raise ValueError("messages must alternate user and assistant, starting with user")
+    return [{'question': messages[i]['content'], 'answer': messages[i + 1]['content']}
+            for i in range(0, len(messages), 2)]
+
+
+@web.middleware
+async def _admission_middleware(request: web.Request, handler):
+
+    # Health checks and scrapes bypass the queue so a load balancer can tell
+    # "busy" from "down"
+    if request.path in ('/health', '/metrics'):
+        return await handler(request)
+
+    admission: AdmissionController = request.app[ADMISSION]
+    start = time.perf_counter()
+    try:
+        waited = await admission.acquire()
+    except Overloaded as e:
+        return _json_error(e.status, e.reason, headers={"Retry-After": "1"})
+
+    try:
+        route = request.match_info.route.resource
+        with collect_timings() as timings, span(
+            "http.request", method=request.method,
+            route=route.canonical if route is not None else request.path,
+            queue_ms=round(waited * 1000, 3)
+        ) as current:
+            timings['queue'] = waited
+            request[TIMINGS] = timings
+            response = await handler(request)
+            timings['total'] = time.perf_counter() - start
+            current.set(status=response.status)
+        if not response.prepared:
+            response.headers['Server-Timing'] = _server_timing(timings)
+            if current.trace_id is not None:
+                response.headers['X-Trace-Id'] = current.trace_id
+        return response
+    finally:
+        admission.release()
+
+
+async def _health(request: web.Request) -> web.Response:
+
+    engine: RAGEngine = request.app[ENGINE]
+    info = await asyncio.to_thread(engine.get_database_info)
+    return web.json_response({
+        "status": "ok" if 'error' not in info else "degraded",
+        "chunks": info.get('count', 0),
+        "queue": request.app[ADMISSION].stats(),
+        "providers": engine.get_scheduler_stats()
+    })
+
+
+async def _metrics(request: web.Request) -> web.Response:
+
+    # Span metrics (empty while tracing is off) plus queue and provider gauges
+    admission = request.app[ADMISSION].stats()
+    providers = request.app[ENGINE].get_scheduler_stats()
+    lines = [
+        "# HELP rag_http_requests_active Requests being worked on.",
+        "# TYPE rag_http_requests_active gauge",
+        f"rag_http_requests_active {admission['active']}",
+        "# HELP rag_http_requests_queued Requests waiting for a worker.",
+        "# TYPE rag_http_requests_queued gauge",
+        f"rag_http_requests_queued {admission['queued']}",
+        "# HELP rag_http_requests_refused_total Requests refused with 429 or 503.",
+        "# TYPE rag_http_requests_refused_total counter",
+        f'rag_http_requests_refused_total{{reason="queue_full"}} {admission["rejected"]}',
+        f'rag_http_requests_refused_total{{reason="queue_timeout"}} {admission["timed_out"]}',
+        "# HELP rag_provider_in_flight Provider calls in flight.",
+        "# TYPE rag_provider_in_flight gauge",
+        f"rag_provider_in_flight {providers['in_flight']}",
+        "# HELP rag_provider_queued Provider calls waiting for capacity, by priority.",
+        "# TYPE rag_provider_queued gauge",
+    ]
+    priorities = {name: value for name, value in providers.items() if isinstance(value, dict)}
+    lines += [f'rag_provider_queued{{priority="{name}"}} {value["queued"]}' for name, value in priorities.items()]
+    usage = request.app[ENGINE].usage.stats()["total"]
+    lines += [
+        "# HELP rag_tokens_total Provider tokens used, by kind.",
+        "# TYPE rag_tokens_total counter",
+        f'rag_tokens_total{{kind="prompt"}} {usage["prompt_tokens"]}',
+        f'rag_tokens_total{{kind="completion"}} {usage["completion_tokens"]}',
+        f'rag_tokens_total{{kind="embedding"}} {usage["embedding_tokens"]}',
+        "# HELP rag_cost_usd_total Estimated provider cost in USD.",
+        "# TYPE rag_cost_usd_total counter",
+        f"rag_cost_usd_total {usage['cost_usd']}",
+    ]
+    text = render_prometheus() + "\n".join(lines) + "\n"
+    return web.Response(body=text.encode('utf-8'),
+                        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+
+async def _list_documents(request: web.Request) -> web.Response:
+
+    engine: RAGEngine = request.app[ENGINE]
+    return web.json_response({"documents": await asyncio.to_thread(engine.list_documents)})
+
+
+async def _delete_document(request: web.Request) -> web.Response:
+
+    engine: RAGEngine = request.app[ENGINE]
+    deleted = await asyncio.to_thread(engine.delete_document, request.match_info['source'])
+    return web.json_response({"deleted_chunks": deleted})
+
+
+async def _ingest(request: web.Request) -> web.Response:
+
+    # Multipart upload (field "file") or a raw PDF body with ?name=<file name>.
+    # Ingestion runs as a background job; poll /jobs/<job_id>.
+    engine: RAGEngine = request.app[ENGINE]
+    max_bytes = request.app[MAX_UPLOAD_BYTES]
+
+    if request.content_type.startswith('multipart/'):
+        reader = await request.multipart()
+        part = await reader.next()
+        while part is not None and part.name != 'file':
+            part = await reader.next()
+        if part is None:
+            return _json_error(400, "Missing 'file' field")
+        name = part.filename or request.query.get('name')
+        read = part.read_chunk
+    else:
+        name = request.query.get('name')
+        read = request.content.read
+
+    if not name:
+        return _json_error(400, "Missing document name")
+
+    fd, temp_path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        size = 0
+        with os.fdopen(fd, 'wb') as f:
+            while True:
+                chunk = await read(1 << 16)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    return _json_error(413, f"Upload exceeds {max_bytes // (1024 * 1024)} MB")
+                f.write(chunk)
+
+        if size == 0:
+            return _json_error(400, "Empty upload")
+
+        # The job manager keeps its own copy, so the temp file can go right away
+        job_id = await asyncio.to_thread(engine.submit_ingest, temp_path, os.path.basename(name))
+        return web.json_response({"job_id": job_id, "status": "queued"}, status=202)
+    finally:
+        os.remove(temp_path)
+
+
+async def _get_job(request: web.Request) -> web.Response:
+
+    engine: RAGEngine = request.app[ENGINE]
+    try:
+        job = engine.get_ingest_job(request.match_info['job_id'])
+    except KeyError:
+        return _json_error(404, "Unknown job")
+    return web.json_response({
+        "job_id": job.job_id,
+        "source": job.source,
+        "status": job.status,
+        "progress": job.progress,
+        "fraction_complete": job.fraction_complete,
+        "error": job.error,
+        "result": job.result
+    })
+
+
+async def _ask(request: web.Request) -> web.StreamResponse:
+
+    # JSON body: {"question", "history"?, "sources"?, "page_range"?, "where"?, "stream"?,
+    # "session_id"?}. Requests are stateless: conversation history (chat
+    # messages, see _parse_history) travels with each request. The session id (or the X-Session-Id header) groups token
+    # usage for per-session budgets.
+    engine: RAGEngine = request.app[ENGINE]
+    try:
+        payload = await request.json()
+    except json.JSONDecodeError:
+        return _json_error(400, "Body must be JSON")
+
+    question = payload.get('question') if isinstance(payload, dict) else None
+    if not isinstance(question, str) or not question.strip():
+        return _json_error(400, "Missing 'question'")
+
+    try:
+        history = _parse_history(payload)
+    except ValueError as e:
+        return _json_error(400, f"Invalid history: {e}")
+    session_id = payload.get('session_id') or request.headers.get('X-Session-Id') or 'anonymous'
+    try:
+        filters = _parse_filters(payload)
+    except (TypeError, ValueError) as e:
+        return _json_error(400, f"Invalid filter: {e}")
+
+    if payload.get('stream'):
+        return await _stream_answer(request, engine, question, filters, history, session_id)
+
+    try:
+        answer = await asyncio.wait_for(
+            engine.aask_question(question, use_context=bool(history), filters=filters,
+                                 history=history, session_id=session_id),
+            timeout=request.app[REQUEST_TIMEOUT]
+        )
+    except asyncio.TimeoutError:
+        return _json_error(504, "Timed out generating the answer")
+
+    return web.json_response({
+        "answer": answer.text,
+        "sources": answer.sources,
+        "confidence": answer.confidence,
+        "usage": answer.usage
+    })
+
+
+async def _stream_answer(request: web.Request, engine: RAGEngine, question: str,
+                         filters: Optional[SearchFilter], history, session_id: str) -> web.StreamResponse:
+
+    # Server-sent events: "sources", then "token"s, then "done" (or "error").
+    # Headers go out before the answer exists, so Server-Timing carries only
+    # the queue wait; the full timings arrive in the "done" event.
+    timings = request[TIMINGS]
+    response = web.StreamResponse(headers={
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+        "Server-Timing": _server_timing(timings)
+    })
+    await response.prepare(request)
+
+    async def send(event: Dict[str, Any]) -> None:
+        await response.write(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode())
+
+    events = engine.astream_question(question, use_context=bool(history), filters=filters,
+                                     history=history, session_id=session_id)
+
+    async def relay() -> None:
+        # One task for the whole stream: the generator's usage scope and
+        # trace span stay in the same context from first event to last
+        async for event in events:
+            if event['type'] == 'done':
+                event['timings_ms'] = {name: round(seconds * 1000, 1) for name, seconds in timings.items()}
+            await send(event)
+
+    try:
+        await asyncio.wait_for(relay(), timeout=request.app[REQUEST_TIMEOUT])
+    except asyncio.TimeoutError:
+        await send({"type": "error", "error": "Timed out generating the answer"})
+    except Exception as e:
+        await send({"type": "error", "error": str(e)})
+    finally:
+        await events.aclose()
+
+    await response.write_eof()
+    return response
+
+
+@web.middleware
+async def _error_middleware(request: web.Request, handler):
+
+    try:
+        return await handler(request)
+    except web.HTTPException:
+        raise
+    except ValueError as e:
+        return _json_error(400, str(e))
+    except Exception as e:
+        return _json_error(500, str(e))
+
+
+def create_app(engine: RAGEngine, max_concurrency: int = 64, max_queue: int = 256,
+               queue_timeout: float = 10.0, request_timeout: float = 120.0,
+               max_upload_mb: int = 100) -> web.Application:
+
+    app = web.Application(
+        middlewares=[_error_middleware, _admission_middleware],
+        client_max_size=max_upload_mb * 1024 * 1024
+    )
+    app[ENGINE] = engine
+    app[ADMISSION] = AdmissionController(max_concurrency, max_queue, queue_timeout)
+    app[REQUEST_TIMEOUT] = request_timeout
+    app[MAX_UPLOAD_BYTES] = max_upload_mb * 1024 * 1024
+
+    app.router.add_get('/health', _health)
+    app.router.add_get('/metrics', _metrics)
+    app.router.add_get('/documents', _list_documents)
+    app.router.add_post('/documents', _ingest)
+    app.router.add_delete('/documents/{source}', _delete_document)
+    app.router.add_get('/jobs/{job_id}', _get_job)
+    app.router.add_post('/ask', _ask)
+    return app
+
+
+def create_app_from_config(engine: RAGEngine) -> web.Application:
+
+    config = engine.config
+    return create_app(
+        engine,
+        max_concurrency=config.get('server.max_concurrency', 64),
+        max_queue=config.get('server.max_queue', 256),
+        queue_timeout=config.get('server.queue_timeout_seconds', 10),
+        request_timeout=config.get('server.request_timeout_seconds', 120),
+        max_upload_mb=config.get('server.max_upload_mb', 100)
+    )
@@ -0,0 +1,267 @@
+"""Background ingestion jobs with progress events and resumable checkpoints."""
+
+# submit an upload, poll or subscribe to its progress, survive a restart
+
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict, replace
+from typing import List, Dict, Any, Optional, Callable
+
+
+@dataclass
+class IngestJob:
+
+    job_id: str
+    source: str
+    # The job's own copy of the upload, kept until the job completes
+    file_path: str
+    # queued -> running -> completed | failed
+    status: str = 'queued'
+    progress: Dict[str, int] = field(default_factory=dict)
+    # {"next_page", "next_chunk"}: everything before it is already stored
+    checkpoint: Dict[str, int] = field(default_factory=dict)
+    # Chunking settings the checkpoint was made with
+    chunking: Dict[str, int] = field(default_factory=dict)
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    attempts: int = 0
+    error: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+
+    @property
+    def done(self) -> bool:
+
+        return self.status in ('completed', 'failed')
+
+    @property
+    def fraction_complete(self) -> float:
+
+        if self.status == 'completed':
+            return 1.0
+        pages_total = self.progress.get('pages_total') or 0
+        created = self.progress.get('chunks_created', 0)
+        if not pages_total or not created:
+            return 0.0
+        # The chunk total is only known at the end; extrapolate it from the
+        # pages chunked so far.
+        parsed = self.progress.get('pages_parsed', 0) / pages_total
+        return min(1.0, parsed * self.progress.get('chunks_stored', 0) / created)
+
+
+class IngestJobManager:
+
+    _shared: Dict[str, 'IngestJobManager'] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, jobs_directory: str, run_job: Callable[..., Dict[str, Any]],
+                 max_concurrent_jobs: int = 1, chunking: Optional[Dict[str, int]] = None):
+
+        # run_job(job, on_progress, on_checkpoint, resume_from) ingests the
+        # job's file and returns a JSON-serialisable result.
+        self.jobs_directory = jobs_directory
+        self.run_job = run_job
+        self.chunking = chunking or {}
+
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, IngestJob] = {}
+        self._subscribers: Dict[str, List[Callable[[IngestJob], None]]] = {}
+        self._done_events: Dict[str, threading.Event] = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrent_jobs, thread_name_prefix="ingest-job"
+        )
+
+        os.makedirs(jobs_directory, exist_ok=True)
+        self._load_jobs()
+
+    @classmethod
+    def open_shared(cls, jobs_directory: str, run_job: Callable[..., Dict[str, Any]],
+                    **kwargs) -> 'IngestJobManager':
+
+        # One manager (and one set of worker threads) per jobs directory, so
+        # every session sees every job and a crashed job is resumed only once.
+        key = os.path.abspath(jobs_directory)
+        with cls._shared_lock:
+            if key not in cls._shared:
+                manager = cls(jobs_directory, run_job, **kwargs)
+                manager.resume_incomplete()
+                cls._shared[key] = manager
+            return cls._shared[key]
+
+    def submit(self, file_path: str, source_name: Optional[str] = None) -> str:
+
+        job_id = uuid.uuid4().hex[:12]
+        source = source_name or os.path.basename(file_path)
+
+        # Copied so the caller can delete its temp file and a resumed job
+        # still has the same bytes to read.
+        job_file = os.path.join(self.jobs_directory, f"{job_id}.pdf")
+        shutil.copyfile(file_path, job_file)
+
+        job = IngestJob(job_id=job_id, source=source, file_path=job_file, chunking=dict(self.chunking))
+        with self._lock:
+            self._jobs[job_id] = job
+            self._done_events[job_id] = threading.Event()
+            self._save(job)
+
+        self._executor.submit(self._execute, job_id)
+        return job_id
+
+    def get(self, job_id: str) -> IngestJob:
+
+        with self._lock:
+            if job_id not in self._jobs:
+                raise KeyError(f"Unknown ingest job: {job_id}")
+            return self._snapshot(self._jobs[job_id])
+
+    def list_jobs(self) -> List[IngestJob]:
+
+        with self._lock:
+            jobs = [self._snapshot(job) for job in self._jobs.values()]
+        return sorted(jobs, key=lambda job: job.created_at)
+
+    def subscribe(self, job_id: str, callback: Callable[[IngestJob], None]) -> Callable[[], None]:
+
+        # callback(job) runs on the ingest thread after every progress event;
+        # returns a function that removes the subscription.
+        with self._lock:
+            if job_id not in self._jobs:
+                raise KeyError(f"Unknown ingest job: {job_id}")
+            self._subscribers.setdefault(job_id, []).append(callback)
+
+        def unsubscribe() -> None:
+            with self._lock:
+                callbacks = self._subscribers.get(job_id, [])
+                if callback in callbacks:
+                    callbacks.remove(callback)
+
+        return unsubscribe
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> IngestJob:
+
+        with self._lock:
+            event = self._done_events.get(job_id)
+        if event is None:
+            raise KeyError(f"Unknown ingest job: {job_id}")
+        event.wait(timeout)
+        return self.get(job_id)
+
+    def retry(self, job_id: str) -> None:
+
+        # Failed jobs keep their file and checkpoint; retrying continues from it
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                raise KeyError(f"Unknown ingest job: {job_id}")
+            if job.status != 'failed':
+                raise ValueError(f"Only failed jobs can be retried (job {job_id} is {job.status})")
+            job.status = 'queued'
+            job.error = None
+            self._done_events[job_id] = threading.Event()
+            self._save(job)
+        self._executor.submit(self._execute, job_id)
+
+    def resume_incomplete(self) -> List[str]:
+
+        # Jobs still queued or running on disk were interrupted by a restart
+        with self._lock:
+            job_ids = [job.job_id for job in self._jobs.values() if not job.done]
+        for job_id in job_ids:
+            self._executor.submit(self._execute, job_id)
+        return job_ids
+
+    def _execute(self, job_id: str) -> None:
+
+        with self._lock:
+            job = self._jobs[job_id]
+            if job.chunking != self.chunking:
+                # Chunk boundaries would not line up with what is stored
+                job.checkpoint = {}
+                job.chunking = dict(self.chunking)
+            job.status = 'running'
+            job.started_at = time.time()
+            job.attempts += 1
+            resume_from = dict(job.checkpoint)
+            self._save(job)
+        self._notify(job_id)
+
+        def on_progress(progress: Dict[str, int]) -> None:
+            with self._lock:
+                job.progress = dict(progress)
+            self._notify(job_id)
+
+        def on_checkpoint(checkpoint: Dict[str, int]) -> None:
+            with self._lock:
+                job.checkpoint = dict(checkpoint)
+                self._save(job)
+
+        try:
+            result = self.run_job(job, on_progress, on_checkpoint, resume_from or None)
+        except Exception as e:
+            with self._lock:
+                job.status = 'failed'
+                job.error = str(e)
+                job.finished_at = time.time()
+                self._save(job)
+        else:
+            with self._lock:
+                job.status = 'completed'
+                job.result = result
+                job.finished_at = time.time()
+                self._save(job)
+            if os.path.exists(job.file_path):
+                os.remove(job.file_path)
+
+        self._notify(job_id)
+        with self._lock:
+            self._done_events[job_id].set()
+
+    def _notify(self, job_id: str) -> None:
+
+        with self._lock:
+            callbacks = list(self._subscribers.get(job_id, []))
+            snapshot = self._snapshot(self._jobs[job_id])
+        for callback in callbacks:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                print(f"Warning: Ingest job subscriber failed: {e}")
+
+    @staticmethod
+    def _snapshot(job: IngestJob) -> IngestJob:
+
+        return replace(job, progress=dict(job.progress), checkpoint=dict(job.checkpoint))
+
+    def _job_path(self, job_id: str) -> str:
+
+        return os.path.join(self.jobs_directory, f"{job_id}.json")
+
+    def _save(self, job: IngestJob) -> None:
+
+        path = self._job_path(job.job_id)
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump(asdict(job), f)
+        os.replace(f"{path}.tmp", path)
+
+    def _load_jobs(self) -> None:
+
+        for name in sorted(os.listdir(self.jobs_directory)):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.jobs_directory, name), 'r') as f:
+                    job = IngestJob(**json.load(f))
+            except Exception as e:
+                print(f"Warning: Failed to load ingest job '{name}': {e}")
+                continue
+
+            self._jobs[job.job_id] = job
+            event = threading.Event()
+            if job.done:
+                event.set()
+            self._done_events[job.job_id] = event
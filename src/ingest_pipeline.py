@@ -0,0 +1,558 @@
+"""Pipelined document ingestion: parse, chunk, embed and store run concurrently."""
+
+# each stage feeds the next through a bounded queue
+
+import atexit
+import contextvars
+import multiprocessing
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict, Any, Optional, Callable, Tuple
+
+from langchain_core.documents import Document
+
+from src.pdf_loader import PDFLoader, PDFProcessingError
+from src.profiling import profile_thread
+from src.tracing import emit
+
+
+_DONE = object()
+
+
+class _Aborted(Exception):
+
+    pass
+
+
+def _load_page_range_timed(file_path: str, start: int, stop: int) -> Tuple[List[Document], float]:
+
+    # Runs in a worker process; the parse time comes back with the pages
+    started = time.perf_counter()
+    documents = PDFLoader.load_page_range(file_path, start, stop)
+    return documents, time.perf_counter() - started
+
+
+# Parse worker pools, one per worker count, kept for the life of the process.
+# Workers come from a forkserver (spawn where there is none), never from a
+# fork of this process: the app runs Streamlit, Chroma and aiohttp threads,
+# and a forked child can inherit a lock one of them was holding.
+_parse_pools: Dict[int, ProcessPoolExecutor] = {}
+_parse_pools_lock = threading.Lock()
+
+
+def _parse_pool(workers: int) -> ProcessPoolExecutor:
+
+    with _parse_pools_lock:
+        pool = _parse_pools.get(workers)
+        if pool is None:
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+            _parse_pools[workers] = pool
+        return pool
+
+
+def _discard_parse_pool(workers: int, pool: ProcessPoolExecutor) -> None:
+
+    # A worker died (e.g. killed by the OS); the next document gets a new pool
+    with _parse_pools_lock:
+        if _parse_pools.get(workers) is pool:
+            del _parse_pools[workers]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+@atexit.register
+def _shutdown_parse_pools() -> None:
+
+    with _parse_pools_lock:
+        pools = list(_parse_pools.values())
+        _parse_pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+class _StageStats:
+
+    def __init__(self, workers: int):
+
+        self.workers = workers
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.first_start: Optional[float] = None
+        self.last_end: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def record(self, items: int, busy_seconds: float, start: float) -> None:
+
+        with self._lock:
+            self.items += items
+            self.busy_seconds += busy_seconds
+            self.first_start = start if self.first_start is None else min(self.first_start, start)
+            self.last_end = max(self.last_end or 0.0, time.perf_counter())
+
+    def to_dict(self) -> Dict[str, Any]:
+
+        active = (self.last_end - self.first_start) if self.first_start is not None else 0.0
+        return {
+            "items": self.items,
+            "workers": self.workers,
+            "busy_seconds": self.busy_seconds,
+            "active_seconds": active,
+            "items_per_second": self.items / active if active > 0 else 0.0,
+            # Fraction of the stage's worker time spent working rather than waiting
+            "utilization": self.busy_seconds / (active * self.workers) if active > 0 else 0.0
+        }
+
+
+class _QueueStats:
+
+    def __init__(self, capacity: int):
+
+        self.capacity = capacity
+        self.samples = 0
+        self.total = 0
+        self.max = 0
+        self._lock = threading.Lock()
+
+    def sample(self, size: int) -> None:
+
+        # Sampled on every put
+        with self._lock:
+            self.samples += 1
+            self.total += size
+            self.max = max(self.max, size)
+
+    def to_dict(self) -> Dict[str, Any]:
+
+        # A queue that stays near capacity means the stage after it is the
+        # bottleneck; one that stays empty means the stage before it is.
+        return {
+            "capacity": self.capacity,
+            "mean_occupancy": self.total / self.samples if self.samples else 0.0,
+            "max_occupancy": self.max
+        }
+
+
+class IngestPipeline:
+
+    def __init__(self, pdf_loader: PDFLoader, text_chunker, embedding_service, vector_store_manager,
+                 parse_workers: int = 2, pages_per_task: int = 8,
+                 embed_workers: int = 4, embed_batch_size: int = 64,
+                 store_batch_size: int = 256, queue_size: int = 8,
+                 context_compressor=None):
+
+        self.pdf_loader = pdf_loader
+        self.text_chunker = text_chunker
+        self.embedding_service = embedding_service
+        self.vector_store_manager = vector_store_manager
+        # 0 parses in a thread of this process instead of worker processes
+        self.parse_workers = parse_workers
+        self.pages_per_task = pages_per_task
+        self.embed_workers = embed_workers
+        self.embed_batch_size = embed_batch_size
+        self.store_batch_size = store_batch_size
+        self.queue_size = queue_size
+        # When set, sentences are embedded alongside their chunks
+        self.context_compressor = context_compressor
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], pdf_loader: PDFLoader, text_chunker,
+                    embedding_service, vector_store_manager,
+                    context_compressor=None) -> 'IngestPipeline':
+
+        ingestion_config = config.get('ingestion', {})
+        return cls(
+            pdf_loader, text_chunker, embedding_service, vector_store_manager,
+            parse_workers=ingestion_config.get('parse_workers', 2),
+            pages_per_task=ingestion_config.get('pages_per_task', 8),
+            embed_workers=ingestion_config.get('embed_workers', 4),
+            embed_batch_size=ingestion_config.get('embed_batch_size', 64),
+            store_batch_size=ingestion_config.get('store_batch_size', 256),
+            queue_size=ingestion_config.get('queue_size', 8),
+            context_compressor=context_compressor
+        )
+
+    def run(self, file_path: str, source: str,
+            on_progress: Optional[Callable[[Dict[str, int]], None]] = None,
+            on_checkpoint: Optional[Callable[[Dict[str, int]], None]] = None,
+            resume_from: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+
+        # on_progress gets a snapshot of the counters after every batch in any
+        # stage; on_checkpoint gets {"next_page", "next_chunk"} whenever every
+        # chunk of the pages before next_page is stored. Passing a checkpoint
+        # back as resume_from skips the work it covers.
+        page_count = self.pdf_loader.count_pages(file_path)
+        if page_count == 0:
+            raise PDFProcessingError(f"No content extracted from PDF: {file_path}")
+
+        resume_from = resume_from or {}
+        start_page = resume_from.get('next_page', 0)
+        start_chunk = resume_from.get('next_chunk', 0)
+        if start_chunk:
+            # The lexical index is only saved at the end of a run, so chunks
+            # stored before an interruption are re-read from the vector store.
+            self.vector_store_manager.sync_lexical_index(
+                self.vector_store_manager.make_chunk_ids(source, start_chunk)
+            )
+
+        # Re-ingesting a document that is already indexed replaces it. The new
+        # version is held back until every chunk is embedded and then written
+        # at the end, so queries never see the two versions mixed and a failed
+        # run leaves the old version intact. Such a run has no checkpoints.
+        replacing = not start_chunk and self.vector_store_manager.has_document(source)
+
+        return _PipelineRun(
+            self, file_path, source, page_count, on_progress, on_checkpoint, start_page, start_chunk, replacing
+        ).execute()
+
+
+class _PipelineRun:
+
+    def __init__(self, pipeline: IngestPipeline, file_path: str, source: str, page_count: int,
+                 on_progress: Optional[Callable[[Dict[str, int]], None]],
+                 on_checkpoint: Optional[Callable[[Dict[str, int]], None]],
+                 start_page: int, start_chunk: int, replacing: bool = False):
+
+        self.pipeline = pipeline
+        self.file_path = file_path
+        self.source = source
+        self.page_count = page_count
+        self.on_progress = on_progress
+        self.on_checkpoint = on_checkpoint
+        self.start_page = start_page
+        self.start_chunk = start_chunk
+        self.replacing = replacing
+        # Embedded chunks of a replacing run, written once it has succeeded
+        self._held: List[Tuple[str, Document]] = []
+        self._held_embeddings: List[List[float]] = []
+
+        size = pipeline.queue_size
+        # pages -> chunker, chunk batches -> embedders, embedded batches -> store
+        self.pages_queue: queue.Queue = queue.Queue(maxsize=size)
+        self.embed_queue: queue.Queue = queue.Queue(maxsize=size)
+        self.store_queue: queue.Queue = queue.Queue(maxsize=size)
+        self.queue_stats = {
+            "parse->chunk": _QueueStats(size),
+            "chunk->embed": _QueueStats(size),
+            "embed->store": _QueueStats(size)
+        }
+        self._queue_names = {
+            id(self.pages_queue): "parse->chunk",
+            id(self.embed_queue): "chunk->embed",
+            id(self.store_queue): "embed->store"
+        }
+
+        self.stage_stats = {
+            "parse": _StageStats(max(1, pipeline.parse_workers)),
+            "chunk": _StageStats(1),
+            "embed": _StageStats(pipeline.embed_workers),
+            "store": _StageStats(1)
+        }
+
+        self.abort = threading.Event()
+        self.errors: List[BaseException] = []
+        self.next_chunk = start_chunk
+        self.sentences_embedded = 0
+        self.progress = {
+            "pages_total": page_count,
+            "pages_parsed": start_page,
+            "chunks_created": start_chunk,
+            "chunks_embedded": start_chunk,
+            "chunks_stored": start_chunk
+        }
+        self._progress_lock = threading.Lock()
+
+        # (page, first chunk, end chunk) in page order, and the chunks stored
+        # beyond the committed prefix; batches are stored out of order.
+        self._page_spans: deque = deque()
+        self._stored: set = set()
+        self._commit_lock = threading.Lock()
+
+    def execute(self) -> Dict[str, Any]:
+
+        stages = [(self._parse, 1), (self._chunk, 1), (self._embed, self.pipeline.embed_workers), (self._store, 1)]
+        threads = []
+        started = time.perf_counter()
+
+        for target, count in stages:
+            for _ in range(count):
+                # Each thread runs in a copy of the caller's context, so the
+                # caller's provider priority applies to the embedding calls
+                # and a profiled caller's profile samples the stages.
+                context = contextvars.copy_context()
+                thread = threading.Thread(
+                    target=context.run, args=(self._guard, target), daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+
+        for thread in threads:
+            thread.join()
+
+        if self.pipeline.context_compressor is not None:
+            self.pipeline.context_compressor.store.save()
+
+        if self.errors:
+            # A first ingest keeps the batches that did land, for a resume to
+            # continue from (a replacing run wrote nothing); persist the
+            # lexical side to match
+            self.pipeline.vector_store_manager.flush_lexical_index()
+            raise self.errors[0]
+
+        if self.replacing:
+            self._write_held()
+        self.pipeline.vector_store_manager.remove_stale_chunks(
+            self.source, self.pipeline.vector_store_manager.make_chunk_ids(self.source, self.next_chunk)
+        )
+        # Centroids are taken from the stored embeddings once the document is
+        # complete, so a resumed run covers the chunks of the interrupted one
+        self.pipeline.vector_store_manager.refresh_document_centroids(self.source)
+
+        stats = {
+            "pages": self.page_count,
+            "chunks": self.next_chunk,
+            "resumed_from_chunk": self.start_chunk,
+            "sentences_embedded": self.sentences_embedded,
+            "elapsed_seconds": time.perf_counter() - started,
+            "stages": {name: stage.to_dict() for name, stage in self.stage_stats.items()},
+            "queues": {name: q.to_dict() for name, q in self.queue_stats.items()}
+        }
+        # The stage with the most work per worker sets the pace
+        stats["bottleneck"] = max(
+            self.stage_stats, key=lambda name: self.stage_stats[name].busy_seconds / self.stage_stats[name].workers
+        )
+        return stats
+
+    def _guard(self, target: Callable[[], None]) -> None:
+
+        try:
+            with profile_thread():
+                target()
+        except _Aborted:
+            pass
+        except BaseException as e:
+            self.errors.append(e)
+            self.abort.set()
+
+    def _put(self, q: queue.Queue, item: Any) -> None:
+
+        # Blocks while the queue is full (backpressure) but gives up as soon
+        # as another stage has failed.
+        while True:
+            if self.abort.is_set():
+                raise _Aborted()
+            try:
+                q.put(item, timeout=0.1)
+                self.queue_stats[self._queue_names[id(q)]].sample(q.qsize())
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, q: queue.Queue) -> Any:
+
+        while True:
+            if self.abort.is_set():
+                raise _Aborted()
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+    def _advance(self, key: str, amount: int) -> None:
+
+        with self._progress_lock:
+            self.progress[key] += amount
+            snapshot = dict(self.progress)
+        if self.on_progress is not None:
+            self.on_progress(snapshot)
+
+    def _parse(self) -> None:
+
+        pipeline = self.pipeline
+        ranges = [
+            (start, min(start + pipeline.pages_per_task, self.page_count))
+            for start in range(self.start_page, self.page_count, pipeline.pages_per_task)
+        ]
+
+        try:
+            if pipeline.parse_workers <= 0:
+                for start, stop in ranges:
+                    began = time.perf_counter()
+                    pages, seconds = _load_page_range_timed(self.file_path, start, stop)
+                    self._emit_pages(pages, seconds, began)
+                return
+
+            pool = _parse_pool(pipeline.parse_workers)
+            # A bounded window of tasks, consumed in page order so chunk
+            # numbering matches a sequential load.
+            window = pipeline.parse_workers * 2
+            pending = deque()
+            try:
+                for start, stop in ranges:
+                    pending.append((time.perf_counter(), pool.submit(
+                        _load_page_range_timed, self.file_path, start, stop
+                    )))
+                    if len(pending) >= window:
+                        began, future = pending.popleft()
+                        self._emit_pages(*future.result(), began)
+                while pending:
+                    began, future = pending.popleft()
+                    self._emit_pages(*future.result(), began)
+            except BrokenProcessPool:
+                _discard_parse_pool(pipeline.parse_workers, pool)
+                raise
+            except BaseException:
+                # The pool is shared with other ingests: cancel only our tasks
+                for _, future in pending:
+                    future.cancel()
+                raise
+        finally:
+            if not self.abort.is_set():
+                self._put(self.pages_queue, _DONE)
+
+    def _emit_pages(self, pages: List[Document], seconds: float, began: float) -> None:
+
+        self.stage_stats["parse"].record(len(pages), seconds, began)
+        # Timed where the pages were parsed, which may be a worker process
+        emit("pdf.load_pages", seconds, items=len(pages))
+        self._advance("pages_parsed", len(pages))
+        self._put(self.pages_queue, pages)
+
+    def _chunk(self) -> None:
+
+        pipeline = self.pipeline
+        batch: List[Tuple[str, Document]] = []
+
+        try:
+            while True:
+                pages = self._get(self.pages_queue)
+                if pages is _DONE:
+                    break
+
+                began = time.perf_counter()
+                created = 0
+                # Page by page, so every chunk is attributed to a page span
+                for page in pages:
+                    chunks = pipeline.text_chunker.split_documents([page])
+                    first = self.next_chunk
+                    ids = pipeline.vector_store_manager.make_chunk_ids(self.source, len(chunks), start=first)
+                    for chunk_id, chunk in zip(ids, chunks):
+                        chunk.metadata['source'] = self.source
+                        chunk.metadata['chunk_index'] = self.next_chunk
+                        self.next_chunk += 1
+                        batch.append((chunk_id, chunk))
+                    with self._commit_lock:
+                        self._page_spans.append((page.metadata['page'], first, self.next_chunk))
+                    created += len(chunks)
+                self.stage_stats["chunk"].record(created, time.perf_counter() - began, began)
+                self._advance("chunks_created", created)
+
+                while len(batch) >= pipeline.embed_batch_size:
+                    self._put(self.embed_queue, batch[:pipeline.embed_batch_size])
+                    batch = batch[pipeline.embed_batch_size:]
+
+            if batch:
+                self._put(self.embed_queue, batch)
+        finally:
+            if not self.abort.is_set():
+                for _ in range(pipeline.embed_workers):
+                    self._put(self.embed_queue, _DONE)
+
+    def _embed(self) -> None:
+
+        try:
+            while True:
+                batch = self._get(self.embed_queue)
+                if batch is _DONE:
+                    break
+
+                began = time.perf_counter()
+                embeddings = self.pipeline.embedding_service.embed_documents(
+                    [chunk.page_content for _, chunk in batch]
+                )
+                if self.pipeline.context_compressor is not None:
+                    sentences = self.pipeline.context_compressor.prepare([chunk for _, chunk in batch])
+                    with self._progress_lock:
+                        self.sentences_embedded += sentences
+                self.stage_stats["embed"].record(len(batch), time.perf_counter() - began, began)
+                self._advance("chunks_embedded", len(batch))
+                self._put(self.store_queue, (batch, embeddings))
+        finally:
+            if not self.abort.is_set():
+                self._put(self.store_queue, _DONE)
+
+    def _store(self) -> None:
+
+        pipeline = self.pipeline
+        finished_embedders = 0
+        pending: List[Tuple[str, Document]] = []
+        pending_embeddings: List[List[float]] = []
+
+        while finished_embedders < pipeline.embed_workers:
+            item = self._get(self.store_queue)
+            if item is _DONE:
+                finished_embedders += 1
+                continue
+
+            batch, embeddings = item
+            pending.extend(batch)
+            pending_embeddings.extend(embeddings)
+            if len(pending) >= pipeline.store_batch_size:
+                self._write(pending, pending_embeddings)
+                pending, pending_embeddings = [], []
+
+        if pending:
+            self._write(pending, pending_embeddings)
+
+    def _write(self, batch: List[Tuple[str, Document]], embeddings: List[List[float]]) -> None:
+
+        if self.replacing:
+            self._held.extend(batch)
+            self._held_embeddings.extend(embeddings)
+            return
+
+        began = time.perf_counter()
+        # The lexical index is saved once at the end, not after every batch
+        self.pipeline.vector_store_manager.add_embedded_documents(
+            [chunk for _, chunk in batch], embeddings, [chunk_id for chunk_id, _ in batch],
+            save_lexical=False
+        )
+        self.stage_stats["store"].record(len(batch), time.perf_counter() - began, began)
+        self._advance("chunks_stored", len(batch))
+        self._commit([int(chunk.metadata['chunk_index']) for _, chunk in batch])
+
+    def _write_held(self) -> None:
+
+        # One upsert unless the document has more chunks than the store
+        # accepts per call
+        manager = self.pipeline.vector_store_manager
+        size = manager.max_batch_size
+        began = time.perf_counter()
+        for start in range(0, len(self._held), size):
+            batch = self._held[start:start + size]
+            manager.add_embedded_documents(
+                [chunk for _, chunk in batch], self._held_embeddings[start:start + size],
+                [chunk_id for chunk_id, _ in batch], save_lexical=False
+            )
+        self.stage_stats["store"].record(len(self._held), time.perf_counter() - began, began)
+        self._advance("chunks_stored", len(self._held))
+
+    def _commit(self, indices: List[int]) -> None:
+
+        checkpoint = None
+        with self._commit_lock:
+            self._stored.update(indices)
+            # Pages leave the span list once all of their chunks are stored
+            while self._page_spans:
+                page, first, end = self._page_spans[0]
+                if not all(index in self._stored for index in range(first, end)):
+                    break
+                self._page_spans.popleft()
+                self._stored.difference_update(range(first, end))
+                checkpoint = {"next_page": page + 1, "next_chunk": end}
+
+        if checkpoint is not None and self.on_checkpoint is not None:
+            self.on_checkpoint(checkpoint)
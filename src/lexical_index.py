@@ -0,0 +1,393 @@
+"""In-process BM25 lexical index kept alongside the vector store."""
+
+# keyword search without an embedding call
+
+import heapq
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import List, Dict, Any, Optional, Tuple, Callable
+from langchain_core.documents import Document
+
+from src.shared_files import file_lock, file_signature
+
+
+logger = logging.getLogger(__name__)
+
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_POSSESSIVE_PATTERN = re.compile(r"['’]s\b")
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have how in is it its of on or that the
+this to was were what when where which who why will with
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+
+    # "Snell's law" -> ["snell", "law"], so possessives match the bare name
+    text = _POSSESSIVE_PATTERN.sub("", text.lower())
+    return [t for t in _TOKEN_PATTERN.findall(text) if t not in STOPWORDS]
+
+
+class BM25Index:
+
+    # Persisted as a JSON snapshot plus an append-only log of the adds and
+    # removals since then, so a write costs disk time proportional to the
+    # chunks it touched. The log is folded into the snapshot once it holds
+    # more entries than the index has chunks (and at least COMPACT_MIN).
+    # Other processes (ingest jobs, the HTTP server, Streamlit) write the same
+    # files: appends and compaction take a file lock, and every read first
+    # picks up whatever was written since the last one.
+
+    COMPACT_MIN = 1000
+
+    _shared: Dict[str, 'BM25Index'] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.5, b: float = 0.75):
+
+        self.path = path
+        self.k1 = k1
+        self.b = b
+
+        self._lock = threading.RLock()
+        # Serialises file writes; never held together with a search
+        self._write_lock = threading.Lock()
+        # Log records not yet on disk, and the number already in the log file
+        self._pending: List[Dict[str, Any]] = []
+        self._log_entries = 0
+        # What has been read from disk: the snapshot's signature, the log's
+        # inode and how many bytes of it were replayed
+        self._snapshot_signature: Optional[tuple] = None
+        self._log_inode: Optional[int] = None
+        self._log_offset = 0
+        # term -> {chunk id -> term frequency}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        # chunk id -> (text, metadata, token count)
+        self._documents: Dict[str, Tuple[str, Dict[str, Any], int]] = {}
+        self._total_length = 0
+        # chunk id -> BM25 length normalisation, rebuilt lazily after writes
+        self._norms: Optional[Dict[str, float]] = None
+
+        if path:
+            with self._lock:
+                self._load()
+
+    @classmethod
+    def open_shared(cls, path: str) -> 'BM25Index':
+
+        # Every engine in the process that points at the same file shares one
+        # in-memory index, so writes from one session are visible to the others.
+        key = os.path.abspath(path)
+        with cls._shared_lock:
+            if key not in cls._shared:
+                cls._shared[key] = cls(path)
+            return cls._shared[key]
+
+    @property
+    def log_path(self) -> str:
+
+        return f"{self.path}.log"
+
+    @property
+    def exists_on_disk(self) -> bool:
+
+        return bool(self.path) and (os.path.exists(self.path) or os.path.exists(self.log_path))
+
+    def __len__(self) -> int:
+
+        with self._lock:
+            self._sync()
+            return len(self._documents)
+
+    def add_documents(self, ids: List[str], documents: List[Document], save: bool = True) -> None:
+
+        with self._lock:
+            for chunk_id, doc in zip(ids, documents):
+                self._add(chunk_id, doc.page_content, dict(doc.metadata))
+                if self.path:
+                    self._pending.append({"add": chunk_id, "text": doc.page_content, "metadata": dict(doc.metadata)})
+
+        if save:
+            self.save()
+
+    def remove_ids(self, ids: List[str], save: bool = True) -> int:
+
+        with self._lock:
+            removed = [chunk_id for chunk_id in ids if self._remove(chunk_id)]
+            if removed and self.path:
+                self._pending.append({"remove": removed})
+
+        if removed and save:
+            self.save()
+        return len(removed)
+
+    def remove_source(self, source: str, save: bool = True) -> int:
+
+        with self._lock:
+            self._sync()
+            ids = [
+                chunk_id for chunk_id, (_, metadata, _) in self._documents.items()
+                if metadata.get('source') == source
+            ]
+        return self.remove_ids(ids, save=save)
+
+    def clear(self, save: bool = True) -> None:
+
+        with self._lock:
+            self._reset()
+            if self.path:
+                # Nothing queued before the clear matters any more
+                self._pending = [{"clear": True}]
+
+        if save:
+            self.save()
+
+    def _reset(self) -> None:
+
+        self._postings = {}
+        self._documents = {}
+        self._total_length = 0
+        self._norms = None
+
+    def _add(self, chunk_id: str, text: str, metadata: Dict[str, Any]) -> None:
+
+        self._remove(chunk_id)
+
+        tokens = tokenize(text)
+        for term, freq in Counter(tokens).items():
+            self._postings.setdefault(term, {})[chunk_id] = freq
+
+        self._documents[chunk_id] = (text, metadata, len(tokens))
+        self._total_length += len(tokens)
+        self._norms = None
+
+    def _remove(self, chunk_id: str) -> bool:
+
+        entry = self._documents.pop(chunk_id, None)
+        if entry is None:
+            return False
+
+        text, _, length = entry
+        self._total_length -= length
+        self._norms = None
+
+        for term in set(tokenize(text)):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(chunk_id, None)
+                if not postings:
+                    del self._postings[term]
+
+        return True
+
+    def _apply(self, record: Dict[str, Any]) -> None:
+
+        if "add" in record:
+            self._add(record["add"], record["text"], record["metadata"])
+        elif "remove" in record:
+            for chunk_id in record["remove"]:
+                self._remove(chunk_id)
+        elif "clear" in record:
+            self._reset()
+
+    def _get_norms(self) -> Dict[str, float]:
+
+        if self._norms is None:
+            avg_length = self._total_length / len(self._documents) if self._documents else 1.0
+            avg_length = avg_length or 1.0
+            self._norms = {
+                chunk_id: self.k1 * (1 - self.b + self.b * length / avg_length)
+                for chunk_id, (_, _, length) in self._documents.items()
+            }
+        return self._norms
+
+    def search(self, query: str, k: int = 4,
+               predicate: Optional[Callable[[Dict[str, Any]], bool]] = None) -> List[Tuple[Document, float]]:
+
+        with self._lock:
+            self._sync()
+            doc_count = len(self._documents)
+            if doc_count == 0:
+                return []
+
+            norms = self._get_norms()
+            scores: Dict[str, float] = {}
+            allowed: Dict[str, bool] = {}
+            k1_plus_1 = self.k1 + 1
+
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, freq in postings.items():
+                    if predicate is not None:
+                        # Each candidate's metadata is checked once, before scoring
+                        if chunk_id not in allowed:
+                            allowed[chunk_id] = predicate(self._documents[chunk_id][1])
+                        if not allowed[chunk_id]:
+                            continue
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * freq * k1_plus_1 / (freq + norms[chunk_id])
+
+            top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+            results = []
+            for chunk_id, score in top:
+                text, metadata, _ = self._documents[chunk_id]
+                results.append((Document(page_content=text, metadata=dict(metadata), id=chunk_id), score))
+
+            return results
+
+    def save(self) -> None:
+
+        if not self.path:
+            return
+
+        # Queued records are taken under the index lock; the disk write
+        # happens outside it, so searches never wait for the file system.
+        # The file lock keeps other processes' appends and compactions from
+        # interleaving with this one, and catching up first means a
+        # compacted snapshot includes their records.
+        with self._write_lock, file_lock(self.path):
+            with self._lock:
+                self._sync()
+                records, self._pending = self._pending, []
+                compact = self._log_entries + len(records) > max(self.COMPACT_MIN, len(self._documents))
+                if compact:
+                    # Shallow copy: entries are immutable tuples
+                    documents = dict(self._documents)
+                log_offset = self._log_offset
+            if not records:
+                return
+
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            if compact:
+                self._write_snapshot(documents)
+                return
+
+            with open(self.log_path, 'ab') as f:
+                # Bytes past what was replayed can only be a record cut short
+                # by a crash (appends are made under the lock): cut them off
+                # so this append starts on a fresh line
+                if f.tell() > log_offset:
+                    f.truncate(log_offset)
+                f.write("".join(json.dumps(record) + "\n" for record in records).encode('utf-8'))
+            signature = file_signature(self.log_path)
+            with self._lock:
+                self._log_entries += len(records)
+                # This process's own records need no replay
+                if signature is not None and self._log_inode in (None, signature[0]):
+                    self._log_inode = signature[0]
+                    self._log_offset = max(self._log_offset, signature[2])
+
+    def _write_snapshot(self, documents: Dict[str, Tuple[str, Dict[str, Any], int]]) -> None:
+
+        payload = {
+            "k1": self.k1,
+            "b": self.b,
+            "documents": {
+                chunk_id: {"text": text, "metadata": metadata}
+                for chunk_id, (text, metadata, _) in documents.items()
+            }
+        }
+
+        # Write to a temp file and swap it in so a crash never leaves a
+        # half-written index behind. The snapshot holds every logged record,
+        # so the log starts over.
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, self.path)
+        if os.path.exists(self.log_path):
+            os.remove(self.log_path)
+        with self._lock:
+            self._snapshot_signature = file_signature(self.path)
+            self._log_inode = None
+            self._log_offset = 0
+            self._log_entries = 0
+
+    def _sync(self) -> None:
+
+        # Under self._lock: reload when the snapshot was replaced or the log
+        # started over (compaction, a clear), else replay what was appended
+        if not self.path:
+            return
+        log = file_signature(self.log_path)
+        if (file_signature(self.path) != self._snapshot_signature
+                or (self._log_inode is not None and (log[0] if log else None) != self._log_inode)
+                or (log[2] if log else 0) < self._log_offset):
+            self._load()
+        elif log is not None and log[2] > self._log_offset and self._replay_log():
+            # Records this process has not saved yet go on top, in the order
+            # they will be appended
+            for record in self._pending:
+                self._apply(record)
+
+    def _load(self) -> None:
+
+        # The whole index from disk, then this process's unsaved records
+        self._reset()
+        self._snapshot_signature = file_signature(self.path)
+        self._log_inode = None
+        self._log_offset = 0
+        self._log_entries = 0
+
+        if self._snapshot_signature is not None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    payload = json.load(f)
+                self.k1 = payload.get("k1", self.k1)
+                self.b = payload.get("b", self.b)
+                for chunk_id, document in payload.get("documents", {}).items():
+                    self._add(chunk_id, document["text"], document["metadata"])
+            except Exception as e:
+                # The files are dropped so the owner rebuilds the index from
+                # the vector store (see VectorStoreManager._get_lexical_index)
+                logger.warning("Discarding unreadable lexical index '%s': %s", self.path, e)
+                self._reset()
+                for path in (self.path, self.log_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+                self._snapshot_signature = None
+                return
+
+        self._replay_log()
+        for record in self._pending:
+            self._apply(record)
+
+    def _replay_log(self) -> int:
+
+        # Complete records appended since the last replay; a torn last line
+        # is left for the next writer to cut off
+        try:
+            with open(self.log_path, 'rb') as f:
+                inode = os.fstat(f.fileno()).st_ino
+                if inode != self._log_inode:
+                    self._log_inode = inode
+                    self._log_offset = 0
+                f.seek(self._log_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return 0
+
+        complete = data[:data.rfind(b"\n") + 1]
+        replayed = 0
+        for line in complete.splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                logger.warning("Skipping unreadable record in '%s'", self.log_path)
+                continue
+            self._apply(record)
+            replayed += 1
+        self._log_offset += len(complete)
+        self._log_entries += replayed
+        return replayed
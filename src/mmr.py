@@ -0,0 +1,50 @@
+"""Maximal Marginal Relevance selection over candidate embeddings."""
+
+# pick relevant but non-redundant chunks
+
+from typing import List, Sequence
+
+import numpy as np
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def maximal_marginal_relevance(query_embedding: Sequence[float],
+                               candidate_embeddings: Sequence[Sequence[float]],
+                               k: int = 4,
+                               lambda_mult: float = 0.5) -> List[int]:
+    
+    candidates = np.asarray(candidate_embeddings, dtype=np.float32)
+    if k <= 0 or candidates.size == 0:
+        return []
+    
+    candidates = _normalize(candidates)
+    query = _normalize(np.asarray(query_embedding, dtype=np.float32))
+    k = min(k, len(candidates))
+    
+    relevance = candidates @ query
+    
+    first = int(np.argmax(relevance))
+    selected = [first]
+    chosen = np.zeros(len(candidates), dtype=bool)
+    chosen[first] = True
+    
+    # Highest similarity of each candidate to anything already selected. It is
+    # updated with one matrix-vector product per pick, so selection costs
+    # O(k * fetch_k * dim) and never builds the full pairwise matrix.
+    redundancy = candidates @ candidates[first]
+    
+    while len(selected) < k:
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[chosen] = -np.inf
+        
+        best = int(np.argmax(scores))
+        selected.append(best)
+        chosen[best] = True
+        np.maximum(redundancy, candidates @ candidates[best], out=redundancy)
+    
+    return selected
@@ -4,6 +4,9 @@ import os
 from typing import List
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_core.documents import Document
+from pypdf import PdfReader
+
+from src.tracing import span
 
 
 class PDFProcessingError(Exception):
@@ -50,8 +53,10 @@ class PDFLoader:
             self.validate_pdf(file_path)
             
          
-            loader = PyPDFLoader(file_path)
-            documents = loader.load()
+            with span("pdf.load", bytes=os.path.getsize(file_path)) as current:
+                loader = PyPDFLoader(file_path)
+                documents = loader.load()
+                current.set(items=len(documents))
             
             if not documents:
                 raise PDFProcessingError(f"No content extracted from PDF: {file_path}")
@@ -66,3 +71,41 @@ class PDFLoader:
             raise PDFProcessingError(
                 f"Failed to load PDF '{file_path}': {str(e)}"
             ) from e
+    
+    def count_pages(self, file_path: str) -> int:
+        
+        try:
+            self.validate_pdf(file_path)
+            return len(PdfReader(file_path).pages)
+        except PDFProcessingError:
+            raise
+        except Exception as e:
+            raise PDFProcessingError(
+                f"Failed to read PDF '{file_path}': {str(e)}"
+            ) from e
+    
+    @staticmethod
+    def load_page_range(file_path: str, start: int, stop: int) -> List[Document]:
+        
+        # Entry point for worker processes: each worker opens the
+        # file itself and extracts only its own pages, so nothing large has to
+        # be pickled on the way in. Metadata matches what load() produces.
+        try:
+            reader = PdfReader(file_path)
+            total_pages = len(reader.pages)
+            documents = []
+            for page in range(start, min(stop, total_pages)):
+                documents.append(Document(
+                    page_content=reader.pages[page].extract_text() or "",
+                    metadata={
+                        "source": file_path,
+                        "total_pages": total_pages,
+                        "page": page,
+                        "page_label": reader.page_labels[page]
+                    }
+                ))
+            return documents
+        except Exception as e:
+            raise PDFProcessingError(
+                f"Failed to load pages {start}-{stop - 1} of '{file_path}': {str(e)}"
+            ) from e
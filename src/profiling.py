@@ -0,0 +1,290 @@
+"""On-demand sampling profiler for single ingests and questions."""
+
+# stacks -> collapsed text (flamegraph.pl, speedscope) or speedscope JSON
+
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Tuple
+
+
+FORMATS = ('speedscope', 'collapsed')
+
+# (function, file, first line)
+Frame = Tuple[str, str, int]
+
+
+def _short_path(path: str) -> str:
+
+    # Paths inside site-packages or this checkout, relative to that root
+    for marker in ('site-packages' + os.sep, 'dist-packages' + os.sep):
+        index = path.rfind(marker)
+        if index >= 0:
+            return path[index + len(marker):]
+    cwd = os.getcwd() + os.sep
+    return path[len(cwd):] if path.startswith(cwd) else path
+
+
+# The sampler of the profile_block the current code runs under, if any
+_active_sampler: contextvars.ContextVar = contextvars.ContextVar('active_sampler', default=None)
+
+# tracemalloc is process-wide: concurrent profiles share it, and the last
+# one out stops it (unless it was already running before the first)
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+_tracemalloc_owned = False
+
+
+def _acquire_tracemalloc() -> None:
+
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0:
+            _tracemalloc_owned = not tracemalloc.is_tracing()
+            if _tracemalloc_owned:
+                tracemalloc.start()
+            else:
+                tracemalloc.reset_peak()
+        _tracemalloc_users += 1
+
+
+def _release_tracemalloc() -> None:
+
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0 and _tracemalloc_owned:
+            tracemalloc.stop()
+
+
+class _Sampler(threading.Thread):
+
+    # Every interval, records the stacks of the profiled thread and of the
+    # threads it registered with profile_thread() (e.g. ingest pipeline
+    # stages). Nothing else is sampled: Streamlit runs every session's
+    # script in its own thread, and those must stay out of the profile.
+    def __init__(self, target_ident: int, interval: float, trace_memory: bool):
+
+        super().__init__(name="profiler", daemon=True)
+        self.interval = interval
+        self.trace_memory = trace_memory
+        self.idents = {target_ident}
+        self.counts: Counter = Counter()
+        self.ticks = 0
+        self.peak_snapshot: Optional[tracemalloc.Snapshot] = None
+        self.memory_error: Optional[str] = None
+        self._snapshot_at = 0
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+
+        while not self._stop_event.wait(self.interval):
+            self.sample()
+
+    def sample(self) -> None:
+
+        idents = set(self.idents)
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident not in idents:
+                continue
+            stack: List[Frame] = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            stack.reverse()
+            self.counts[(names.get(ident, str(ident)), tuple(stack))] += 1
+        self.ticks += 1
+
+        if self.trace_memory:
+            # Snapshot whenever traced memory has grown by a tenth since the
+            # last one, so the top lines describe the peak, not the end state.
+            # A failure ends memory snapshots, never the stack sampling.
+            try:
+                current, _ = tracemalloc.get_traced_memory()
+                if current > self._snapshot_at * 1.1:
+                    self._snapshot_at = current
+                    self.peak_snapshot = tracemalloc.take_snapshot()
+            except Exception as e:
+                self.trace_memory = False
+                self.memory_error = f"{type(e).__name__}: {e}"
+
+    def stop(self) -> None:
+
+        self._stop_event.set()
+        self.join()
+
+
+class Profile:
+
+    def __init__(self, name: str, interval: float):
+
+        self.profile_id = uuid.uuid4().hex[:8]
+        self.name = name
+        self.interval = interval
+        # Measured: under load the sampler wakes up less often than asked
+        self.seconds_per_sample = interval
+        self.started = time.time()
+        self.duration = 0.0
+        self.samples: Dict[Tuple[str, Tuple[Frame, ...]], int] = {}
+        self.memory: Optional[Dict[str, Any]] = None
+        self.paths: List[str] = []
+
+    @property
+    def sample_count(self) -> int:
+
+        return sum(self.samples.values())
+
+    def collapsed(self) -> str:
+
+        # "thread;outer (file:line);...;inner (file:line) count" per distinct stack
+        lines = []
+        for (thread, stack), count in sorted(self.samples.items(), key=lambda item: -item[1]):
+            frames = [thread] + [f"{name} ({_short_path(path)}:{line})" for name, path, line in stack]
+            lines.append(f"{';'.join(frame.replace(';', ':') for frame in frames)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self) -> Dict[str, Any]:
+
+        # One sampled profile per thread; weights are seconds
+        frames: List[Dict[str, Any]] = []
+        frame_index: Dict[Frame, int] = {}
+        per_thread: Dict[str, Dict[str, list]] = {}
+        for (thread, stack), count in self.samples.items():
+            indices = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    name, path, line = frame
+                    frames.append({"name": name, "file": _short_path(path), "line": line})
+                indices.append(frame_index[frame])
+            profile = per_thread.setdefault(thread, {"samples": [], "weights": []})
+            profile["samples"].append(indices)
+            profile["weights"].append(count * self.seconds_per_sample)
+
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": self.name,
+            "exporter": "rag-qa-profiler",
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": thread,
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": sum(profile["weights"]),
+                    "samples": profile["samples"],
+                    "weights": profile["weights"]
+                }
+                for thread, profile in per_thread.items()
+            ]
+        }
+
+    def render(self, fmt: str) -> str:
+
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported profile format: {fmt}")
+        if fmt == 'collapsed':
+            return self.collapsed()
+        return json.dumps(self.speedscope())
+
+    def write(self, output_dir: str, fmt: str = 'speedscope') -> List[str]:
+
+        os.makedirs(output_dir, exist_ok=True)
+        stem = os.path.join(
+            output_dir,
+            f"{self.name}-{time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started))}-{self.profile_id}"
+        )
+        extension = '.speedscope.json' if fmt == 'speedscope' else '.collapsed.txt'
+        with open(stem + extension, 'w', encoding='utf-8') as f:
+            f.write(self.render(fmt))
+        self.paths = [stem + extension]
+        if self.memory is not None:
+            with open(stem + '.memory.json', 'w', encoding='utf-8') as f:
+                json.dump(self.memory, f, indent=2)
+            self.paths.append(stem + '.memory.json')
+        return self.paths
+
+
+@contextmanager
+def profile_thread():
+
+    # Adds the calling thread to the profile this code runs under (threads
+    # must be started in a copy of the profiled caller's context). Does
+    # nothing when nothing is being profiled.
+    sampler = _active_sampler.get()
+    if sampler is None:
+        yield
+        return
+    ident = threading.get_ident()
+    sampler.idents.add(ident)
+    try:
+        yield
+    finally:
+        sampler.idents.discard(ident)
+
+
+def _memory_summary(snapshot: Optional[tracemalloc.Snapshot], peak: int, top: int,
+                    error: Optional[str] = None) -> Dict[str, Any]:
+
+    summary = {"peak_mb": round(peak / 2 ** 20, 2), "top": []}
+    if error is not None:
+        summary["error"] = error
+    if snapshot is None:
+        return summary
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    ])
+    summary["snapshot_mb"] = round(sum(stat.size for stat in snapshot.statistics('filename')) / 2 ** 20, 2)
+    for stat in snapshot.statistics('lineno')[:top]:
+        frame = stat.traceback[0]
+        summary["top"].append({
+            "location": f"{_short_path(frame.filename)}:{frame.lineno}",
+            "size_kb": round(stat.size / 1024, 1),
+            "count": stat.count
+        })
+    return summary
+
+
+@contextmanager
+def profile_block(name: str, interval: float = 0.005, trace_memory: bool = False, memory_top: int = 15):
+
+    # Samples the calling thread (and threads it registers with
+    # profile_thread) until the block exits; the yielded Profile is filled
+    # in then. trace_memory also runs tracemalloc, which slows
+    # allocation-heavy code noticeably; the peak is process-wide, so
+    # overlapping profiles include each other's allocations.
+    profile = Profile(name, interval)
+    if trace_memory:
+        _acquire_tracemalloc()
+
+    sampler = _Sampler(threading.get_ident(), interval, trace_memory)
+    token = _active_sampler.set(sampler)
+    start = time.perf_counter()
+    sampler.start()
+    try:
+        yield profile
+    finally:
+        sampler.stop()
+        _active_sampler.reset(token)
+        profile.duration = time.perf_counter() - start
+        profile.samples = dict(sampler.counts)
+        if sampler.ticks:
+            profile.seconds_per_sample = profile.duration / sampler.ticks
+        if trace_memory:
+            try:
+                _, peak = tracemalloc.get_traced_memory()
+                profile.memory = _memory_summary(sampler.peak_snapshot, peak, memory_top, sampler.memory_error)
+            finally:
+                _release_tracemalloc()
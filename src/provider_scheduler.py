@@ -0,0 +1,320 @@
+"""Process-wide scheduler for embedding and LLM provider calls."""
+
+# one shared quota, interactive questions ahead of bulk ingestion
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from enum import IntEnum
+from typing import Dict, Any, Optional
+
+
+class Priority(IntEnum):
+
+    INTERACTIVE = 0
+    BULK = 1
+
+
+_current_priority: contextvars.ContextVar = contextvars.ContextVar(
+    'provider_priority', default=Priority.INTERACTIVE
+)
+
+
+@contextmanager
+def request_priority(priority: Priority):
+
+    # Provider calls made inside this block (on this thread or task) are
+    # queued at the given priority.
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority() -> Priority:
+
+    return _current_priority.get()
+
+
+_encoding = None
+
+
+def estimate_tokens(text: str) -> int:
+
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    # Roughly four characters per token for English text
+    return len(text) // 4 + 1
+
+
+class _TokenBucket:
+
+    def __init__(self, per_minute: Optional[float], burst_seconds: float):
+
+        self.configure(per_minute, burst_seconds)
+
+    def configure(self, per_minute: Optional[float], burst_seconds: float) -> None:
+
+        self.per_minute = per_minute
+        if per_minute:
+            self.rate = per_minute / 60.0
+            self.capacity = max(1.0, self.rate * burst_seconds)
+            self.level = getattr(self, 'level', self.capacity)
+            self.level = min(self.level, self.capacity)
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+
+        if self.per_minute:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def clamp(self, amount: float) -> float:
+
+        # A single request larger than the whole bucket would never fit
+        return min(amount, self.capacity) if self.per_minute else amount
+
+    def seconds_until(self, amount: float) -> float:
+
+        if not self.per_minute or self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+
+        if self.per_minute:
+            self.level -= amount
+
+
+def _resolve(future: asyncio.Future) -> None:
+
+    if not future.done():
+        future.set_result(None)
+
+
+class _Grant:
+
+    def __init__(self, scheduler: 'ProviderScheduler'):
+
+        self._scheduler = scheduler
+        self._released = False
+
+    def release(self) -> None:
+
+        if not self._released:
+            self._released = True
+            self._scheduler._release()
+
+    def __enter__(self) -> '_Grant':
+
+        return self
+
+    def __exit__(self, *exc) -> None:
+
+        self.release()
+
+
+class ProviderScheduler:
+
+    def __init__(self, requests_per_minute: Optional[int] = None,
+                 tokens_per_minute: Optional[int] = None,
+                 max_concurrent: Optional[int] = None,
+                 burst_seconds: float = 60.0):
+
+        self._cond = threading.Condition()
+        self._queue = []
+        # (event loop, future) for each coroutine waiting in aacquire
+        self._async_waiters = []
+        self._sequence = itertools.count()
+        self._in_flight = 0
+
+        self._requests = _TokenBucket(requests_per_minute, burst_seconds)
+        self._tokens = _TokenBucket(tokens_per_minute, burst_seconds)
+        self.max_concurrent = max_concurrent
+
+        self._queued = {priority: 0 for priority in Priority}
+        self._granted = {priority: 0 for priority in Priority}
+        self._total_wait = {priority: 0.0 for priority in Priority}
+        self._max_wait = {priority: 0.0 for priority in Priority}
+
+    def configure(self, requests_per_minute: Optional[int] = None,
+                  tokens_per_minute: Optional[int] = None,
+                  max_concurrent: Optional[int] = None,
+                  burst_seconds: float = 60.0) -> None:
+
+        with self._cond:
+            self._requests.configure(requests_per_minute, burst_seconds)
+            self._tokens.configure(tokens_per_minute, burst_seconds)
+            self.max_concurrent = max_concurrent
+            self._notify_all()
+
+    def acquire(self, tokens: int = 1, priority: Optional[Priority] = None) -> _Grant:
+
+        priority = current_priority() if priority is None else Priority(priority)
+        start = time.monotonic()
+
+        with self._cond:
+            tokens = self._tokens.clamp(max(1, tokens))
+            entry = (priority, next(self._sequence))
+            heapq.heappush(self._queue, entry)
+            self._queued[priority] += 1
+
+            try:
+                while True:
+                    timeout = None
+                    # Strict priority, FIFO within a priority: only the head of the
+                    # queue may take budget, so bulk work cannot slip past a waiting
+                    # interactive request.
+                    if self._queue[0] == entry:
+                        timeout = self._try_grant(tokens)
+                        if timeout == 0:
+                            heapq.heappop(self._queue)
+                            self._queued[priority] -= 1
+                            self._record_wait(priority, time.monotonic() - start)
+                            self._notify_all()
+                            return _Grant(self)
+
+                    self._cond.wait(timeout=timeout)
+            except BaseException:
+                # Interrupted while queued: give up the place in line
+                if entry in self._queue:
+                    self._queue.remove(entry)
+                    heapq.heapify(self._queue)
+                    self._queued[priority] -= 1
+                    self._notify_all()
+                raise
+
+    async def aacquire(self, tokens: int = 1, priority: Optional[Priority] = None) -> _Grant:
+
+        # Same queue and budgets as acquire(), but waiting suspends the
+        # coroutine instead of blocking a thread.
+        priority = current_priority() if priority is None else Priority(priority)
+        start = time.monotonic()
+        loop = asyncio.get_running_loop()
+
+        with self._cond:
+            tokens = self._tokens.clamp(max(1, tokens))
+            entry = (priority, next(self._sequence))
+            heapq.heappush(self._queue, entry)
+            self._queued[priority] += 1
+
+        try:
+            while True:
+                with self._cond:
+                    timeout = None
+                    if self._queue[0] == entry:
+                        timeout = self._try_grant(tokens)
+                        if timeout == 0:
+                            heapq.heappop(self._queue)
+                            self._queued[priority] -= 1
+                            self._record_wait(priority, time.monotonic() - start)
+                            self._notify_all()
+                            return _Grant(self)
+
+                    wakeup = loop.create_future()
+                    self._async_waiters.append((loop, wakeup))
+
+                await asyncio.wait([wakeup], timeout=timeout)
+        except BaseException:
+            with self._cond:
+                if entry in self._queue:
+                    self._queue.remove(entry)
+                    heapq.heapify(self._queue)
+                    self._queued[priority] -= 1
+                    self._notify_all()
+            raise
+
+    def _notify_all(self) -> None:
+
+        # Called with the condition held: wake blocked threads and waiting
+        # coroutines alike, whichever loop they run on.
+        self._cond.notify_all()
+        waiters, self._async_waiters = self._async_waiters, []
+        for loop, wakeup in waiters:
+            try:
+                loop.call_soon_threadsafe(_resolve, wakeup)
+            except RuntimeError:
+                # Loop already closed
+                pass
+
+    def _try_grant(self, tokens: float) -> Optional[float]:
+
+        if self.max_concurrent and self._in_flight >= self.max_concurrent:
+            # Woken by _release
+            return None
+
+        now = time.monotonic()
+        self._requests.refill(now)
+        self._tokens.refill(now)
+
+        wait = max(self._requests.seconds_until(1), self._tokens.seconds_until(tokens))
+        if wait > 0:
+            return wait
+
+        self._requests.take(1)
+        self._tokens.take(tokens)
+        self._in_flight += 1
+        return 0
+
+    def _release(self) -> None:
+
+        with self._cond:
+            self._in_flight -= 1
+            self._notify_all()
+
+    def _record_wait(self, priority: Priority, waited: float) -> None:
+
+        self._granted[priority] += 1
+        self._total_wait[priority] += waited
+        self._max_wait[priority] = max(self._max_wait[priority], waited)
+
+    def stats(self) -> Dict[str, Any]:
+
+        with self._cond:
+            stats = {
+                "in_flight": self._in_flight,
+                "queue_depth": sum(self._queued.values()),
+            }
+            for priority in Priority:
+                name = priority.name.lower()
+                granted = self._granted[priority]
+                stats[name] = {
+                    "queued": self._queued[priority],
+                    "granted": granted,
+                    "avg_wait_ms": self._total_wait[priority] / granted * 1000 if granted else 0.0,
+                    "max_wait_ms": self._max_wait[priority] * 1000,
+                }
+            return stats
+
+
+_scheduler = ProviderScheduler()
+
+
+def get_scheduler() -> ProviderScheduler:
+
+    return _scheduler
+
+
+def configure_scheduler(limits: Dict[str, Any]) -> ProviderScheduler:
+
+    # Limits are updated in place so queued callers keep their position
+    _scheduler.configure(
+        requests_per_minute=limits.get('requests_per_minute'),
+        tokens_per_minute=limits.get('tokens_per_minute'),
+        max_concurrent=limits.get('max_concurrent'),
+        burst_seconds=limits.get('burst_seconds', 60.0)
+    )
+    return _scheduler
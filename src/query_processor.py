@@ -2,12 +2,20 @@
 
 # Handles user question
 
-from typing import List
+import asyncio
+from dataclasses import replace
+from typing import List, Optional
 from langchain_core.documents import Document
 
+from src.vector_store_manager import SearchFilter
+from src.retrieval_cache import RetrievalCache
+from src.tracing import span
+
 
 class QueryProcessor:
  
+    RETRIEVAL_MODES = ('vector', 'lexical', 'hybrid')
+    SEARCH_TYPES = ('similarity', 'mmr')
     
     def __init__(self, vector_store_manager, config: dict):
       
@@ -17,8 +25,42 @@ class QueryProcessor:
         retrieval_config = config.get('retrieval', {})
         self.default_top_k = retrieval_config.get('top_k', 4)
         self.score_threshold = retrieval_config.get('score_threshold')
+        self.mode = retrieval_config.get('mode', 'vector')
+        self.rrf_k = retrieval_config.get('rrf_k', 60)
+        self.hybrid_fetch_k = retrieval_config.get('hybrid_fetch_k', 20)
+        self.search_type = retrieval_config.get('search_type', 'similarity')
+        self.mmr_lambda = retrieval_config.get('mmr_lambda', 0.5)
+        self.fetch_k = retrieval_config.get('fetch_k', 20)
+        
+        if self.mode not in self.RETRIEVAL_MODES:
+            raise ValueError(f"Unsupported retrieval mode: {self.mode}")
+        if self.search_type not in self.SEARCH_TYPES:
+            raise ValueError(f"Unsupported search type: {self.search_type}")
+        
+        # Two-level retrieval: document centroids first, then chunks of the
+        # routed documents only
+        routing_config = retrieval_config.get('document_routing', {})
+        self.routing_enabled = routing_config.get('enabled', False)
+        self.routed_documents = routing_config.get('documents', 5)
+        self.routing_min_documents = routing_config.get('min_documents', 20)
+        
+        cache_config = retrieval_config.get('cache', {})
+        self.cache = None
+        if cache_config.get('enabled', True):
+            self.cache = RetrievalCache.open_shared(
+                vector_store_manager.corpus_key,
+                max_entries=cache_config.get('max_entries', 1024)
+            )
+        
+        # Everything besides question, k and filters that changes the result
+        self._cache_settings = (
+            self.mode, self.search_type, self.score_threshold,
+            self.mmr_lambda, self.fetch_k, self.rrf_k, self.hybrid_fetch_k,
+            self.routing_enabled, self.routed_documents, self.routing_min_documents
+        )
     
-    def retrieve_context(self, question: str, k: int = None) -> List[Document]:
+    def retrieve_context(self, question: str, k: int = None,
+                         filters: Optional[SearchFilter] = None) -> List[Document]:
         
         if not question or not question.strip():
             raise ValueError("Question cannot be empty")
@@ -27,14 +69,281 @@ class QueryProcessor:
         num_results = k if k is not None else self.default_top_k
         
         try:
-          
-            documents = self.vector_store_manager.similarity_search(
-                query=question,
+            
+            with span("retrieve", mode=self.mode, search_type=self.search_type, k=num_results) as current:
+                if self.cache is None:
+                    documents = self._search(question, num_results, filters)
+                    current.set(items=len(documents))
+                    return documents
+                
+                # The generation is read before searching: if a write lands mid-search
+                # the result is stored under the old generation and never served again.
+                cache_key = RetrievalCache.make_key(
+                    question, num_results, self.vector_store_manager.generation,
+                    filters=filters, settings=self._cache_settings
+                )
+                documents = self.cache.get(cache_key)
+                current.set(cache_hit=documents is not None)
+                if documents is None:
+                    documents = self._search(question, num_results, filters)
+                    self.cache.put(cache_key, documents)
+                current.set(items=len(documents))
+                
+                return documents
+            
+        except Exception as e:
+            raise Exception(f"Failed to retrieve context for question: {e}")
+    
+    def _search(self, question: str, num_results: int,
+                filters: Optional[SearchFilter]) -> List[Document]:
+        
+        if self.mode == 'lexical':
+            # No embedding call: answered entirely from the in-process index
+            return self.vector_store_manager.lexical_search(
+                question, k=num_results, filters=filters
+            )
+        
+        if self.routing_enabled:
+            # Cached by the embedding service, so the search below reuses it
+            query_embedding = self.vector_store_manager.embedding_service.embed_query(question)
+            filters = self._routed_filters(query_embedding, filters)
+        
+        if self.mode == 'hybrid':
+            return self._hybrid_search(question, num_results, filters)
+        
+        if self.search_type == 'mmr':
+            return self.vector_store_manager.max_marginal_relevance_search(
+                question,
                 k=num_results,
-                score_threshold=self.score_threshold
+                fetch_k=self.fetch_k,
+                lambda_mult=self.mmr_lambda,
+                filters=filters
             )
+          
+        documents = self.vector_store_manager.similarity_search(
+            query=question,
+            k=num_results,
+            score_threshold=self.score_threshold,
+            filters=filters
+        )
+        
+        return documents
+    
+    def retrieve_contexts(self, questions: List[str], k: int = None,
+                          filters: Optional[SearchFilter] = None) -> List[List[Document]]:
+
+        # Same results as retrieve_context per question, but the uncached
+        # questions share one embedding request and one index query.
+        if any(not question or not question.strip() for question in questions):
+            raise ValueError("Question cannot be empty")
+
+        num_results = k if k is not None else self.default_top_k
+
+        try:
+
+            generation = self.vector_store_manager.generation
+            results: List[Optional[List[Document]]] = [None] * len(questions)
+            cache_keys = [None] * len(questions)
+            if self.cache is not None:
+                for i, question in enumerate(questions):
+                    cache_keys[i] = RetrievalCache.make_key(
+                        question, num_results, generation,
+                        filters=filters, settings=self._cache_settings
+                    )
+                    results[i] = self.cache.get(cache_keys[i])
+
+            missing = [i for i, documents in enumerate(results) if documents is None]
+            with span("retrieve_batch", mode=self.mode, search_type=self.search_type, k=num_results,
+                      items=len(questions), cache_hits=len(questions) - len(missing)):
+                if missing:
+                    searched = self._search_many([questions[i] for i in missing], num_results, filters)
+                    for i, documents in zip(missing, searched):
+                        results[i] = documents
+                        if self.cache is not None:
+                            self.cache.put(cache_keys[i], documents)
+
+            return results
+
+        except Exception as e:
+            raise Exception(f"Failed to retrieve context for questions: {e}")
+
+    def _search_many(self, questions: List[str], num_results: int,
+                     filters: Optional[SearchFilter]) -> List[List[Document]]:
+
+        store = self.vector_store_manager
+
+        if self.mode == 'lexical':
+            return [store.lexical_search(question, k=num_results, filters=filters) for question in questions]
+
+        embeddings = store.embedding_service.embed_queries(questions)
+        if self.routing_enabled:
+            # Questions routed to the same documents still share one index query
+            question_filters = [self._routed_filters(embedding, filters) for embedding in embeddings]
+            groups = {}
+            for i, question_filter in enumerate(question_filters):
+                key = tuple(question_filter.sources) if question_filter is not None and question_filter.sources else ()
+                groups.setdefault(key, []).append(i)
+        else:
+            question_filters = [filters] * len(questions)
+            groups = {(): list(range(len(questions)))}
+
+        fetch_k = max(num_results, self.hybrid_fetch_k) if self.mode == 'hybrid' else num_results
+        if self.mode != 'hybrid' and self.search_type == 'mmr':
+            return [
+                store.max_marginal_relevance_search_by_vector(
+                    embedding, k=num_results, fetch_k=self.fetch_k,
+                    lambda_mult=self.mmr_lambda, filters=question_filter
+                )
+                for embedding, question_filter in zip(embeddings, question_filters)
+            ]
+
+        vector_results: List[List[Document]] = [None] * len(questions)
+        for indices in groups.values():
+            found = store.similarity_search_by_vectors(
+                [embeddings[i] for i in indices], k=fetch_k, filters=question_filters[indices[0]]
+            )
+            for i, documents in zip(indices, found):
+                vector_results[i] = documents
+
+        if self.mode == 'hybrid':
+            return [
+                self.reciprocal_rank_fusion(
+                    [vector_docs, store.lexical_search(question, k=fetch_k, filters=question_filter)],
+                    num_results, self.rrf_k
+                )
+                for question, vector_docs, question_filter in zip(questions, vector_results, question_filters)
+            ]
+
+        return vector_results
+
+    def _routed_filters(self, query_embedding: List[float],
+                        filters: Optional[SearchFilter]) -> Optional[SearchFilter]:
+
+        # A question already limited to some documents is searched in exactly those
+        if filters is not None and filters.sources:
+            return filters
+
+        sources = self.vector_store_manager.route_documents(
+            query_embedding, self.routed_documents, self.routing_min_documents
+        )
+        if sources is None:
+            return filters
+        return replace(filters, sources=sources) if filters is not None else SearchFilter(sources=sources)
+
+    async def aretrieve_context(self, question: str, k: int = None,
+                                filters: Optional[SearchFilter] = None) -> List[Document]:
+        
+        if not question or not question.strip():
+            raise ValueError("Question cannot be empty")
+        
+        num_results = k if k is not None else self.default_top_k
+        
+        try:
             
-            return documents
+            with span("retrieve", mode=self.mode, search_type=self.search_type, k=num_results) as current:
+                if self.cache is None:
+                    documents = await self._asearch(question, num_results, filters)
+                    current.set(items=len(documents))
+                    return documents
+                
+                cache_key = RetrievalCache.make_key(
+                    question, num_results, self.vector_store_manager.generation,
+                    filters=filters, settings=self._cache_settings
+                )
+                documents = self.cache.get(cache_key)
+                current.set(cache_hit=documents is not None)
+                if documents is None:
+                    documents = await self._asearch(question, num_results, filters)
+                    self.cache.put(cache_key, documents)
+                current.set(items=len(documents))
+                
+                return documents
             
         except Exception as e:
             raise Exception(f"Failed to retrieve context for question: {e}")
+    
+    async def _asearch(self, question: str, num_results: int,
+                       filters: Optional[SearchFilter]) -> List[Document]:
+        
+        if self.mode == 'lexical':
+            # In-process and sub-millisecond: not worth a thread hop
+            return self.vector_store_manager.lexical_search(
+                question, k=num_results, filters=filters
+            )
+        
+        if self.routing_enabled:
+            query_embedding = await self.vector_store_manager.embedding_service.aembed_query(question)
+            filters = self._routed_filters(query_embedding, filters)
+        
+        if self.mode == 'hybrid':
+            fetch_k = max(num_results, self.hybrid_fetch_k)
+            # BM25 runs in a worker thread while the query embedding is in flight
+            vector_docs, lexical_docs = await asyncio.gather(
+                self.vector_store_manager.asimilarity_search(
+                    query=question,
+                    k=fetch_k,
+                    score_threshold=self.score_threshold,
+                    filters=filters
+                ),
+                asyncio.to_thread(
+                    self.vector_store_manager.lexical_search, question, k=fetch_k, filters=filters
+                )
+            )
+            return self.reciprocal_rank_fusion([vector_docs, lexical_docs], num_results, self.rrf_k)
+        
+        if self.search_type == 'mmr':
+            return await self.vector_store_manager.amax_marginal_relevance_search(
+                question,
+                k=num_results,
+                fetch_k=self.fetch_k,
+                lambda_mult=self.mmr_lambda,
+                filters=filters
+            )
+        
+        return await self.vector_store_manager.asimilarity_search(
+            query=question,
+            k=num_results,
+            score_threshold=self.score_threshold,
+            filters=filters
+        )
+    
+    def get_cache_stats(self) -> dict:
+        
+        if self.cache is None:
+            return {"enabled": False}
+        return dict(self.cache.stats(), enabled=True)
+    
+    def _hybrid_search(self, question: str, k: int,
+                       filters: Optional[SearchFilter]) -> List[Document]:
+        
+        fetch_k = max(k, self.hybrid_fetch_k)
+        
+        vector_docs = self.vector_store_manager.similarity_search(
+            query=question,
+            k=fetch_k,
+            score_threshold=self.score_threshold,
+            filters=filters
+        )
+        lexical_docs = self.vector_store_manager.lexical_search(
+            question, k=fetch_k, filters=filters
+        )
+        
+        return self.reciprocal_rank_fusion([vector_docs, lexical_docs], k, self.rrf_k)
+    
+    @staticmethod
+    def reciprocal_rank_fusion(rankings: List[List[Document]], k: int,
+                               rrf_k: int = 60) -> List[Document]:
+        
+        # score(d) = sum over rankings of 1 / (rrf_k + rank); only ranks are used,
+        # so BM25 scores and vector distances never need to be calibrated.
+        scores = {}
+        documents = {}
+        
+        for ranking in rankings:
+            for rank, doc in enumerate(ranking, 1):
+                key = doc.id or (doc.metadata.get('source'), doc.metadata.get('chunk_index'), doc.page_content)
+                scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+                documents.setdefault(key, doc)
+        
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        return [documents[key] for key in ranked[:k]]
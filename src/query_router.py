@@ -0,0 +1,195 @@
+"""Route each question to a fast or a full answer configuration."""
+
+# linear score over cheap question features; no model call involved
+
+import json
+import math
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional
+
+from src.answer_cache import is_follow_up
+
+
+ROUTES = ('fast', 'full')
+
+_NUMBER = re.compile(r"(?<![a-z])[-+]?\d+(?:[.,]\d+)?(?:e[-+]?\d+)?", re.IGNORECASE)
+_MATH_SYMBOL = re.compile(r"[=+*/^√∫∑≤≥<>±×÷]|\bsqrt\b|\blog\b|\bsin\b|\bcos\b|\btan\b")
+_UNIT = re.compile(
+    r"\d\s*(?:m/s2?|km/h|m|cm|mm|km|kg|g|mg|s|ms|min|h|n|j|kj|w|kw|v|a|ohm|Ω|hz|pa|kpa|mol|l|ml|°c|°f|k|%)\b",
+    re.IGNORECASE
+)
+_SOLVE = re.compile(
+    r"\b(calculate|compute|solve|find|derive|prove|show that|evaluate|simplify|integrate|"
+    r"differentiate|determine|how much|how many|how long|how far|how fast|estimate)\b",
+    re.IGNORECASE
+)
+_DEFINITION = re.compile(
+    r"^\s*(what is|what are|what's|define|definition of|who|when|which|name|list|meaning of|state)\b",
+    re.IGNORECASE
+)
+_EXPLAIN = re.compile(r"\b(explain|why|compare|difference between|contrast|describe)\b", re.IGNORECASE)
+_SENTENCE_END = re.compile(r"[.?!](?:\s|$)")
+
+
+# score > 0 -> full. Counts are capped so one long formula cannot dominate.
+DEFAULT_WEIGHTS = {
+    'bias': -1.0,
+    'numbers': 0.6,
+    'math_symbols': 0.5,
+    'units': 0.8,
+    'solve_verb': 1.6,
+    'extra_sentences': 0.5,
+    'words_per_20': 0.4,
+    'explain': 0.3,
+    'definition': -1.0,
+    'follow_up': 0.5,
+}
+
+
+def question_features(question: str, has_history: bool = False) -> Dict[str, float]:
+
+    words = question.split()
+    return {
+        'numbers': min(len(_NUMBER.findall(question)), 3),
+        'math_symbols': min(len(_MATH_SYMBOL.findall(question)), 3),
+        'units': float(bool(_UNIT.search(question))),
+        'solve_verb': float(bool(_SOLVE.search(question))),
+        'extra_sentences': min(max(len(_SENTENCE_END.findall(question.strip())) - 1, 0), 2),
+        'words_per_20': min(len(words) / 20, 2.0),
+        'explain': float(bool(_EXPLAIN.search(question))),
+        'definition': float(bool(_DEFINITION.search(question))),
+        'follow_up': float(has_history and is_follow_up(question)),
+    }
+
+
+@dataclass
+class RouteDecision:
+
+    route: str
+    score: float
+    # Features that moved the score, largest contribution first
+    reasons: List[str] = field(default_factory=list)
+    features: Dict[str, float] = field(default_factory=dict)
+
+
+class QueryRouter:
+
+    def __init__(self, weights: Optional[Dict[str, float]] = None, threshold: float = 0.0,
+                 log_path: Optional[str] = None):
+
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self.threshold = threshold
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        # Log appends are serialised apart from the stats, which stay cheap to read
+        self._log_lock = threading.Lock()
+        # route -> running totals of what its answers cost
+        self._stats: Dict[str, Dict[str, float]] = {}
+        if log_path:
+            os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> 'QueryRouter':
+
+        routing_config = config.get('routing', {})
+        return cls(
+            weights=routing_config.get('weights'),
+            threshold=routing_config.get('threshold', 0.0),
+            log_path=routing_config.get('log_path') or None
+        )
+
+    def route(self, question: str, chat_history: Optional[List[dict]] = None) -> RouteDecision:
+
+        features = question_features(question, has_history=bool(chat_history))
+        contributions = {name: self.weights.get(name, 0.0) * value for name, value in features.items()}
+        score = self.weights.get('bias', 0.0) + sum(contributions.values())
+        reasons = [
+            f"{name}{'+' if value > 0 else '-'}"
+            for name, value in sorted(contributions.items(), key=lambda item: -abs(item[1]))
+            if value
+        ]
+        return RouteDecision(
+            route='full' if score > self.threshold else 'fast',
+            score=round(score, 3),
+            reasons=reasons,
+            features=features
+        )
+
+    def record(self, decision: RouteDecision, question: str, generator,
+               latency_seconds: float, usage: Dict[str, Any]) -> None:
+
+        # One log line per answered question, for comparing routes offline
+        entry = {
+            "time": round(time.time(), 3),
+            "route": decision.route,
+            "score": decision.score,
+            "reasons": decision.reasons,
+            "question_chars": len(question),
+            "model": generator.model,
+            "prompt": generator.prompt_variant,
+            "max_tokens": generator.max_tokens,
+            "latency_ms": round(latency_seconds * 1000, 1),
+            "prompt_tokens": usage.get('prompt_tokens', 0),
+            "completion_tokens": usage.get('completion_tokens', 0),
+            "cost_usd": usage.get('cost_usd', 0.0),
+            # No LLM call: answered from the answer cache
+            "cached": usage.get('llm_calls', 0) == 0
+        }
+        with self._lock:
+            stats = self._stats.setdefault(decision.route, {
+                "questions": 0, "latency_seconds": 0.0, "completion_tokens": 0, "cost_usd": 0.0
+            })
+            stats["questions"] += 1
+            stats["latency_seconds"] += latency_seconds
+            stats["completion_tokens"] += entry["completion_tokens"]
+            stats["cost_usd"] += entry["cost_usd"]
+        if self.log_path:
+            line = json.dumps(entry) + "\n"
+            with self._log_lock:
+                with open(self.log_path, 'a', encoding='utf-8') as f:
+                    f.write(line)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+
+        with self._lock:
+            return {
+                route: {
+                    "questions": stats["questions"],
+                    "avg_latency_ms": stats["latency_seconds"] / stats["questions"] * 1000,
+                    "avg_completion_tokens": stats["completion_tokens"] / stats["questions"],
+                    "avg_cost_usd": stats["cost_usd"] / stats["questions"],
+                }
+                for route, stats in self._stats.items()
+            }
+
+
+def summarize_log(path: str) -> Dict[str, Dict[str, float]]:
+
+    # Per route: questions, mean and p95 latency, mean tokens and cost
+    by_route: Dict[str, List[dict]] = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if not entry.get('cached'):
+                by_route.setdefault(entry['route'], []).append(entry)
+
+    summary = {}
+    for route, entries in sorted(by_route.items()):
+        latencies = sorted(entry['latency_ms'] for entry in entries)
+        count = len(entries)
+        summary[route] = {
+            "questions": count,
+            "avg_latency_ms": sum(latencies) / count,
+            "p95_latency_ms": latencies[min(count - 1, math.ceil(0.95 * count) - 1)],
+            "avg_prompt_tokens": sum(entry['prompt_tokens'] for entry in entries) / count,
+            "avg_completion_tokens": sum(entry['completion_tokens'] for entry in entries) / count,
+            "avg_cost_usd": sum(entry['cost_usd'] for entry in entries) / count,
+        }
+    return summary
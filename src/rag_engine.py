@@ -2,17 +2,37 @@
 
 # orchaestrate everything
 
+import asyncio
 import os
-from typing import Optional, Dict, Any, List
-from dataclasses import dataclass
+import json
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, List, Callable, AsyncIterator
+from dataclasses import dataclass, replace, asdict
+
+from langchain_core.documents import Document
 
 from src.config import Config
 from src.pdf_loader import PDFLoader, PDFProcessingError
 from src.text_chunker import TextChunker
 from src.embedding_service import EmbeddingService
-from src.vector_store_manager import VectorStoreManager
+from src.vector_store_manager import VectorStoreManager, SearchFilter
 from src.query_processor import QueryProcessor
 from src.answer_generator import AnswerGenerator, Answer
+from src.answer_cache import SemanticAnswerCache, context_fingerprint, is_follow_up
+from src.retrieval_cache import normalize_question
+from src.single_flight import SingleFlight
+from src.ingest_pipeline import IngestPipeline
+from src.ingest_jobs import IngestJobManager, IngestJob
+from src.provider_scheduler import Priority, request_priority, configure_scheduler
+from src.request_timing import stage_timer
+from src.tracing import span, configure_tracing
+from src.usage import configure_usage, track_usage
+from src.profiling import Profile, profile_block
+from src.query_router import QueryRouter, RouteDecision, ROUTES
+from src.context_compression import ContextCompressor
+from src.summary_index import SummaryIndex, DocumentSummary, build_document_summary, pages_from_chunks, summary_documents
 
 
 @dataclass
@@ -22,6 +42,21 @@ class DocumentInfo:
     chunk_count: int
     file_size_mb: float
     status: str
+    # Per-stage throughput and queue occupancy from the ingestion pipeline
+    stats: Optional[Dict[str, Any]] = None
+
+
+@dataclass
+class AnswerPlan:
+    
+    generator: AnswerGenerator
+    # None: retrieval.top_k
+    top_k: Optional[int] = None
+    # Which budget is spent ('session' or 'global'), if any
+    degraded: Optional[str] = None
+    route: Optional[RouteDecision] = None
+    # Precomputed context (overview questions: summaries); skips retrieval
+    context: Optional[List[Document]] = None
 
 
 class RAGEngine:
@@ -32,7 +67,12 @@ class RAGEngine:
         
         self.config = config if config is not None else Config()
         
-       
+        # Usage and budgets are tracked per session; callers serving many
+        # clients pass their own session_id instead
+        self.session_id = uuid.uuid4().hex[:12]
+        # The most recent profiled ingest or question on this engine
+        self.last_profile: Optional[Profile] = None
+        
         self._initialize_components()
         
     
@@ -47,17 +87,27 @@ class RAGEngine:
         )
         
        
+        # Shared by every engine in the process; the last configuration wins
+        self.scheduler = configure_scheduler(self.config.get_section('provider_limits'))
+        configure_tracing(self.config.get_section('tracing'))
+        self.usage = configure_usage(self.config.get_section('usage'))
+        
         embedding_config = self.config.get_section('embedding')
         self.embedding_service = EmbeddingService(
             provider=embedding_config.get('provider', 'openai'),
-            model=embedding_config.get('model', 'text-embedding-ada-002')
+            model=embedding_config.get('model', 'text-embedding-ada-002'),
+            scheduler=self.scheduler
         )
         
         storage_config = self.config.get_section('storage')
         self.vector_store_manager = VectorStoreManager(
             embedding_service=self.embedding_service,
             persist_directory=storage_config.get('persist_directory', './data/chroma_db'),
-            collection_name=storage_config.get('collection_name', 'educational_docs')
+            collection_name=storage_config.get('collection_name', 'educational_docs'),
+            delete_batch_size=storage_config.get('delete_batch_size', VectorStoreManager.DELETE_BATCH_SIZE),
+            hnsw_config=storage_config.get('hnsw', {}),
+            pages_per_section=self.config.get('retrieval.document_routing.pages_per_section', 10),
+            document_routing=self.config.get('retrieval.document_routing.enabled', False)
         )
         
       
@@ -71,54 +121,153 @@ class RAGEngine:
             provider=llm_config.get('provider', 'openai'),
             model=llm_config.get('model', 'gpt-3.5-turbo'),
             temperature=llm_config.get('temperature', 0.7),
-            max_tokens=llm_config.get('max_tokens', 500)
+            max_tokens=llm_config.get('max_tokens', 500),
+            scheduler=self.scheduler
+        )
+        # Built on first use, once a budget is spent
+        self._budget_generator = None
+        
+        routing_config = self.config.get_section('routing')
+        self.router = None
+        self._route_generators: Dict[str, AnswerGenerator] = {}
+        if routing_config.get('enabled', False):
+            self.router = QueryRouter.from_config(self.config.to_dict())
+            routes = routing_config.get('routes', {})
+            for route in ROUTES:
+                self._route_generators[route] = self._route_generator(routes.get(route, {}))
+        
+        answer_cache_config = self.config.get_section('answer_cache')
+        self.answer_cache = None
+        if answer_cache_config.get('enabled', False):
+            ttl_hours = answer_cache_config.get('ttl_hours')
+            self.answer_cache = SemanticAnswerCache.open_shared(
+                os.path.join(
+                    storage_config.get('persist_directory', './data/chroma_db'),
+                    f"{storage_config.get('collection_name', 'educational_docs')}_answer_cache"
+                ),
+                similarity_threshold=answer_cache_config.get('similarity_threshold', 0.95),
+                max_entries=answer_cache_config.get('max_entries', 500),
+                ttl_seconds=ttl_hours * 3600 if ttl_hours else None,
+                save_delay=answer_cache_config.get('save_delay_seconds', 2)
+            )
+        
+        summaries_config = self.config.get_section('summaries')
+        self.summary_index = None
+        if summaries_config.get('enabled', False):
+            self.summary_index = SummaryIndex.open_shared(os.path.join(
+                storage_config.get('persist_directory', './data/chroma_db'),
+                f"{storage_config.get('collection_name', 'educational_docs')}_summaries.json"
+            ))
+            self._summarizer = AnswerGenerator(
+                provider=llm_config.get('provider', 'openai'),
+                model=summaries_config.get('model') or llm_config.get('model', 'gpt-3.5-turbo'),
+                temperature=0.3,
+                max_tokens=summaries_config.get('max_tokens', 300),
+                scheduler=self.scheduler
+            )
+            self._overview_generator = AnswerGenerator(
+                provider=llm_config.get('provider', 'openai'),
+                model=llm_config.get('model', 'gpt-3.5-turbo'),
+                temperature=llm_config.get('temperature', 0.7),
+                max_tokens=summaries_config.get('answer_max_tokens', 400),
+                scheduler=self.scheduler,
+                prompt_variant='compact'
+            )
+        
+        self.context_compressor = None
+        if self.config.get('context_compression.enabled', False):
+            self.context_compressor = ContextCompressor.from_config(self.config.to_dict(), self.embedding_service)
+        
+        self.ingest_pipeline = IngestPipeline.from_config(
+            self.config.to_dict(), self.pdf_loader, self.text_chunker,
+            self.embedding_service, self.vector_store_manager,
+            context_compressor=self.context_compressor
         )
+        
+        self.ingest_jobs = IngestJobManager.open_shared(
+            os.path.join(storage_config.get('persist_directory', './data/chroma_db'), 'ingest_jobs'),
+            self._run_ingest_job,
+            max_concurrent_jobs=self.config.get('ingestion.max_concurrent_jobs', 1),
+            chunking=dict(self.config.get_section('chunking'))
+        )
+        
+        self.single_flight = None
+        if self.config.get('concurrency.coalesce_questions', True):
+            self.single_flight = SingleFlight.open_shared(self.vector_store_manager.corpus_key)
+    
+    @contextmanager
+    def _profiled(self, name: str, requested: bool, trace_memory: bool = False):
+        
+        # Yields None unless this call or profiling.enabled asks for a
+        # profile; the profile is written even when the call fails.
+        config = self.config.get_section('profiling')
+        if not (requested or config.get('enabled', False)):
+            yield None
+            return
+        
+        profile = None
+        try:
+            with profile_block(
+                name,
+                interval=config.get('interval_ms', 5) / 1000,
+                trace_memory=trace_memory and config.get('trace_memory', True),
+                memory_top=config.get('memory_top', 15)
+            ) as profile:
+                yield profile
+        finally:
+            if profile is not None:
+                profile.write(config.get('output_dir', './data/profiles'), config.get('format', 'speedscope'))
+                self.last_profile = profile
     
-    def ingest_document(self, file_path: str, show_progress: bool = True) -> DocumentInfo:
+    def ingest_document(self, file_path: str, show_progress: bool = True,
+                        source_name: Optional[str] = None,
+                        on_progress: Optional[Callable[[Dict[str, int]], None]] = None,
+                        on_checkpoint: Optional[Callable[[Dict[str, int]], None]] = None,
+                        resume_from: Optional[Dict[str, int]] = None,
+                        profile: bool = False) -> DocumentInfo:
         
         try:
-            filename = os.path.basename(file_path)
+            filename = source_name or os.path.basename(file_path)
             
             if show_progress:
                 print(f"\n Processing document: {filename}")
                 print("=" * 60)
             
-            
-            if show_progress:
-                print(" Step 1/4: Loading PDF...")
-            
-            documents = self.pdf_loader.load(file_path)
-            
-            if show_progress:
-                print(f" Loaded {len(documents)} pages")
-            
-            
-            if show_progress:
-                print(" Step 2/4: Splitting into chunks...")
-            
-            chunks = self.text_chunker.split_documents(documents)
-            chunk_count = len(chunks)
-            
-            if show_progress:
-                print(f" Created {chunk_count} chunks")
-            
-           
             if show_progress:
-                print(" Step 3/4: Generating embeddings...")
+                print(" Loading, chunking, embedding and storing (pipelined)...")
             
-           
+            # Stages run concurrently, so total time tracks the slowest stage
+            # rather than the sum of all four. Chunk ids are derived from the
+            # source name, so ingesting a file that is already indexed replaces
+            # its chunks instead of duplicating them. Embedding calls queue
+            # behind students' questions.
+            with self._profiled("ingest", profile, trace_memory=True) as profiler, \
+                    request_priority(Priority.BULK), track_usage(ingest_source=filename) as usage, \
+                    span("ingest", source=filename, bytes=os.path.getsize(file_path)) as current:
+                stats = self.ingest_pipeline.run(
+                    file_path, filename,
+                    on_progress=on_progress,
+                    on_checkpoint=on_checkpoint,
+                    resume_from=resume_from
+                )
+                current.set(items=stats['chunks'], pages=stats['pages'], bottleneck=stats['bottleneck'])
+            stats['usage'] = usage.to_dict()
+            if profiler is not None:
+                stats['profile'] = {"paths": profiler.paths, "memory": profiler.memory}
+            if self.summary_index is not None:
+                self.schedule_summary(filename)
+                stats['summary'] = 'pending'
+            chunk_count = stats['chunks']
             
             if show_progress:
-                print(" Embeddings generated")
-            
-         
-            if show_progress:
-                print(" Step 4/4: Storing in vector database...")
-            
-            self.vector_store_manager.add_documents(chunks)
-            
-            if show_progress:
-                print(" Stored in database")
+                print(f" {stats['pages']} pages -> {chunk_count} chunks in {stats['elapsed_seconds']:.2f}s")
+                for stage, stage_stats in stats['stages'].items():
+                    print(f"   {stage:<6} {stage_stats['items_per_second']:>9.1f} items/s "
+                          f"({stage_stats['utilization']:.0%} busy)")
+                for name, queue_stats in stats['queues'].items():
+                    print(f"   {name:<13} queue {queue_stats['mean_occupancy']:.1f}"
+                          f"/{queue_stats['capacity']} avg, {queue_stats['max_occupancy']} max")
+                print(f"   Bottleneck: {stats['bottleneck']}")
             
             
             file_size_mb = os.path.getsize(file_path) / (1024 * 1024)
@@ -135,7 +284,8 @@ class RAGEngine:
                 filename=filename,
                 chunk_count=chunk_count,
                 file_size_mb=file_size_mb,
-                status="success"
+                status="success",
+                stats=stats
             )
             
         except PDFProcessingError as e:
@@ -147,41 +297,447 @@ class RAGEngine:
                 print(f"\n Error during document ingestion: {e}\n")
             raise Exception(f"Failed to ingest document: {e}")
     
-    def ask_question(self, question: str, use_context: bool = True) -> Answer:
+    def submit_ingest(self, file_path: str, source_name: Optional[str] = None) -> str:
+        
+        # Returns at once; the document is ingested on a background thread
+        return self.ingest_jobs.submit(file_path, source_name=source_name)
+    
+    def get_ingest_job(self, job_id: str) -> IngestJob:
+        
+        return self.ingest_jobs.get(job_id)
+    
+    def list_ingest_jobs(self) -> List[IngestJob]:
+        
+        return self.ingest_jobs.list_jobs()
+    
+    def subscribe_ingest(self, job_id: str, callback: Callable[[IngestJob], None]) -> Callable[[], None]:
+        
+        return self.ingest_jobs.subscribe(job_id, callback)
+    
+    def wait_for_ingest(self, job_id: str, timeout: Optional[float] = None) -> IngestJob:
+        
+        return self.ingest_jobs.wait(job_id, timeout=timeout)
+    
+    def _run_ingest_job(self, job: IngestJob, on_progress: Callable[[Dict[str, int]], None],
+                        on_checkpoint: Callable[[Dict[str, int]], None],
+                        resume_from: Optional[Dict[str, int]]) -> Dict[str, Any]:
+        
+        doc_info = self.ingest_document(
+            job.file_path,
+            show_progress=False,
+            source_name=job.source,
+            on_progress=on_progress,
+            on_checkpoint=on_checkpoint,
+            resume_from=resume_from
+        )
+        return asdict(doc_info)
+    
+    def ask_question(self, question: str, use_context: bool = True,
+                     filters: Optional[SearchFilter] = None,
+                     history: Optional[List[Dict[str, str]]] = None,
+                     session_id: Optional[str] = None,
+                     profile: bool = False) -> Answer:
        
+        # history: the caller's own [{'question', 'answer'}] turns. When given
+        # it replaces this engine's conversation, which is left untouched, so
+        # one engine can serve many independent clients.
         if not question or not question.strip():
             raise ValueError("Question cannot be empty")
         
         try:
-         
-            context_documents = self.query_processor.retrieve_context(question)
             
-           
-            chat_history = []
-            if use_context and self._conversation_history:
-                
-                for entry in self._conversation_history:
-                    chat_history.append({"role": "user", "content": entry['question']})
-                    chat_history.append({"role": "assistant", "content": entry['answer']})
-            
-         
-            answer = self.answer_generator.generate_answer(
-                question, 
-                context_documents,
-                chat_history=chat_history
-            )
+            chat_history = self._build_chat_history(use_context, history)
+            session_id = session_id or self.session_id
+            
+            started = time.perf_counter()
+            with self._profiled("ask", profile), track_usage(session_id=session_id) as usage, \
+                    span("ask", history_turns=len(chat_history) // 2) as current:
+                plan = self._answer_plan(question, chat_history, session_id, filters)
+                current.set(degraded=plan.degraded, route=plan.route and plan.route.route)
+                if self.single_flight is not None and not chat_history:
+                    # Identical history-free questions in flight at the same time
+                    # share one retrieval and one LLM call; each caller gets a copy.
+                    shared = self.single_flight.do(
+                        self._coalesce_key(question, filters, plan),
+                        lambda: self._answer_question(question, filters, chat_history, plan)
+                    )
+                    answer = replace(shared, sources=list(shared.sources))
+                else:
+                    answer = self._answer_question(question, filters, chat_history, plan)
+            answer = replace(answer, usage=self._plan_usage(plan, question, usage, started))
             
            
-            self._conversation_history.append({
-                'question': question,
-                'answer': answer.text
-            })
+            if history is None:
+                self._conversation_history.append({
+                    'question': question,
+                    'answer': answer.text
+                })
+            
+            return answer
+            
+        except ValueError:
+            # Bad input, not a failure: let callers (the HTTP API) answer 400
+            raise
+        except Exception as e:
+            raise Exception(f"Failed to answer question: {e}")
+    
+    async def aask_question(self, question: str, use_context: bool = True,
+                            filters: Optional[SearchFilter] = None,
+                            history: Optional[List[Dict[str, str]]] = None,
+                            session_id: Optional[str] = None) -> Answer:
+        
+        # Same behaviour as ask_question, but every provider call is awaited,
+        # so one event loop can serve many questions at once.
+        if not question or not question.strip():
+            raise ValueError("Question cannot be empty")
+        
+        try:
+            
+            chat_history = self._build_chat_history(use_context, history)
+            session_id = session_id or self.session_id
+            
+            started = time.perf_counter()
+            with track_usage(session_id=session_id) as usage, \
+                    span("ask", history_turns=len(chat_history) // 2) as current:
+                plan = self._answer_plan(question, chat_history, session_id, filters)
+                current.set(degraded=plan.degraded, route=plan.route and plan.route.route)
+                if self.single_flight is not None and not chat_history:
+                    shared = await self.single_flight.ado(
+                        self._coalesce_key(question, filters, plan),
+                        lambda: self._aanswer_question(question, filters, chat_history, plan)
+                    )
+                    answer = replace(shared, sources=list(shared.sources))
+                else:
+                    answer = await self._aanswer_question(question, filters, chat_history, plan)
+            answer = replace(answer, usage=await self._aplan_usage(plan, question, usage, started))
+            
+            if history is None:
+                self._conversation_history.append({
+                    'question': question,
+                    'answer': answer.text
+                })
             
             return answer
             
+        except ValueError:
+            # Bad input, not a failure: let callers (the HTTP API) answer 400
+            raise
         except Exception as e:
             raise Exception(f"Failed to answer question: {e}")
     
+    async def astream_question(self, question: str, use_context: bool = True,
+                               filters: Optional[SearchFilter] = None,
+                               history: Optional[List[Dict[str, str]]] = None,
+                               session_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        
+        # Events: {"type": "sources", "sources"} once retrieval is done, then
+        # {"type": "token", "text"} as the answer is generated, then
+        # {"type": "done", "text", "usage"} with the full answer. Not
+        # coalesced: every stream is generated for its own caller.
+        if not question or not question.strip():
+            raise ValueError("Question cannot be empty")
+        
+        chat_history = self._build_chat_history(use_context, history)
+        session_id = session_id or self.session_id
+        
+        started = time.perf_counter()
+        with track_usage(session_id=session_id) as usage, \
+                span("ask", history_turns=len(chat_history) // 2, streamed=True) as current:
+            plan = self._answer_plan(question, chat_history, session_id, filters)
+            current.set(degraded=plan.degraded, route=plan.route and plan.route.route)
+            if plan.context is not None:
+                context_documents = plan.context
+            else:
+                with stage_timer('retrieve'):
+                    context_documents = await self.query_processor.aretrieve_context(
+                        question, k=plan.top_k, filters=filters
+                    )
+            sources = self.answer_generator._extract_sources(context_documents) if context_documents else []
+            yield {"type": "sources", "sources": sources}
+        
+            use_answer_cache = (
+                self.answer_cache is not None
+                and bool(context_documents)
+                and not chat_history
+            )
+        
+            answer = None
+            if use_answer_cache:
+                question_embedding = await self.embedding_service.aembed_query(question)
+                fingerprint = self._answer_fingerprint(plan, context_documents)
+                answer = self.answer_cache.lookup(question_embedding, fingerprint)
+        
+            if answer is not None:
+                yield {"type": "token", "text": answer.text}
+            else:
+                pieces = []
+                prompt_documents = context_documents
+                if plan.context is None:
+                    prompt_documents = await self._acompress_context(question, context_documents)
+                with stage_timer('generate'):
+                    async for piece in plan.generator.astream_answer(
+                        question, prompt_documents, chat_history=chat_history
+                    ):
+                        pieces.append(piece)
+                        yield {"type": "token", "text": piece}
+            
+                answer = Answer(text="".join(pieces), sources=sources, confidence=1.0 if context_documents else 0.0)
+                if use_answer_cache:
+                    await asyncio.to_thread(
+                        self.answer_cache.store, question, question_embedding, fingerprint, answer
+                    )
+        
+            if history is None:
+                self._conversation_history.append({
+                    'question': question,
+                    'answer': answer.text
+                })
+        
+            yield {"type": "done", "text": answer.text, "usage": await self._aplan_usage(plan, question, usage, started)}
+    
+    def _build_chat_history(self, use_context: bool,
+                            history: Optional[List[Dict[str, str]]] = None) -> List[Dict[str, str]]:
+        
+        turns = history if history is not None else self._conversation_history
+        chat_history = []
+        if use_context and turns:
+            
+            for entry in turns:
+                chat_history.append({"role": "user", "content": entry['question']})
+                chat_history.append({"role": "assistant", "content": entry['answer']})
+        
+        return chat_history
+    
+    def _coalesce_key(self, question: str, filters: Optional[SearchFilter], plan: AnswerPlan) -> tuple:
+        
+        return (
+            normalize_question(question),
+            json.dumps(filters.to_where(), sort_keys=True) if filters is not None else "",
+            self.vector_store_manager.generation,
+            plan.degraded,
+            plan.route and plan.route.route
+        )
+    
+    @staticmethod
+    def _answer_fingerprint(plan: AnswerPlan, context_documents: List[Document]) -> str:
+        
+        # The same chunks give a different answer on another route, under a
+        # budget, or from another model, prompt or token limit
+        generator = plan.generator
+        return context_fingerprint(context_documents, (
+            plan.route and plan.route.route,
+            plan.degraded,
+            generator.model,
+            generator.prompt_variant,
+            generator.max_tokens
+        ))
+    
+    def _route_generator(self, route_config: Dict[str, Any]) -> AnswerGenerator:
+        
+        # A route that changes nothing shares the default generator
+        llm_config = self.config.get_section('llm')
+        model = route_config.get('model') or llm_config.get('model', 'gpt-3.5-turbo')
+        max_tokens = route_config.get('max_tokens') or llm_config.get('max_tokens', 500)
+        prompt_variant = route_config.get('prompt', 'full')
+        default = self.answer_generator
+        if (model, max_tokens, prompt_variant) == (default.model, default.max_tokens, default.prompt_variant):
+            return default
+        return AnswerGenerator(
+            provider=llm_config.get('provider', 'openai'),
+            model=model,
+            temperature=llm_config.get('temperature', 0.7),
+            max_tokens=max_tokens,
+            scheduler=self.scheduler,
+            prompt_variant=prompt_variant
+        )
+    
+    def _answer_plan(self, question: str, chat_history: List[Dict[str, str]],
+                     session_id: Optional[str] = None,
+                     filters: Optional[SearchFilter] = None) -> AnswerPlan:
+        
+        # Overview questions with a matching precomputed summary are answered
+        # from it, budget or not: that is already the cheapest plan. Once the
+        # session's or the day's budget is spent, other questions are still
+        # answered, but from fewer chunks and with the cheaper model and
+        # shorter answers set in usage.degrade; that overrides routing.
+        # Otherwise the router picks the fast or the full configuration.
+        reason = self.usage.over_budget(session_id)
+        summaries = self._find_summaries(question, chat_history, filters)
+        if summaries:
+            decision = RouteDecision('summary', 0.0, ['overview']) if self.router is not None else None
+            return AnswerPlan(self._overview_generator, degraded=reason, route=decision, context=summaries)
+        if reason is None:
+            if self.router is None:
+                return AnswerPlan(self.answer_generator)
+            decision = self.router.route(question, chat_history)
+            return AnswerPlan(self._route_generators[decision.route], route=decision)
+        
+        degrade = self.usage.degrade
+        if self._budget_generator is None:
+            llm_config = self.config.get_section('llm')
+            self._budget_generator = AnswerGenerator(
+                provider=llm_config.get('provider', 'openai'),
+                model=degrade.get('model') or llm_config.get('model', 'gpt-3.5-turbo'),
+                temperature=llm_config.get('temperature', 0.7),
+                max_tokens=degrade.get('max_tokens') or llm_config.get('max_tokens', 500),
+                scheduler=self.scheduler
+            )
+        return AnswerPlan(self._budget_generator, degrade.get('top_k'), reason)
+    
+    def _find_summaries(self, question: str, chat_history: List[Dict[str, str]],
+                        filters: Optional[SearchFilter]) -> Optional[List[Document]]:
+        
+        if self.summary_index is None or (chat_history and is_follow_up(question)):
+            return None
+        # Page and metadata filters cannot be applied to a summary
+        if filters is not None and (filters.page_range or filters.where):
+            return None
+        matches = self.summary_index.find(
+            question,
+            sources=filters.sources if filters is not None and filters.sources else None,
+            max_documents=self.config.get('summaries.max_documents', 3)
+        )
+        return summary_documents(matches) or None
+    
+    def _plan_usage(self, plan: AnswerPlan, question: str, usage, started: float) -> Dict[str, Any]:
+        
+        totals = usage.to_dict()
+        if plan.route is not None:
+            self.router.record(plan.route, question, plan.generator, time.perf_counter() - started, totals)
+        return dict(totals, degraded=plan.degraded, route=plan.route and plan.route.route)
+    
+    async def _aplan_usage(self, plan: AnswerPlan, question: str, usage, started: float) -> Dict[str, Any]:
+        
+        # Recording a routed answer appends to the routing log; keep that
+        # file write off the event loop
+        if plan.route is not None and self.router.log_path:
+            return await asyncio.to_thread(self._plan_usage, plan, question, usage, started)
+        return self._plan_usage(plan, question, usage, started)
+    
+    async def _aanswer_question(self, question: str, filters: Optional[SearchFilter],
+                                chat_history: List[Dict[str, str]], plan: AnswerPlan) -> Answer:
+        
+        generator, top_k = plan.generator, plan.top_k
+        if plan.context is not None:
+            with stage_timer('generate'):
+                return await generator.agenerate_answer(question, plan.context, chat_history=chat_history)
+        
+        embedding_task = None
+        if self.answer_cache is not None and not chat_history:
+            # The answer-cache embedding is started alongside retrieval; in
+            # vector mode both await the same embedding call.
+            embedding_task = asyncio.ensure_future(self.embedding_service.aembed_query(question))
+        
+        try:
+            with stage_timer('retrieve'):
+                context_documents = await self.query_processor.aretrieve_context(
+                    question, k=top_k, filters=filters
+                )
+        except BaseException:
+            if embedding_task is not None:
+                embedding_task.cancel()
+            raise
+        
+        use_answer_cache = embedding_task is not None and bool(context_documents)
+        if embedding_task is not None and not use_answer_cache:
+            embedding_task.cancel()
+        
+        if use_answer_cache:
+            question_embedding = await embedding_task
+            fingerprint = self._answer_fingerprint(plan, context_documents)
+            answer = self.answer_cache.lookup(question_embedding, fingerprint)
+            if answer is not None:
+                return answer
+        
+        prompt_documents = await self._acompress_context(question, context_documents)
+        with stage_timer('generate'):
+            answer = await generator.agenerate_answer(
+                question,
+                prompt_documents,
+                chat_history=chat_history
+            )
+        
+        if use_answer_cache:
+            # Persisting the cache writes to disk; keep it off the event loop
+            await asyncio.to_thread(
+                self.answer_cache.store, question, question_embedding, fingerprint, answer
+            )
+        
+        return answer
+    
+    def _answer_question(self, question: str, filters: Optional[SearchFilter],
+                         chat_history: List[Dict[str, str]], plan: AnswerPlan) -> Answer:
+        
+        generator, top_k = plan.generator, plan.top_k
+        if plan.context is not None:
+            with stage_timer('generate'):
+                return generator.generate_answer(question, plan.context, chat_history=chat_history)
+        
+        with stage_timer('retrieve'):
+            context_documents = self.query_processor.retrieve_context(question, k=top_k, filters=filters)
+        
+        # An answer written with a conversation in view depends on that
+        # conversation ("Why?", "Can you give an example?"), so questions with
+        # history neither read from nor write to the shared answer cache.
+        use_answer_cache = (
+            self.answer_cache is not None
+            and bool(context_documents)
+            and not chat_history
+        )
+        
+        if use_answer_cache:
+            question_embedding = self.embedding_service.embed_query(question)
+            fingerprint = self._answer_fingerprint(plan, context_documents)
+            answer = self.answer_cache.lookup(question_embedding, fingerprint)
+            if answer is not None:
+                return answer
+        
+        prompt_documents = self._compress_context(question, context_documents)
+        with stage_timer('generate'):
+            answer = generator.generate_answer(
+                question, 
+                prompt_documents,
+                chat_history=chat_history
+            )
+        
+        if use_answer_cache:
+            self.answer_cache.store(question, question_embedding, fingerprint, answer)
+        
+        return answer
+    
+    def _compress_context(self, question: str, context_documents: List[Document]) -> List[Document]:
+        
+        # Right before generation: the answer cache keys on the chunks as
+        # retrieved, and the query embedding usually comes from the cache
+        # retrieval filled. Compression only trims the prompt, so when it
+        # fails (e.g. embedding sentences the store no longer holds) the
+        # question is answered from the chunks as retrieved.
+        if self.context_compressor is None or not context_documents:
+            return context_documents
+        try:
+            with stage_timer('compress'):
+                compressed, _ = self.context_compressor.compress(
+                    self.embedding_service.embed_query(question), context_documents
+                )
+        except Exception:
+            return context_documents
+        return compressed
+    
+    async def _acompress_context(self, question: str, context_documents: List[Document]) -> List[Document]:
+        
+        if self.context_compressor is None or not context_documents:
+            return context_documents
+        try:
+            with stage_timer('compress'):
+                query_embedding = await self.embedding_service.aembed_query(question)
+                # May embed sentences of chunks indexed before compression was on
+                compressed, _ = await asyncio.to_thread(
+                    self.context_compressor.compress, query_embedding, context_documents
+                )
+        except Exception:
+            return context_documents
+        return compressed
+    
     def get_conversation_history(self) -> List[Dict[str, str]]:
        
         return self._conversation_history.copy()
@@ -194,12 +750,105 @@ class RAGEngine:
        
         return self.vector_store_manager.get_collection_info()
     
+    def get_cache_stats(self) -> Dict[str, Any]:
+        
+        stats = {"retrieval": self.query_processor.get_cache_stats()}
+        stats["answer"] = (
+            dict(self.answer_cache.stats(), enabled=True)
+            if self.answer_cache is not None else {"enabled": False}
+        )
+        stats["sentences"] = (
+            dict(self.context_compressor.store.stats(), enabled=True)
+            if self.context_compressor is not None else {"enabled": False}
+        )
+        return stats
+    
+    def get_usage_stats(self, session_id: Optional[str] = None) -> Dict[str, Any]:
+        
+        return self.usage.stats(session_id or self.session_id)
+    
+    def get_routing_stats(self) -> Dict[str, Any]:
+        
+        # Per route: questions answered, mean latency, completion tokens and cost
+        if self.router is None:
+            return {}
+        return self.router.stats()
+    
+    def get_scheduler_stats(self) -> Dict[str, Any]:
+        
+        return self.scheduler.stats()
+    
+    def list_documents(self) -> List[Dict[str, Any]]:
+        
+        return self.vector_store_manager.list_documents()
+    
+    def schedule_summary(self, source: str):
+        
+        # Built in the background, one document at a time, from the chunks
+        # already stored; the previous summary is served until it finishes
+        return self.summary_index.schedule(source, lambda: self._build_summary(source))
+    
+    def _build_summary(self, source: str) -> DocumentSummary:
+        
+        summaries_config = self.config.get_section('summaries')
+        with request_priority(Priority.BULK), track_usage(ingest_source=source) as usage, \
+                span("summarize", source=source) as current:
+            pages = pages_from_chunks(self.vector_store_manager.get_document_chunks(source))
+            summary = build_document_summary(
+                source, pages, self._summarizer.summarize,
+                map_chars=summaries_config.get('map_chars', 6000),
+                fanout=summaries_config.get('fanout', 6),
+                workers=summaries_config.get('workers', 4),
+                pages_per_section=summaries_config.get('pages_per_section', 10)
+            )
+            current.set(pages=len(pages), items=len(summary.sections), llm_calls=summary.llm_calls,
+                        cost_usd=usage.cost_usd)
+        return summary
+    
+    def get_summary(self, source: str) -> Dict[str, Any]:
+        
+        # {"status": None | 'pending' | 'ready' | 'failed', "summary": {...} or None}
+        if self.summary_index is None:
+            return {"status": None, "summary": None}
+        summary = self.summary_index.get(source)
+        return {
+            "status": self.summary_index.status(source),
+            "summary": asdict(summary) if summary is not None else None
+        }
+    
+    def delete_document(self, source: str) -> int:
+        
+        try:
+            if self.summary_index is not None:
+                self.summary_index.remove(source)
+            return self.vector_store_manager.delete_by_source(source)
+        except Exception as e:
+            raise Exception(f"Failed to delete document '{source}': {e}")
+    
+    def replace_document(self, file_path: str, source_name: Optional[str] = None,
+                         show_progress: bool = True) -> DocumentInfo:
+        
+        # Only the replaced file is re-embedded; every other document is
+        # untouched. The new version is written once it is fully embedded, so
+        # a failure keeps the old one (see IngestPipeline.run).
+        return self.ingest_document(
+            file_path,
+            show_progress=show_progress,
+            source_name=source_name
+        )
+    
     def reset_database(self) -> bool:
         
         try:
           
             self.vector_store_manager.clear_all_documents()
             
+            if self.answer_cache is not None:
+                self.answer_cache.clear()
+            
+            if self.summary_index is not None:
+                self.summary_index.clear()
+            
           
             self.clear_conversation_history()
             return True
@@ -0,0 +1,88 @@
+"""LRU cache for retrieval results, invalidated by corpus generation."""
+
+# skip embedding + search for repeated questions
+
+import json
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+from langchain_core.documents import Document
+
+
+def normalize_question(question: str) -> str:
+    
+    # "  What is  Ohm's law? " and "what is ohm's law" share one entry
+    return " ".join(question.lower().split()).rstrip("?!. ")
+
+
+class RetrievalCache:
+    
+    _shared: Dict[str, 'RetrievalCache'] = {}
+    _shared_lock = threading.Lock()
+    
+    def __init__(self, max_entries: int = 1024):
+        
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Tuple, List[Document]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    @classmethod
+    def open_shared(cls, namespace: str, max_entries: int = 1024) -> 'RetrievalCache':
+        
+        # One cache per corpus for the whole process, so a question answered
+        # in one session is a hit in every other session.
+        with cls._shared_lock:
+            if namespace not in cls._shared:
+                cls._shared[namespace] = cls(max_entries=max_entries)
+            return cls._shared[namespace]
+    
+    @staticmethod
+    def make_key(question: str, k: int, generation: str, filters=None,
+                 settings: Tuple = ()) -> Tuple:
+        
+        where = filters.to_where() if filters is not None else None
+        filter_key = json.dumps(where, sort_keys=True) if where else ""
+        return (normalize_question(question), k, filter_key, settings, generation)
+    
+    def get(self, key: Tuple) -> Optional[List[Document]]:
+        
+        with self._lock:
+            documents = self._entries.get(key)
+            if documents is None:
+                self.misses += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(documents)
+    
+    def put(self, key: Tuple, documents: List[Document]) -> None:
+        
+        with self._lock:
+            self._entries[key] = list(documents)
+            self._entries.move_to_end(key)
+            
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self) -> None:
+        
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
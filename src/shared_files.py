@@ -0,0 +1,49 @@
+"""Helpers for index files that several processes read and write."""
+
+# the Streamlit app, the HTTP server and ingest jobs share one data directory
+
+import os
+from contextlib import contextmanager
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+
+def file_signature(path: str) -> Optional[tuple]:
+
+    # Changes whenever the file is rewritten, appended to or swapped in with
+    # os.replace (which gives every version a new inode); None if missing
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+@contextmanager
+def file_lock(path: str):
+
+    # Exclusive lock on "<path>.lock", between processes and between threads
+    # (every holder opens its own handle). Held around writes only; readers
+    # rely on files being appended whole lines at a time or swapped in.
+    lock_path = f"{path}.lock"
+    os.makedirs(os.path.dirname(os.path.abspath(lock_path)), exist_ok=True)
+    with open(lock_path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
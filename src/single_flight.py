@@ -0,0 +1,105 @@
+"""Coalescing of identical in-flight calls (single-flight)."""
+
+# N identical concurrent questions -> one retrieval and one LLM call
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Call:
+    
+    def __init__(self):
+        
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    
+    _shared: Dict[str, 'SingleFlight'] = {}
+    _shared_lock = threading.Lock()
+    
+    def __init__(self):
+        
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        # (event loop, key) -> task; coroutines coalesce within their own loop
+        self._async_calls: Dict[Hashable, asyncio.Future] = {}
+        self.executed = 0
+        self.coalesced = 0
+    
+    @classmethod
+    def open_shared(cls, namespace: str) -> 'SingleFlight':
+        
+        with cls._shared_lock:
+            if namespace not in cls._shared:
+                cls._shared[namespace] = cls()
+            return cls._shared[namespace]
+    
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+                leader = True
+        
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # Remove the key before waking followers: anyone arriving after this
+            # point starts a fresh call instead of reading a finished one.
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+    
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        
+        call_key = (asyncio.get_running_loop(), key)
+        
+        with self._lock:
+            task = self._async_calls.get(call_key)
+            if task is not None:
+                self.coalesced += 1
+            else:
+                task = asyncio.ensure_future(fn())
+                self._async_calls[call_key] = task
+                self.executed += 1
+                task.add_done_callback(lambda _: self._forget(call_key))
+        
+        # Shielded: a caller that is cancelled leaves the shared call running
+        # for everyone else waiting on it.
+        return await asyncio.shield(task)
+    
+    def _forget(self, call_key: Hashable) -> None:
+        
+        with self._lock:
+            self._async_calls.pop(call_key, None)
+    
+    def stats(self) -> Dict[str, int]:
+        
+        with self._lock:
+            return {
+                "executed": self.executed,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls) + len(self._async_calls)
+            }
@@ -0,0 +1,150 @@
+"""Deterministic local embedding and chat providers for tests and benchmarks."""
+
+# no network, no API key, repeatable output
+
+import asyncio
+import hashlib
+import math
+import random
+import re
+import threading
+import time
+from typing import List, Any, Optional, AsyncIterator, Callable, Union
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+_CHAT_COUNTER_LOCK = threading.Lock()
+
+# Seconds per call: a constant, or a function drawing from a distribution
+Latency = Union[float, Callable[[], float]]
+
+
+def _seconds(latency: Latency) -> float:
+
+    return latency() if callable(latency) else latency
+
+
+class StubEmbeddings(Embeddings):
+
+    def __init__(self, dimension: int = 64, latency: Latency = 0.0):
+
+        self.dimension = dimension
+        self.latency = latency
+        self.document_calls = 0
+        self.query_calls = 0
+        self._lock = threading.Lock()
+
+    def _embed(self, text: str) -> List[float]:
+
+        # Hashed bag of words: texts that share words get similar vectors, so
+        # retrieval over stub embeddings still behaves like retrieval.
+        vector = [0.0] * self.dimension
+        for word in _WORD_PATTERN.findall(text.lower()):
+            digest = hashlib.md5(word.encode('utf-8')).digest()
+            index = int.from_bytes(digest[:4], 'little') % self.dimension
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+
+        with self._lock:
+            self.document_calls += 1
+        if self.latency:
+            time.sleep(_seconds(self.latency))
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+
+        with self._lock:
+            self.query_calls += 1
+        if self.latency:
+            time.sleep(_seconds(self.latency))
+        return self._embed(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+
+        with self._lock:
+            self.document_calls += 1
+        if self.latency:
+            await asyncio.sleep(_seconds(self.latency))
+        return [self._embed(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+
+        with self._lock:
+            self.query_calls += 1
+        if self.latency:
+            await asyncio.sleep(_seconds(self.latency))
+        return self._embed(text)
+
+
+class StubChatModel(BaseChatModel):
+
+    latency: Latency = 0.0
+    # Share of calls that raise, to exercise error handling under load
+    failure_rate: float = 0.0
+    call_count: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+
+        return "stub"
+
+    def _respond(self, messages: List[BaseMessage]) -> ChatResult:
+
+        with _CHAT_COUNTER_LOCK:
+            self.call_count += 1
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise RuntimeError("Stub provider error")
+
+        prompt = "\n".join(str(message.content) for message in messages)
+        match = re.search(r"Current Question:\s*(.+)", prompt)
+        question = match.group(1).strip() if match else prompt[-200:]
+
+        text = f"Stub answer to: {question}"
+        message = AIMessage(content=text, usage_metadata=self._usage(prompt, text))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    @staticmethod
+    def _usage(prompt: str, text: str) -> dict:
+
+        # Reported like a provider would; one token per word keeps it predictable
+        input_tokens, output_tokens = len(prompt.split()), len(text.split())
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens}
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+
+        if self.latency:
+            time.sleep(_seconds(self.latency))
+        return self._respond(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+
+        if self.latency:
+            await asyncio.sleep(_seconds(self.latency))
+        return self._respond(messages)
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+
+        # Word by word, with the latency spread across the words; usage comes
+        # with the last chunk, as from OpenAI with stream_usage
+        message = self._respond(messages).generations[0].message
+        words = message.content.split(" ")
+        latency = _seconds(self.latency)
+        for i, word in enumerate(words):
+            if latency:
+                await asyncio.sleep(latency / len(words))
+            piece = word if i == 0 else " " + word
+            usage = message.usage_metadata if i == len(words) - 1 else None
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece, usage_metadata=usage))
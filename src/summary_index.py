@@ -0,0 +1,450 @@
+"""Precomputed chapter and document summaries for overview questions."""
+
+# summarize each document once after ingest; "summarize chapter 3" is then
+# answered from a few hundred tokens of summary instead of retrieved chunks
+
+import contextvars
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from dataclasses import dataclass, field, asdict
+from typing import List, Dict, Any, Optional, Callable, Tuple
+
+from langchain_core.documents import Document
+
+from src.lexical_index import tokenize
+
+
+_NUMBER_WORDS = {
+    word: value for value, word in enumerate(
+        "zero one two three four five six seven eight nine ten eleven twelve thirteen "
+        "fourteen fifteen sixteen seventeen eighteen nineteen twenty".split()
+    )
+}
+_NUMBER = r"(\d{1,3}|[ivxlc]{1,7}|" + "|".join(_NUMBER_WORDS) + r")"
+
+# "Chapter 3", "CHAPTER III: Waves", "Unit two - Energy"
+_CHAPTER_HEADING = re.compile(
+    r"^\s*(chapter|unit|part|lesson|module)\s+" + _NUMBER + r"\b[\s:.\-–—]*(.{0,80})$", re.IGNORECASE
+)
+# "3 Thermodynamics", "4. Waves and Optics": no final full stop, so not a sentence
+_NUMBERED_HEADING = re.compile(r"^\s*(\d{1,2})\.?\s+([A-Z][A-Za-z0-9 ,'&()\-–]{2,70})$")
+# Headings are looked for in the first lines of each page
+HEADING_LINES = 3
+
+_OVERVIEW = re.compile(
+    r"\b(summari[sz]e|summary|overview|outline|recap|tl;?dr|main (ideas|points|topics)|"
+    r"key (ideas|points|takeaways|concepts)|what (is|are) (this|the) \w+ about|what does (this|the) \w+ cover)\b",
+    re.IGNORECASE
+)
+_SECTION_REFERENCE = re.compile(r"\b(chapter|unit|part|lesson|module|section)\s+" + _NUMBER + r"\b", re.IGNORECASE)
+# Words that ask for a summary rather than name what to summarize
+_OVERVIEW_WORDS = frozenset("""
+summarize summarise summary overview outline recap tl dr main key ideas points topics takeaways concepts
+document documents book pdf notes file chapter chapters section sections unit part lesson module
+give me please can could you brief short quick whole entire about cover covers do does is are
+""".split())
+
+
+def _to_number(token: str) -> Optional[int]:
+
+    token = token.lower()
+    if token.isdigit():
+        return int(token)
+    if token in _NUMBER_WORDS:
+        return _NUMBER_WORDS[token]
+    values = {'i': 1, 'v': 5, 'x': 10, 'l': 50, 'c': 100}
+    if not token or any(ch not in values for ch in token):
+        return None
+    total = 0
+    for current, following in zip(token, token[1:] + ' '):
+        value = values[current]
+        total += -value if following in values and values[following] > value else value
+    return total
+
+
+@dataclass
+class SectionSummary:
+
+    title: str
+    # Chapter or section number from the heading, if it had one
+    number: Optional[int]
+    # 0-based, inclusive, like the 'page' chunk metadata
+    first_page: int
+    last_page: int
+    summary: str = ""
+
+
+@dataclass
+class DocumentSummary:
+
+    source: str
+    summary: str
+    sections: List[SectionSummary] = field(default_factory=list)
+    created_at: float = field(default_factory=time.time)
+    llm_calls: int = 0
+
+
+def pages_from_chunks(chunks: List[Document]) -> List[Tuple[int, str]]:
+
+    # (page, text) in page order, from stored chunks in chunk order. Chunk
+    # overlap is left in; it repeats a sentence or two per chunk.
+    pages: Dict[int, List[str]] = {}
+    for chunk in chunks:
+        pages.setdefault(int(chunk.metadata.get('page', 0)), []).append(chunk.page_content)
+    return [(page, "\n".join(texts)) for page, texts in sorted(pages.items())]
+
+
+def detect_sections(pages: List[Tuple[int, str]], pages_per_section: int = 10) -> List[SectionSummary]:
+
+    # Chapter-style headings first, then numbered headings; a document with
+    # neither is cut into fixed runs of pages. At most one heading per page.
+    if not pages:
+        return []
+
+    def find(pattern: re.Pattern, title: Callable[[re.Match], Tuple[Optional[int], str]]):
+        found = []
+        for page, text in pages:
+            lines = [line.strip() for line in text.splitlines() if line.strip()][:HEADING_LINES]
+            for line in lines:
+                match = pattern.match(line)
+                if match:
+                    found.append((page, *title(match)))
+                    break
+        return found
+
+    headings = find(_CHAPTER_HEADING, lambda m: (_to_number(m.group(2)), m.group(0).strip()))
+    if not headings:
+        numbered = find(_NUMBERED_HEADING, lambda m: (int(m.group(1)), m.group(0).strip()))
+        # Numbered headings only count if they run in order; otherwise they
+        # are more likely list items or table rows
+        numbers = [number for _, number, _ in numbered]
+        if len(numbered) >= 2 and numbers == sorted(set(numbers)):
+            headings = numbered
+
+    last_page = pages[-1][0]
+    if not headings:
+        first_page = pages[0][0]
+        return [
+            SectionSummary(
+                title=f"Pages {start + 1}-{min(start + pages_per_section, last_page + 1)}", number=None,
+                first_page=start, last_page=min(start + pages_per_section - 1, last_page)
+            )
+            for start in range(first_page, last_page + 1, pages_per_section)
+        ]
+
+    sections = []
+    if headings[0][0] > pages[0][0]:
+        sections.append(SectionSummary("Front matter", None, pages[0][0], headings[0][0] - 1))
+    for i, (page, number, title) in enumerate(headings):
+        end = headings[i + 1][0] - 1 if i + 1 < len(headings) else last_page
+        sections.append(SectionSummary(title, number, page, end))
+    return sections
+
+
+class _Summarizer:
+
+    def __init__(self, summarize: Callable[[str, str], str], map_chars: int, fanout: int, workers: int):
+
+        self.summarize = summarize
+        self.map_chars = map_chars
+        self.fanout = fanout
+        self.workers = workers
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def run(self, items: List[Tuple[str, str]]) -> List[str]:
+
+        # (text, instruction) pairs summarized concurrently; each call runs in
+        # a copy of the caller's context, so its priority and usage scope apply
+        with self._lock:
+            self.calls += len(items)
+        if len(items) == 1:
+            return [self.summarize(*items[0])]
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="summarize") as pool:
+            futures = [pool.submit(contextvars.copy_context().run, self.summarize, text, instruction)
+                       for text, instruction in items]
+            return [future.result() for future in futures]
+
+    def reduce(self, groups: Dict[Any, List[str]], instruction: Callable[[Any], str]) -> Dict[Any, str]:
+
+        # Every group's summaries are merged `fanout` at a time until one is
+        # left; one level of every group is summarized concurrently
+        groups = dict(groups)
+        while True:
+            batches = [
+                (key, summaries[i:i + self.fanout])
+                for key, summaries in groups.items() if len(summaries) > 1
+                for i in range(0, len(summaries), self.fanout)
+            ]
+            if not batches:
+                return {key: summaries[0] for key, summaries in groups.items()}
+            merged = self.run([("\n\n".join(batch), instruction(key)) for key, batch in batches])
+            for key in {key for key, _ in batches}:
+                groups[key] = []
+            for (key, _), summary in zip(batches, merged):
+                groups[key].append(summary)
+
+    def split(self, text: str) -> List[str]:
+
+        # Pieces of at most map_chars, cut at line breaks where possible
+        pieces, current = [], ""
+        for line in text.splitlines(keepends=True):
+            while len(line) > self.map_chars:
+                if current:
+                    pieces.append(current)
+                    current = ""
+                pieces.append(line[:self.map_chars])
+                line = line[self.map_chars:]
+            if current and len(current) + len(line) > self.map_chars:
+                pieces.append(current)
+                current = ""
+            current += line
+        if current.strip():
+            pieces.append(current)
+        return pieces
+
+
+def build_document_summary(source: str, pages: List[Tuple[int, str]], summarize: Callable[[str, str], str],
+                           map_chars: int = 6000, fanout: int = 6, workers: int = 4,
+                           pages_per_section: int = 10) -> DocumentSummary:
+
+    # Map: every piece of every section is summarized, all at once. Reduce:
+    # a section's piece summaries are merged into the section summary, and
+    # section summaries into the document summary, `fanout` at a time.
+    summarizer = _Summarizer(summarize, map_chars, fanout, workers)
+    sections = detect_sections(pages, pages_per_section)
+    page_text = dict(pages)
+
+    pieces: List[Tuple[int, str]] = []
+    for index, section in enumerate(sections):
+        text = "\n".join(page_text.get(page, "") for page in range(section.first_page, section.last_page + 1))
+        pieces.extend((index, piece) for piece in summarizer.split(text) if piece.strip())
+    if not pieces:
+        raise ValueError(f"No text to summarize in '{source}'")
+
+    mapped = summarizer.run([
+        (piece, f"Summarize this part of {sections[index].title} from '{source}' in at most five sentences.")
+        for index, piece in pieces
+    ])
+    by_section: Dict[int, List[str]] = {}
+    for (index, _), summary in zip(pieces, mapped):
+        by_section.setdefault(index, []).append(summary)
+
+    # Sections without text (blank or image-only pages) are dropped
+    merged = summarizer.reduce(
+        by_section,
+        lambda index: f"Combine these partial summaries of {sections[index].title} into one summary of the section."
+    )
+    for index, summary in merged.items():
+        sections[index].summary = summary
+    sections = [section for index, section in enumerate(sections) if index in merged]
+    if len(sections) == 1:
+        overview = sections[0].summary
+    else:
+        overview = summarizer.reduce(
+            {source: [f"{section.title}:\n{section.summary}" for section in sections]},
+            lambda _: f"Write an overview of '{source}' from these section summaries: "
+                      f"one short paragraph, then one line per section."
+        )[source]
+    return DocumentSummary(source=source, summary=overview, sections=sections, llm_calls=summarizer.calls)
+
+
+class SummaryIndex:
+
+    _shared: Dict[str, 'SummaryIndex'] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, path: Optional[str] = None):
+
+        self.path = path
+        self._lock = threading.Lock()
+        self._summaries: Dict[str, DocumentSummary] = {}
+        # source -> build in progress, and the last failure of each source
+        self._pending: Dict[str, Future] = {}
+        self._errors: Dict[str, str] = {}
+        # Bumped by remove (per source) and clear (all sources): a build
+        # scheduled before either is dropped instead of stored
+        self._generations: Dict[str, int] = {}
+        self._epoch = 0
+        # One build at a time: summaries are background work
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summaries")
+
+        if path and os.path.exists(path):
+            self._load()
+
+    @classmethod
+    def open_shared(cls, path: str) -> 'SummaryIndex':
+
+        key = os.path.abspath(path)
+        with cls._shared_lock:
+            if key not in cls._shared:
+                cls._shared[key] = cls(path)
+            return cls._shared[key]
+
+    def __len__(self) -> int:
+
+        return len(self._summaries)
+
+    def get(self, source: str) -> Optional[DocumentSummary]:
+
+        with self._lock:
+            return self._summaries.get(source)
+
+    def put(self, summary: DocumentSummary) -> None:
+
+        with self._lock:
+            self._summaries[summary.source] = summary
+            self._save()
+
+    def remove(self, source: str) -> None:
+
+        with self._lock:
+            self._generations[source] = self._generations.get(source, 0) + 1
+            self._errors.pop(source, None)
+            if self._summaries.pop(source, None) is not None:
+                self._save()
+
+    def clear(self) -> None:
+
+        with self._lock:
+            self._epoch += 1
+            self._summaries = {}
+            self._errors = {}
+            self._save()
+
+    def _generation(self, source: str) -> Tuple[int, int]:
+
+        return self._epoch, self._generations.get(source, 0)
+
+    def schedule(self, source: str, build: Callable[[], DocumentSummary]) -> Future:
+
+        # A source already waiting to be built is not queued twice
+        with self._lock:
+            pending = self._pending.get(source)
+            if pending is not None and not pending.running() and not pending.done():
+                return pending
+            future = self._executor.submit(self._build, source, build, self._generation(source))
+            self._pending[source] = future
+            return future
+
+    def _build(self, source: str, build: Callable[[], DocumentSummary],
+               generation: Tuple[int, int]) -> DocumentSummary:
+
+        try:
+            summary = build()
+        except Exception as e:
+            with self._lock:
+                if self._generation(source) == generation:
+                    self._errors[source] = str(e)
+            print(f"Warning: Failed to summarize '{source}': {e}")
+            raise
+        with self._lock:
+            # Deleted (or the index cleared) while building: the document is
+            # gone, so its summary must not come back
+            if self._generation(source) == generation:
+                self._summaries[summary.source] = summary
+                self._errors.pop(source, None)
+                self._save()
+        return summary
+
+    def status(self, source: str) -> Optional[str]:
+
+        # 'pending' while queued or building, then 'ready' or 'failed'
+        with self._lock:
+            pending = self._pending.get(source)
+            if pending is not None and not pending.done():
+                return 'pending'
+            if source in self._errors:
+                return 'failed'
+            return 'ready' if source in self._summaries else None
+
+    def find(self, question: str, sources: Optional[List[str]] = None,
+             max_documents: int = 3) -> List[Tuple[DocumentSummary, Optional[SectionSummary]]]:
+
+        # Summaries that answer an overview question: the numbered chapter it
+        # names, else the sections whose titles share its words, else whole
+        # documents when it names nothing more specific. Empty when the
+        # question is not an overview question or nothing matches.
+        if not _OVERVIEW.search(question):
+            return []
+        with self._lock:
+            documents = [
+                summary for source, summary in sorted(self._summaries.items())
+                if sources is None or source in sources
+            ]
+        if not documents:
+            return []
+
+        reference = _SECTION_REFERENCE.search(question)
+        if reference:
+            number = _to_number(reference.group(2))
+            return [
+                (document, section)
+                for document in documents for section in document.sections
+                if section.number is not None and section.number == number
+            ]
+
+        words = set(tokenize(question)) - _OVERVIEW_WORDS
+        if not words:
+            return [(document, None) for document in documents] if len(documents) <= max_documents else []
+
+        # Named by file name: the whole document
+        named = [document for document in documents if words & set(tokenize(os.path.splitext(document.source)[0]))]
+        if named:
+            return [(document, None) for document in named[:max_documents]]
+
+        scored = [
+            (len(words & set(tokenize(section.title))), document, section)
+            for document in documents for section in document.sections
+        ]
+        best = max((score for score, _, _ in scored), default=0)
+        # A topic that is not a section title is left to retrieval
+        return [(document, section) for score, document, section in scored if best and score == best]
+
+    def _save(self) -> None:
+
+        if not self.path:
+            return
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(f"{self.path}.tmp", 'w') as f:
+            json.dump([asdict(summary) for summary in self._summaries.values()], f, indent=2)
+        os.replace(f"{self.path}.tmp", self.path)
+
+    def _load(self) -> None:
+
+        try:
+            with open(self.path, 'r') as f:
+                entries = json.load(f)
+            self._summaries = {
+                entry['source']: DocumentSummary(
+                    **dict(entry, sections=[SectionSummary(**section) for section in entry['sections']])
+                )
+                for entry in entries
+            }
+        except Exception as e:
+            print(f"Warning: Failed to load summary index '{self.path}': {e}")
+
+
+def summary_documents(matches: List[Tuple[DocumentSummary, Optional[SectionSummary]]]) -> List[Document]:
+
+    # Context documents for the answer generator, one per summary
+    documents = []
+    for document, section in matches:
+        if section is None:
+            documents.append(Document(
+                page_content=f"Overview of {document.source}:\n{document.summary}",
+                metadata={'source': document.source, 'page': 0, 'summary': 'document'}
+            ))
+        else:
+            documents.append(Document(
+                page_content=(f"{section.title} (pages {section.first_page + 1}-{section.last_page + 1}):\n"
+                              f"{section.summary}"),
+                metadata={'source': document.source, 'page': section.first_page, 'summary': 'section',
+                          'section': section.title}
+            ))
+    return documents
@@ -6,6 +6,8 @@ from typing import List, Dict, Any
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 
+from src.tracing import span
+
 
 class TextChunker:
     
@@ -25,7 +27,12 @@ class TextChunker:
     
     def split_documents(self, documents: List[Document]) -> List[Document]:
        
-        chunks = self.text_splitter.split_documents(documents)
+        with span("chunker.split") as current:
+            if current.recording:
+                # Characters, not encoded bytes
+                current.set(chars=sum(len(doc.page_content) for doc in documents))
+            chunks = self.text_splitter.split_documents(documents)
+            current.set(items=len(chunks), pages=len(documents))
         
         return chunks
     
@@ -0,0 +1,300 @@
+"""Span-based tracing of the ingest and ask pipelines."""
+
+# spans -> JSONL trace file, Prometheus text metrics, recent traces for the UI
+
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+
+# Span attributes with these names are also summed into Prometheus counters
+COUNTED_ATTRIBUTES = ('items', 'bytes', 'chars', 'tokens')
+
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar('current_span', default=None)
+_span_ids = itertools.count(1)
+
+
+class _Trace:
+
+    def __init__(self, exported: bool):
+
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.exported = exported
+        self.started = time.time()
+        self.origin = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add(self, record: Dict[str, Any]) -> None:
+
+        with self._lock:
+            self.spans.append(record)
+
+    def to_dict(self) -> Dict[str, Any]:
+
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s['offset_ms'])
+        return {"trace_id": self.trace_id, "started": self.started, "spans": spans}
+
+
+class Span:
+
+    __slots__ = ('name', 'attributes', 'trace', 'span_id', 'parent_id', '_start', '_token')
+
+    recording = True
+
+    def __init__(self, name: str, attributes: Dict[str, Any], exported: bool = True):
+
+        self.name = name
+        self.attributes = attributes
+        parent = _current_span.get()
+        self.trace = parent.trace if parent is not None else _Trace(exported)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.span_id = next(_span_ids)
+
+    @property
+    def trace_id(self) -> str:
+
+        return self.trace.trace_id
+
+    def set(self, **attributes: Any) -> None:
+
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> 'Span':
+
+        self._token = _current_span.set(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+
+        end = time.perf_counter()
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            # Exited from another context (e.g. a generator closed elsewhere)
+            pass
+        self._finish(end, f"{exc_type.__name__}: {exc}" if exc_type is not None else None)
+
+    def _finish(self, end: float, error: Optional[str]) -> None:
+
+        record = {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "offset_ms": round((self._start - self.trace.origin) * 1000, 3),
+            "duration_ms": round((end - self._start) * 1000, 3),
+            "attributes": self.attributes
+        }
+        if error is not None:
+            record["error"] = error
+        self.trace.add(record)
+        _tracer.observe(record)
+
+        if self.parent_id is None:
+            _tracer.finish(self.trace)
+
+
+class _NoopSpan:
+
+    # Returned when nothing is recording: entering, setting and leaving do nothing.
+    # Attributes that cost something to compute can be guarded with `recording`.
+    trace_id = None
+    recording = False
+
+    def set(self, **attributes: Any) -> None:
+
+        pass
+
+    def __enter__(self) -> '_NoopSpan':
+
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Metrics:
+
+    # Per span name: duration histogram, error count and attribute totals
+    def __init__(self):
+
+        self._lock = threading.Lock()
+        self._spans: Dict[str, Dict[str, Any]] = {}
+
+    def observe(self, record: Dict[str, Any]) -> None:
+
+        seconds = record["duration_ms"] / 1000
+        with self._lock:
+            entry = self._spans.get(record["name"])
+            if entry is None:
+                entry = {
+                    "count": 0, "sum": 0.0, "errors": 0,
+                    "buckets": [0] * len(DURATION_BUCKETS),
+                    "totals": dict.fromkeys(COUNTED_ATTRIBUTES, 0)
+                }
+                self._spans[record["name"]] = entry
+            entry["count"] += 1
+            entry["sum"] += seconds
+            if "error" in record:
+                entry["errors"] += 1
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    entry["buckets"][i] += 1
+            for key in COUNTED_ATTRIBUTES:
+                value = record["attributes"].get(key)
+                if isinstance(value, (int, float)):
+                    entry["totals"][key] += value
+
+    def render(self) -> str:
+
+        with self._lock:
+            spans = {name: dict(entry, buckets=list(entry["buckets"]), totals=dict(entry["totals"]))
+                     for name, entry in sorted(self._spans.items())}
+
+        lines = [
+            "# HELP rag_span_duration_seconds Time spent in each instrumented stage.",
+            "# TYPE rag_span_duration_seconds histogram",
+        ]
+        for name, entry in spans.items():
+            for bound, count in zip(DURATION_BUCKETS, entry["buckets"]):
+                lines.append(f'rag_span_duration_seconds_bucket{{span="{name}",le="{bound}"}} {count}')
+            lines.append(f'rag_span_duration_seconds_bucket{{span="{name}",le="+Inf"}} {entry["count"]}')
+            lines.append(f'rag_span_duration_seconds_sum{{span="{name}"}} {entry["sum"]:.6f}')
+            lines.append(f'rag_span_duration_seconds_count{{span="{name}"}} {entry["count"]}')
+
+        lines += ["# HELP rag_span_errors_total Stages that raised.", "# TYPE rag_span_errors_total counter"]
+        lines += [f'rag_span_errors_total{{span="{name}"}} {entry["errors"]}' for name, entry in spans.items()]
+
+        for key in COUNTED_ATTRIBUTES:
+            lines += [f"# HELP rag_span_{key}_total Sum of the '{key}' attribute per stage.",
+                      f"# TYPE rag_span_{key}_total counter"]
+            lines += [
+                f'rag_span_{key}_total{{span="{name}"}} {entry["totals"][key]}'
+                for name, entry in spans.items() if entry["totals"][key]
+            ]
+        return "\n".join(lines) + "\n"
+
+
+class _Tracer:
+
+    def __init__(self):
+
+        self.enabled = False
+        self.export_path: Optional[str] = None
+        self.metrics = _Metrics()
+        self._recent: deque = deque(maxlen=50)
+        self._export_lock = threading.Lock()
+
+    def configure(self, enabled: bool, export_path: Optional[str], keep_traces: int) -> None:
+
+        self.enabled = enabled
+        self.export_path = export_path
+        if keep_traces != self._recent.maxlen:
+            self._recent = deque(self._recent, maxlen=keep_traces)
+        if enabled and export_path:
+            os.makedirs(os.path.dirname(os.path.abspath(export_path)), exist_ok=True)
+
+    def observe(self, record: Dict[str, Any]) -> None:
+
+        if self.enabled:
+            self.metrics.observe(record)
+
+    def finish(self, trace: _Trace) -> None:
+
+        self._recent.append(trace)
+        if not (self.enabled and trace.exported and self.export_path):
+            return
+
+        lines = "".join(json.dumps(span, default=str) + "\n" for span in trace.to_dict()["spans"])
+        with self._export_lock:
+            with open(self.export_path, 'a', encoding='utf-8') as f:
+                f.write(lines)
+
+
+_tracer = _Tracer()
+
+
+def configure_tracing(config: Dict[str, Any]) -> None:
+
+    _tracer.configure(
+        enabled=bool(config.get('enabled', False)),
+        export_path=config.get('export_path'),
+        keep_traces=config.get('keep_traces', 50)
+    )
+
+
+def tracing_enabled() -> bool:
+
+    return _tracer.enabled
+
+
+def span(name: str, **attributes: Any):
+
+    # Cheap when tracing is off: one flag and one context variable lookup,
+    # then a shared object whose methods do nothing.
+    if not _tracer.enabled and _current_span.get() is None:
+        return _NOOP_SPAN
+    return Span(name, attributes)
+
+
+def emit(name: str, seconds: float, **attributes: Any) -> None:
+
+    # Records a span that was timed elsewhere (e.g. in a parse worker
+    # process) as a child of the current span, ending now
+    if not _tracer.enabled and _current_span.get() is None:
+        return
+    completed = Span(name, attributes)
+    end = time.perf_counter()
+    completed._start = end - seconds
+    completed._finish(end, None)
+
+
+@contextmanager
+def capture(name: str, **attributes: Any):
+
+    # Records this block as one trace even when tracing is turned off (for the
+    # evaluation tab). Yields the root span; get_trace(root.trace_id) after.
+    root = Span(name, attributes, exported=False) if _current_span.get() is None else span(name, **attributes)
+    with root:
+        yield root
+
+
+def current_trace_id() -> Optional[str]:
+
+    current = _current_span.get()
+    return current.trace_id if current is not None else None
+
+
+def recent_traces(limit: int = 20) -> List[Dict[str, Any]]:
+
+    # Newest first
+    return [trace.to_dict() for trace in list(_tracer._recent)[::-1][:limit]]
+
+
+def get_trace(trace_id: str) -> Optional[Dict[str, Any]]:
+
+    for trace in list(_tracer._recent)[::-1]:
+        if trace.trace_id == trace_id:
+            return trace.to_dict()
+    return None
+
+
+def render_prometheus() -> str:
+
+    return _tracer.metrics.render()
@@ -0,0 +1,240 @@
+"""Token usage and cost accounting per request, session and ingest, with budgets."""
+
+# providers call record_usage(); totals land in every open scope and the ledger
+
+import contextvars
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from typing import Dict, Any, Optional
+
+
+# USD per 1K tokens as (prompt, completion); embeddings only have a prompt side.
+# Override or extend with usage.prices in config.yaml.
+DEFAULT_PRICES = {
+    'gpt-3.5-turbo': (0.0005, 0.0015),
+    'gpt-4o-mini': (0.00015, 0.0006),
+    'gpt-4o': (0.0025, 0.01),
+    'gpt-4-turbo': (0.01, 0.03),
+    'text-embedding-ada-002': (0.0001, 0.0),
+    'text-embedding-3-small': (0.00002, 0.0),
+    'text-embedding-3-large': (0.00013, 0.0),
+}
+
+_scope: contextvars.ContextVar = contextvars.ContextVar('usage_scope', default=None)
+
+
+@dataclass
+class UsageTotals:
+
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    embedding_tokens: int = 0
+    llm_calls: int = 0
+    embedding_calls: int = 0
+    cost_usd: float = 0.0
+    # LLM calls whose provider reported no usage, so it was estimated locally.
+    # Embedding tokens are always counted locally.
+    estimated_calls: int = 0
+
+    def add(self, kind: str, prompt_tokens: int, completion_tokens: int,
+            cost: float, estimated: bool) -> None:
+
+        if kind == 'embedding':
+            self.embedding_tokens += prompt_tokens
+            self.embedding_calls += 1
+        else:
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.llm_calls += 1
+        self.cost_usd += cost
+        self.estimated_calls += int(estimated)
+
+    @property
+    def total_tokens(self) -> int:
+
+        return self.prompt_tokens + self.completion_tokens + self.embedding_tokens
+
+    def to_dict(self) -> Dict[str, Any]:
+
+        return dict(asdict(self), cost_usd=round(self.cost_usd, 6), total_tokens=self.total_tokens)
+
+
+class _Scope:
+
+    __slots__ = ('totals', 'session_id', 'ingest_source', 'parent', '_lock')
+
+    def __init__(self, session_id: Optional[str], ingest_source: Optional[str], parent: Optional['_Scope']):
+
+        self.totals = UsageTotals()
+        self.session_id = session_id
+        self.ingest_source = ingest_source
+        self.parent = parent
+        # Ingest stages record from several threads at once
+        self._lock = threading.Lock()
+
+
+class UsageLedger:
+
+    # Process-wide totals: overall, per UTC day, per session and per ingested
+    # document. Sessions and documents are kept for the most recent
+    # max_entries of each.
+    def __init__(self, max_entries: int = 10000):
+
+        self._lock = threading.Lock()
+        self.max_entries = max_entries
+        self.prices: Dict[str, tuple] = dict(DEFAULT_PRICES)
+        self.session_budget_usd: Optional[float] = None
+        self.global_budget_usd: Optional[float] = None
+        self.degrade: Dict[str, Any] = {}
+        self.total = UsageTotals()
+        self._day = time.strftime('%Y-%m-%d', time.gmtime())
+        self.today = UsageTotals()
+        self._sessions: 'OrderedDict[str, UsageTotals]' = OrderedDict()
+        self._ingests: 'OrderedDict[str, UsageTotals]' = OrderedDict()
+
+    def configure(self, prices: Optional[Dict[str, Dict[str, float]]] = None,
+                  session_budget_usd: Optional[float] = None,
+                  global_budget_usd: Optional[float] = None,
+                  degrade: Optional[Dict[str, Any]] = None) -> None:
+
+        with self._lock:
+            self.prices = dict(DEFAULT_PRICES)
+            for model, price in (prices or {}).items():
+                self.prices[model] = (price.get('prompt', 0.0), price.get('completion', 0.0))
+            self.session_budget_usd = session_budget_usd
+            self.global_budget_usd = global_budget_usd
+            self.degrade = dict(degrade or {})
+
+    def cost(self, model: str, prompt_tokens: int, completion_tokens: int = 0) -> float:
+
+        prompt_price, completion_price = self.prices.get(model, (0.0, 0.0))
+        return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+
+    def record(self, kind: str, model: str, prompt_tokens: int, completion_tokens: int = 0,
+               estimated: bool = False) -> float:
+
+        cost = self.cost(model, prompt_tokens, completion_tokens)
+        entry = (kind, prompt_tokens, completion_tokens, cost, estimated)
+
+        session_id = ingest_source = None
+        scope = _scope.get()
+        while scope is not None:
+            with scope._lock:
+                scope.totals.add(*entry)
+            session_id = session_id or scope.session_id
+            ingest_source = ingest_source or scope.ingest_source
+            scope = scope.parent
+
+        with self._lock:
+            self._roll_day()
+            self.total.add(*entry)
+            self.today.add(*entry)
+            if session_id is not None:
+                self._entry(self._sessions, session_id).add(*entry)
+            if ingest_source is not None:
+                self._entry(self._ingests, ingest_source).add(*entry)
+        return cost
+
+    def _roll_day(self) -> None:
+
+        day = time.strftime('%Y-%m-%d', time.gmtime())
+        if day != self._day:
+            self._day = day
+            self.today = UsageTotals()
+
+    def _entry(self, entries: 'OrderedDict[str, UsageTotals]', key: str) -> UsageTotals:
+
+        totals = entries.get(key)
+        if totals is None:
+            totals = entries[key] = UsageTotals()
+            if len(entries) > self.max_entries:
+                entries.popitem(last=False)
+        else:
+            entries.move_to_end(key)
+        return totals
+
+    def session_totals(self, session_id: str) -> UsageTotals:
+
+        with self._lock:
+            return UsageTotals(**asdict(self._sessions.get(session_id, UsageTotals())))
+
+    def ingest_totals(self, source: str) -> UsageTotals:
+
+        with self._lock:
+            return UsageTotals(**asdict(self._ingests.get(source, UsageTotals())))
+
+    def over_budget(self, session_id: Optional[str] = None) -> Optional[str]:
+
+        # Which budget is spent ('session' or 'global'), or None
+        with self._lock:
+            self._roll_day()
+            if self.global_budget_usd is not None and self.today.cost_usd >= self.global_budget_usd:
+                return 'global'
+            if (self.session_budget_usd is not None and session_id is not None
+                    and session_id in self._sessions
+                    and self._sessions[session_id].cost_usd >= self.session_budget_usd):
+                return 'session'
+            return None
+
+    def stats(self, session_id: Optional[str] = None) -> Dict[str, Any]:
+
+        with self._lock:
+            self._roll_day()
+            stats = {
+                "total": self.total.to_dict(),
+                "today": self.today.to_dict(),
+                "global_budget_usd": self.global_budget_usd,
+                "session_budget_usd": self.session_budget_usd,
+            }
+            if session_id is not None:
+                stats["session"] = self._sessions.get(session_id, UsageTotals()).to_dict()
+        stats["over_budget"] = self.over_budget(session_id)
+        return stats
+
+
+_ledger = UsageLedger()
+
+
+def get_ledger() -> UsageLedger:
+
+    return _ledger
+
+
+def configure_usage(config: Dict[str, Any]) -> UsageLedger:
+
+    # Shared by every engine in the process, like the provider scheduler
+    _ledger.configure(
+        prices=config.get('prices'),
+        session_budget_usd=config.get('session_budget_usd'),
+        global_budget_usd=config.get('global_budget_usd'),
+        degrade=config.get('degrade')
+    )
+    return _ledger
+
+
+@contextmanager
+def track_usage(session_id: Optional[str] = None, ingest_source: Optional[str] = None):
+
+    # Usage recorded inside this block (on this thread, or in threads and
+    # tasks that copy its context) is added to the yielded totals and to
+    # those of any enclosing block.
+    scope = _Scope(session_id, ingest_source, _scope.get())
+    token = _scope.set(scope)
+    try:
+        yield scope.totals
+    finally:
+        try:
+            _scope.reset(token)
+        except ValueError:
+            # Exited from another context (e.g. a generator closed elsewhere)
+            pass
+
+
+def record_usage(kind: str, model: str, prompt_tokens: int, completion_tokens: int = 0,
+                 estimated: bool = False) -> float:
+
+    # kind: 'llm' or 'embedding'. Returns the estimated cost in USD.
+    return _ledger.record(kind, model, prompt_tokens, completion_tokens, estimated)
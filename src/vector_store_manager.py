@@ -3,54 +3,713 @@
 # store or search vectors
 
 
-from typing import List, Optional
+import asyncio
+import hashlib
+import os
+import threading
+import uuid
+from dataclasses import dataclass
+from typing import List, Optional, Dict, Any, Tuple
 from langchain_chroma import Chroma
 from langchain_core.documents import Document
 
+from src.lexical_index import BM25Index
+from src.document_router import DocumentRouter
+from src.mmr import maximal_marginal_relevance
+from src.tracing import span
+
+
+def _compare(value: Any, condition: Any) -> bool:
+    
+    if not isinstance(condition, dict):
+        return value == condition
+    
+    for op, operand in condition.items():
+        if op == "$eq" and not value == operand:
+            return False
+        if op == "$ne" and not value != operand:
+            return False
+        if op == "$in" and value not in operand:
+            return False
+        if op == "$nin" and value in operand:
+            return False
+        if op in ("$gt", "$gte", "$lt", "$lte"):
+            if value is None:
+                return False
+            if op == "$gt" and not value > operand:
+                return False
+            if op == "$gte" and not value >= operand:
+                return False
+            if op == "$lt" and not value < operand:
+                return False
+            if op == "$lte" and not value <= operand:
+                return False
+    return True
+
+
+def matches_where(where: Dict[str, Any], metadata: Dict[str, Any]) -> bool:
+    
+    # Python evaluation of the Chroma where-clause subset used by SearchFilter,
+    # for indexes that live outside Chroma (e.g. the lexical index).
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(clause, metadata) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(clause, metadata) for clause in condition):
+                return False
+        elif not _compare(metadata.get(key), condition):
+            return False
+    return True
+
+
+@dataclass
+class SearchFilter:
+    
+    sources: Optional[List[str]] = None
+    # Inclusive (first, last) range over the 0-based 'page' metadata; either end may be None
+    page_range: Optional[Tuple[Optional[int], Optional[int]]] = None
+    # Any additional Chroma metadata predicate, e.g. {"chunk_index": {"$lt": 50}}
+    where: Optional[Dict[str, Any]] = None
+    
+    def to_where(self) -> Optional[Dict[str, Any]]:
+        
+        clauses = []
+        
+        if self.sources:
+            if len(self.sources) == 1:
+                clauses.append({"source": self.sources[0]})
+            else:
+                clauses.append({"source": {"$in": list(self.sources)}})
+        
+        if self.page_range:
+            first_page, last_page = self.page_range
+            if first_page is not None:
+                clauses.append({"page": {"$gte": first_page}})
+            if last_page is not None:
+                clauses.append({"page": {"$lte": last_page}})
+        
+        if self.where:
+            clauses.append(self.where)
+        
+        if not clauses:
+            return None
+        if len(clauses) == 1:
+            return clauses[0]
+        return {"$and": clauses}
+    
+    def matches(self, metadata: Dict[str, Any]) -> bool:
+        
+        where = self.to_where()
+        return where is None or matches_where(where, metadata)
+
 
 class VectorStoreManager:
    
+    # Number of ids fetched and deleted per round trip when removing chunks,
+    # so deletes never hold the whole collection in memory.
+    DELETE_BATCH_SIZE = 500
+    
+    # storage.hnsw config keys -> Chroma collection metadata keys
+    HNSW_METADATA_KEYS = {
+        'space': 'hnsw:space',
+        'M': 'hnsw:M',
+        'construction_ef': 'hnsw:construction_ef',
+        'search_ef': 'hnsw:search_ef',
+        'batch_size': 'hnsw:batch_size',
+        'sync_threshold': 'hnsw:sync_threshold',
+    }
+    
+    # Corpus generation per (persist directory, collection). It changes on
+    # every write so caches keyed by it can never serve results from an older
+    # corpus. The current value is a random token in a small file next to the
+    # collection, replaced atomically on every write, so writes from other
+    # processes (serve.py, batch_answer.py, another Streamlit server) are seen
+    # too; readers only stat the file and re-read it when it was replaced.
+    # corpus key -> (file signature, token)
+    _generations: Dict[str, Tuple[Optional[tuple], str]] = {}
+    _generations_lock = threading.Lock()
     
     def __init__(self, embedding_service, persist_directory: str = "./data/chroma_db", 
-                 collection_name: str = "educational_docs"):
+                 collection_name: str = "educational_docs",
+                 delete_batch_size: int = DELETE_BATCH_SIZE,
+                 hnsw_config: Optional[Dict[str, Any]] = None,
+                 lexical_index_path: Optional[str] = None,
+                 centroid_index_path: Optional[str] = None,
+                 pages_per_section: int = 10,
+                 document_routing: bool = False):
       
         self.embedding_service = embedding_service
         self.persist_directory = persist_directory
         self.collection_name = collection_name
+        self.delete_batch_size = delete_batch_size
+        self.hnsw_config = hnsw_config or {}
+        self.lexical_index_path = lexical_index_path or os.path.join(
+            persist_directory, f"{collection_name}_lexical_index.json"
+        )
+        self.centroid_index_path = centroid_index_path or os.path.join(
+            persist_directory, f"{collection_name}_centroids"
+        )
+        self.pages_per_section = pages_per_section
+        # Document centroids are only maintained while routing is on
+        self.document_routing = document_routing
         self._vector_store = None
+        self._lexical_index = None
+        self._document_router = None
+    
+    @property
+    def corpus_key(self) -> str:
+        
+        return f"{os.path.abspath(self.persist_directory)}::{self.collection_name}"
+    
+    @property
+    def generation_path(self) -> str:
+        
+        return os.path.join(self.persist_directory, f"{self.collection_name}.generation")
+    
+    @staticmethod
+    def _file_signature(path: str) -> Optional[tuple]:
+        
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        # os.replace gives every version a new inode
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    
+    @property
+    def generation(self) -> str:
+        
+        path = self.generation_path
+        signature = self._file_signature(path)
+        cached = self._generations.get(self.corpus_key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        
+        token = "0"
+        if signature is not None:
+            try:
+                with open(path, 'r') as f:
+                    token = f.read().strip() or "0"
+            except FileNotFoundError:
+                pass
+        with self._generations_lock:
+            self._generations[self.corpus_key] = (signature, token)
+        return token
+    
+    def _bump_generation(self) -> None:
+        
+        token = uuid.uuid4().hex
+        path = self.generation_path
+        with self._generations_lock:
+            os.makedirs(self.persist_directory, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w') as f:
+                f.write(token)
+            os.replace(tmp_path, path)
+            self._generations[self.corpus_key] = (self._file_signature(path), token)
+    
+    @classmethod
+    def build_collection_metadata(cls, hnsw_config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        
+        metadata = {
+            cls.HNSW_METADATA_KEYS[key]: value
+            for key, value in hnsw_config.items()
+            if key in cls.HNSW_METADATA_KEYS and value is not None
+        }
+        return metadata or None
     
     def _get_vector_store(self) -> Chroma:
         
         if self._vector_store is None:
+            # HNSW settings only take effect when the collection is created;
+            # an existing collection keeps the settings it was built with.
             self._vector_store = Chroma(
                 collection_name=self.collection_name,
-                embedding_function=self.embedding_service._embeddings,
-                persist_directory=self.persist_directory
+                # The service itself (not the raw LangChain object) so Chroma's
+                # calls get retries and the query-embedding cache.
+                embedding_function=self.embedding_service,
+                persist_directory=self.persist_directory,
+                collection_metadata=self.build_collection_metadata(self.hnsw_config)
             )
         return self._vector_store
     
-    def add_documents(self, documents: List[Document]) -> List[str]:
+    @staticmethod
+    def make_chunk_ids(source: str, count: int, start: int = 0) -> List[str]:
+        
+        # Ids depend only on the source name and the chunk position, so
+        # re-indexing a document overwrites its own chunks in place.
+        source_key = hashlib.sha1(source.encode('utf-8')).hexdigest()[:16]
+        return [f"{source_key}-{i:06d}" for i in range(start, start + count)]
+    
+    def _get_lexical_index(self) -> BM25Index:
+        
+        if self._lexical_index is None:
+            index = BM25Index.open_shared(self.lexical_index_path)
+            
+            # Collections created before the lexical index existed are indexed
+            # once from their stored chunks.
+            if not index.exists_on_disk and len(index) == 0:
+                collection = self._get_vector_store()._collection
+                offset = 0
+                while True:
+                    page = collection.get(
+                        limit=self.delete_batch_size,
+                        offset=offset,
+                        include=['documents', 'metadatas']
+                    )
+                    if not page['ids']:
+                        break
+                    index.add_documents(
+                        page['ids'],
+                        [
+                            Document(page_content=text or "", metadata=metadata or {})
+                            for text, metadata in zip(page['documents'], page['metadatas'])
+                        ],
+                        save=False
+                    )
+                    offset += len(page['ids'])
+                index.save()
+            
+            self._lexical_index = index
+        return self._lexical_index
+    
+    def _get_document_router(self) -> DocumentRouter:
+        
+        if self._document_router is None:
+            self._document_router = DocumentRouter.open_shared(
+                self.centroid_index_path, pages_per_section=self.pages_per_section
+            )
+        router = self._document_router
+        
+        # Collections created before the routing index existed, or whose
+        # index was discarded as unreadable, get their centroids from the
+        # stored chunk embeddings. (len first: it picks up or discards what
+        # is on disk.)
+        if len(router) == 0 and not router.exists_on_disk:
+            for entry in self.list_documents():
+                self._refresh_centroids(router, entry["source"], save=False)
+            router.save()
+        return router
+    
+    def refresh_document_centroids(self, source: str) -> None:
+        
+        # Called once a document's chunks are final (end of an ingest or a
+        # replace), so the centroids never mix two versions of a document
+        if not self.document_routing:
+            self._discard_document_router()
+            return
+        self._refresh_centroids(self._get_document_router(), source)
+    
+    def _discard_document_router(self) -> None:
+        
+        # With routing off nothing reads the centroids and they are not kept
+        # up to date. An index left from when routing was on would go stale,
+        # so it is dropped and rebuilt from the stored embeddings the next
+        # time routing is used.
+        if os.path.exists(f"{self.centroid_index_path}.json"):
+            DocumentRouter.open_shared(
+                self.centroid_index_path, pages_per_section=self.pages_per_section
+            ).discard()
+    
+    def _refresh_centroids(self, router: DocumentRouter, source: str, save: bool = True) -> None:
+        
+        collection = self._get_vector_store()._collection
+        chunks = []
+        embeddings = []
+        offset = 0
+        
+        while True:
+            page = collection.get(
+                where={"source": source},
+                limit=self.delete_batch_size,
+                offset=offset,
+                include=['metadatas', 'embeddings']
+            )
+            
+            if not page['ids']:
+                break
+            
+            chunks.extend(
+                Document(page_content="", metadata=metadata or {}, id=chunk_id)
+                for chunk_id, metadata in zip(page['ids'], page['metadatas'])
+            )
+            embeddings.extend(page['embeddings'])
+            offset += len(page['ids'])
+        
+        order = sorted(range(len(chunks)), key=lambda i: chunks[i].metadata.get('chunk_index', 0))
+        router.set_document(source, [chunks[i] for i in order], [embeddings[i] for i in order], save=save)
+    
+    def route_documents(self, query_embedding: List[float], n_documents: int,
+                        min_documents: int = 0) -> Optional[List[str]]:
+        
+        # The n most relevant sources, or None when the corpus has too few
+        # documents for routing to pay off and every chunk should be searched
+        router = self._get_document_router()
+        if len(router) <= max(n_documents, min_documents):
+            return None
+        
+        with span("vectorstore.route", documents=n_documents, candidates=len(router)) as current:
+            routed = router.route(query_embedding, n_documents)
+            current.set(items=len(routed))
+        return [source for source, _ in routed]
+    
+    def add_documents(self, documents: List[Document], ids: Optional[List[str]] = None) -> List[str]:
        
         try:
             vector_store = self._get_vector_store()
-            ids = vector_store.add_documents(documents)
+            lexical_index = self._get_lexical_index()
+            try:
+                with span("vectorstore.add", items=len(documents)):
+                    ids = vector_store.add_documents(documents, ids=ids)
+                    lexical_index.add_documents(ids, documents)
+            finally:
+                # Bump even on failure: a partial write still changed the corpus
+                self._bump_generation()
             return ids
         except Exception as e:
             raise Exception(f"Failed to add documents to vector store: {e}")
     
+    def replace_document(self, source: str, documents: List[Document]) -> List[str]:
+        
+        # Copies: the caller's documents keep their own metadata
+        documents = [
+            Document(page_content=doc.page_content,
+                     metadata={**doc.metadata, 'source': source, 'chunk_index': index})
+            for index, doc in enumerate(documents)
+        ]
+        
+        ids = self.make_chunk_ids(source, len(documents))
+        
+        try:
+            # Embeddings are computed before anything is written, so a failed
+            # embedding call leaves the previous version of the document intact.
+            # Upserting by stable id then swaps chunks in place; readers never
+            # see the document missing.
+            if documents:
+                self.add_documents(documents, ids=ids)
+            
+            self.remove_stale_chunks(source, ids)
+            self.refresh_document_centroids(source)
+            
+            return ids
+        except Exception as e:
+            raise Exception(f"Failed to replace document '{source}': {e}")
+    
+    @property
+    def max_batch_size(self) -> int:
+        
+        # Most chunks one upsert may carry
+        return self._get_vector_store()._client.get_max_batch_size()
+    
+    def has_document(self, source: str) -> bool:
+        
+        return bool(self._get_vector_store()._collection.get(
+            where={"source": source}, limit=1, include=[]
+        )['ids'])
+    
+    def add_embedded_documents(self, documents: List[Document], embeddings: List[List[float]],
+                               ids: List[str], save_lexical: bool = True) -> List[str]:
+        
+        # For callers that embedded the chunks themselves (the ingestion
+        # pipeline): one upsert round trip, no embedding call here.
+        try:
+            lexical_index = self._get_lexical_index()
+            try:
+                with span("vectorstore.upsert", items=len(documents)):
+                    self._get_vector_store()._collection.upsert(
+                        ids=ids,
+                        embeddings=embeddings,
+                        documents=[doc.page_content for doc in documents],
+                        metadatas=[doc.metadata or None for doc in documents]
+                    )
+                    lexical_index.add_documents(ids, documents, save=save_lexical)
+            finally:
+                self._bump_generation()
+            return ids
+        except Exception as e:
+            raise Exception(f"Failed to add documents to vector store: {e}")
+    
+    def sync_lexical_index(self, ids: List[str]) -> None:
+        
+        # Re-read stored chunks into the lexical index, for writers that were
+        # interrupted before saving it
+        collection = self._get_vector_store()._collection
+        lexical_index = self._get_lexical_index()
+        for start in range(0, len(ids), self.delete_batch_size):
+            page = collection.get(
+                ids=ids[start:start + self.delete_batch_size],
+                include=['documents', 'metadatas']
+            )
+            lexical_index.add_documents(
+                page['ids'],
+                [
+                    Document(page_content=text or "", metadata=metadata or {})
+                    for text, metadata in zip(page['documents'], page['metadatas'])
+                ],
+                save=False
+            )
+    
+    def flush_lexical_index(self) -> None:
+        
+        self._get_lexical_index().save()
+    
+    def remove_stale_chunks(self, source: str, keep_ids: List[str]) -> int:
+        
+        # Chunks left over from a longer previous version of the document
+        stale_ids = self._find_stale_ids(source, set(keep_ids))
+        for start in range(0, len(stale_ids), self.delete_batch_size):
+            self._get_vector_store()._collection.delete(
+                ids=stale_ids[start:start + self.delete_batch_size]
+            )
+        
+        self._get_lexical_index().remove_ids(stale_ids, save=False)
+        # Always persisted here: batched writers skip saving until the end
+        self.flush_lexical_index()
+        if stale_ids:
+            self._bump_generation()
+        
+        return len(stale_ids)
+    
+    def _find_stale_ids(self, source: str, keep_ids: set) -> List[str]:
+        
+        collection = self._get_vector_store()._collection
+        stale_ids = []
+        offset = 0
+        
+        while True:
+            page_ids = collection.get(
+                where={"source": source},
+                limit=self.delete_batch_size,
+                offset=offset,
+                include=[]
+            )['ids']
+            
+            if not page_ids:
+                break
+            
+            stale_ids.extend(i for i in page_ids if i not in keep_ids)
+            offset += len(page_ids)
+        
+        return stale_ids
+    
+    def get_document_chunks(self, source: str) -> List[Document]:
+        
+        # Every stored chunk of one document, in chunk order
+        collection = self._get_vector_store()._collection
+        chunks = []
+        offset = 0
+        
+        while True:
+            page = collection.get(
+                where={"source": source},
+                limit=self.delete_batch_size,
+                offset=offset,
+                include=['documents', 'metadatas']
+            )
+            
+            if not page['ids']:
+                break
+            
+            chunks.extend(
+                Document(page_content=text or "", metadata=metadata or {}, id=chunk_id)
+                for chunk_id, text, metadata in zip(page['ids'], page['documents'], page['metadatas'])
+            )
+            offset += len(page['ids'])
+        
+        return sorted(chunks, key=lambda doc: doc.metadata.get('chunk_index', 0))
+    
+    def list_documents(self) -> List[Dict[str, Any]]:
+        
+        try:
+            collection = self._get_vector_store()._collection
+            documents: Dict[str, Dict[str, Any]] = {}
+            offset = 0
+            
+            while True:
+                page = collection.get(
+                    limit=self.delete_batch_size,
+                    offset=offset,
+                    include=['metadatas']
+                )
+                
+                if not page['ids']:
+                    break
+                
+                for metadata in page['metadatas']:
+                    metadata = metadata or {}
+                    source = metadata.get('source', 'Unknown')
+                    entry = documents.setdefault(
+                        source, {"source": source, "chunk_count": 0, "pages": set()}
+                    )
+                    entry["chunk_count"] += 1
+                    if 'page' in metadata:
+                        entry["pages"].add(metadata['page'])
+                
+                offset += len(page['ids'])
+            
+            return [
+                {
+                    "source": entry["source"],
+                    "chunk_count": entry["chunk_count"],
+                    "page_count": len(entry["pages"])
+                }
+                for entry in sorted(documents.values(), key=lambda d: d["source"])
+            ]
+        except Exception as e:
+            raise Exception(f"Failed to list documents: {e}")
+    
     def similarity_search(self, query: str, k: int = 4, 
-                         score_threshold: Optional[float] = None) -> List[Document]:
+                         score_threshold: Optional[float] = None,
+                         filters: Optional[SearchFilter] = None) -> List[Document]:
         
         try:
             vector_store = self._get_vector_store()
             
             # ChromaDB uses distance metrics where lower is better
+            
+            # The metadata predicate is evaluated by Chroma before nearest-neighbour
+            # scoring, so only chunks inside the filter compete for the top-k slots.
+            where = filters.to_where() if filters is not None else None
            
-            documents = vector_store.similarity_search(query, k=k)
+            with span("vectorstore.search", k=k, filtered=where is not None) as current:
+                documents = vector_store.similarity_search(query, k=k, filter=where)
+                current.set(items=len(documents))
             
             return documents
         except Exception as e:
             raise Exception(f"Failed to perform similarity search: {e}")
+    
+    def max_marginal_relevance_search(self, query: str, k: int = 4, fetch_k: int = 20,
+                                      lambda_mult: float = 0.5,
+                                      filters: Optional[SearchFilter] = None) -> List[Document]:
+        
+        try:
+            query_embedding = self.embedding_service.embed_query(query)
+            return self._mmr_by_vector(query_embedding, k, fetch_k, lambda_mult, filters)
+        except Exception as e:
+            raise Exception(f"Failed to perform MMR search: {e}")
+    
+    def similarity_search_by_vectors(self, query_embeddings: List[List[float]], k: int = 4,
+                                     filters: Optional[SearchFilter] = None) -> List[List[Document]]:
+
+        # One index query for many questions; results come back in input order
+        try:
+            if not query_embeddings:
+                return []
+
+            collection = self._get_vector_store()._collection
+            where = filters.to_where() if filters is not None else None
+            with span("vectorstore.search_batch", k=k, queries=len(query_embeddings),
+                      filtered=where is not None):
+                results = collection.query(
+                    query_embeddings=query_embeddings,
+                    n_results=k,
+                    where=where,
+                    include=['documents', 'metadatas']
+                )
+
+            return [
+                [
+                    Document(page_content=text, metadata=metadata or {}, id=doc_id)
+                    for doc_id, text, metadata in zip(ids, texts, metadatas)
+                ]
+                for ids, texts, metadatas in zip(results['ids'], results['documents'], results['metadatas'])
+            ]
+        except Exception as e:
+            raise Exception(f"Failed to perform similarity search: {e}")
+
+    def max_marginal_relevance_search_by_vector(self, query_embedding: List[float], k: int = 4,
+                                                fetch_k: int = 20, lambda_mult: float = 0.5,
+                                                filters: Optional[SearchFilter] = None) -> List[Document]:
+
+        try:
+            return self._mmr_by_vector(query_embedding, k, fetch_k, lambda_mult, filters)
+        except Exception as e:
+            raise Exception(f"Failed to perform MMR search: {e}")
+
+    def _mmr_by_vector(self, query_embedding: List[float], k: int, fetch_k: int,
+                       lambda_mult: float, filters: Optional[SearchFilter]) -> List[Document]:
+        
+        collection = self._get_vector_store()._collection
+        where = filters.to_where() if filters is not None else None
+        
+        # Over-fetch candidates together with their stored vectors, then
+        # choose the final k in NumPy without re-embedding anything.
+        with span("vectorstore.mmr", k=k, fetch_k=fetch_k, filtered=where is not None) as current:
+            results = collection.query(
+                query_embeddings=[query_embedding],
+                n_results=max(k, fetch_k),
+                where=where,
+                include=['documents', 'metadatas', 'embeddings']
+            )
+            
+            ids = results['ids'][0]
+            if not ids:
+                return []
+            
+            selected = maximal_marginal_relevance(
+                query_embedding,
+                results['embeddings'][0],
+                k=k,
+                lambda_mult=lambda_mult
+            )
+            current.set(items=len(selected), candidates=len(ids))
+        
+        return [
+            Document(
+                page_content=results['documents'][0][i],
+                metadata=results['metadatas'][0][i] or {},
+                id=ids[i]
+            )
+            for i in selected
+        ]
+    
+    async def asimilarity_search(self, query: str, k: int = 4,
+                                 score_threshold: Optional[float] = None,
+                                 filters: Optional[SearchFilter] = None) -> List[Document]:
+        
+        try:
+            vector_store = self._get_vector_store()
+            where = filters.to_where() if filters is not None else None
+            
+            # The embedding call is awaited; the local index lookup runs in a
+            # worker thread so it never stalls the event loop.
+            query_embedding = await self.embedding_service.aembed_query(query)
+            with span("vectorstore.search", k=k, filtered=where is not None) as current:
+                documents = await asyncio.to_thread(
+                    vector_store.similarity_search_by_vector, query_embedding, k=k, filter=where
+                )
+                current.set(items=len(documents))
+            return documents
+        except Exception as e:
+            raise Exception(f"Failed to perform similarity search: {e}")
+    
+    async def amax_marginal_relevance_search(self, query: str, k: int = 4, fetch_k: int = 20,
+                                             lambda_mult: float = 0.5,
+                                             filters: Optional[SearchFilter] = None) -> List[Document]:
+        
+        try:
+            query_embedding = await self.embedding_service.aembed_query(query)
+            return await asyncio.to_thread(
+                self._mmr_by_vector, query_embedding, k, fetch_k, lambda_mult, filters
+            )
+        except Exception as e:
+            raise Exception(f"Failed to perform MMR search: {e}")
+    
+    def lexical_search(self, query: str, k: int = 4,
+                       filters: Optional[SearchFilter] = None) -> List[Document]:
+        
+        try:
+            where = filters.to_where() if filters is not None else None
+            predicate = (lambda metadata: matches_where(where, metadata)) if where else None
+            
+            with span("vectorstore.lexical", k=k, filtered=where is not None) as current:
+                results = self._get_lexical_index().search(query, k=k, predicate=predicate)
+                current.set(items=len(results))
+            return [doc for doc, _ in results]
+        except Exception as e:
+            raise Exception(f"Failed to perform lexical search: {e}")
 
     def get_collection_info(self) -> dict:
       
@@ -61,7 +720,8 @@ class VectorStoreManager:
             return {
                 "name": self.collection_name,
                 "count": collection.count(),
-                "persist_directory": self.persist_directory
+                "persist_directory": self.persist_directory,
+                "metadata": collection.metadata or {}
             }
         except Exception as e:
             return {
@@ -71,29 +731,67 @@ class VectorStoreManager:
                 "error": str(e)
             }
     
+    def _delete_in_pages(self, where: Optional[dict] = None) -> int:
+        
+        collection = self._get_vector_store()._collection
+        deleted = 0
+        
+        # Read ids only, one page at a time, and delete each page before
+        # fetching the next; memory stays bounded by delete_batch_size.
+        while True:
+            page_ids = collection.get(
+                where=where,
+                limit=self.delete_batch_size,
+                include=[]
+            )['ids']
+            
+            if not page_ids:
+                break
+            
+            collection.delete(ids=page_ids)
+            deleted += len(page_ids)
+        
+        return deleted
+    
     def clear_all_documents(self) -> bool:
        
         try:
-            vector_store = self._get_vector_store()
-            collection = vector_store._collection
-            
-           
-            all_ids = collection.get()['ids']
-            
-           
-            if all_ids:
-                collection.delete(ids=all_ids)
-            
+            try:
+                self._delete_in_pages()
+                self._get_lexical_index().clear()
+                if self.document_routing:
+                    self._get_document_router().clear()
+                else:
+                    self._discard_document_router()
+            finally:
+                self._bump_generation()
             return True
         except Exception as e:
             raise Exception(f"Failed to clear documents: {e}")
     
+    def delete_by_source(self, source: str) -> int:
+        
+        try:
+            try:
+                deleted = self._delete_in_pages(where={"source": source})
+                self._get_lexical_index().remove_source(source)
+                if self.document_routing:
+                    self._get_document_router().remove(source)
+                else:
+                    self._discard_document_router()
+            finally:
+                self._bump_generation()
+            return deleted
+        except Exception as e:
+            raise Exception(f"Failed to delete documents for source '{source}': {e}")
+    
     def delete_collection(self) -> bool:
         
         try:
             if self._vector_store is not None:
                 self._vector_store.delete_collection()
                 self._vector_store = None
+                self._bump_generation()
             return True
         except Exception as e:
             raise Exception(f"Failed to delete collection: {e}")
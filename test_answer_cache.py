@@ -0,0 +1,143 @@
+"""Quick test of the semantic answer cache."""
+
+import os
+import tempfile
+import time
+
+import numpy as np
+from langchain_core.documents import Document
+
+from src.answer_cache import SemanticAnswerCache
+from src.answer_generator import Answer
+from src.query_router import RouteDecision
+from src.rag_engine import AnswerPlan
+from testing_utils import make_stub_engine
+
+
+def unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def test_threshold_ttl_and_fingerprint():
+    """Hits need a similar question, the same chunks and an unexpired entry."""
+    print("Testing SemanticAnswerCache...")
+
+    cache = SemanticAnswerCache(similarity_threshold=0.95, ttl_seconds=3600)
+    answer = Answer(text="V = IR", sources=["physics.pdf (Page 1)"])
+    cache.store("What is Ohm's law?", unit([1, 0, 0]), "fp-1", answer)
+
+    # cos = 0.995 and 0.89 against the stored question
+    assert cache.lookup(unit([1, 0.1, 0]), "fp-1").text == "V = IR"
+    assert cache.lookup(unit([1, 0.5, 0]), "fp-1") is None
+    # Same question, different chunks retrieved
+    assert cache.lookup(unit([1, 0, 0]), "fp-2") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+    # Expired entries are dropped on the next lookup
+    cache._entries[0]['created_at'] -= 7200
+    assert cache.lookup(unit([1, 0, 0]), "fp-1") is None
+    assert cache.stats()["size"] == 0
+
+    print("SemanticAnswerCache tests passed!\n")
+
+
+def test_questions_with_history_bypass_the_cache():
+    """An answer written for one conversation is never served to another student."""
+    print("Testing the history bypass...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_stub_engine(tmp, llm_latency=0.0)
+        engine.config.get_section('answer_cache').update(enabled=True)
+        engine._initialize_components()
+        engine.answer_generator._llm.latency = 0.0
+        history = [{"question": "What is Ohm's law?", "answer": "V = IR."}]
+
+        # Not a recognisable follow-up, but asked within a conversation
+        first = engine.ask_question("Can you give an example?", history=history)
+        assert first.usage["llm_calls"] == 1
+        assert engine.answer_cache.stats()["size"] == 0
+
+        # The same words from a fresh session are generated anew, then cached
+        fresh = engine.ask_question("Can you give an example?", history=[])
+        assert fresh.usage["llm_calls"] == 1
+        again = engine.ask_question("can you give an example", history=[])
+        assert again.usage["llm_calls"] == 0 and again.text == fresh.text
+        # With history, the cached answer is not looked up either
+        assert engine.ask_question("Can you give an example?", history=history).usage["llm_calls"] == 1
+
+    print("History bypass tests passed!\n")
+
+
+def test_fingerprint_covers_route_budget_and_generator():
+    """Answers from the fast route or a degraded plan are never served to a full-route question."""
+    print("Testing plan-aware fingerprints...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_stub_engine(tmp, llm_latency=0.0)
+        engine.config.get_section('routing').update(enabled=True, log_path="")
+        engine._initialize_components()
+        chunks = [Document(page_content="Ohm's law: V = IR.", metadata={"source": "physics.pdf"}, id="c1")]
+
+        fast = AnswerPlan(engine._route_generators['fast'], route=RouteDecision('fast', -1.0))
+        full = AnswerPlan(engine._route_generators['full'], route=RouteDecision('full', 1.0))
+        degraded = AnswerPlan(engine._route_generators['full'], 2, "session budget")
+        fingerprints = {engine._answer_fingerprint(plan, chunks) for plan in (fast, full, degraded)}
+        assert len(fingerprints) == 3
+        # The same plan and chunks still hit
+        again = AnswerPlan(engine._route_generators['full'], route=RouteDecision('full', 3.0))
+        assert engine._answer_fingerprint(again, chunks) == engine._answer_fingerprint(full, chunks)
+
+    print("Plan-aware fingerprint tests passed!\n")
+
+
+def test_stores_are_saved_together():
+    """A burst of stores is written once, after the save delay, through unique temp files."""
+    print("Testing debounced saves...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "answers")
+        cache = SemanticAnswerCache(path, save_delay=0.3)
+        replaces = []
+        real_replace = os.replace
+
+        def recording_replace(src, dst):
+            replaces.append(src)
+            real_replace(src, dst)
+
+        os.replace = recording_replace
+        try:
+            for i in range(20):
+                cache.store(f"Question {i}?", unit([1, i, 0]), "fp-1", Answer(text=f"Answer {i}", sources=[]))
+            assert not os.path.exists(f"{path}.json")
+
+            time.sleep(0.6)
+            # One .npy and one .json swap for all 20 stores
+            assert len(replaces) == 2 and len(set(replaces)) == 2
+            assert SemanticAnswerCache(path).stats()["size"] == 20
+
+            cache.store("Question 20?", unit([1, 20, 0]), "fp-1", Answer(text="Answer 20", sources=[]))
+            cache.flush()
+            assert len(replaces) == 4
+            assert SemanticAnswerCache(path).stats()["size"] == 21
+        finally:
+            os.replace = real_replace
+
+        assert sorted(os.listdir(tmp)) == ["answers.json", "answers.npy"]
+
+    print("Debounced save tests passed!\n")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Answer Cache Tests")
+    print("=" * 60 + "\n")
+
+    test_threshold_ttl_and_fingerprint()
+    test_questions_with_history_bypass_the_cache()
+    test_fingerprint_covers_route_budget_and_generator()
+    test_stores_are_saved_together()
+
+    print("=" * 60)
+    print("All tests completed successfully!")
+    print("=" * 60)
@@ -0,0 +1,124 @@
+"""Quick test of the asyncio question path."""
+
+import asyncio
+import tempfile
+import time
+
+from src.provider_scheduler import ProviderScheduler, Priority
+from testing_utils import make_stub_engine
+
+
+def test_async_answer_matches_sync():
+    """aask_question gives the same answer and sources as ask_question."""
+    print("Testing async answer...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_stub_engine(tmp, llm_latency=0.0)
+        sync_answer = engine.ask_question("What is Ohm's law?", use_context=False)
+        async_answer = asyncio.run(engine.aask_question("What is Ohm's law?", use_context=False))
+
+        assert async_answer.text == sync_answer.text
+        assert async_answer.sources == sync_answer.sources
+        assert len(engine.get_conversation_history()) == 2
+        print(f" {async_answer.text}")
+
+    print("Async answer tests passed!\n")
+
+
+def test_concurrent_questions_overlap_on_one_loop():
+    """Many distinct questions on one event loop take about one LLM latency, not the sum."""
+    print("Testing concurrency on one event loop...")
+
+    questions = 100
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_stub_engine(tmp, llm_latency=0.2)
+        engine.single_flight = None
+
+        async def ask_all():
+            return await asyncio.gather(*(
+                engine.aask_question(f"Question {i}: what is Snell's law?", use_context=False)
+                for i in range(questions)
+            ))
+
+        start = time.perf_counter()
+        answers = asyncio.run(ask_all())
+        elapsed = time.perf_counter() - start
+
+        assert len(answers) == questions
+        assert engine.answer_generator._llm.call_count == questions
+        # Sequentially this would take 100 * 0.2 = 20 s
+        assert elapsed < 5, f"{questions} questions took {elapsed:.2f}s"
+        print(f" {questions} questions in {elapsed:.2f}s")
+
+    print("Concurrency tests passed!\n")
+
+
+def test_identical_async_questions_share_one_call():
+    """Identical concurrent history-free questions are coalesced on the loop too."""
+    print("Testing async coalescing...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_stub_engine(tmp, llm_latency=0.1)
+        embeddings = engine.embedding_service._embeddings
+        query_calls_before = embeddings.query_calls
+
+        async def ask_all():
+            return await asyncio.gather(*(
+                engine.aask_question("  What is Ohm's law? ", use_context=False) for _ in range(10)
+            ))
+
+        answers = asyncio.run(ask_all())
+
+        assert engine.answer_generator._llm.call_count == 1
+        assert embeddings.query_calls - query_calls_before == 1
+        assert len({id(a) for a in answers}) == 10
+        print(" 10 callers -> 1 LLM call")
+
+    print("Async coalescing tests passed!\n")
+
+
+def test_async_scheduler_priority():
+    """Coroutines waiting in aacquire are served interactive-first, FIFO within a priority."""
+    print("Testing async scheduler ordering...")
+
+    scheduler = ProviderScheduler(max_concurrent=1)
+    order = []
+
+    async def call(label, priority):
+        grant = await scheduler.aacquire(priority=priority)
+        with grant:
+            order.append(label)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        holder = await scheduler.aacquire()
+        tasks = [asyncio.ensure_future(call(f"bulk-{i}", Priority.BULK)) for i in range(3)]
+        await asyncio.sleep(0.01)
+        tasks.append(asyncio.ensure_future(call("question", Priority.INTERACTIVE)))
+        await asyncio.sleep(0.01)
+        assert scheduler.stats()["queue_depth"] == 4
+        holder.release()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+
+    assert order == ["question", "bulk-0", "bulk-1", "bulk-2"], order
+    assert scheduler.stats()["in_flight"] == 0
+    print(f" Served in order: {order}")
+
+    print("Async scheduler tests passed!\n")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Async Query Path Tests")
+    print("=" * 60 + "\n")
+
+    test_async_answer_matches_sync()
+    test_concurrent_questions_overlap_on_one_loop()
+    test_identical_async_questions_share_one_call()
+    test_async_scheduler_priority()
+
+    print("=" * 60)
+    print("All tests completed successfully!")
+    print("=" * 60)
@@ -0,0 +1,190 @@
+"""Quick test of batch question answering."""
+
+import json
+import os
+import tempfile
+import time
+
+from src.batch_answering import BatchAnswerer, completed_ids, load_questions
+from testing_utils import make_stub_engine
+
+
+def write_questions(path, count):
+
+    with open(path, "w") as f:
+        for i in range(count):
+            topic = "Ohm's law" if i % 2 else "Snell's law"
+            item = {"id": f"q{i}", "question": f"Problem {i}: explain {topic}."}
+            if i == 3:
+                item["history"] = [{"question": "What is current?", "answer": "Flow of charge."}]
+            f.write(json.dumps(item) + "\n")
+
+
+def read_answers(path):
+
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_batch_matches_one_by_one():
+    """Batched retrieval + concurrent generation gives the same answers as ask_question."""
+    print("Testing batch answers...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_stub_engine(tmp, llm_latency=0.1)
+        questions_path = os.path.join(tmp, "questions.jsonl")
+        output_path = os.path.join(tmp, "answers.jsonl")
+        write_questions(questions_path, 20)
+        embeddings = engine.embedding_service._embeddings
+        calls_before = embeddings.query_calls + embeddings.document_calls
+
+        start = time.perf_counter()
+        stats = BatchAnswerer(engine, max_concurrency=10, retrieval_batch_size=8).run(
+            load_questions(questions_path), output_path
+        )
+        elapsed = time.perf_counter() - start
+
+        records = {r["id"]: r for r in read_answers(output_path)}
+        assert stats["answered"] == 20 and stats["failed"] == 0
+        # 20 questions in batches of 8 -> 3 embedding requests
+        assert embeddings.query_calls + embeddings.document_calls - calls_before == 3
+        # One by one this would take 20 * 0.1 = 2 s
+        assert elapsed < 1.5, f"20 questions took {elapsed:.2f}s"
+        assert engine.get_conversation_history() == []
+        assert {"retrieve_ms", "generate_ms"} <= set(records["q0"]["timings"])
+
+        # The batch filled the query cache: asking again embeds nothing
+        calls_before = embeddings.query_calls + embeddings.document_calls
+        for item in load_questions(questions_path):
+            expected = engine.ask_question(item.question, history=item.history)
+            assert records[item.id]["answer"] == expected.text
+            assert records[item.id]["sources"] == expected.sources
+        assert embeddings.query_calls + embeddings.document_calls == calls_before
+        print(f" 20 questions in {elapsed:.2f}s")
+
+    print("Batch answer tests passed!\n")
+
+
+def test_resume_skips_answered_and_retries_failed():
+    """A second run only answers questions missing or failed in the output file."""
+    print("Testing resume...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_stub_engine(tmp, llm_latency=0.0)
+        questions_path = os.path.join(tmp, "questions.csv")
+        output_path = os.path.join(tmp, "answers.jsonl")
+        with open(questions_path, "w") as f:
+            f.write("id,question,sources\n")
+            for i in range(6):
+                f.write(f"{i},What is Ohm's law? ({i}),physics.pdf\n")
+
+        # What an interrupted run leaves behind: two answers, one failure, a torn line
+        with open(output_path, "w") as f:
+            f.write(json.dumps({"id": "0", "answer": "old"}) + "\n")
+            f.write(json.dumps({"id": "1", "answer": "old"}) + "\n")
+            f.write(json.dumps({"id": "2", "error": "provider outage"}) + "\n")
+            f.write('{"id": "3", "ans')
+
+        llm = engine.answer_generator._llm
+        calls_before = llm.call_count
+        stats = BatchAnswerer(engine).run(load_questions(questions_path), output_path)
+
+        assert stats["skipped"] == 2
+        assert stats["answered"] == 4
+        assert llm.call_count - calls_before == 4
+        answered = {r["id"] for r in read_answers_lenient(output_path) if "answer" in r}
+        assert answered == {"0", "1", "2", "3", "4", "5"}
+        print(f" Resumed: {stats}")
+
+    print("Resume tests passed!\n")
+
+
+def test_item_failures_stay_in_their_record():
+    """A question whose plan fails is an error record; the plan's top_k reaches retrieval."""
+    print("Testing per-item failures...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_stub_engine(tmp, llm_latency=0.0)
+        questions_path = os.path.join(tmp, "questions.jsonl")
+        output_path = os.path.join(tmp, "answers.jsonl")
+        write_questions(questions_path, 6)
+
+        answer_plan = engine._answer_plan
+
+        def failing_plan(question, chat_history, session_id=None, filters=None):
+            if question.startswith("Problem 2:"):
+                raise RuntimeError("planner broke")
+            plan = answer_plan(question, chat_history, session_id, filters)
+            plan.top_k = 1
+            return plan
+
+        requested = []
+        retrieve_contexts = engine.query_processor.retrieve_contexts
+
+        def recording_retrieve(questions, k=None, filters=None):
+            requested.append(k)
+            return retrieve_contexts(questions, k, filters)
+
+        engine._answer_plan = failing_plan
+        engine.query_processor.retrieve_contexts = recording_retrieve
+        stats = BatchAnswerer(engine, retrieval_batch_size=4).run(load_questions(questions_path), output_path)
+
+        records = {r["id"]: r for r in read_answers(output_path)}
+        assert stats["answered"] == 5 and stats["failed"] == 1
+        assert records["q2"]["error"] == "planner broke"
+        assert requested and set(requested) == {1}
+        assert all(len(records[f"q{i}"]["sources"]) == 1 for i in (0, 1, 3, 4, 5))
+
+    print("Per-item failure tests passed!\n")
+
+
+def test_question_and_output_files_are_read_loosely():
+    """id 0 is kept, a string "sources" becomes a list, and records without an id are skipped."""
+    print("Testing file parsing...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        questions_path = os.path.join(tmp, "questions.jsonl")
+        with open(questions_path, "w") as f:
+            f.write(json.dumps({"id": 0, "question": "What is Ohm's law?", "sources": "physics.pdf"}) + "\n")
+            f.write(json.dumps({"question": "What is Snell's law?", "sources": "a.pdf; b.pdf"}) + "\n")
+            f.write(json.dumps({"id": "q3", "question": "What is current?", "sources": []}) + "\n")
+
+        questions = load_questions(questions_path)
+        assert [q.id for q in questions] == ["0", "2", "q3"]
+        assert [q.sources for q in questions] == [["physics.pdf"], ["a.pdf", "b.pdf"], None]
+
+        output_path = os.path.join(tmp, "answers.jsonl")
+        with open(output_path, "w") as f:
+            f.write(json.dumps({"id": 0, "answer": "V = IR"}) + "\n")
+            f.write(json.dumps({"answer": "no id"}) + "\n")
+            f.write(json.dumps({"id": "2", "error": "provider outage"}) + "\n")
+        assert completed_ids(output_path) == {"0"}
+
+    print("File parsing tests passed!\n")
+
+
+def read_answers_lenient(path):
+
+    records = []
+    with open(path) as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                pass
+    return records
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Batch Answering Tests")
+    print("=" * 60 + "\n")
+
+    test_batch_matches_one_by_one()
+    test_resume_skips_answered_and_retries_failed()
+    test_item_failures_stay_in_their_record()
+    test_question_and_output_files_are_read_loosely()
+
+    print("=" * 60)
+    print("All tests completed successfully!")
+    print("=" * 60)
@@ -0,0 +1,141 @@
+"""Quick test of query-aware context compression."""
+
+import asyncio
+import os
+import tempfile
+
+from langchain_core.documents import Document
+
+from src.context_compression import ContextCompressor, SentenceEmbeddingStore, split_sentences
+from src.embedding_service import EmbeddingService
+from testing_utils import write_pdf, make_stub_engine
+
+
+CIRCUITS = (
+    "Electric circuits connect a source to a load through conducting wires. "
+    "Ohm's law states that the voltage across a resistor equals current times resistance. "
+    "Batteries store chemical energy and release it as electrical energy. "
+    "Fuses protect household wiring from excessive currents. "
+    "Copper is the most common conductor in domestic installations. "
+    "Alternating current reverses direction many times per second."
+)
+
+OPTICS = (
+    "Light travels in straight lines through a uniform medium. "
+    "Snell's law relates the angles of incidence and refraction at a boundary. "
+    "Mirrors reflect light so that the angle of incidence equals the angle of reflection. "
+    "Lenses focus light by refraction at two curved surfaces. "
+    "The speed of light in vacuum is about three hundred thousand kilometres per second."
+)
+
+
+def test_split_and_compress():
+    """The best-matching sentences and their neighbours survive; the rest is cut."""
+    print("Testing split_sentences and compress...")
+
+    assert split_sentences("See Fig. 3 for the circuit. It shows a resistor in series with a lamp.") == [
+        "See Fig. 3 for the circuit.", "It shows a resistor in series with a lamp."
+    ]
+    assert len(split_sentences(CIRCUITS)) == 6
+
+    service = EmbeddingService(provider="stub", model="stub")
+    compressor = ContextCompressor(service, SentenceEmbeddingStore(), ratio=0.4, neighbors=0)
+    documents = [
+        Document(page_content=CIRCUITS, metadata={"source": "physics.pdf", "page": 3}, id="c1"),
+        Document(page_content=OPTICS, metadata={"source": "physics.pdf", "page": 7}, id="c2"),
+        Document(page_content="Short chunk.", metadata={"source": "physics.pdf", "page": 9}, id="c3"),
+    ]
+
+    question = "What does Ohm's law say about voltage and resistance?"
+    compressed, stats = compressor.compress(service.embed_query(question), documents)
+    assert "Ohm's law states" in compressed[0].page_content
+    assert "Fuses" not in compressed[0].page_content
+    # Every chunk is still there, so sources are unchanged; short ones pass through
+    assert [doc.id for doc in compressed] == ["c1", "c2", "c3"]
+    assert compressed[2] is documents[2]
+    assert compressed[1].page_content.count("…") >= 1
+    # The originals (possibly shared with the retrieval cache) are untouched
+    assert documents[0].page_content == CIRCUITS
+    assert stats["chars_after"] < 0.6 * stats["chars_before"]
+
+    # Sentences are embedded once; a second question is scored from the store
+    calls = service._embeddings.document_calls
+    compressor.compress(service.embed_query("What does Snell's law relate?"), documents)
+    assert service._embeddings.document_calls == calls
+    print(f" {stats['chars_before']} -> {stats['chars_after']} chars")
+
+    print("Compression tests passed!\n")
+
+
+def test_engine_compresses_with_ingest_embeddings():
+    """Ingest fills the sentence store; answers then use fewer prompt tokens."""
+    print("Testing engine compression...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_stub_engine(tmp, llm_latency=0.0)
+        path = os.path.join(tmp, "notes.pdf")
+        write_pdf(path, [CIRCUITS, OPTICS])
+        engine.ingest_document(path, show_progress=False)
+        question = "What does Ohm's law say about voltage and resistance?"
+        plain = engine.ask_question(question, history=[])
+
+        engine.config.get_section('context_compression').update(enabled=True, ratio=0.3)
+        engine._initialize_components()
+        engine.answer_generator._llm.latency = 0.0
+        info = engine.ingest_document(path, show_progress=False)
+        assert info.stats["sentences_embedded"] > 0
+        store = engine.context_compressor.store
+        assert os.path.exists(f"{store.path}.npy")
+
+        misses = store.stats()["misses"]
+        compressed = engine.ask_question(question, history=[])
+        # Every sentence was embedded at ingest: no embedding at question time
+        assert store.stats()["misses"] == misses
+        assert compressed.sources == plain.sources
+        assert compressed.usage["prompt_tokens"] < plain.usage["prompt_tokens"]
+        print(f" prompt tokens {plain.usage['prompt_tokens']} -> {compressed.usage['prompt_tokens']}")
+
+    print("Engine compression tests passed!\n")
+
+
+def test_compression_failure_falls_back_to_retrieved_chunks():
+    """A failing compressor costs the savings, never the answer."""
+    print("Testing compression fallback...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_stub_engine(tmp, llm_latency=0.0)
+        path = os.path.join(tmp, "notes.pdf")
+        write_pdf(path, [CIRCUITS, OPTICS])
+        engine.ingest_document(path, show_progress=False)
+        question = "What does Ohm's law say about voltage and resistance?"
+        plain = engine.ask_question(question, history=[])
+
+        engine.config.get_section('context_compression').update(enabled=True)
+        engine._initialize_components()
+        engine.answer_generator._llm.latency = 0.0
+
+        def broken(query_embedding, documents):
+            raise RuntimeError("sentence embedding failed")
+
+        engine.context_compressor.compress = broken
+        answer = engine.ask_question(question, history=[])
+        assert answer.sources == plain.sources
+        assert answer.usage["prompt_tokens"] == plain.usage["prompt_tokens"]
+        answer = asyncio.run(engine.aask_question(question, history=[]))
+        assert answer.usage["prompt_tokens"] == plain.usage["prompt_tokens"]
+
+    print("Compression fallback tests passed!\n")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Context Compression Tests")
+    print("=" * 60 + "\n")
+
+    test_split_and_compress()
+    test_engine_compresses_with_ingest_embeddings()
+    test_compression_failure_falls_back_to_retrieved_chunks()
+
+    print("=" * 60)
+    print("All tests completed successfully!")
+    print("=" * 60)
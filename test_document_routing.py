@@ -0,0 +1,178 @@
+"""Quick test of two-level retrieval through document and section centroids."""
+
+import asyncio
+import os
+import tempfile
+
+import numpy as np
+from langchain_core.documents import Document
+
+from src.document_router import DocumentRouter
+from src.vector_store_manager import SearchFilter
+from testing_utils import write_pdf, make_stub_engine
+
+
+OPTICS = [
+    "Light is refracted by a lens; the focal length of the lens sets where light converges.",
+    "A mirror reflects light; refraction and reflection of light follow simple rules.",
+]
+
+CIRCUITS = [
+    "Current through a resistor depends on voltage and resistance in the circuit.",
+    "A capacitor stores charge; circuit voltage and current change as it charges.",
+]
+
+
+def _chunks(pages):
+    return [Document(page_content="", metadata={"page": page, "chunk_index": i}) for i, page in enumerate(pages)]
+
+
+def test_router_ranks_documents_by_best_section():
+    """A document whose one section matches beats one that is vaguely related throughout."""
+    print("Testing DocumentRouter...")
+
+    e1, e2, e3 = np.eye(3)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "centroids")
+        router = DocumentRouter(path, pages_per_section=10)
+        # 30 pages without headings -> three sections; only the last is about e1
+        pages = list(range(30))
+        router.set_document("a.pdf", _chunks(pages), [e1 if page >= 20 else e2 for page in pages])
+        router.set_document("b.pdf", _chunks([0, 1, 2]), [0.6 * e1 + 0.8 * e3] * 3)
+        router.set_document("c.pdf", _chunks([0, 1]), [e3, e3])
+
+        # a.pdf's mean is only 0.45 from e1, b.pdf's is 0.6, but a.pdf's last section is 1.0
+        routed = router.route(e1, 2)
+        assert [source for source, _ in routed] == ["a.pdf", "b.pdf"]
+        assert abs(routed[0][1] - 1.0) < 1e-5
+        assert router.stats() == {"documents": 3, "rows": 4 + 2 + 2}
+        assert [source for source, _ in router.route(e3, 10)][0] == "c.pdf"
+
+        # Persisted on every change and reloaded as is
+        reloaded = DocumentRouter(path)
+        assert reloaded.route(e1, 2) == routed
+        router.remove("a.pdf")
+        assert [source for source, _ in router.route(e1, 1)] == ["b.pdf"]
+        assert "a.pdf" not in DocumentRouter(path)
+
+    print("DocumentRouter tests passed!\n")
+
+
+def test_router_follows_other_writers():
+    """Centroids written elsewhere are picked up and kept; unreadable files are discarded."""
+    print("Testing shared centroid files...")
+
+    e1, e2, _ = np.eye(3)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "centroids")
+        # Two instances on one path, as in two processes
+        first, second = DocumentRouter(path), DocumentRouter(path)
+        first.set_document("a.pdf", _chunks([0, 1]), [e1, e1])
+        assert "a.pdf" in second
+        second.set_document("b.pdf", _chunks([0, 1]), [e2, e2])
+        # The second write was made on top of the first, not over it
+        assert [source for source, _ in first.route(e2, 1)] == ["b.pdf"]
+        assert "a.pdf" in DocumentRouter(path) and "b.pdf" in DocumentRouter(path)
+        first.remove("a.pdf")
+        assert second.stats()["documents"] == 1
+
+        with open(f"{path}.json", "w") as f:
+            f.write('[{"source": "b.pdf", "chunks": 2, "sections": [{}, {}]}]')
+        assert len(DocumentRouter(path)) == 0
+        assert not os.path.exists(f"{path}.json") and not os.path.exists(f"{path}.npy")
+        assert len(second) == 0
+
+    print("Shared centroid tests passed!\n")
+
+
+def test_engine_searches_only_routed_documents():
+    """With routing on, chunk search runs only inside the documents the centroids pick."""
+    print("Testing routed retrieval...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_stub_engine(tmp, llm_latency=0.0)
+        engine.config.get_section('retrieval')['document_routing'].update(
+            enabled=True, documents=1, min_documents=0
+        )
+        engine._initialize_components()
+
+        for name, pages in (("optics.pdf", OPTICS), ("circuits.pdf", CIRCUITS)):
+            path = os.path.join(tmp, name)
+            write_pdf(path, pages)
+            engine.ingest_document(path, show_progress=False)
+        store = engine.vector_store_manager
+        assert store._get_document_router().stats()["documents"] == 3
+        assert os.path.exists(f"{store.centroid_index_path}.npy")
+
+        processor = engine.query_processor
+        question = "How does a lens refract light to its focal point?"
+        documents = processor.retrieve_context(question, k=3)
+        assert documents and {doc.metadata["source"] for doc in documents} == {"optics.pdf"}
+        # The batched and async paths route the same way
+        assert processor.retrieve_contexts([question], k=3)[0] == documents
+        assert asyncio.run(processor.aretrieve_context(question, k=3)) == documents
+
+        # An explicit source filter is never overridden by routing
+        filtered = processor.retrieve_context(question, k=3, filters=SearchFilter(sources=["circuits.pdf"]))
+        assert {doc.metadata["source"] for doc in filtered} == {"circuits.pdf"}
+
+        engine.delete_document("optics.pdf")
+        assert "optics.pdf" not in store._get_document_router()
+        documents = processor.retrieve_context(question, k=3)
+        assert "optics.pdf" not in {doc.metadata["source"] for doc in documents}
+
+        # Centroids left unreadable (e.g. by a crash) are rebuilt from the store
+        with open(f"{store.centroid_index_path}.json", "w") as f:
+            f.write("[")
+        assert store._get_document_router().stats()["documents"] == 2
+        assert os.path.exists(f"{store.centroid_index_path}.json")
+
+    print("Routed retrieval tests passed!\n")
+
+
+def test_centroids_only_maintained_while_routing_is_on():
+    """With routing off writes skip the centroids; turning it on builds them from the store."""
+    print("Testing lazy centroid maintenance...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_stub_engine(tmp, llm_latency=0.0)
+        store = engine.vector_store_manager
+        for name, pages in (("optics.pdf", OPTICS), ("circuits.pdf", CIRCUITS)):
+            path = os.path.join(tmp, name)
+            write_pdf(path, pages)
+            engine.ingest_document(path, show_progress=False)
+        engine.delete_document("physics.pdf")
+        assert not os.path.exists(f"{store.centroid_index_path}.json")
+
+        routing = engine.config.get_section('retrieval')['document_routing']
+        routing.update(enabled=True, documents=1, min_documents=0)
+        engine._initialize_components()
+        store = engine.vector_store_manager
+        question = "How does a lens refract light to its focal point?"
+        documents = engine.query_processor.retrieve_context(question, k=3)
+        assert {doc.metadata["source"] for doc in documents} == {"optics.pdf"}
+        assert store._get_document_router().stats()["documents"] == 2
+        assert os.path.exists(f"{store.centroid_index_path}.json")
+
+        # A write with routing off drops the index instead of leaving it stale
+        routing.update(enabled=False)
+        engine._initialize_components()
+        engine.delete_document("optics.pdf")
+        assert not os.path.exists(f"{engine.vector_store_manager.centroid_index_path}.json")
+
+    print("Lazy centroid tests passed!\n")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Document Routing Tests")
+    print("=" * 60 + "\n")
+
+    test_router_ranks_documents_by_best_section()
+    test_router_follows_other_writers()
+    test_engine_searches_only_routed_documents()
+    test_centroids_only_maintained_while_routing_is_on()
+
+    print("=" * 60)
+    print("All tests completed successfully!")
+    print("=" * 60)
@@ -0,0 +1,162 @@
+"""Quick test of the headless HTTP API."""
+
+import asyncio
+import json
+import os
+import tempfile
+
+
+from src.http_server import create_app
+from testing_utils import write_pdf, PAGES, make_stub_engine, with_client
+
+
+def test_ask_and_stream():
+    """POST /ask answers with sources and Server-Timing; stream=true sends SSE events."""
+    print("Testing /ask...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_stub_engine(tmp, llm_latency=0.0)
+
+        async def scenario(client):
+            response = await client.post("/ask", json={"question": "What is Ohm's law?"})
+            assert response.status == 200
+            body = await response.json()
+            assert body["answer"]
+            assert body["sources"][0].startswith("physics.pdf")
+            timing = response.headers["Server-Timing"]
+            assert "queue;dur=" in timing and "retrieve;dur=" in timing and "total;dur=" in timing
+            print(f" Server-Timing: {timing}")
+
+            response = await client.post("/ask", json={
+                "question": "What is Ohm's law?", "stream": True,
+                "history": [{"role": "user", "content": "Hi"}, {"role": "assistant", "content": "Hello"}]
+            })
+            assert response.status == 200
+            assert response.headers["Content-Type"].startswith("text/event-stream")
+            events = [json.loads(line[len("data: "):])
+                      for line in (await response.text()).splitlines() if line.startswith("data: ")]
+            assert events[0]["type"] == "sources"
+            assert events[-1]["type"] == "done"
+            tokens = [e["text"] for e in events if e["type"] == "token"]
+            assert "".join(tokens) == events[-1]["text"]
+            assert "generate" in events[-1]["timings_ms"]
+            assert events[-1]["usage"]["completion_tokens"] > 0
+            print(f" Streamed {len(tokens)} tokens")
+
+            response = await client.post("/ask", json={"question": "  "})
+            assert response.status == 400
+
+        asyncio.run(with_client(create_app(engine), scenario))
+        # Requests carry their own history; the engine keeps none
+        assert engine.get_conversation_history() == []
+
+    print("Ask tests passed!\n")
+
+
+def test_bad_requests_return_400():
+    """Malformed history and ValueErrors raised inside the engine are client errors."""
+    print("Testing bad requests...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_stub_engine(tmp, llm_latency=0.0)
+
+        async def scenario(client):
+            for history in ({"role": "user", "content": "Hi"},
+                            [{"question": "Hi", "answer": "Hello"}],
+                            [{"role": "system", "content": "Hi"}, {"role": "assistant", "content": "Hello"}],
+                            [{"role": "user", "content": 3}, {"role": "assistant", "content": "Hello"}],
+                            [{"role": "user", "content": "Hi"}]):
+                response = await client.post("/ask", json={"question": "What is Ohm's law?", "history": history})
+                assert response.status == 400, history
+                assert (await response.json())["error"].startswith("Invalid history")
+
+            def reject(*args, **kwargs):
+                raise ValueError("Unsupported retrieval mode: nope")
+
+            engine._answer_plan = reject
+            response = await client.post("/ask", json={"question": "What is Ohm's law?"})
+            assert response.status == 400
+            assert (await response.json())["error"] == "Unsupported retrieval mode: nope"
+
+        asyncio.run(with_client(create_app(engine), scenario))
+
+    print("Bad request tests passed!\n")
+
+
+def test_overload_returns_429_and_503():
+    """Requests beyond workers + queue are refused; queued ones time out with 503."""
+    print("Testing backpressure...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_stub_engine(tmp, llm_latency=0.5)
+        engine.single_flight = None
+        app = create_app(engine, max_concurrency=2, max_queue=2, queue_timeout=0.2)
+
+        async def scenario(client):
+            async def ask(i):
+                response = await client.post("/ask", json={"question": f"Question {i}?"})
+                return response.status, response.headers.get("Retry-After")
+
+            results = await asyncio.gather(*(ask(i) for i in range(8)))
+            statuses = sorted(status for status, _ in results)
+            # 2 answered, 2 queued past the timeout, 4 refused outright
+            assert statuses == [200] * 2 + [429] * 4 + [503] * 2, statuses
+            assert all(retry == "1" for status, retry in results if status != 200)
+
+            health = await (await client.get("/health")).json()
+            assert health["queue"]["rejected"] == 4
+            assert health["queue"]["timed_out"] == 2
+            assert health["queue"]["active"] == 0
+            print(f" Statuses: {statuses}")
+
+        asyncio.run(with_client(app, scenario))
+
+    print("Backpressure tests passed!\n")
+
+
+def test_upload_and_documents():
+    """POST /documents starts an ingest job; the document is listed once it completes."""
+    print("Testing upload...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_stub_engine(tmp, llm_latency=0.0)
+        pdf_path = os.path.join(tmp, "notes.pdf")
+        write_pdf(pdf_path, PAGES)
+
+        async def scenario(client):
+            with open(pdf_path, "rb") as f:
+                response = await client.post("/documents?name=mechanics.pdf", data=f.read(),
+                                             headers={"Content-Type": "application/pdf"})
+            assert response.status == 202
+            job_id = (await response.json())["job_id"]
+
+            await asyncio.to_thread(engine.wait_for_ingest, job_id, 60)
+            job = await (await client.get(f"/jobs/{job_id}")).json()
+            assert job["status"] == "completed", job["error"]
+
+            documents = (await (await client.get("/documents")).json())["documents"]
+            assert "mechanics.pdf" in [d["source"] for d in documents]
+
+            response = await client.delete("/documents/mechanics.pdf")
+            assert (await response.json())["deleted_chunks"] == job["result"]["chunk_count"]
+            assert (await client.get("/jobs/nope")).status == 404
+            print(f" Ingested {job['result']['chunk_count']} chunks over HTTP")
+
+        asyncio.run(with_client(create_app(engine), scenario))
+
+    print("Upload tests passed!\n")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("HTTP Server Tests")
+    print("=" * 60 + "\n")
+
+    test_ask_and_stream()
+    test_bad_requests_return_400()
+    test_overload_returns_429_and_503()
+    test_upload_and_documents()
+
+    print("=" * 60)
+    print("All tests completed successfully!")
+    print("=" * 60)
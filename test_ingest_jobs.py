@@ -0,0 +1,131 @@
+"""Quick test of background ingestion jobs, progress events and resume."""
+
+import json
+import os
+import tempfile
+
+from src.ingest_jobs import IngestJobManager
+from testing_utils import write_pdf, make_pipeline, PAGES, make_stub_engine
+
+
+def test_submitted_job_reports_progress_and_completes():
+    """submit -> progress events -> completed job with the ingest result."""
+    print("Testing background ingest job...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_stub_engine(tmp, llm_latency=0.0)
+        pdf_path = os.path.join(tmp, "upload.pdf")
+        write_pdf(pdf_path, PAGES)
+
+        events = []
+        job_id = engine.submit_ingest(pdf_path, source_name="mechanics.pdf")
+        engine.subscribe_ingest(job_id, events.append)
+        # The job has its own copy of the file
+        os.remove(pdf_path)
+
+        job = engine.wait_for_ingest(job_id, timeout=60)
+
+        assert job.status == "completed", job.error
+        assert job.result["filename"] == "mechanics.pdf"
+        assert job.result["chunk_count"] == job.progress["chunks_stored"] > 0
+        assert job.fraction_complete == 1.0
+        assert any(e.progress.get("pages_parsed") for e in events)
+        assert events[-1].status == "completed"
+        assert "mechanics.pdf" in [d["source"] for d in engine.list_documents()]
+        # The uploaded copy is removed once the job completes
+        assert not os.path.exists(job.file_path)
+        print(f" {len(events)} progress events, {job.result['chunk_count']} chunks stored")
+
+    print("Background job tests passed!\n")
+
+
+def test_failed_job_resumes_from_checkpoint():
+    """A job that fails mid-way resumes after its last checkpoint on retry."""
+    print("Testing checkpoint resume...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, "notes.pdf")
+        write_pdf(pdf_path, PAGES)
+        pipeline, manager = make_pipeline(tmp, embed_workers=1)
+        embed = pipeline.embedding_service.embed_documents
+        embedded = []
+        fail_after = [3]
+
+        def flaky_embed(texts, max_retries=3):
+            if len(embedded) >= fail_after[0]:
+                raise RuntimeError("provider outage")
+            embedded.append(len(texts))
+            return embed(texts)
+
+        pipeline.embedding_service.embed_documents = flaky_embed
+
+        def run_job(job, on_progress, on_checkpoint, resume_from):
+            return pipeline.run(job.file_path, job.source, on_progress=on_progress,
+                                on_checkpoint=on_checkpoint, resume_from=resume_from)
+
+        jobs = IngestJobManager(os.path.join(tmp, "jobs"), run_job)
+        job_id = jobs.submit(pdf_path, source_name="notes.pdf")
+        job = jobs.wait(job_id, timeout=60)
+
+        assert job.status == "failed"
+        assert job.checkpoint["next_chunk"] > 0
+        first_attempt = sum(embedded)
+
+        fail_after[0] = 10_000
+        jobs.retry(job_id)
+        job = jobs.wait(job_id, timeout=60)
+
+        assert job.status == "completed", job.error
+        total = job.result["chunks"]
+        # Chunks before the checkpoint were not embedded again
+        assert sum(embedded) - first_attempt == total - job.result["resumed_from_chunk"]
+        assert sum(embedded) < total + first_attempt
+        assert manager._get_vector_store()._collection.count() == total
+        assert len(manager._get_lexical_index()) == total
+        print(f" Resumed at chunk {job.result['resumed_from_chunk']} of {total}")
+
+    print("Checkpoint resume tests passed!\n")
+
+
+def test_interrupted_job_resumes_on_restart():
+    """A job left 'running' on disk is picked up by the next manager."""
+    print("Testing resume after restart...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        jobs_directory = os.path.join(tmp, "jobs")
+        os.makedirs(jobs_directory)
+        pdf_path = os.path.join(jobs_directory, "abc123.pdf")
+        write_pdf(pdf_path, PAGES)
+        pipeline, _ = make_pipeline(tmp)
+
+        # What a crash mid-ingest leaves behind
+        with open(os.path.join(jobs_directory, "abc123.json"), "w") as f:
+            json.dump({"job_id": "abc123", "source": "notes.pdf", "file_path": pdf_path,
+                       "status": "running", "checkpoint": {"next_page": 0, "next_chunk": 0}}, f)
+
+        def run_job(job, on_progress, on_checkpoint, resume_from):
+            return pipeline.run(job.file_path, job.source, on_progress=on_progress,
+                                on_checkpoint=on_checkpoint, resume_from=resume_from)
+
+        jobs = IngestJobManager.open_shared(jobs_directory, run_job)
+        job = jobs.wait("abc123", timeout=60)
+
+        assert job.status == "completed", job.error
+        assert job.attempts == 1
+        print(f" Interrupted job completed with {job.result['chunks']} chunks")
+
+    print("Restart tests passed!\n")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Ingest Job Tests")
+    print("=" * 60 + "\n")
+
+    test_submitted_job_reports_progress_and_completes()
+    test_failed_job_resumes_from_checkpoint()
+    test_interrupted_job_resumes_on_restart()
+
+    print("=" * 60)
+    print("All tests completed successfully!")
+    print("=" * 60)
@@ -0,0 +1,199 @@
+"""Quick test of the pipelined ingestion stages."""
+
+import os
+import tempfile
+
+import pytest
+
+from src import ingest_pipeline, tracing
+from src.pdf_loader import PDFLoader
+from src.provider_scheduler import ProviderScheduler, Priority, request_priority
+from testing_utils import write_pdf, make_pipeline, PAGES
+
+
+@pytest.mark.parametrize("parse_workers", [0, 2])
+def test_pipeline_matches_sequential_ingest(parse_workers):
+    """Chunks, ids and metadata are the same as load -> split done in sequence."""
+    print(f"Testing pipeline output (parse_workers={parse_workers})...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, "notes.pdf")
+        write_pdf(pdf_path, PAGES)
+        pipeline, manager = make_pipeline(tmp, parse_workers=parse_workers)
+
+        with tracing.capture("ingest") as root:
+            stats = pipeline.run(pdf_path, "notes.pdf")
+
+        expected = pipeline.text_chunker.split_documents(PDFLoader().load(pdf_path))
+        stored = manager._get_vector_store()._collection.get(include=["documents", "metadatas"])
+        by_index = {m["chunk_index"]: (i, d, m) for i, d, m in
+                    zip(stored["ids"], stored["documents"], stored["metadatas"])}
+
+        assert stats["pages"] == len(PAGES)
+        assert stats["chunks"] == len(expected) == len(by_index)
+        expected_ids = manager.make_chunk_ids("notes.pdf", len(expected))
+        for index, chunk in enumerate(expected):
+            chunk_id, text, metadata = by_index[index]
+            assert chunk_id == expected_ids[index]
+            assert text == chunk.page_content
+            assert metadata["page"] == chunk.metadata["page"]
+            assert metadata["source"] == "notes.pdf"
+
+        assert len(manager._get_lexical_index()) == len(expected)
+        assert set(stats["stages"]) == {"parse", "chunk", "embed", "store"}
+        assert stats["stages"]["store"]["items"] == len(expected)
+        assert all(q["max_occupancy"] <= q["capacity"] for q in stats["queues"].values())
+        # Parse time is traced whether pages were parsed here or in a worker
+        spans = tracing.get_trace(root.trace_id)["spans"]
+        parsed = [span for span in spans if span["name"] == "pdf.load_pages"]
+        assert sum(span["attributes"]["items"] for span in parsed) == len(PAGES)
+        assert all(span["parent_id"] == root.span_id for span in parsed)
+        splits = [span for span in spans if span["name"] == "chunker.split"]
+        chars = sum(len(page.page_content) for page in PDFLoader().load(pdf_path))
+        assert sum(span["attributes"]["chars"] for span in splits) == chars
+        print(f" {stats['chunks']} chunks, bottleneck: {stats['bottleneck']}")
+
+    print("Pipeline output tests passed!\n")
+
+
+def test_reingest_shorter_document_drops_stale_chunks():
+    """Re-ingesting a shorter version removes the chunks it no longer has."""
+    print("Testing re-ingest...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, "notes.pdf")
+        pipeline, manager = make_pipeline(tmp)
+
+        write_pdf(pdf_path, PAGES)
+        long_count = pipeline.run(pdf_path, "notes.pdf")["chunks"]
+        write_pdf(pdf_path, PAGES[:5])
+        short_count = pipeline.run(pdf_path, "notes.pdf")["chunks"]
+
+        assert short_count < long_count
+        assert manager._get_vector_store()._collection.count() == short_count
+        assert len(manager._get_lexical_index()) == short_count
+        print(f" {long_count} -> {short_count} chunks")
+
+    print("Re-ingest tests passed!\n")
+
+
+def test_failed_replace_keeps_the_old_version():
+    """A re-ingest that fails halfway leaves the indexed version exactly as it was."""
+    print("Testing failed replace...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, "notes.pdf")
+        pipeline, manager = make_pipeline(tmp)
+        write_pdf(pdf_path, PAGES)
+        pipeline.run(pdf_path, "notes.pdf")
+        collection = manager._get_vector_store()._collection
+        before = collection.get(include=["documents"])
+        generation = manager.generation
+
+        embed_documents = pipeline.embedding_service.embed_documents
+        calls = []
+
+        def failing_later(texts, max_retries=3):
+            calls.append(len(texts))
+            if len(calls) > 4:
+                raise RuntimeError("quota exceeded")
+            return embed_documents(texts, max_retries)
+
+        pipeline.embedding_service.embed_documents = failing_later
+        write_pdf(pdf_path, [page.replace("mechanics", "optics") for page in PAGES[:12]])
+        with pytest.raises(RuntimeError, match="quota exceeded"):
+            pipeline.run(pdf_path, "notes.pdf")
+
+        # More batches than store_batch_size were embedded, none were written
+        assert sum(calls[:4]) > 8
+        after = collection.get(include=["documents"])
+        assert sorted(zip(after["ids"], after["documents"])) == sorted(zip(before["ids"], before["documents"]))
+        assert manager.generation == generation
+        assert len(manager._get_lexical_index()) == len(before["ids"])
+
+        # The same replace succeeds once embedding works again
+        pipeline.embedding_service.embed_documents = embed_documents
+        stats = pipeline.run(pdf_path, "notes.pdf")
+        texts = collection.get(include=["documents"])["documents"]
+        assert len(texts) == stats["chunks"] and not any("mechanics" in text for text in texts)
+
+    print("Failed replace tests passed!\n")
+
+
+def test_embedding_failure_stops_every_stage():
+    """An error in one stage is raised from run() instead of hanging the pipeline."""
+    print("Testing failure propagation...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, "notes.pdf")
+        write_pdf(pdf_path, PAGES)
+        pipeline, _ = make_pipeline(tmp)
+
+        def failing(texts, max_retries=3):
+            raise RuntimeError("quota exceeded")
+
+        pipeline.embedding_service.embed_documents = failing
+
+        with pytest.raises(RuntimeError, match="quota exceeded"):
+            pipeline.run(pdf_path, "notes.pdf")
+        print(" Error raised from run()")
+
+    print("Failure propagation tests passed!\n")
+
+
+def test_embedding_runs_at_caller_priority():
+    """Embedding threads inherit the caller's bulk priority."""
+    print("Testing priority propagation...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, "notes.pdf")
+        write_pdf(pdf_path, PAGES)
+        scheduler = ProviderScheduler()
+        pipeline, _ = make_pipeline(tmp, scheduler=scheduler)
+
+        with request_priority(Priority.BULK):
+            pipeline.run(pdf_path, "notes.pdf")
+
+        stats = scheduler.stats()
+        assert stats["bulk"]["granted"] > 0
+        assert stats["interactive"]["granted"] == 0
+        print(f" {stats['bulk']['granted']} embedding calls at bulk priority")
+
+    print("Priority propagation tests passed!\n")
+
+
+def test_parse_workers_share_one_non_forked_pool():
+    """Parse workers come from one long-lived pool that never forks the app process."""
+    print("Testing the parse worker pool...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, "notes.pdf")
+        write_pdf(pdf_path, PAGES)
+        pipeline, _ = make_pipeline(tmp, parse_workers=2)
+
+        pipeline.run(pdf_path, "notes.pdf")
+        pool = ingest_pipeline._parse_pools[2]
+        assert pool._mp_context.get_start_method() in ("forkserver", "spawn")
+        stats = pipeline.run(pdf_path, "notes.pdf")
+        assert ingest_pipeline._parse_pools[2] is pool
+        assert stats["pages"] == len(PAGES)
+
+    print("Parse pool tests passed!\n")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Ingestion Pipeline Tests")
+    print("=" * 60 + "\n")
+
+    test_pipeline_matches_sequential_ingest(0)
+    test_pipeline_matches_sequential_ingest(2)
+    test_parse_workers_share_one_non_forked_pool()
+    test_reingest_shorter_document_drops_stale_chunks()
+    test_failed_replace_keeps_the_old_version()
+    test_embedding_failure_stops_every_stage()
+    test_embedding_runs_at_caller_priority()
+
+    print("=" * 60)
+    print("All tests completed successfully!")
+    print("=" * 60)
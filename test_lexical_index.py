@@ -0,0 +1,200 @@
+"""Quick test of the BM25 lexical index, metadata predicates and rank fusion."""
+
+import os
+import subprocess
+import sys
+import tempfile
+
+from langchain_core.documents import Document
+
+from src.embedding_service import EmbeddingService
+from src.lexical_index import BM25Index, tokenize
+from src.query_processor import QueryProcessor
+from src.vector_store_manager import VectorStoreManager, matches_where
+
+
+# Another process adding chunks one at a time, compacting every few writes
+WRITER_SCRIPT = """
+import sys
+from langchain_core.documents import Document
+from src.lexical_index import BM25Index
+index = BM25Index(sys.argv[1])
+index.COMPACT_MIN = 20
+for i in range(30):
+    index.add_documents([f"{sys.argv[2]}-{i}"], [Document(page_content=f"worker chunk {i}", metadata={})])
+"""
+
+
+def doc(text, source="a.pdf", page=0):
+    return Document(page_content=text, metadata={"source": source, "page": page})
+
+
+def test_bm25_scoring():
+    """Rare terms weigh more, repeated terms saturate, long chunks are normalised."""
+    print("Testing BM25 scoring...")
+
+    assert tokenize("What is Snell's law?") == ["snell", "law"]
+
+    index = BM25Index()
+    index.add_documents(["c1", "c2", "c3", "c4"], [
+        doc("Ohm's law relates voltage, current and resistance."),
+        doc("Newton's law of motion relates force and acceleration."),
+        doc("Snell's law describes refraction at a boundary."),
+        doc("Refraction refraction refraction of light in a prism, described at length "
+            "with many more words about lenses, mirrors, colours and the spectrum."),
+    ])
+
+    # "law" is in three chunks, "ohm" in one: the rare term decides the ranking
+    assert [d.id for d, _ in index.search("ohm law", k=4)][0] == "c1"
+    results = index.search("snell refraction", k=4)
+    assert [d.id for d, _ in results][:2] == ["c3", "c4"]
+    assert results[0][1] > results[1][1] > 0
+    assert index.search("photosynthesis") == []
+    assert [d.id for d, _ in index.search("law", k=4, predicate=lambda m: m["page"] == 1)] == []
+
+    # Re-adding an id replaces it; removal drops its postings
+    index.add_documents(["c1"], [doc("Kirchhoff's rules for circuits.")])
+    assert index.search("ohm") == []
+    assert index.remove_ids(["c1", "missing"]) == 1
+    assert len(index) == 3 and index.search("kirchhoff") == []
+
+    print("BM25 scoring tests passed!\n")
+
+
+def test_matches_where():
+    """The Python evaluation of where clauses agrees with Chroma's operators."""
+    print("Testing matches_where...")
+
+    metadata = {"source": "a.pdf", "page": 4, "chunk_index": 10}
+    assert matches_where({"source": "a.pdf"}, metadata)
+    assert not matches_where({"source": "b.pdf"}, metadata)
+    assert matches_where({"source": {"$in": ["a.pdf", "b.pdf"]}}, metadata)
+    assert not matches_where({"source": {"$nin": ["a.pdf"]}}, metadata)
+    assert matches_where({"page": {"$gte": 4, "$lt": 5}}, metadata)
+    assert not matches_where({"page": {"$gt": 4}}, metadata)
+    assert matches_where({"source": {"$ne": "b.pdf"}}, metadata)
+    assert matches_where({"$and": [{"source": "a.pdf"}, {"page": {"$lte": 4}}]}, metadata)
+    assert not matches_where({"$and": [{"source": "a.pdf"}, {"page": {"$lte": 3}}]}, metadata)
+    assert matches_where({"$or": [{"source": "b.pdf"}, {"chunk_index": 10}]}, metadata)
+    # Range operators never match a missing field
+    assert not matches_where({"missing": {"$gte": 0}}, metadata)
+
+    print("matches_where tests passed!\n")
+
+
+def test_reciprocal_rank_fusion():
+    """Chunks ranked well by both retrievers come first; ranks, not scores, are used."""
+    print("Testing reciprocal rank fusion...")
+
+    a, b, c, d = (Document(page_content=t, metadata={}, id=t) for t in "abcd")
+    fused = QueryProcessor.reciprocal_rank_fusion([[a, b, c], [b, d, a]], k=3, rrf_k=60)
+    # b: 1/62 + 1/61, a: 1/61 + 1/63, d: 1/62, c: 1/63
+    assert [x.id for x in fused] == ["b", "a", "d"]
+    assert [x.id for x in QueryProcessor.reciprocal_rank_fusion([[c], []], k=3)] == ["c"]
+
+    print("RRF tests passed!\n")
+
+
+def test_persistence_is_incremental():
+    """Writes append to a log instead of rewriting the snapshot; reload replays it."""
+    print("Testing incremental persistence...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "lexical.json")
+        index = BM25Index(path)
+        index.COMPACT_MIN = 10
+        index.add_documents([f"c{i}" for i in range(8)], [doc(f"chunk {i} about optics", page=i) for i in range(8)])
+        # Fewer log records than COMPACT_MIN: appended, no snapshot yet
+        assert os.path.exists(index.log_path) and not os.path.exists(path)
+
+        index.add_documents(["c1"], [doc("chunk 1 rewritten about circuits", page=1)])
+        index.remove_source("b.pdf")
+        index.remove_ids(["c2"])
+        with open(index.log_path) as f:
+            assert len(f.readlines()) == 10
+
+        # A crash mid-append leaves a torn last line, which is ignored
+        with open(index.log_path, "a") as f:
+            f.write('{"add": "c9", "te')
+        reloaded = BM25Index(path)
+        assert len(reloaded) == 7
+        reloaded.add_documents(["c10"], [doc("chunk 10 about prisms", page=10)])
+        assert [d.id for d, _ in BM25Index(path).search("prisms")] == ["c10"]
+        reloaded.remove_ids(["c10"])
+        assert [d.id for d, _ in reloaded.search("circuits")] == ["c1"]
+        assert reloaded.search("chunk 2 optics", k=10, predicate=lambda m: m["page"] == 2) == []
+
+        # Past COMPACT_MIN log entries the log is folded into the snapshot
+        index.add_documents(["c20"], [doc("one more")])
+        assert os.path.exists(path) and not os.path.exists(index.log_path)
+        assert len(BM25Index(path)) == 8
+
+        index.clear()
+        assert len(BM25Index(path)) == 0
+
+    print("Persistence tests passed!\n")
+
+
+def test_writes_from_other_processes():
+    """Concurrent writers lose nothing, and a loaded index picks up their records."""
+    print("Testing cross-process writes...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "lexical.json")
+        index = BM25Index(path)
+        index.add_documents(["c0"], [doc("chunk about optics")])
+        assert index.search("worker") == []
+
+        root = os.path.dirname(os.path.abspath(__file__))
+        writers = [
+            subprocess.Popen([sys.executable, "-c", WRITER_SCRIPT, path, f"w{n}"], cwd=root,
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            for n in range(3)
+        ]
+        for writer in writers:
+            _, stderr = writer.communicate(timeout=120)
+            assert writer.returncode == 0, stderr.decode()
+
+        assert len(index) == 91
+        assert len(index.search("worker", k=200)) == 90
+        assert len(BM25Index(path)) == 91
+
+    print("Cross-process write tests passed!\n")
+
+
+def test_unreadable_snapshot_is_rebuilt_from_the_store():
+    """A corrupt snapshot is discarded and the index rebuilt from the stored chunks."""
+    print("Testing corrupt snapshot recovery...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = VectorStoreManager(EmbeddingService(provider="stub", model="stub"), persist_directory=tmp,
+                                   collection_name="lexical_test")
+        store.replace_document("a.pdf", [doc(f"chunk {i} about prisms", page=i) for i in range(5)])
+        path = store.lexical_index_path
+        with open(path, "w") as f:
+            f.write('{"documents": {"c1": ')
+        BM25Index._shared.pop(os.path.abspath(path))
+
+        store = VectorStoreManager(EmbeddingService(provider="stub", model="stub"), persist_directory=tmp,
+                                   collection_name="lexical_test")
+        assert len(store._get_lexical_index()) == 5
+        assert len(BM25Index(path)) == 5
+
+    print("Corrupt snapshot tests passed!\n")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Lexical Index Tests")
+    print("=" * 60 + "\n")
+
+    test_bm25_scoring()
+    test_matches_where()
+    test_reciprocal_rank_fusion()
+    test_persistence_is_incremental()
+    test_writes_from_other_processes()
+    test_unreadable_snapshot_is_rebuilt_from_the_store()
+
+    print("=" * 60)
+    print("All tests completed successfully!")
+    print("=" * 60)
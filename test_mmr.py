@@ -0,0 +1,59 @@
+"""Quick test of Maximal Marginal Relevance selection."""
+
+import numpy as np
+
+from benchmarks.mmr_selection import naive_mmr
+from src.mmr import maximal_marginal_relevance
+
+
+def test_mmr_prefers_diverse_candidates():
+    """lambda=1 ranks by relevance; lower lambda skips near-duplicates of what is already picked."""
+    print("Testing maximal_marginal_relevance...")
+
+    query = [1.0, 0.0, 0.0]
+    candidates = [
+        [1.0, 0.05, 0.0],   # most relevant
+        [1.0, 0.06, 0.0],   # near-duplicate of the first
+        [0.7, 0.0, 0.7],    # less relevant, different direction
+        [0.0, 1.0, 0.0],    # irrelevant
+    ]
+
+    assert maximal_marginal_relevance(query, candidates, k=3, lambda_mult=1.0) == [0, 1, 2]
+    assert maximal_marginal_relevance(query, candidates, k=2, lambda_mult=0.5) == [0, 2]
+    # Unnormalised inputs give the same selection
+    scaled = [[5 * x for x in candidate] for candidate in candidates]
+    assert maximal_marginal_relevance(query, scaled, k=2, lambda_mult=0.5) == [0, 2]
+
+    assert maximal_marginal_relevance(query, [], k=3) == []
+    assert maximal_marginal_relevance(query, candidates, k=0) == []
+    assert sorted(maximal_marginal_relevance(query, candidates, k=10)) == [0, 1, 2, 3]
+
+    print("MMR selection tests passed!\n")
+
+
+def test_mmr_matches_reference_loop():
+    """The vectorized selection picks the same indices as the per-pair reference."""
+    print("Testing MMR against the reference loop...")
+
+    rng = np.random.default_rng(0)
+    # lambda > 0: at 0 the reference scores every first pick 0 and takes index 0
+    for lambda_mult in (0.1, 0.3, 0.5, 0.9):
+        query = rng.normal(size=32)
+        candidates = rng.normal(size=(40, 32))
+        assert maximal_marginal_relevance(query, candidates, 6, lambda_mult) == \
+            naive_mmr(query.tolist(), candidates.tolist(), 6, lambda_mult)
+
+    print("Reference comparison passed!\n")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("MMR Tests")
+    print("=" * 60 + "\n")
+
+    test_mmr_prefers_diverse_candidates()
+    test_mmr_matches_reference_loop()
+
+    print("=" * 60)
+    print("All tests completed successfully!")
+    print("=" * 60)
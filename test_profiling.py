@@ -0,0 +1,141 @@
+"""Quick test of the on-demand profiler."""
+
+import contextvars
+import json
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from src.profiling import profile_block, profile_thread
+from testing_utils import write_pdf, PAGES, make_stub_engine
+
+
+def busy_wait(seconds):
+
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(200))
+
+
+def registered_busy_wait(seconds):
+
+    with profile_thread():
+        busy_wait(seconds)
+
+
+def test_profile_block_output():
+    """Samples the calling thread and threads it registers, not other threads."""
+    print("Testing profile_block...")
+
+    stop = threading.Event()
+    bystander = threading.Thread(target=lambda: stop.wait(), name="bystander", daemon=True)
+    bystander.start()
+    try:
+        with profile_block("unit", interval=0.002) as profile:
+            helper = threading.Thread(target=contextvars.copy_context().run, args=(registered_busy_wait, 0.1),
+                                      name="helper")
+            # Started meanwhile but not by the profiled call (another session)
+            other = threading.Thread(target=busy_wait, args=(0.1,), name="other-session")
+            helper.start()
+            other.start()
+            busy_wait(0.15)
+            helper.join()
+            other.join()
+    finally:
+        stop.set()
+
+    assert profile.sample_count > 10 and profile.duration >= 0.15
+    threads = {thread for thread, _ in profile.samples}
+    assert "helper" in threads
+    assert "bystander" not in threads and "other-session" not in threads
+
+    collapsed = profile.collapsed()
+    assert "busy_wait (test_profiling.py:" in collapsed
+    for line in collapsed.strip().splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0 and ";" in stack
+
+    document = profile.speedscope()
+    frame_count = len(document["shared"]["frames"])
+    for thread_profile in document["profiles"]:
+        assert thread_profile["type"] == "sampled"
+        assert len(thread_profile["samples"]) == len(thread_profile["weights"])
+        assert all(0 <= index < frame_count for sample in thread_profile["samples"] for index in sample)
+    print(f" {profile.sample_count} samples over {len(threads)} threads, {frame_count} frames")
+
+    print("profile_block tests passed!\n")
+
+
+def test_overlapping_memory_profiles_share_tracemalloc():
+    """The first profile to finish does not stop tracemalloc under the other."""
+    print("Testing overlapping memory profiles...")
+
+    assert not tracemalloc.is_tracing()
+    first_done = threading.Event()
+    results = {}
+
+    def second():
+        with profile_block("second", interval=0.002, trace_memory=True) as profile:
+            first_done.wait(5)
+            blocks = [bytearray(1024) for _ in range(2000)]
+            busy_wait(0.05)
+            del blocks
+        results["second"] = profile
+
+    with profile_block("first", interval=0.002, trace_memory=True) as first:
+        thread = threading.Thread(target=second)
+        thread.start()
+        busy_wait(0.05)
+    first_done.set()
+    thread.join()
+
+    assert first.memory is not None and "error" not in first.memory
+    assert "error" not in results["second"].memory and results["second"].memory["peak_mb"] > 1
+    assert not tracemalloc.is_tracing()
+
+    print("Overlapping memory profile tests passed!\n")
+
+
+def test_engine_profiles_ask_and_ingest():
+    """profile=True writes the request's profile; ingest adds a tracemalloc summary."""
+    print("Testing engine profiling...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_stub_engine(tmp, llm_latency=0.05)
+        output_dir = os.path.join(tmp, "profiles")
+        engine.config.get_section('profiling')['output_dir'] = output_dir
+
+        engine.ask_question("What is Ohm's law?")
+        assert engine.last_profile is None
+
+        engine.ask_question("What is Snell's law?", profile=True)
+        profile = engine.last_profile
+        assert profile.name == "ask" and profile.sample_count > 0
+        with open(profile.paths[0]) as f:
+            assert json.load(f)["profiles"]
+
+        path = os.path.join(tmp, "mechanics.pdf")
+        write_pdf(path, PAGES)
+        info = engine.ingest_document(path, show_progress=False, profile=True)
+        memory = info.stats["profile"]["memory"]
+        assert memory["peak_mb"] > 0
+        assert {os.path.basename(p).rsplit(".", 2)[-2] for p in info.stats["profile"]["paths"]} >= {"speedscope", "memory"}
+        print(f" ingest peak {memory['peak_mb']} MB, top line {memory['top'][0]['location'] if memory['top'] else '-'}")
+
+    print("Engine profiling tests passed!\n")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Profiling Tests")
+    print("=" * 60 + "\n")
+
+    test_profile_block_output()
+    test_overlapping_memory_profiles_share_tracemalloc()
+    test_engine_profiles_ask_and_ingest()
+
+    print("=" * 60)
+    print("All tests completed successfully!")
+    print("=" * 60)
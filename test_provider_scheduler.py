@@ -0,0 +1,149 @@
+"""Quick test of the provider scheduler against local stub providers."""
+
+import threading
+import time
+
+from src.embedding_service import EmbeddingService
+from src.provider_scheduler import ProviderScheduler, Priority, request_priority
+
+
+def test_requests_per_minute_budget():
+    """Calls beyond the burst wait for the bucket to refill."""
+    print("Testing requests/min budget...")
+
+    # 600/min = 10/s, burst of 0.5s -> 5 immediate grants, then 1 every 100ms
+    scheduler = ProviderScheduler(requests_per_minute=600, burst_seconds=0.5)
+
+    start = time.monotonic()
+    for _ in range(10):
+        with scheduler.acquire():
+            pass
+    elapsed = time.monotonic() - start
+
+    assert 0.4 <= elapsed < 1.5, f"10 calls took {elapsed:.2f}s"
+    assert scheduler.stats()["interactive"]["granted"] == 10
+    print(f" 10 calls at 600/min with 5 burst took {elapsed:.2f}s")
+
+    print("Requests/min tests passed!\n")
+
+
+def test_tokens_per_minute_budget():
+    """Large requests consume the token budget; oversized ones are clamped."""
+    print("Testing tokens/min budget...")
+
+    # 6000 tokens/min = 100/s with a 1s burst of 100 tokens
+    scheduler = ProviderScheduler(tokens_per_minute=6000, burst_seconds=1)
+
+    start = time.monotonic()
+    with scheduler.acquire(tokens=100):
+        pass
+    with scheduler.acquire(tokens=30):
+        pass
+    elapsed = time.monotonic() - start
+    assert 0.2 <= elapsed < 1.0, f"second call waited {elapsed:.2f}s"
+
+    # Bigger than the whole bucket: must still be granted, not wait forever
+    with scheduler.acquire(tokens=10_000):
+        pass
+    print(f" Token budget enforced ({elapsed:.2f}s wait), oversized request granted")
+
+    print("Tokens/min tests passed!\n")
+
+
+def test_interactive_goes_before_bulk():
+    """With one slot free, queued questions are served before queued ingestion."""
+    print("Testing priority ordering...")
+
+    scheduler = ProviderScheduler(max_concurrent=1)
+    order = []
+    order_lock = threading.Lock()
+
+    def call(label, priority):
+        with request_priority(priority):
+            with scheduler.acquire():
+                with order_lock:
+                    order.append(label)
+
+    holder = scheduler.acquire()
+    bulk = [threading.Thread(target=call, args=(f"bulk-{i}", Priority.BULK)) for i in range(3)]
+    for thread in bulk:
+        thread.start()
+    while scheduler.stats()["bulk"]["queued"] < 3:
+        time.sleep(0.001)
+
+    question = threading.Thread(target=call, args=("question", Priority.INTERACTIVE))
+    question.start()
+    while scheduler.stats()["interactive"]["queued"] < 1:
+        time.sleep(0.001)
+
+    stats = scheduler.stats()
+    assert stats["queue_depth"] == 4 and stats["in_flight"] == 1
+
+    holder.release()
+    for thread in bulk + [question]:
+        thread.join()
+
+    assert order[0] == "question", order
+    # FIFO within a priority
+    assert order[1:] == ["bulk-0", "bulk-1", "bulk-2"], order
+    assert scheduler.stats()["queue_depth"] == 0
+    print(f" Served in order: {order}")
+
+    print("Priority tests passed!\n")
+
+
+def test_embedding_service_goes_through_scheduler():
+    """Stub embedding calls are counted and limited by the scheduler."""
+    print("Testing EmbeddingService integration...")
+
+    scheduler = ProviderScheduler(max_concurrent=2)
+    service = EmbeddingService(provider="stub", model="stub", scheduler=scheduler)
+    service._embeddings.latency = 0.05
+
+    active = []
+    peak = []
+    original = service._embeddings.embed_documents
+
+    def tracked(texts):
+        active.append(1)
+        peak.append(len(active))
+        try:
+            return original(texts)
+        finally:
+            active.pop()
+
+    service._embeddings.embed_documents = tracked
+
+    def ingest(i):
+        with request_priority(Priority.BULK):
+            service.embed_documents([f"chunk {i} about optics"])
+
+    threads = [threading.Thread(target=ingest, args=(i,)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    service.embed_query("What is refraction?")
+    for thread in threads:
+        thread.join()
+
+    stats = scheduler.stats()
+    assert max(peak) <= 2
+    assert stats["bulk"]["granted"] == 6
+    assert stats["interactive"]["granted"] == 1
+    print(f" Peak concurrency {max(peak)}, bulk avg wait {stats['bulk']['avg_wait_ms']:.0f} ms")
+
+    print("EmbeddingService integration tests passed!\n")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Provider Scheduler Tests")
+    print("=" * 60 + "\n")
+
+    test_requests_per_minute_budget()
+    test_tokens_per_minute_budget()
+    test_interactive_goes_before_bulk()
+    test_embedding_service_goes_through_scheduler()
+
+    print("=" * 60)
+    print("All tests completed successfully!")
+    print("=" * 60)
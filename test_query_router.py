@@ -0,0 +1,99 @@
+"""Quick test of query-complexity routing."""
+
+import json
+import os
+import tempfile
+
+from src.query_router import QueryRouter, summarize_log
+from testing_utils import make_stub_engine
+
+
+FAST_QUESTIONS = [
+    "What is Ohm's law?",
+    "Define refraction.",
+    "Who formulated the laws of motion?",
+    "What is the unit of resistance?",
+]
+
+FULL_QUESTIONS = [
+    "A 12 V battery drives a current through a 4 ohm resistor. Calculate the current and the power dissipated.",
+    "Solve 3x^2 - 5x + 2 = 0 and check both roots.",
+    "A car accelerates from 0 to 27 m/s in 9 s. How far does it travel?",
+    "Derive the lens equation from similar triangles and explain each step.",
+]
+
+
+def test_router_classifies_questions():
+    """Definitions take the fast route, multi-step numeric problems the full one."""
+    print("Testing QueryRouter...")
+
+    router = QueryRouter()
+    for question in FAST_QUESTIONS:
+        decision = router.route(question)
+        assert decision.route == 'fast', (question, decision)
+    for question in FULL_QUESTIONS:
+        decision = router.route(question)
+        assert decision.route == 'full', (question, decision)
+        assert decision.reasons and decision.reasons[0].endswith('+')
+
+    # Threshold and weights come from config
+    strict = QueryRouter.from_config({"routing": {"threshold": 10.0}})
+    assert strict.route(FULL_QUESTIONS[0]).route == 'fast'
+    eager = QueryRouter(weights={"bias": 5.0})
+    assert eager.route(FAST_QUESTIONS[0]).route == 'full'
+    print(f" e.g. {router.route(FULL_QUESTIONS[0])}")
+
+    print("QueryRouter tests passed!\n")
+
+
+def test_engine_routes_and_logs():
+    """With routing on, fast questions use the compact prompt and are logged per route."""
+    print("Testing engine routing...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_stub_engine(tmp, llm_latency=0.0)
+        log_path = os.path.join(tmp, "routing.jsonl")
+        engine.config.get_section('routing').update(enabled=True, log_path=log_path)
+        engine._initialize_components()
+        for generator in engine._route_generators.values():
+            generator._llm.latency = 0.0
+
+        fast = engine._route_generators['fast']
+        full = engine._route_generators['full']
+        assert fast.prompt_variant == 'compact' and fast.max_tokens == 350
+        # The full route keeps llm.* unchanged, so it shares the default generator
+        assert full is engine.answer_generator
+
+        for question in FAST_QUESTIONS[:2] + FULL_QUESTIONS[:2]:
+            answer = engine.ask_question(question, history=[])
+            expected = 'fast' if question in FAST_QUESTIONS else 'full'
+            assert answer.usage["route"] == expected
+
+        with open(log_path) as f:
+            entries = [json.loads(line) for line in f]
+        assert [entry["route"] for entry in entries] == ['fast', 'fast', 'full', 'full']
+        assert entries[0]["prompt"] == 'compact' and entries[0]["max_tokens"] == 350
+        assert entries[2]["prompt"] == 'full'
+
+        stats = engine.get_routing_stats()
+        assert stats['fast']['questions'] == 2 and stats['full']['questions'] == 2
+        summary = summarize_log(log_path)
+        assert set(summary) == {'fast', 'full'}
+        print(f" fast: {summary['fast']['avg_prompt_tokens']:.0f} prompt tokens avg, "
+              f"full: {summary['full']['avg_prompt_tokens']:.0f}")
+        assert summary['fast']['avg_prompt_tokens'] < summary['full']['avg_prompt_tokens']
+
+    print("Engine routing tests passed!\n")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Query Routing Tests")
+    print("=" * 60 + "\n")
+
+    test_router_classifies_questions()
+    test_engine_routes_and_logs()
+
+    print("=" * 60)
+    print("All tests completed successfully!")
+    print("=" * 60)
@@ -0,0 +1,92 @@
+"""Quick test that corpus writes invalidate cached retrieval results."""
+
+import os
+import subprocess
+import sys
+import tempfile
+
+from langchain_core.documents import Document
+
+from src.embedding_service import EmbeddingService
+from src.query_processor import QueryProcessor
+from src.vector_store_manager import VectorStoreManager
+
+
+CONFIG = {"retrieval": {"top_k": 2, "score_threshold": None, "cache": {"enabled": True}}}
+
+# Another process writing to the same persist directory
+DELETE_SCRIPT = """
+import sys
+from src.embedding_service import EmbeddingService
+from src.vector_store_manager import VectorStoreManager
+store = VectorStoreManager(EmbeddingService(provider="stub", model="stub"),
+                           persist_directory=sys.argv[1], collection_name="cache_test")
+print(store.delete_by_source(sys.argv[2]))
+"""
+
+
+def make_processor(persist_directory):
+    store = VectorStoreManager(EmbeddingService(provider="stub", model="stub"),
+                               persist_directory=persist_directory, collection_name="cache_test")
+    return QueryProcessor(store, CONFIG), store
+
+
+def test_replace_and_delete_invalidate_cached_results():
+    """A cached result is never served after the corpus changes."""
+    print("Testing in-process invalidation...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        processor, store = make_processor(tmp)
+        store.replace_document("a.pdf", [Document(page_content="Ohm's law: V = IR.", metadata={"page": 0})])
+        question = "What is Ohm's law?"
+
+        first = processor.retrieve_context(question)
+        assert processor.retrieve_context(question) == first
+        assert processor.cache.hits == 1
+
+        store.replace_document("a.pdf", [Document(page_content="Ohm's law, revised: V = I * R.", metadata={"page": 0})])
+        assert processor.retrieve_context(question)[0].page_content.startswith("Ohm's law, revised")
+
+        store.delete_by_source("a.pdf")
+        assert processor.retrieve_context(question) == []
+
+    print("In-process invalidation tests passed!\n")
+
+
+def test_write_from_another_process_invalidates():
+    """The generation lives on disk, so another process's delete is seen here."""
+    print("Testing cross-process invalidation...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        processor, store = make_processor(tmp)
+        store.replace_document("a.pdf", [Document(page_content="Ohm's law: V = IR.", metadata={"page": 0})])
+        store.replace_document("b.pdf", [Document(page_content="Ohm was a physicist.", metadata={"page": 0})])
+        question = "Who was Ohm?"
+        processor.retrieve_context(question)
+        before = store.generation
+        misses = processor.cache.misses
+
+        root = os.path.dirname(os.path.abspath(__file__))
+        result = subprocess.run([sys.executable, "-c", DELETE_SCRIPT, tmp, "b.pdf"], cwd=root,
+                                capture_output=True, text=True, timeout=120)
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.strip().splitlines()[-1] == "1"
+
+        assert store.generation != before
+        processor.retrieve_context(question)
+        assert processor.cache.misses == misses + 1
+
+    print("Cross-process invalidation tests passed!\n")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Retrieval Cache Tests")
+    print("=" * 60 + "\n")
+
+    test_replace_and_delete_invalidate_cached_results()
+    test_write_from_another_process_invalidates()
+
+    print("=" * 60)
+    print("All tests completed successfully!")
+    print("=" * 60)
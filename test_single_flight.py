@@ -0,0 +1,114 @@
+"""Quick test that identical concurrent questions share one upstream call."""
+
+import tempfile
+import threading
+
+from src.single_flight import SingleFlight
+from testing_utils import make_stub_engine
+
+
+def test_concurrent_identical_questions_share_one_call():
+    """N engines asking the same question at once -> one retrieval and one LLM call."""
+    print("Testing single-flight coalescing...")
+
+    callers = 8
+    with tempfile.TemporaryDirectory() as tmp:
+        # One engine per caller, like one Streamlit session per student
+        engines = [make_stub_engine(tmp) for _ in range(callers)]
+        llm = engines[0].answer_generator._llm
+        for engine in engines[1:]:
+            engine.answer_generator._llm = llm
+            engine.embedding_service = engines[0].embedding_service
+            engine.query_processor.vector_store_manager = engines[0].vector_store_manager
+        embeddings = engines[0].embedding_service._embeddings
+        query_calls_before = embeddings.query_calls
+
+        barrier = threading.Barrier(callers)
+        answers = [None] * callers
+
+        def ask(i):
+            barrier.wait()
+            answers[i] = engines[i].ask_question("  What is Ohm's law? ")
+
+        threads = [threading.Thread(target=ask, args=(i,)) for i in range(callers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert llm.call_count == 1, f"expected 1 LLM call, got {llm.call_count}"
+        assert embeddings.query_calls - query_calls_before == 1
+        assert all(a is not None and a.text == answers[0].text for a in answers)
+        # every caller gets its own copy
+        assert len({id(a) for a in answers}) == callers
+        print(f" {callers} callers -> {llm.call_count} LLM call")
+
+    print("Single-flight tests passed!\n")
+
+
+def test_follow_ups_are_not_coalesced():
+    """Questions with conversation history always run on their own."""
+    print("Testing that history-dependent questions bypass coalescing...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_stub_engine(tmp, llm_latency=0.0)
+        engine.ask_question("What is Ohm's law?")
+        engine.ask_question("What is Ohm's law?")
+
+        assert engine.answer_generator._llm.call_count == 2
+        print(" Follow-up generated separately")
+
+    print("Follow-up tests passed!\n")
+
+
+def test_errors_reach_every_caller():
+    """A failing leader call raises in every waiting caller."""
+    print("Testing error propagation...")
+
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    errors = []
+
+    def failing():
+        started.set()
+        release.wait()
+        raise RuntimeError("upstream failed")
+
+    def call():
+        try:
+            flight.do("key", failing)
+        except RuntimeError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait()
+    followers = [threading.Thread(target=call) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    while flight.stats()["coalesced"] < 3:
+        pass
+    release.set()
+    for thread in [leader] + followers:
+        thread.join()
+
+    assert len(errors) == 4
+    assert flight.stats() == {"executed": 1, "coalesced": 3, "in_flight": 0}
+    print(" Error delivered to all 4 callers")
+
+    print("Error propagation tests passed!\n")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Single-Flight Coalescing Tests")
+    print("=" * 60 + "\n")
+
+    test_concurrent_identical_questions_share_one_call()
+    test_follow_ups_are_not_coalesced()
+    test_errors_reach_every_caller()
+
+    print("=" * 60)
+    print("All tests completed successfully!")
+    print("=" * 60)
@@ -0,0 +1,155 @@
+"""Quick test of precomputed chapter summaries for overview questions."""
+
+import os
+import tempfile
+import threading
+
+from src.summary_index import (
+    SummaryIndex, DocumentSummary, SectionSummary, detect_sections, build_document_summary
+)
+from testing_utils import write_pdf, make_stub_engine
+
+
+CHAPTER_PAGES = [
+    "Preface for students using these notes.",
+    "Chapter 1: Mechanics",
+    "Newton's second law states that force equals mass times acceleration.",
+    "Momentum is conserved when no external force acts on a system.",
+    "CHAPTER II - Optics",
+    "Snell's law relates the angles of incidence and refraction.",
+]
+
+
+def test_sections_and_lookup():
+    """Headings split the document; overview questions find the right summaries."""
+    print("Testing section detection and lookup...")
+
+    pages = list(enumerate(CHAPTER_PAGES))
+    sections = detect_sections(pages)
+    assert [(s.title, s.number, s.first_page, s.last_page) for s in sections] == [
+        ("Front matter", None, 0, 0),
+        ("Chapter 1: Mechanics", 1, 1, 3),
+        ("CHAPTER II - Optics", 2, 4, 5),
+    ]
+    numbered = detect_sections([(0, "1 Kinematics\nVelocity is..."), (1, "more text"), (2, "2. Dynamics")])
+    assert [s.number for s in numbered] == [1, 2]
+    # No headings: fixed runs of pages
+    plain = detect_sections([(page, "Some text.") for page in range(25)], pages_per_section=10)
+    assert [(s.first_page, s.last_page) for s in plain] == [(0, 9), (10, 19), (20, 24)]
+
+    calls = []
+
+    def summarize(text, instruction):
+        calls.append(instruction)
+        return f"summary of {len(text)} chars"
+
+    summary = build_document_summary("physics.pdf", pages, summarize, map_chars=80, fanout=2)
+    # The mechanics chapter is longer than map_chars: mapped in pieces, then reduced
+    assert any(instruction.startswith("Combine") for instruction in calls)
+    assert summary.llm_calls == len(calls) and summary.summary.startswith("summary of")
+    assert all(section.summary for section in summary.sections)
+
+    index = SummaryIndex()
+    index.put(summary)
+    index.put(DocumentSummary("chemistry.pdf", "Atoms and bonds.", [
+        SectionSummary("Chapter 1: Atoms", 1, 0, 4, "Atoms."),
+        SectionSummary("Chapter 2: Bonds", 2, 5, 9, "Bonds."),
+    ]))
+
+    matches = index.find("Summarize chapter two", sources=["physics.pdf"])
+    assert [(d.source, s.title) for d, s in matches] == [("physics.pdf", "CHAPTER II - Optics")]
+    assert len(index.find("Summarize chapter 1")) == 2
+    matches = index.find("Give me an overview of the chapter on optics")
+    assert [s.title for _, s in matches] == ["CHAPTER II - Optics"]
+    assert [(d.source, s) for d, s in index.find("Summarize the chemistry notes")] == [("chemistry.pdf", None)]
+    assert len(index.find("What are the main points?")) == 2
+    # Not an overview question, or a topic that is no section: left to retrieval
+    assert index.find("What is Snell's law?") == []
+    assert index.find("Summarize the photoelectric effect") == []
+    print(f" {len(calls)} summarize calls for {len(summary.sections)} sections")
+
+    print("Section and lookup tests passed!\n")
+
+
+def test_engine_answers_overview_from_summary():
+    """After ingest the summary is built in the background; overview questions skip retrieval."""
+    print("Testing engine summaries...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_stub_engine(tmp, llm_latency=0.0)
+        engine.config.get_section('summaries').update(enabled=True)
+        engine._initialize_components()
+        engine.answer_generator._llm.latency = 0.0
+
+        path = os.path.join(tmp, "notes.pdf")
+        write_pdf(path, CHAPTER_PAGES)
+        info = engine.ingest_document(path, show_progress=False)
+        assert info.stats["summary"] == "pending"
+        engine.summary_index._pending["notes.pdf"].result(timeout=30)
+        result = engine.get_summary("notes.pdf")
+        assert result["status"] == "ready"
+        assert len(result["summary"]["sections"]) == 3
+
+        answer = engine.ask_question("Summarize chapter 2", history=[])
+        # One small LLM call over the summary; no query embedding, no retrieval
+        assert answer.usage["llm_calls"] == 1 and answer.usage["embedding_tokens"] == 0
+        assert answer.sources == ["notes.pdf (Page 4)"]
+
+        regular = engine.ask_question("What is Snell's law?", history=[])
+        assert regular.usage["embedding_tokens"] > 0
+        print(f" overview answer: {answer.usage['prompt_tokens']} prompt tokens, "
+              f"regular: {regular.usage['prompt_tokens']}")
+
+        engine.delete_document("notes.pdf")
+        assert engine.get_summary("notes.pdf")["summary"] is None
+
+    print("Engine summary tests passed!\n")
+
+
+def test_delete_during_build_is_not_undone():
+    """A build that finishes after its document was deleted or the index cleared is dropped."""
+    print("Testing builds superseded by delete and clear...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "summaries.json")
+        index = SummaryIndex(path)
+
+        def blocked_build(source, started, release):
+            def build():
+                started.set()
+                release.wait(10)
+                return DocumentSummary(source=source, summary=f"Overview of {source}.", sections=[])
+            return build
+
+        for supersede in (lambda: index.remove("a.pdf"), index.clear):
+            started, release = threading.Event(), threading.Event()
+            future = index.schedule("a.pdf", blocked_build("a.pdf", started, release))
+            assert started.wait(10)
+            supersede()
+            release.set()
+            future.result(timeout=10)
+            assert index.get("a.pdf") is None and index.status("a.pdf") is None
+            assert SummaryIndex(path).get("a.pdf") is None
+
+        # A build scheduled after the delete is stored as usual
+        started, release = threading.Event(), threading.Event()
+        release.set()
+        index.schedule("a.pdf", blocked_build("a.pdf", started, release)).result(timeout=10)
+        assert index.get("a.pdf").summary == "Overview of a.pdf."
+        assert SummaryIndex(path).get("a.pdf") is not None
+
+    print("Superseded build tests passed!\n")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Summary Tests")
+    print("=" * 60 + "\n")
+
+    test_sections_and_lookup()
+    test_engine_answers_overview_from_summary()
+    test_delete_during_build_is_not_undone()
+
+    print("=" * 60)
+    print("All tests completed successfully!")
+    print("=" * 60)
@@ -0,0 +1,103 @@
+"""Quick test of per-request tracing."""
+
+import asyncio
+import json
+import os
+import tempfile
+
+from src import tracing
+from src.http_server import create_app
+from testing_utils import with_client, make_stub_engine
+
+
+def spans_by_name(spans):
+
+    return {span["name"]: span for span in spans}
+
+
+def test_disabled_tracing_records_nothing():
+    """With tracing off, span() hands back the shared no-op and no trace is kept."""
+    print("Testing disabled tracing...")
+
+    tracing.configure_tracing({"enabled": False})
+    before = len(tracing.recent_traces(limit=1000))
+
+    with tracing.span("outer", items=3) as outer:
+        with tracing.span("inner") as inner:
+            inner.set(tokens=10)
+    assert outer is inner is tracing._NOOP_SPAN
+    assert not outer.recording and outer.trace_id is None
+    assert len(tracing.recent_traces(limit=1000)) == before
+    assert "rag_span_duration_seconds_count" not in tracing.render_prometheus()
+
+    # capture() records one trace for the UI, still without exporting it
+    with tracing.capture("evaluate") as root:
+        with tracing.span("child", items=2):
+            pass
+    trace = tracing.get_trace(root.trace_id)
+    assert [span["name"] for span in trace["spans"]] == ["evaluate", "child"]
+    assert trace["spans"][1]["parent_id"] == trace["spans"][0]["span_id"]
+
+    print("Disabled tracing tests passed!\n")
+
+
+def test_ask_trace_export_and_metrics():
+    """An ask is one trace: retrieval, embedding and generation nest under it."""
+    print("Testing ask trace...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_stub_engine(tmp, llm_latency=0.0)
+        export_path = os.path.join(tmp, "traces", "traces.jsonl")
+        tracing.configure_tracing({"enabled": True, "export_path": export_path, "keep_traces": 10})
+        try:
+            engine.ask_question("What is Ohm's law?")
+
+            with open(export_path) as f:
+                records = [json.loads(line) for line in f]
+            assert len({record["trace_id"] for record in records}) == 1
+            spans = spans_by_name(records)
+            assert spans["ask"]["parent_id"] is None
+            assert spans["retrieve"]["parent_id"] == spans["ask"]["span_id"]
+            assert spans["vectorstore.search"]["parent_id"] == spans["retrieve"]["span_id"]
+            assert spans["embedding.embed_query"]["parent_id"] == spans["vectorstore.search"]["span_id"]
+            assert spans["llm.generate"]["parent_id"] == spans["ask"]["span_id"]
+            assert spans["retrieve"]["attributes"]["items"] == 2
+            assert spans["llm.generate"]["attributes"]["tokens"] > 0
+            assert spans["llm.generate"]["attributes"]["output_tokens"] > 0
+            for record in records:
+                assert record["duration_ms"] >= 0 and "error" not in record
+            print(f" {len(records)} spans: {', '.join(span['name'] for span in records)}")
+
+            async def scenario(client):
+                response = await client.post("/ask", json={"question": "What is Snell's law?"})
+                assert response.status == 200
+                trace = tracing.get_trace(response.headers["X-Trace-Id"])
+                assert trace["spans"][0]["name"] == "http.request"
+                assert trace["spans"][0]["attributes"]["route"] == "/ask"
+
+                response = await client.get("/metrics")
+                assert response.status == 200
+                return await response.text()
+
+            text = asyncio.run(with_client(create_app(engine), scenario))
+            assert 'rag_span_duration_seconds_count{span="ask"} 2' in text
+            assert 'rag_span_tokens_total{span="llm.generate"}' in text
+            assert "rag_http_requests_active 0" in text
+            print(" /metrics served span histograms and queue gauges")
+        finally:
+            tracing.configure_tracing({"enabled": False})
+
+    print("Ask trace tests passed!\n")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Tracing Tests")
+    print("=" * 60 + "\n")
+
+    test_disabled_tracing_records_nothing()
+    test_ask_trace_export_and_metrics()
+
+    print("=" * 60)
+    print("All tests completed successfully!")
+    print("=" * 60)
@@ -0,0 +1,123 @@
+"""Quick test of token usage accounting and budgets."""
+
+import asyncio
+import os
+import tempfile
+
+from src.usage import configure_usage, get_ledger
+from testing_utils import write_pdf, PAGES, make_stub_engine
+
+
+STUB_PRICES = {"stub": {"prompt": 0.01, "completion": 0.02}}
+
+
+def test_ask_usage_per_request_and_session():
+    """Each answer carries its own usage; the session and the day add them up."""
+    print("Testing ask usage...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_stub_engine(tmp, llm_latency=0.0)
+        configure_usage({"prices": STUB_PRICES})
+        try:
+            today_before = get_ledger().stats()["today"]["total_tokens"]
+
+            first = engine.ask_question("What is Ohm's law?", session_id="usage-a")
+            usage = first.usage
+            # The stub reports usage like a provider, so nothing is estimated
+            assert usage["llm_calls"] == 1 and usage["estimated_calls"] == 0
+            assert usage["prompt_tokens"] > 0 and usage["completion_tokens"] > 0
+            assert usage["embedding_tokens"] > 0 and usage["degraded"] is None
+            # The stub embedding model is also called "stub", so its tokens are priced too
+            expected = ((usage["prompt_tokens"] + usage["embedding_tokens"]) * 0.01
+                        + usage["completion_tokens"] * 0.02) / 1000
+            assert abs(usage["cost_usd"] - expected) < 1e-6
+
+            # A repeated question hits the query embedding cache: no embedding tokens
+            second = engine.ask_question("What is Ohm's law?", session_id="usage-a")
+            assert second.usage["embedding_tokens"] == 0
+
+            events = []
+
+            async def stream():
+                async for event in engine.astream_question("What is Snell's law?", session_id="usage-b"):
+                    events.append(event)
+
+            asyncio.run(stream())
+            assert events[-1]["usage"]["completion_tokens"] > 0
+
+            session = get_ledger().session_totals("usage-a")
+            assert session.llm_calls == 2
+            assert session.total_tokens == first.usage["total_tokens"] + second.usage["total_tokens"]
+            today = get_ledger().stats()["today"]["total_tokens"]
+            assert today - today_before == session.total_tokens + events[-1]["usage"]["total_tokens"]
+            print(f" Session: {session.total_tokens} tokens, ${session.cost_usd:.5f}")
+        finally:
+            configure_usage({})
+
+    print("Ask usage tests passed!\n")
+
+
+def test_budget_degrades_instead_of_refusing():
+    """Past the session budget, answers use degrade.top_k and degrade.max_tokens."""
+    print("Testing budgets...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_stub_engine(tmp, llm_latency=0.0)
+        configure_usage({
+            "prices": STUB_PRICES,
+            "session_budget_usd": 0.0001,
+            "degrade": {"top_k": 1, "max_tokens": 50}
+        })
+        try:
+            question = "Explain Ohm's law and Snell's law."
+            full = engine.ask_question(question, session_id="budget-a")
+            assert full.usage["degraded"] is None and len(full.sources) == 2
+
+            degraded = engine.ask_question(question, session_id="budget-a")
+            assert degraded.usage["degraded"] == "session"
+            assert len(degraded.sources) == 1
+            assert engine._budget_generator.max_tokens == 50
+            assert degraded.text
+
+            # Other sessions keep the full configuration
+            other = engine.ask_question(question, session_id="budget-b")
+            assert other.usage["degraded"] is None and len(other.sources) == 2
+            assert engine.get_usage_stats("budget-a")["over_budget"] == "session"
+            print(f" Degraded answer used {degraded.usage['prompt_tokens']} prompt tokens "
+                  f"vs {full.usage['prompt_tokens']}")
+        finally:
+            configure_usage({})
+
+    print("Budget tests passed!\n")
+
+
+def test_ingest_usage():
+    """An ingest reports its embedding tokens and is tracked per document."""
+    print("Testing ingest usage...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_stub_engine(tmp, llm_latency=0.0)
+        path = os.path.join(tmp, "mechanics.pdf")
+        write_pdf(path, PAGES)
+
+        info = engine.ingest_document(path, show_progress=False)
+        usage = info.stats["usage"]
+        assert usage["embedding_tokens"] > 0 and usage["llm_calls"] == 0
+        assert get_ledger().ingest_totals("mechanics.pdf").embedding_tokens >= usage["embedding_tokens"]
+        print(f" {info.chunk_count} chunks -> {usage['embedding_tokens']} embedding tokens")
+
+    print("Ingest usage tests passed!\n")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Usage Accounting Tests")
+    print("=" * 60 + "\n")
+
+    test_ask_usage_per_request_and_session()
+    test_budget_degrades_instead_of_refusing()
+    test_ingest_usage()
+
+    print("=" * 60)
+    print("All tests completed successfully!")
+    print("=" * 60)
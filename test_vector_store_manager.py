@@ -0,0 +1,167 @@
+"""Quick test of per-document replace, list and delete in the vector store."""
+
+import tempfile
+
+from langchain_core.documents import Document
+
+from src.embedding_service import EmbeddingService
+from src.vector_store_manager import VectorStoreManager, SearchFilter
+
+
+def make_store(persist_directory, delete_batch_size=3):
+    return VectorStoreManager(
+        EmbeddingService(provider="stub", model="stub"),
+        persist_directory=persist_directory,
+        collection_name="store_test",
+        delete_batch_size=delete_batch_size
+    )
+
+
+def chunks(prefix, count):
+    return [Document(page_content=f"{prefix} chunk {i} about circuits", metadata={"page": i // 2})
+            for i in range(count)]
+
+
+def stored_ids(store, source):
+    return sorted(store._get_vector_store()._collection.get(where={"source": source}, include=[])["ids"])
+
+
+def test_replace_with_shorter_version_removes_stale_chunks():
+    """Re-ingesting keeps ids stable, overwrites in place and drops the leftover tail."""
+    print("Testing replace_document...")
+
+    assert VectorStoreManager.make_chunk_ids("a.pdf", 2) == VectorStoreManager.make_chunk_ids("a.pdf", 2)
+    assert VectorStoreManager.make_chunk_ids("a.pdf", 2, start=1)[0] == VectorStoreManager.make_chunk_ids("a.pdf", 2)[1]
+    assert set(VectorStoreManager.make_chunk_ids("a.pdf", 3)).isdisjoint(VectorStoreManager.make_chunk_ids("b.pdf", 3))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = make_store(tmp)
+        ids = store.replace_document("a.pdf", chunks("v1", 8))
+        store.replace_document("b.pdf", chunks("other", 2))
+        assert stored_ids(store, "a.pdf") == sorted(ids)
+
+        # Shorter second version: the first five ids are reused, the last three go
+        version = chunks("v2", 5)
+        new_ids = store.replace_document("a.pdf", version)
+        assert new_ids == ids[:5]
+        # The caller's documents are not stamped
+        assert all(doc.metadata == {"page": i // 2} for i, doc in enumerate(version))
+        assert stored_ids(store, "a.pdf") == sorted(new_ids)
+        texts = store._get_vector_store()._collection.get(where={"source": "a.pdf"})["documents"]
+        assert all(text.startswith("v2") for text in texts)
+        assert [doc.metadata["chunk_index"] for doc in store.get_document_chunks("a.pdf")] == list(range(5))
+        # The lexical index follows the same ids
+        lexical = store._get_lexical_index().search("v1 v2 chunk circuits", k=20)
+        assert sorted(doc.page_content[:2] for doc, _ in lexical) == ["ot"] * 2 + ["v2"] * 5
+        # Other documents are untouched
+        assert len(stored_ids(store, "b.pdf")) == 2
+
+    print("Replace tests passed!\n")
+
+
+def test_list_and_delete_documents():
+    """list_documents counts chunks and pages per source; delete_by_source removes only that source."""
+    print("Testing list_documents and delete_by_source...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = make_store(tmp)
+        store.replace_document("a.pdf", chunks("alpha", 7))
+        store.replace_document("b.pdf", chunks("beta", 2))
+
+        assert store.list_documents() == [
+            {"source": "a.pdf", "chunk_count": 7, "page_count": 4},
+            {"source": "b.pdf", "chunk_count": 2, "page_count": 1},
+        ]
+
+        # More chunks than delete_batch_size: deleted over several pages
+        assert store.delete_by_source("a.pdf") == 7
+        assert store.delete_by_source("a.pdf") == 0
+        assert [entry["source"] for entry in store.list_documents()] == ["b.pdf"]
+        assert all(doc.metadata["source"] == "b.pdf" for doc, _ in store._get_lexical_index().search("alpha beta", k=10))
+
+        assert store.clear_all_documents()
+        assert store.list_documents() == []
+
+    print("List and delete tests passed!\n")
+
+
+def test_search_filter_where_clauses():
+    """SearchFilter builds Chroma where clauses; filtered search only returns matching chunks."""
+    print("Testing SearchFilter...")
+
+    assert SearchFilter().to_where() is None
+    assert SearchFilter(sources=["a.pdf"]).to_where() == {"source": "a.pdf"}
+    assert SearchFilter(sources=["a.pdf", "b.pdf"]).to_where() == {"source": {"$in": ["a.pdf", "b.pdf"]}}
+    assert SearchFilter(page_range=(2, None)).to_where() == {"page": {"$gte": 2}}
+    assert SearchFilter(sources=["a.pdf"], page_range=(1, 3), where={"chunk_index": {"$lt": 5}}).to_where() == {
+        "$and": [{"source": "a.pdf"}, {"page": {"$gte": 1}}, {"page": {"$lte": 3}}, {"chunk_index": {"$lt": 5}}]
+    }
+    in_range = SearchFilter(sources=["a.pdf"], page_range=(1, 3))
+    assert in_range.matches({"source": "a.pdf", "page": 2})
+    assert not in_range.matches({"source": "a.pdf", "page": 4})
+    assert not in_range.matches({"source": "b.pdf", "page": 2})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = make_store(tmp)
+        store.replace_document("a.pdf", chunks("alpha", 8))
+        store.replace_document("b.pdf", chunks("beta", 4))
+
+        found = store.similarity_search("chunk about circuits", k=10, filters=SearchFilter(sources=["b.pdf"]))
+        assert len(found) == 4 and {doc.metadata["source"] for doc in found} == {"b.pdf"}
+        found = store.similarity_search("chunk about circuits", k=10, filters=in_range)
+        assert sorted(doc.metadata["page"] for doc in found) == [1, 1, 2, 2, 3, 3]
+        found = store.lexical_search("alpha chunk", k=10, filters=in_range)
+        assert len(found) == 6 and all(in_range.matches(doc.metadata) for doc in found)
+
+    print("SearchFilter tests passed!\n")
+
+
+def test_matches_where_agrees_with_chroma():
+    """Filters evaluated in Python (lexical index) select the same chunks as Chroma does."""
+    print("Testing where-clause translation...")
+
+    filters = [
+        SearchFilter(sources=["a.pdf", "b.pdf"]),
+        SearchFilter(page_range=(None, 1)),
+        SearchFilter(page_range=(2, 2)),
+        SearchFilter(sources=["b.pdf"], page_range=(1, None)),
+        SearchFilter(where={"chunk_index": {"$ne": 0}}),
+        SearchFilter(where={"source": {"$nin": ["a.pdf"]}}),
+        SearchFilter(where={"$and": [{"page": {"$gt": 0}}, {"page": {"$lt": 3}}]}),
+        SearchFilter(where={"$or": [{"source": "c.pdf"}, {"page": {"$eq": 0}}]}),
+        SearchFilter(sources=["a.pdf"], where={"$and": [{"page": {"$gte": 1}}, {"chunk_index": {"$lte": 4}}]}),
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = make_store(tmp)
+        store.replace_document("a.pdf", chunks("alpha", 8))
+        store.replace_document("b.pdf", chunks("beta", 4))
+        store.replace_document("c.pdf", chunks("gamma", 3))
+        collection = store._get_vector_store()._collection
+        everything = collection.get(include=["metadatas"])
+
+        for search_filter in filters:
+            expected = sorted(collection.get(where=search_filter.to_where(), include=[])["ids"])
+            matched = sorted(
+                chunk_id for chunk_id, metadata in zip(everything["ids"], everything["metadatas"])
+                if search_filter.matches(metadata)
+            )
+            assert matched == expected, search_filter
+            assert 0 < len(matched) < 15, search_filter
+
+    print("Where-clause translation tests passed!\n")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Vector Store Manager Tests")
+    print("=" * 60 + "\n")
+
+    test_replace_with_shorter_version_removes_stale_chunks()
+    test_list_and_delete_documents()
+    test_search_filter_where_clauses()
+    test_matches_where_agrees_with_chroma()
+
+    print("=" * 60)
+    print("All tests completed successfully!")
+    print("=" * 60)
@@ -0,0 +1,93 @@
+"""Stub engines, PDFs and clients shared by the test modules."""
+
+import os
+
+import yaml
+from aiohttp.test_utils import TestServer, TestClient
+from langchain_core.documents import Document
+
+from src.config import Config
+from src.embedding_service import EmbeddingService
+from src.ingest_pipeline import IngestPipeline
+from src.pdf_loader import PDFLoader
+from src.rag_engine import RAGEngine
+from src.text_chunker import TextChunker
+from src.vector_store_manager import VectorStoreManager
+
+
+def make_stub_engine(persist_directory, llm_latency=0.2):
+    """Build a RAGEngine on stub providers with both caches turned off."""
+    config_path = os.path.join(persist_directory, "config.yaml")
+    with open(config_path, "w") as f:
+        yaml.safe_dump({
+            "embedding": {"provider": "stub", "model": "stub"},
+            "llm": {"provider": "stub", "model": "stub"},
+            "retrieval": {"top_k": 2, "cache": {"enabled": False}},
+            "answer_cache": {"enabled": False},
+            "storage": {"persist_directory": persist_directory},
+        }, f)
+
+    engine = RAGEngine(Config(config_path, load_env=False))
+    engine.answer_generator._llm.latency = llm_latency
+    engine.vector_store_manager.replace_document("physics.pdf", [
+        Document(page_content="Ohm's law states that V = IR.", metadata={"page": 0}),
+        Document(page_content="Snell's law relates angles of refraction.", metadata={"page": 1}),
+    ])
+    return engine
+
+
+def write_pdf(path, pages):
+    """Write a minimal PDF with one line of Helvetica text per page."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    body = b"%PDF-1.4\n"
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(body))
+        body += f"{number} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(body)
+    body += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    body += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    body += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+
+    with open(path, "wb") as f:
+        f.write(body)
+
+
+def make_pipeline(persist_directory, scheduler=None, **kwargs):
+    embedding_service = EmbeddingService(provider="stub", model="stub", scheduler=scheduler)
+    manager = VectorStoreManager(embedding_service, persist_directory=persist_directory,
+                                 collection_name="pipeline_test")
+    settings = dict(parse_workers=0, pages_per_task=3, embed_workers=3,
+                    embed_batch_size=4, store_batch_size=8, queue_size=2)
+    settings.update(kwargs)
+    pipeline = IngestPipeline(PDFLoader(), TextChunker(chunk_size=60, chunk_overlap=10),
+                              embedding_service, manager, **settings)
+    return pipeline, manager
+
+
+PAGES = [
+    f"Page {i} covers topic {i}: momentum, energy and the conservation laws of mechanics."
+    for i in range(20)
+]
+
+
+async def with_client(app, scenario):
+
+    client = TestClient(TestServer(app))
+    await client.start_server()
+    try:
+        return await scenario(client)
+    finally:
+        await client.close()
@@ -0,0 +1,252 @@
+"""Sweep ChromaDB HNSW settings and measure build time, size, latency and recall."""
+
+# Usage:
+#   python tune_index.py --synthetic 20000 --dim 384
+#   python tune_index.py --pdf book1.pdf book2.pdf --questions questions.txt
+#   python tune_index.py --synthetic 50000 --M 16 32 --construction-ef 100 200 \
+#       --search-ef 10 50 100 --output hnsw_sweep.json
+
+import argparse
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+import chromadb
+
+from src.vector_store_manager import VectorStoreManager
+
+
+def synthetic_vectors(count: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+
+    # Clustered data is closer to real embeddings than uniform noise, which
+    # makes every index look equally good.
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    labels = rng.integers(0, clusters, size=count)
+    vectors = centers[labels] + 0.35 * rng.normal(size=(count, dim))
+    return vectors.astype(np.float32)
+
+
+def embed_pdfs(paths: List[str], questions_path: Optional[str]) -> Dict[str, np.ndarray]:
+
+    from src.rag_engine import RAGEngine
+
+    engine = RAGEngine()
+    texts = []
+    for path in paths:
+        chunks = engine.text_chunker.split_documents(engine.pdf_loader.load(path))
+        texts.extend(chunk.page_content for chunk in chunks)
+
+    print(f"Embedding {len(texts)} chunks from {len(paths)} PDF(s)...")
+    vectors = np.asarray(engine.embedding_service.embed_documents(texts), dtype=np.float32)
+
+    queries = None
+    if questions_path:
+        with open(questions_path, 'r') as f:
+            questions = [line.strip() for line in f if line.strip()]
+        queries = np.asarray(engine.embedding_service.embed_documents(questions), dtype=np.float32)
+
+    return {"corpus": vectors, "queries": queries}
+
+
+def sample_queries(corpus: np.ndarray, count: int, seed: int) -> np.ndarray:
+
+    rng = np.random.default_rng(seed + 1)
+    picks = corpus[rng.integers(0, len(corpus), size=count)]
+    noise = 0.1 * picks.std() * rng.normal(size=picks.shape)
+    return (picks + noise).astype(np.float32)
+
+
+def exact_neighbours(corpus: np.ndarray, queries: np.ndarray, k: int, space: str) -> np.ndarray:
+
+    if space == 'cosine':
+        corpus_n = corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+        queries_n = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+        scores = -(queries_n @ corpus_n.T)
+    elif space == 'ip':
+        scores = -(queries @ corpus.T)
+    else:
+        scores = (
+            (queries ** 2).sum(axis=1, keepdims=True)
+            - 2 * queries @ corpus.T
+            + (corpus ** 2).sum(axis=1)
+        )
+
+    top = np.argpartition(scores, k, axis=1)[:, :k]
+    return top
+
+
+def directory_size_mb(path: str) -> float:
+
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total / (1024 * 1024)
+
+
+def percentile_ms(samples: List[float], q: float) -> float:
+
+    return float(np.percentile(samples, q) * 1000)
+
+
+def build_collection(path: str, corpus: np.ndarray, hnsw_config: Dict[str, Any]):
+
+    client = chromadb.PersistentClient(path=path)
+    collection = client.create_collection(
+        name="hnsw_sweep",
+        metadata=VectorStoreManager.build_collection_metadata(hnsw_config),
+        embedding_function=None
+    )
+
+    batch = client.get_max_batch_size()
+    start = time.perf_counter()
+    for offset in range(0, len(corpus), batch):
+        part = corpus[offset:offset + batch]
+        collection.add(
+            ids=[str(i) for i in range(offset, offset + len(part))],
+            embeddings=part
+        )
+    # count() forces any buffered writes to be applied before timing stops
+    collection.count()
+    build_seconds = time.perf_counter() - start
+
+    return client, collection, build_seconds
+
+
+def measure_queries(collection, queries: np.ndarray, truth: np.ndarray, k: int) -> Dict[str, float]:
+
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[query], n_results=k, include=[])
+        latencies.append(time.perf_counter() - start)
+
+        found = {int(i) for i in result['ids'][0]}
+        hits += len(found & set(expected.tolist()))
+
+    return {
+        "query_p50_ms": percentile_ms(latencies, 50),
+        "query_p95_ms": percentile_ms(latencies, 95),
+        "query_p99_ms": percentile_ms(latencies, 99),
+        "recall_at_k": hits / (len(queries) * k),
+    }
+
+
+def run_sweep(corpus: np.ndarray, queries: np.ndarray, args) -> List[Dict[str, Any]]:
+
+    results = []
+    truth_by_space = {}
+
+    grid = itertools.product(
+        args.space, args.M, args.construction_ef, args.search_ef,
+        args.batch_size, args.sync_threshold
+    )
+
+    for space, m, construction_ef, search_ef, batch_size, sync_threshold in grid:
+        if space not in truth_by_space:
+            truth_by_space[space] = exact_neighbours(corpus, queries, args.k, space)
+        truth = truth_by_space[space]
+
+        hnsw_config = {
+            'space': space,
+            'M': m,
+            'construction_ef': construction_ef,
+            'search_ef': search_ef,
+            'batch_size': batch_size,
+            'sync_threshold': sync_threshold,
+        }
+
+        # Every setting gets a fresh index: Chroma reads search_ef when the
+        # index is loaded, so changing it on a live collection has no effect.
+        work_dir = tempfile.mkdtemp(prefix="hnsw_sweep_")
+        try:
+            client, collection, build_seconds = build_collection(work_dir, corpus, hnsw_config)
+            size_mb = directory_size_mb(work_dir)
+            metrics = measure_queries(collection, queries, truth, args.k)
+            del collection
+            del client
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        row = dict(hnsw_config)
+        row.update({
+            "vectors": len(corpus),
+            "build_seconds": build_seconds,
+            "index_size_mb": size_mb,
+        })
+        row.update(metrics)
+        results.append(row)
+
+        print(
+            f"space={space:<6} M={m:<3} construction_ef={construction_ef:<4} "
+            f"search_ef={search_ef:<4} build={build_seconds:6.2f}s size={size_mb:7.1f}MB "
+            f"p50={metrics['query_p50_ms']:6.2f}ms p95={metrics['query_p95_ms']:6.2f}ms "
+            f"p99={metrics['query_p99_ms']:6.2f}ms recall@{args.k}={metrics['recall_at_k']:.3f}"
+        )
+
+    return results
+
+
+def parse_args():
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--synthetic", type=int, metavar="N", help="Number of synthetic vectors")
+    source.add_argument("--pdf", nargs="+", help="PDFs to chunk and embed with the configured provider")
+
+    parser.add_argument("--dim", type=int, default=384, help="Synthetic vector dimension")
+    parser.add_argument("--clusters", type=int, default=50, help="Synthetic topic clusters")
+    parser.add_argument("--questions", help="Text file with one question per line (PDF mode)")
+    parser.add_argument("--queries", type=int, default=200, help="Number of sampled queries")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours per query for recall@k")
+    parser.add_argument("--seed", type=int, default=7)
+
+    parser.add_argument("--space", nargs="+", default=["l2"], choices=["l2", "cosine", "ip"])
+    parser.add_argument("--M", nargs="+", type=int, default=[16])
+    parser.add_argument("--construction-ef", nargs="+", type=int, default=[100])
+    parser.add_argument("--search-ef", nargs="+", type=int, default=[10, 50, 100])
+    parser.add_argument("--batch-size", nargs="+", type=int, default=[100])
+    parser.add_argument("--sync-threshold", nargs="+", type=int, default=[1000])
+
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    return parser.parse_args()
+
+
+def main():
+
+    args = parse_args()
+
+    if args.synthetic:
+        corpus = synthetic_vectors(args.synthetic, args.dim, args.clusters, args.seed)
+        queries = sample_queries(corpus, args.queries, args.seed)
+    else:
+        embedded = embed_pdfs(args.pdf, args.questions)
+        corpus = embedded["corpus"]
+        queries = embedded["queries"]
+        if queries is None:
+            queries = sample_queries(corpus, args.queries, args.seed)
+
+    if args.k >= len(corpus):
+        raise SystemExit(f"--k ({args.k}) must be smaller than the corpus ({len(corpus)} vectors)")
+
+    print("=" * 60)
+    print(f"HNSW sweep: {len(corpus)} vectors, dim {corpus.shape[1]}, {len(queries)} queries")
+    print("=" * 60)
+
+    results = run_sweep(corpus, queries, args)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,375 @@
+"""Sweep chunking and top_k settings against labeled questions: recall, MRR, prompt tokens, latency."""
+
+# Usage:
+#   python tune_retrieval.py --pdf book.pdf --labels labels.jsonl
+#   python tune_retrieval.py --pdf a.pdf b.pdf --labels labels.jsonl \
+#       --chunk-size 500 1000 1500 --chunk-overlap 0 100 200 --top-k 2 4 8 --output sweep.json
+#   python tune_retrieval.py --synthetic 200 --stub
+#
+# labels.jsonl, one question per line:
+#   {"question": "...", "source": "book.pdf", "pages": [41, 42]}
+#   {"question": "...", "passages": ["text that should be retrieved"]}
+# "pages" are page numbers as shown in the app's source citations; "source"
+# is optional and restricts them to one file. A passage counts as found when a
+# retrieved chunk contains at least PASSAGE_MATCH of its distinct words.
+#
+# Page text and embeddings are cached in --cache-dir, so re-running with a
+# wider grid only embeds chunks it has not seen before. Latency is the index
+# search alone: question embeddings are computed once and reused.
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import random
+import re
+import time
+from typing import List, Dict, Any, Tuple
+
+import chromadb
+import numpy as np
+import yaml
+from langchain_core.documents import Document
+
+from src.answer_generator import AnswerGenerator
+from src.config import Config
+from src.embedding_service import EmbeddingService
+from src.pdf_loader import PDFLoader
+from src.provider_scheduler import estimate_tokens
+from src.text_chunker import TextChunker
+from src.vector_store_manager import VectorStoreManager
+
+
+PASSAGE_MATCH = 0.6
+_WORDS = re.compile(r"[a-z0-9]+")
+
+
+class EmbeddingCache:
+
+    # Vectors keyed by sha1(model + text), saved as one .npz per model
+    def __init__(self, cache_dir: str, embedding_service: EmbeddingService):
+
+        self.embedding_service = embedding_service
+        self.path = os.path.join(
+            cache_dir, f"embeddings_{embedding_service.provider}_{re.sub(r'[^A-Za-z0-9.-]', '_', embedding_service.model)}.npz"
+        )
+        self._vectors: Dict[str, np.ndarray] = {}
+        self.hits = 0
+        self.misses = 0
+        if os.path.exists(self.path):
+            data = np.load(self.path)
+            self._vectors = dict(zip(data['keys'].tolist(), data['vectors']))
+
+    def _key(self, text: str) -> str:
+
+        return hashlib.sha1(f"{self.embedding_service.model}\x00{text}".encode('utf-8')).hexdigest()
+
+    def embed(self, texts: List[str], batch_size: int = 256) -> np.ndarray:
+
+        keys = [self._key(text) for text in texts]
+        missing = list(dict.fromkeys(key for key in keys if key not in self._vectors))
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            text_by_key = dict(zip(keys, texts))
+            for offset in range(0, len(missing), batch_size):
+                batch = missing[offset:offset + batch_size]
+                vectors = self.embedding_service.embed_documents([text_by_key[key] for key in batch])
+                for key, vector in zip(batch, vectors):
+                    self._vectors[key] = np.asarray(vector, dtype=np.float32)
+            self.save()
+
+        return np.stack([self._vectors[key] for key in keys])
+
+    def save(self) -> None:
+
+        keys = list(self._vectors)
+        np.savez(self.path, keys=np.array(keys), vectors=np.stack([self._vectors[key] for key in keys]))
+
+
+def load_pages(paths: List[str], cache_dir: str) -> List[Document]:
+
+    # Extracted page text cached per file content hash
+    loader = PDFLoader()
+    pages = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        cache_path = os.path.join(cache_dir, f"pages_{digest[:16]}.json")
+
+        if os.path.exists(cache_path):
+            with open(cache_path) as f:
+                cached = json.load(f)
+        else:
+            cached = [
+                {"text": doc.page_content, "metadata": doc.metadata}
+                for doc in loader.load(path)
+            ]
+            with open(cache_path, 'w') as f:
+                json.dump(cached, f)
+
+        source = os.path.basename(path)
+        for page in cached:
+            metadata = dict(page["metadata"], source=source)
+            pages.append(Document(page_content=page["text"], metadata=metadata))
+    return pages
+
+
+def load_labels(path: str) -> List[Dict[str, Any]]:
+
+    labels = []
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            label = json.loads(line)
+            if not label.get('question') or not (label.get('pages') or label.get('passages')):
+                raise SystemExit(f"{path}:{number}: needs 'question' and 'pages' or 'passages'")
+            labels.append(label)
+    return labels
+
+
+def synthetic_labels(pages: List[Document], count: int, seed: int) -> List[Dict[str, Any]]:
+
+    # Each question quotes a run of words from one page and expects that page
+    rng = random.Random(seed)
+    labels = []
+    for _ in range(count):
+        page = rng.choice(pages)
+        words = page.page_content.split()
+        start = rng.randrange(0, max(1, len(words) - 10))
+        labels.append({
+            "question": "What does the text say about: " + " ".join(words[start:start + 10]),
+            "source": page.metadata["source"],
+            "pages": [page.metadata["page"]]
+        })
+    return labels
+
+
+def expected_items(label: Dict[str, Any]) -> List[Tuple[str, Any]]:
+
+    items = [("page", (label.get('source'), page)) for page in label.get('pages') or []]
+    items += [("passage", set(_WORDS.findall(passage.lower()))) for passage in label.get('passages') or []]
+    return items
+
+
+def covers(chunk: Document, item: Tuple[str, Any], chunk_words: set) -> bool:
+
+    kind, value = item
+    if kind == "page":
+        source, page = value
+        return chunk.metadata.get('page') == page and source in (None, chunk.metadata.get('source'))
+    return bool(value) and len(value & chunk_words) >= PASSAGE_MATCH * len(value)
+
+
+def score_ranking(ranking: List[Document], items: List[Tuple[str, Any]], k: int) -> Tuple[float, float]:
+
+    # recall@k: share of the expected pages/passages covered by the top k chunks.
+    # reciprocal rank: 1 / rank of the first chunk covering any of them.
+    found = set()
+    first_rank = None
+    for rank, chunk in enumerate(ranking[:k], 1):
+        chunk_words = set(_WORDS.findall(chunk.page_content.lower()))
+        for index, item in enumerate(items):
+            if covers(chunk, item, chunk_words):
+                found.add(index)
+                if first_rank is None:
+                    first_rank = rank
+    return len(found) / len(items), (1.0 / first_rank if first_rank else 0.0)
+
+
+def build_index(client, name: str, chunks: List[Document], vectors: np.ndarray, hnsw_config: Dict[str, Any]):
+
+    collection = client.create_collection(
+        name=name,
+        metadata=VectorStoreManager.build_collection_metadata(hnsw_config),
+        embedding_function=None
+    )
+    batch = client.get_max_batch_size()
+    for offset in range(0, len(chunks), batch):
+        collection.add(
+            ids=[str(i) for i in range(offset, min(offset + batch, len(chunks)))],
+            embeddings=vectors[offset:offset + batch]
+        )
+    return collection
+
+
+def evaluate(collection, chunks: List[Document], labels: List[Dict[str, Any]], question_vectors: np.ndarray,
+             top_k: int, answer_generator: AnswerGenerator) -> Dict[str, float]:
+
+    latencies = []
+    recalls = []
+    reciprocal_ranks = []
+    prompt_tokens = []
+    for label, vector in zip(labels, question_vectors):
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[vector], n_results=min(top_k, len(chunks)), include=[])
+        latencies.append(time.perf_counter() - start)
+
+        ranking = [chunks[int(i)] for i in result['ids'][0]]
+        recall, reciprocal_rank = score_ranking(ranking, expected_items(label), top_k)
+        recalls.append(recall)
+        reciprocal_ranks.append(reciprocal_rank)
+
+        # What the answer prompt would cost: instructions + formatted context + question
+        prompt_tokens.append(
+            answer_generator._prompt_overhead_tokens
+            + estimate_tokens(answer_generator._format_context(ranking) + label['question'])
+        )
+
+    return {
+        "recall_at_k": float(np.mean(recalls)),
+        "mrr": float(np.mean(reciprocal_ranks)),
+        "prompt_tokens": float(np.mean(prompt_tokens)),
+        "latency_p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "latency_p95_ms": float(np.percentile(latencies, 95) * 1000),
+        "latency_p99_ms": float(np.percentile(latencies, 99) * 1000),
+    }
+
+
+def pareto_front(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+
+    # Settings no other setting beats on recall while also being no worse on
+    # prompt tokens and p95 latency (and strictly better on one of the three)
+    def dominates(a, b):
+        no_worse = (a["recall_at_k"] >= b["recall_at_k"] and a["prompt_tokens"] <= b["prompt_tokens"]
+                    and a["latency_p95_ms"] <= b["latency_p95_ms"])
+        better = (a["recall_at_k"] > b["recall_at_k"] or a["prompt_tokens"] < b["prompt_tokens"]
+                  or a["latency_p95_ms"] < b["latency_p95_ms"])
+        return no_worse and better
+
+    return [row for row in rows if not any(dominates(other, row) for other in rows if other is not row)]
+
+
+def run_sweep(pages: List[Document], labels: List[Dict[str, Any]], cache: EmbeddingCache,
+              hnsw_config: Dict[str, Any], args) -> List[Dict[str, Any]]:
+
+    results = []
+    answer_generator = AnswerGenerator(provider="stub")
+    question_vectors = cache.embed([label['question'] for label in labels])
+    client = chromadb.EphemeralClient()
+
+    for number, (chunk_size, chunk_overlap) in enumerate(itertools.product(args.chunk_size, args.chunk_overlap)):
+        if chunk_overlap >= chunk_size:
+            print(f"chunk_size={chunk_size} chunk_overlap={chunk_overlap}: skipped, overlap must be smaller")
+            continue
+
+        chunks = TextChunker(chunk_size=chunk_size, chunk_overlap=chunk_overlap).split_documents(pages)
+        misses_before = cache.misses
+        start = time.perf_counter()
+        vectors = cache.embed([chunk.page_content for chunk in chunks])
+        embed_seconds = time.perf_counter() - start
+
+        name = f"sweep_{number}"
+        collection = build_index(client, name, chunks, vectors, hnsw_config)
+        try:
+            # One index per chunking; every top_k is measured on it
+            for top_k in args.top_k:
+                metrics = evaluate(collection, chunks, labels, question_vectors, top_k, answer_generator)
+                row = {
+                    "chunk_size": chunk_size,
+                    "chunk_overlap": chunk_overlap,
+                    "top_k": top_k,
+                    "chunks": len(chunks),
+                    "embedded_chunks": cache.misses - misses_before,
+                    "embed_seconds": embed_seconds,
+                }
+                row.update(metrics)
+                results.append(row)
+
+                print(
+                    f"chunk_size={chunk_size:<5} overlap={chunk_overlap:<4} top_k={top_k:<3} "
+                    f"chunks={len(chunks):<6} recall@k={metrics['recall_at_k']:.3f} mrr={metrics['mrr']:.3f} "
+                    f"tokens={metrics['prompt_tokens']:7.0f} p50={metrics['latency_p50_ms']:6.2f}ms "
+                    f"p95={metrics['latency_p95_ms']:6.2f}ms p99={metrics['latency_p99_ms']:6.2f}ms"
+                )
+        finally:
+            client.delete_collection(name)
+
+    return results
+
+
+def parse_args():
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--pdf", nargs="+", help="PDFs to index")
+    source.add_argument("--synthetic", type=int, metavar="PAGES",
+                        help="Generate a synthetic textbook with this many pages and its own labels")
+
+    parser.add_argument("--labels", help="Labeled questions (JSONL); required with --pdf")
+    parser.add_argument("--questions", type=int, default=100, help="Synthetic questions (--synthetic)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--config", default="config.yaml", help="Embedding provider and HNSW settings")
+    parser.add_argument("--stub", action="store_true", help="Use the local stub embeddings instead")
+    parser.add_argument("--cache-dir", default="./data/retrieval_sweep_cache")
+
+    parser.add_argument("--chunk-size", nargs="+", type=int, default=[500, 1000, 1500])
+    parser.add_argument("--chunk-overlap", nargs="+", type=int, default=[0, 100, 200])
+    parser.add_argument("--top-k", nargs="+", type=int, default=[2, 4, 8])
+
+    parser.add_argument("--output", help="Write results and the Pareto front as JSON to this path")
+    args = parser.parse_args()
+
+    if args.pdf and not args.labels:
+        parser.error("--labels is required with --pdf")
+    return args
+
+
+def main():
+
+    args = parse_args()
+    os.makedirs(args.cache_dir, exist_ok=True)
+
+    if args.stub:
+        # Only the index settings are needed, so no API key is required
+        with open(args.config) as f:
+            hnsw_config = ((yaml.safe_load(f) or {}).get('storage') or {}).get('hnsw') or {}
+        embedding_service = EmbeddingService(provider="stub", model="stub")
+    else:
+        config = Config(args.config)
+        hnsw_config = config.get('storage.hnsw') or {}
+        embedding_service = EmbeddingService(
+            provider=config.get('embedding.provider', 'openai'),
+            model=config.get('embedding.model', 'text-embedding-ada-002')
+        )
+    cache = EmbeddingCache(args.cache_dir, embedding_service)
+
+    if args.synthetic:
+        from benchmarks.synthetic_corpus import textbook_pages, write_pdf
+
+        path = os.path.join(args.cache_dir, f"synthetic_{args.synthetic}_{args.seed}.pdf")
+        if not os.path.exists(path):
+            write_pdf(path, textbook_pages(args.synthetic, seed=args.seed))
+        pages = load_pages([path], args.cache_dir)
+        labels = synthetic_labels(pages, args.questions, args.seed)
+    else:
+        pages = load_pages(args.pdf, args.cache_dir)
+        labels = load_labels(args.labels)
+
+    print("=" * 60)
+    print(f"Retrieval sweep: {len(pages)} pages, {len(labels)} labeled questions")
+    print("=" * 60)
+
+    results = run_sweep(pages, labels, cache, hnsw_config, args)
+    front = pareto_front(results)
+
+    print("\nPareto-optimal settings (recall@k vs prompt tokens vs p95 latency):")
+    for row in sorted(front, key=lambda r: -r["recall_at_k"]):
+        print(
+            f"  chunk_size={row['chunk_size']:<5} overlap={row['chunk_overlap']:<4} top_k={row['top_k']:<3} "
+            f"recall@k={row['recall_at_k']:.3f} mrr={row['mrr']:.3f} tokens={row['prompt_tokens']:.0f} "
+            f"p95={row['latency_p95_ms']:.2f}ms"
+        )
+    print(f"\nEmbedding cache: {cache.hits} hits, {cache.misses} embedded")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"results": results, "pareto": front}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()